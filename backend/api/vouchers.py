@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Optional
-from datetime import datetime, date, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from typing import Dict, List, Optional
+from datetime import datetime, date, time, timedelta
 from pydantic import BaseModel
+from psycopg2 import errors
 from ..database.db_v2 import get_db
 from ..auth import get_current_user
+from ..availability import WeeklyAvailability, availability_for
+from ..conflicts import ScheduleConflictError, load_therapist_schedule, resolve_slot
+from ..conditional import conditional_get, read_change_counters
 
 router = APIRouter(prefix="/api", tags=["vouchers"])
 
@@ -68,11 +72,56 @@ class PreparationMessage(BaseModel):
 class BackupSessionRequest(BaseModel):
     session_id: int
     
+def if_changed(*tables: str, daily: bool = False):
+    """Dependency: 304 from the tables' change counters before the endpoint's query runs.
+
+    ``daily`` for bodies that also depend on CURRENT_DATE. ETags are per user.
+    """
+    def check(request: Request, response: Response,
+              current_user: dict = Depends(get_current_user), db=Depends(get_db)) -> Dict[str, str]:
+        with db.cursor() as cursor:
+            counters = read_change_counters(cursor, tables)
+        scope = [current_user["id"], date.today()] if daily else [current_user["id"]]
+        return conditional_get(request, response, counters, *scope)
+    return check
+
+def reserve_session_seat(cursor, therapist_id: int, session_date: date, session_time, capacity: int) -> bool:
+    """Serialize bookings of one therapist slot for the rest of the transaction and check a seat is free"""
+    cursor.execute(
+        "SELECT pg_advisory_xact_lock(hashtext(%s))",
+        (f"therapy_session:{therapist_id}:{session_date}:{session_time}",)
+    )
+    cursor.execute("""
+        SELECT COUNT(*) AS booked FROM therapy_sessions
+        WHERE therapist_id = %s AND session_date = %s AND session_time = %s
+          AND status NOT IN ('cancelled', 'rescheduled')
+    """, (therapist_id, session_date, session_time))
+    return cursor.fetchone()["booked"] < (capacity or 1)
+
+def voucher_booking_rules(cursor, voucher_id: int) -> WeeklyAvailability:
+    """Compiled booking rules of the voucher type a client voucher belongs to"""
+    cursor.execute("""
+        SELECT vt.booking_rules, vt.booking_rules_bitmap
+        FROM client_vouchers cv
+        JOIN voucher_types vt ON cv.voucher_type_id = vt.id
+        WHERE cv.id = %s
+    """, (voucher_id,))
+    return availability_for(cursor.fetchone() or {})
+
+def within_booking_rules(availability: WeeklyAvailability, session_date, session_time,
+                         duration_minutes: int) -> bool:
+    if isinstance(session_date, str):
+        session_date = date.fromisoformat(session_date)
+    if isinstance(session_time, str):
+        session_time = time.fromisoformat(session_time)
+    return availability.is_bookable(datetime.combine(session_date, session_time), duration_minutes)
+
 # Client endpoints
 @router.get("/client/vouchers", response_model=List[VoucherResponse])
 async def get_client_vouchers(
     current_user: dict = Depends(get_current_user),
-    db=Depends(get_db)
+    db=Depends(get_db),
+    validators: Dict[str, str] = Depends(if_changed("client_vouchers", "voucher_types", "organizations"))
 ):
     """Get all vouchers for the current client"""
     if current_user["role"] != "client":
@@ -119,7 +168,8 @@ async def get_client_sessions(
     status: Optional[str] = None,
     voucher_id: Optional[int] = None,
     current_user: dict = Depends(get_current_user),
-    db=Depends(get_db)
+    db=Depends(get_db),
+    validators: Dict[str, str] = Depends(if_changed("therapy_sessions", "users"))
 ):
     """Get sessions for the current client"""
     if current_user["role"] != "client":
@@ -193,6 +243,14 @@ async def request_reschedule(
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
         
+        availability = voucher_booking_rules(cursor, session["voucher_id"])
+        requested = [(request.preferred_date, request.preferred_time)]
+        if request.alternative_date and request.alternative_time:
+            requested.append((request.alternative_date, request.alternative_time))
+        for requested_date, requested_time in requested:
+            if not within_booking_rules(availability, requested_date, requested_time, session["duration_minutes"]):
+                raise HTTPException(status_code=400, detail="Requested time is outside the booking hours")
+        
         # Create reschedule request
         cursor.execute("""
             INSERT INTO reschedule_requests 
@@ -230,9 +288,10 @@ async def use_backup_session(
     with db.cursor() as cursor:
         # Get the missed session
         cursor.execute("""
-            SELECT ts.*, cv.backup_sessions_remaining 
+            SELECT ts.*, cv.backup_sessions_remaining, vt.max_clients_per_session
             FROM therapy_sessions ts
             JOIN client_vouchers cv ON ts.voucher_id = cv.id
+            JOIN voucher_types vt ON cv.voucher_type_id = vt.id
             WHERE ts.id = %s AND ts.client_id = %s AND ts.status = 'no_show'
         """, (request.session_id, current_user["id"]))
         
@@ -243,26 +302,48 @@ async def use_backup_session(
         if session["backup_sessions_remaining"] <= 0:
             raise HTTPException(status_code=400, detail="No backup sessions available")
         
+        # Next week at the usual time, or the nearest free slot around it
+        duration = session["duration_minutes"]
+        capacity = session["max_clients_per_session"]
+        wanted = datetime.combine(date.today() + timedelta(days=7), session["session_time"])
+        schedule = load_therapist_schedule(cursor, session["therapist_id"], wanted.date())
+        try:
+            new_start = resolve_slot(schedule, wanted, duration, capacity,
+                                     voucher_booking_rules(cursor, session["voucher_id"]), datetime.now())
+        except ScheduleConflictError as e:
+            if e.suggestion is None:
+                db.rollback()
+                raise HTTPException(status_code=409, detail="No free slot near next week")
+            new_start = e.suggestion
+        if not reserve_session_seat(cursor, session["therapist_id"], new_start.date(),
+                                    new_start.time(), capacity):
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Session is full")
+        
         # Create new session using backup
-        cursor.execute("""
-            INSERT INTO therapy_sessions 
-            (client_id, therapist_id, voucher_id, organization_id,
-             session_date, session_time, duration_minutes, session_type,
-             location, status, is_backup_session, original_session_id)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'scheduled', true, %s)
-            RETURNING id
-        """, (
-            session["client_id"],
-            session["therapist_id"],
-            session["voucher_id"],
-            session["organization_id"],
-            date.today() + timedelta(days=7),  # Schedule for next week
-            session["session_time"],
-            session["duration_minutes"],
-            session["session_type"],
-            session["location"],
-            request.session_id
-        ))
+        try:
+            cursor.execute("""
+                INSERT INTO therapy_sessions 
+                (client_id, therapist_id, voucher_id, organization_id,
+                 session_date, session_time, duration_minutes, session_type,
+                 location, status, is_backup_session, original_session_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'scheduled', true, %s)
+                RETURNING id
+            """, (
+                session["client_id"],
+                session["therapist_id"],
+                session["voucher_id"],
+                session["organization_id"],
+                new_start.date(),
+                new_start.time(),
+                duration,
+                session["session_type"],
+                session["location"],
+                request.session_id
+            ))
+        except errors.ExclusionViolation:
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Therapist was booked at that time meanwhile, please retry")
         
         new_session_id = cursor.fetchone()["id"]
         
@@ -275,7 +356,12 @@ async def use_backup_session(
         
         db.commit()
     
-    return {"message": "Backup session applied", "new_session_id": new_session_id}
+    return {
+        "message": "Backup session applied",
+        "new_session_id": new_session_id,
+        "session_date": new_start.date(),
+        "session_time": new_start.strftime("%H:%M")
+    }
 
 @router.post("/client/purchase-sessions")
 async def purchase_sessions(
@@ -378,7 +464,9 @@ async def purchase_voucher(
 @router.get("/therapist/clients")
 async def get_therapist_clients(
     current_user: dict = Depends(get_current_user),
-    db=Depends(get_db)
+    db=Depends(get_db),
+    validators: Dict[str, str] = Depends(if_changed("client_therapist_assignments", "users", "client_vouchers",
+                                                    "therapy_sessions", daily=True))
 ):
     """Get all clients assigned to therapist"""
     if current_user["role"] != "therapist":
@@ -412,7 +500,9 @@ async def get_therapist_clients(
 async def get_client_vouchers_for_therapist(
     client_id: int,
     current_user: dict = Depends(get_current_user),
-    db=Depends(get_db)
+    db=Depends(get_db),
+    validators: Dict[str, str] = Depends(if_changed("client_therapist_assignments", "client_vouchers",
+                                                    "voucher_types", "organizations"))
 ):
     """Get voucher details for a specific client"""
     if current_user["role"] != "therapist":
@@ -522,7 +612,8 @@ async def send_preparation_message(
 @router.get("/therapist/reschedule-requests")
 async def get_reschedule_requests(
     current_user: dict = Depends(get_current_user),
-    db=Depends(get_db)
+    db=Depends(get_db),
+    validators: Dict[str, str] = Depends(if_changed("reschedule_requests", "therapy_sessions", "users"))
 ):
     """Get pending reschedule requests for therapist"""
     if current_user["role"] != "therapist":
@@ -560,9 +651,11 @@ async def respond_to_reschedule(
     with db.cursor() as cursor:
         # Verify request belongs to therapist
         cursor.execute("""
-            SELECT rr.*, ts.* 
+            SELECT rr.*, ts.*, vt.max_clients_per_session
             FROM reschedule_requests rr
             JOIN therapy_sessions ts ON rr.session_id = ts.id
+            JOIN client_vouchers cv ON ts.voucher_id = cv.id
+            JOIN voucher_types vt ON cv.voucher_type_id = vt.id
             WHERE rr.id = %s AND ts.therapist_id = %s
         """, (request_id, current_user["id"]))
         
@@ -571,34 +664,58 @@ async def respond_to_reschedule(
             raise HTTPException(status_code=404, detail="Request not found")
         
         if response["action"] == "accept":
-            # Create new session
-            cursor.execute("""
-                INSERT INTO therapy_sessions 
-                (client_id, therapist_id, voucher_id, organization_id,
-                 session_date, session_time, duration_minutes, session_type,
-                 location, status)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'scheduled')
-                RETURNING id
-            """, (
-                request["client_id"],
-                request["therapist_id"],
-                request["voucher_id"],
-                request["organization_id"],
-                response["new_date"],
-                response["new_time"],
-                request["duration_minutes"],
-                request["session_type"],
-                request["location"]
-            ))
+            new_start = datetime.combine(date.fromisoformat(str(response["new_date"])),
+                                         time.fromisoformat(str(response["new_time"])))
+            schedule = load_therapist_schedule(cursor, request["therapist_id"], new_start.date(),
+                                               exclude_session_id=request["session_id"])
+            try:
+                resolve_slot(schedule, new_start, request["duration_minutes"],
+                             request["max_clients_per_session"],
+                             voucher_booking_rules(cursor, request["voucher_id"]), datetime.now())
+            except ScheduleConflictError as e:
+                db.rollback()
+                raise HTTPException(status_code=409, detail={
+                    "message": str(e),
+                    "suggested_date": e.suggestion.date() if e.suggestion else None,
+                    "suggested_time": e.suggestion.strftime("%H:%M") if e.suggestion else None
+                })
             
-            new_session_id = cursor.fetchone()["id"]
-            
-            # Update original session
+            # Release the original slot first so the overlap constraint does not see it
             cursor.execute("""
                 UPDATE therapy_sessions 
                 SET status = 'rescheduled' 
                 WHERE id = %s
             """, (request["session_id"],))
+            if not reserve_session_seat(cursor, request["therapist_id"], new_start.date(),
+                                        new_start.time(), request["max_clients_per_session"]):
+                db.rollback()
+                raise HTTPException(status_code=409, detail="Session is full")
+            
+            # Create new session
+            try:
+                cursor.execute("""
+                    INSERT INTO therapy_sessions 
+                    (client_id, therapist_id, voucher_id, organization_id,
+                     session_date, session_time, duration_minutes, session_type,
+                     location, status)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'scheduled')
+                    RETURNING id
+                """, (
+                    request["client_id"],
+                    request["therapist_id"],
+                    request["voucher_id"],
+                    request["organization_id"],
+                    new_start.date(),
+                    new_start.time(),
+                    request["duration_minutes"],
+                    request["session_type"],
+                    request["location"]
+                ))
+            except errors.ExclusionViolation:
+                db.rollback()
+                raise HTTPException(status_code=409, detail="Therapist was booked at that time meanwhile, please retry")
+            
+            new_session_id = cursor.fetchone()["id"]
             
             # Update request
             cursor.execute("""
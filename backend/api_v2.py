@@ -1,18 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from typing import List, Optional
-from datetime import datetime
+import os
+import time
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request, Response
+from typing import Dict, List, Literal, Optional
+from datetime import date, datetime, timedelta
 
 from models_v2 import (
     UserRole, Organization, OrganizationCreate, OrganizationUpdate,
     UserCreate, UserCreateWithOrg, UserUpdate, UserPasswordChange, UserResponse,
     VoucherType, VoucherTypeCreate, VoucherTypeUpdate,
     VoucherPurchase, VoucherResponse, MessageResponse,
-    PaginatedResponse, AuditLog, Permission, PermissionGrant
+    PaginatedResponse, AuditLog, AuditLogPage, Permission, PermissionGrant, AdminStats,
+    AvailableSlot
 )
-from db_v2 import db_v2
+from db_v2_async import database, request_scope
+from passwords import password_hasher
+from audit import audit_writer
+from pagination import (
+    encode_cursor, decode_cursor, cursor_for, PAGINATION_DEFAULT_LIMIT, PAGINATION_MAX_LIMIT
+)
+from db_v2 import USER_SORTS, ORGANIZATION_SORTS, VOUCHER_TYPE_SORTS
 from auth import get_current_user
+from slots import slot_templates, busy_index, free_slots, SLOTS_MAX_WINDOW_DAYS
+from serializers import FastJSONResponse, serializer_for
+from catalog_cache import catalog_cache, catalog_response
+from conditional import conditional_get
+from query_log import query_log
+
+# Seconds /api/admin/stats may serve a cached snapshot
+ADMIN_STATS_TTL = float(os.getenv("ADMIN_STATS_TTL", "15"))
 
-router = APIRouter()
+# Sync backend: every v2 request borrows one pooled connection for its whole lifetime
+router = APIRouter(dependencies=[Depends(request_scope)])
 
 # ============================================
 # DEPENDENCIES
@@ -39,19 +58,73 @@ async def verify_org_access(org_id: int, current_user: UserResponse = Depends(ge
         raise HTTPException(status_code=403, detail="Organization owner access required")
     return True
 
+def if_changed(*tables: str):
+    """Dependency: 304 from the change counters of ``tables`` before the endpoint queries them.
+
+    Declare it after the endpoint's auth dependency. ETags are per user, so a
+    304 only ever confirms a body the same user was already sent.
+    """
+    async def check(request: Request, response: Response,
+                    current_user: UserResponse = Depends(get_current_user)) -> Dict[str, str]:
+        counters = await database.get_change_counters(list(tables))
+        return conditional_get(request, response, counters, current_user.id)
+    return check
+
+def parse_cursor(cursor: Optional[str], columns) -> Optional[list]:
+    """Decode a keyset cursor for the given sort columns (400 if malformed)"""
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor, len(columns))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def build_page(rows: list, limit: int, columns, total=None) -> dict:
+    """Trim the extra look-ahead row into a next_cursor"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = cursor_for(rows[-1], columns)
+    page = {"items": rows, "per_page": limit, "next_cursor": next_cursor}
+    if total is not None:
+        page["total"], page["total_is_estimate"] = total
+    return page
+
+def fast_page_content(model, result, limit: int, columns, total=None) -> dict:
+    """build_page over (column names, tuples) rows, shaped like PaginatedResponse"""
+    names, rows = result
+    page = {name: field.default for name, field in PaginatedResponse.model_fields.items()}
+    page.update(build_page(serializer_for(model, names).many(rows), limit, columns, total))
+    return page
+
+def fast_page(model, result, limit: int, columns, total=None, headers=None) -> FastJSONResponse:
+    """fast_page_content rendered without response_model validation"""
+    return FastJSONResponse(fast_page_content(model, result, limit, columns, total), headers=headers)
+
 # ============================================
 # ADMIN - USER MANAGEMENT
 # ============================================
-@router.get("/api/admin/users", response_model=List[UserResponse])
+@router.get("/api/admin/users", response_model=PaginatedResponse[UserResponse])
 async def list_all_users(
     organization_id: Optional[int] = None,
     role: Optional[UserRole] = None,
     is_active: Optional[bool] = None,
-    current_user: UserResponse = Depends(get_current_admin)
+    approved: Optional[bool] = None,
+    sort: Literal["name", "email", "created_at"] = "name",
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(PAGINATION_DEFAULT_LIMIT, ge=1, le=PAGINATION_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    current_user: UserResponse = Depends(get_current_admin),
+    validators: Dict[str, str] = Depends(if_changed("users", "organizations"))
 ):
     """Admin: List all users in the system"""
-    users = db_v2.list_users(organization_id, role, is_active)
-    return users
+    columns = USER_SORTS[sort]
+    users = await database.list_user_rows(organization_id, role, is_active, approved, sort=sort,
+                                          descending=order == "desc", after=parse_cursor(cursor, columns),
+                                          limit=limit + 1)
+    total = await database.count_users(organization_id, role, is_active, approved) if include_total else None
+    return fast_page(UserResponse, users, limit, columns, total, validators)
 
 @router.post("/api/admin/users", response_model=UserResponse, status_code=201)
 async def create_user_admin(
@@ -60,14 +133,14 @@ async def create_user_admin(
 ):
     """Admin: Create a new user"""
     # Check if email already exists
-    existing = db_v2.get_user_by_email(user_data.email)
+    existing = await database.get_user_by_email(user_data.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create organization if needed
     org_id = None
     if user_data.organization_name:
-        org = db_v2.create_organization(
+        org = await database.create_organization(
             user_data.organization_name,
             user_data.email,
             user_data.name,
@@ -76,7 +149,7 @@ async def create_user_admin(
         org_id = org['id']
     
     # Create user
-    user = db_v2.create_user(
+    user = await database.create_user(
         email=user_data.email,
         name=user_data.name,
         password=user_data.password,
@@ -91,10 +164,11 @@ async def create_user_admin(
 @router.get("/api/admin/users/{user_id}", response_model=UserResponse)
 async def get_user_admin(
     user_id: int,
-    current_user: UserResponse = Depends(get_current_admin)
+    current_user: UserResponse = Depends(get_current_admin),
+    validators: Dict[str, str] = Depends(if_changed("users", "organizations"))
 ):
     """Admin: Get user details"""
-    user = db_v2.get_user(user_id)
+    user = await database.get_user(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -107,12 +181,12 @@ async def update_user_admin(
 ):
     """Admin: Update user details"""
     # Check if user exists
-    user = db_v2.get_user(user_id)
+    user = await database.get_user(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Update user
-    updated_user = db_v2.update_user(
+    updated_user = await database.update_user(
         user_id=user_id,
         updated_by=current_user.id,
         **user_data.dict(exclude_unset=True)
@@ -126,7 +200,7 @@ async def change_user_password_admin(
     current_user: UserResponse = Depends(get_current_admin)
 ):
     """Admin: Change user password"""
-    success = db_v2.change_user_password(user_id, password_data.password, current_user.id)
+    success = await database.change_user_password(user_id, password_data.password, current_user.id)
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": "Password updated successfully"}
@@ -137,7 +211,7 @@ async def delete_user_admin(
     current_user: UserResponse = Depends(get_current_admin)
 ):
     """Admin: Delete a user"""
-    success = db_v2.delete_user(user_id, current_user.id)
+    success = await database.delete_user(user_id, current_user.id)
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": "User deleted successfully"}
@@ -148,21 +222,158 @@ async def approve_user_admin(
     current_user: UserResponse = Depends(get_current_admin)
 ):
     """Admin: Approve a pending user"""
-    user = db_v2.approve_user(user_id, current_user.id)
+    user = await database.approve_user(user_id, current_user.id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
+@router.get("/api/admin/db-pool")
+async def get_db_pool_stats(
+    current_user: UserResponse = Depends(get_current_admin)
+):
+    """Admin: Connection pool usage and exhaustion counters"""
+    return database.stats()
+
+@router.get("/api/admin/password-hasher")
+async def get_password_hasher_stats(
+    current_user: UserResponse = Depends(get_current_admin)
+):
+    """Admin: bcrypt worker pool queue depth and timings"""
+    return password_hasher.stats()
+
+@router.get("/api/admin/audit-writer")
+async def get_audit_writer_stats(
+    current_user: UserResponse = Depends(get_current_admin)
+):
+    """Admin: audit log queue depth and flush latency"""
+    return audit_writer.stats()
+
+@router.get("/api/admin/slow-queries")
+async def get_slow_queries(
+    order_by: Literal["total", "max", "mean", "calls", "slow"] = "total",
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    current_user: UserResponse = Depends(get_current_admin)
+):
+    """Admin: Statement fingerprints of this worker ranked by time, with sampled plans"""
+    return {**query_log.stats(), "queries": query_log.report(order_by, limit)}
+
+@router.delete("/api/admin/slow-queries", response_model=MessageResponse)
+async def reset_slow_queries(
+    current_user: UserResponse = Depends(get_current_admin)
+):
+    """Admin: Start a fresh query report, e.g. after adding an index"""
+    query_log.reset()
+    return {"message": "Query log reset"}
+
+# ============================================
+# ADMIN - DASHBOARD
+# ============================================
+_admin_stats_cache = {"value": None, "expires": 0.0}
+_admin_stats_lock = asyncio.Lock()
+
+def build_admin_stats(counters: dict, now: datetime) -> dict:
+    """Shape raw stat_counters rows (see migration 005) into AdminStats"""
+    def value(key):
+        return counters.get(key) or 0
+    # Keyed by valid_until day: vouchers expiring before today drop out here
+    today = now.strftime("%Y-%m-%d")
+    vouchers_active = sum(v for key, v in counters.items()
+                          if key.startswith("vouchers.active.") and key[len("vouchers.active."):] >= today)
+    return {
+        "users_total": int(value("users.total")),
+        "users_active": int(value("users.active")),
+        "users_pending": int(value("users.pending")),
+        "users_by_role": {key[len("users.role."):]: int(v) for key, v in counters.items()
+                          if key.startswith("users.role.") and v},
+        "organizations_total": int(value("organizations.total")),
+        "organizations_active": int(value("organizations.active")),
+        "voucher_types_active": int(value("voucher_types.active")),
+        "vouchers_active": int(vouchers_active),
+        "sessions_this_week": int(value(f"sessions.week.{now.strftime('%G-%V')}")),
+        "revenue_this_month": float(value(f"revenue.month.{now.strftime('%Y-%m')}")),
+        "revenue_total": float(value("revenue.total")),
+        "generated_at": now,
+    }
+
+@router.get("/api/admin/stats", response_model=AdminStats)
+async def get_admin_stats(
+    current_user: UserResponse = Depends(get_current_admin)
+):
+    """Admin: Dashboard counters (cached for ADMIN_STATS_TTL seconds)"""
+    if _admin_stats_cache["expires"] > time.monotonic():
+        return _admin_stats_cache["value"]
+    async with _admin_stats_lock:
+        # Another request may have refreshed the cache while we waited
+        if _admin_stats_cache["expires"] > time.monotonic():
+            return _admin_stats_cache["value"]
+        now = datetime.now()
+        counters = await database.get_stat_counters(
+            keys=[f"sessions.week.{now.strftime('%G-%V')}", f"revenue.month.{now.strftime('%Y-%m')}",
+                  "revenue.total", "voucher_types.active",
+                  "organizations.total", "organizations.active"],
+            prefixes=["users.", "vouchers.active."]
+        )
+        stats = build_admin_stats(counters, now)
+        _admin_stats_cache.update(value=stats, expires=time.monotonic() + ADMIN_STATS_TTL)
+        return stats
+
+# ============================================
+# AUDIT LOG
+# ============================================
+@router.get("/api/admin/audit-logs", response_model=AuditLogPage)
+async def list_audit_logs_admin(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    organization_id: Optional[int] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    action: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_admin)
+):
+    """Admin: Browse audit logs newest first (defaults to the last 30 days)"""
+    date_to = date_to or datetime.now()
+    date_from = date_from or date_to - timedelta(days=30)
+    if date_from >= date_to:
+        raise HTTPException(status_code=400, detail="date_from must be before date_to")
+    try:
+        after = decode_cursor(cursor, 2) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filters = {
+        "user_id": user_id, "organization_id": organization_id,
+        "entity_type": entity_type, "entity_id": entity_id, "action": action
+    }
+    rows = await database.list_audit_logs(date_from, date_to, filters, after, limit + 1)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1]['created_at'], rows[-1]['id']])
+    return {"items": rows, "next_cursor": next_cursor}
+
 # ============================================
 # ADMIN - ORGANIZATION MANAGEMENT
 # ============================================
-@router.get("/api/admin/organizations", response_model=List[Organization])
+@router.get("/api/admin/organizations", response_model=PaginatedResponse[Organization])
 async def list_organizations_admin(
     is_active: Optional[bool] = None,
-    current_user: UserResponse = Depends(get_current_admin)
+    sort: Literal["name", "created_at"] = "name",
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(PAGINATION_DEFAULT_LIMIT, ge=1, le=PAGINATION_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    current_user: UserResponse = Depends(get_current_admin),
+    validators: Dict[str, str] = Depends(if_changed("organizations"))
 ):
     """Admin: List all organizations"""
-    return db_v2.list_organizations(is_active)
+    columns = ORGANIZATION_SORTS[sort]
+    orgs = await database.list_organization_rows(is_active, sort=sort, descending=order == "desc",
+                                                 after=parse_cursor(cursor, columns), limit=limit + 1)
+    total = await database.count_organizations(is_active) if include_total else None
+    return fast_page(Organization, orgs, limit, columns, total, validators)
 
 @router.post("/api/admin/organizations", response_model=Organization, status_code=201)
 async def create_organization_admin(
@@ -171,11 +382,11 @@ async def create_organization_admin(
 ):
     """Admin: Create a new organization with owner"""
     # Check if owner email already exists
-    existing = db_v2.get_user_by_email(org_data.owner_email)
+    existing = await database.get_user_by_email(org_data.owner_email)
     if existing:
         raise HTTPException(status_code=400, detail="Owner email already registered")
     
-    org = db_v2.create_organization(
+    org = await database.create_organization(
         name=org_data.name,
         owner_email=org_data.owner_email,
         owner_name=org_data.owner_name,
@@ -195,11 +406,11 @@ async def update_organization_admin(
     current_user: UserResponse = Depends(get_current_admin)
 ):
     """Admin: Update organization details"""
-    org = db_v2.get_organization(org_id)
+    org = await database.get_organization(org_id)
     if not org:
         raise HTTPException(status_code=404, detail="Organization not found")
     
-    updated_org = db_v2.update_organization(
+    updated_org = await database.update_organization(
         org_id=org_id,
         user_id=current_user.id,
         **org_data.dict(exclude_unset=True)
@@ -212,7 +423,7 @@ async def delete_organization_admin(
     current_user: UserResponse = Depends(get_current_admin)
 ):
     """Admin: Delete an organization (soft delete)"""
-    updated_org = db_v2.update_organization(
+    updated_org = await database.update_organization(
         org_id=org_id,
         user_id=current_user.id,
         is_active=False
@@ -224,15 +435,27 @@ async def delete_organization_admin(
 # ============================================
 # ORGANIZATION OWNER - USER MANAGEMENT
 # ============================================
-@router.get("/api/organizations/{org_id}/users", response_model=List[UserResponse])
+@router.get("/api/organizations/{org_id}/users", response_model=PaginatedResponse[UserResponse])
 async def list_organization_users(
     org_id: int,
-    current_user: UserResponse = Depends(get_current_org_owner)
+    role: Optional[UserRole] = None,
+    is_active: Optional[bool] = None,
+    sort: Literal["name", "email", "created_at"] = "name",
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(PAGINATION_DEFAULT_LIMIT, ge=1, le=PAGINATION_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    current_user: UserResponse = Depends(get_current_org_owner),
+    validators: Dict[str, str] = Depends(if_changed("users", "organizations"))
 ):
     """Organization owner: List users in organization"""
     await verify_org_access(org_id, current_user)
-    users = db_v2.list_users(organization_id=org_id)
-    return users
+    columns = USER_SORTS[sort]
+    users = await database.list_user_rows(organization_id=org_id, role=role, is_active=is_active,
+                                          sort=sort, descending=order == "desc",
+                                          after=parse_cursor(cursor, columns), limit=limit + 1)
+    total = await database.count_users(org_id, role, is_active) if include_total else None
+    return fast_page(UserResponse, users, limit, columns, total, validators)
 
 @router.post("/api/organizations/{org_id}/users", response_model=UserResponse, status_code=201)
 async def add_user_to_organization(
@@ -244,12 +467,12 @@ async def add_user_to_organization(
     await verify_org_access(org_id, current_user)
     
     # Check if email already exists
-    existing = db_v2.get_user_by_email(user_data.email)
+    existing = await database.get_user_by_email(user_data.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create user
-    user = db_v2.create_user(
+    user = await database.create_user(
         email=user_data.email,
         name=user_data.name,
         password=user_data.password,
@@ -271,7 +494,7 @@ async def remove_user_from_organization(
     await verify_org_access(org_id, current_user)
     
     # Check if user belongs to organization
-    user = db_v2.get_user(user_id)
+    user = await database.get_user(user_id)
     if not user or user['organization_id'] != org_id:
         raise HTTPException(status_code=404, detail="User not found in organization")
     
@@ -280,7 +503,7 @@ async def remove_user_from_organization(
         raise HTTPException(status_code=400, detail="Cannot remove yourself")
     
     # Remove user
-    success = db_v2.delete_user(user_id, current_user.id)
+    success = await database.delete_user(user_id, current_user.id)
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -289,16 +512,32 @@ async def remove_user_from_organization(
 # ============================================
 # ORGANIZATION OWNER - VOUCHER TYPE MANAGEMENT
 # ============================================
-@router.get("/api/organizations/{org_id}/voucher-types", response_model=List[VoucherType])
+@router.get("/api/organizations/{org_id}/voucher-types", response_model=PaginatedResponse[VoucherType])
 async def list_organization_voucher_types(
+    request: Request,
     org_id: int,
     is_active: Optional[bool] = None,
+    sort: Literal["name", "price", "created_at"] = "name",
+    order: Literal["asc", "desc"] = "asc",
+    limit: int = Query(PAGINATION_DEFAULT_LIMIT, ge=1, le=PAGINATION_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     current_user: UserResponse = Depends(get_current_user)
 ):
     """List voucher types for organization"""
     # Public endpoint for clients to see available voucher types
-    voucher_types = db_v2.list_voucher_types(organization_id=org_id, is_active=is_active)
-    return voucher_types
+    columns = VOUCHER_TYPE_SORTS[sort]
+    after = parse_cursor(cursor, columns)
+
+    async def load():
+        voucher_types = await database.list_voucher_type_rows(organization_id=org_id, is_active=is_active,
+                                                              sort=sort, descending=order == "desc",
+                                                              after=after, limit=limit + 1)
+        total = await database.count_voucher_types(org_id, is_active) if include_total else None
+        return fast_page_content(VoucherType, voucher_types, limit, columns, total)
+
+    key = f"org:{org_id}:{is_active}:{sort}:{order}:{limit}:{cursor}:{include_total}"
+    return catalog_response(request, await catalog_cache.fetch(key, load))
 
 @router.post("/api/organizations/{org_id}/voucher-types", response_model=VoucherType, status_code=201)
 async def create_voucher_type(
@@ -312,7 +551,7 @@ async def create_voucher_type(
     # Convert booking rules to dict
     booking_rules = vt_data.booking_rules.dict()
     
-    voucher_type = db_v2.create_voucher_type(
+    voucher_type = await database.create_voucher_type(
         organization_id=org_id,
         created_by=current_user.id,
         name=vt_data.name,
@@ -342,7 +581,7 @@ async def update_voucher_type(
     await verify_org_access(org_id, current_user)
     
     # Check if voucher type belongs to organization
-    vt = db_v2.get_voucher_type(vt_id)
+    vt = await database.get_voucher_type(vt_id)
     if not vt or vt['organization_id'] != org_id:
         raise HTTPException(status_code=404, detail="Voucher type not found")
     
@@ -351,7 +590,7 @@ async def update_voucher_type(
     if 'booking_rules' in update_data:
         update_data['booking_rules'] = update_data['booking_rules'].dict()
     
-    updated_vt = db_v2.update_voucher_type(
+    updated_vt = await database.update_voucher_type(
         voucher_type_id=vt_id,
         updated_by=current_user.id,
         **update_data
@@ -368,11 +607,11 @@ async def deactivate_voucher_type(
     await verify_org_access(org_id, current_user)
     
     # Check if voucher type belongs to organization
-    vt = db_v2.get_voucher_type(vt_id)
+    vt = await database.get_voucher_type(vt_id)
     if not vt or vt['organization_id'] != org_id:
         raise HTTPException(status_code=404, detail="Voucher type not found")
     
-    deactivated_vt = db_v2.deactivate_voucher_type(vt_id, current_user.id)
+    deactivated_vt = await database.deactivate_voucher_type(vt_id, current_user.id)
     return deactivated_vt
 
 @router.delete("/api/organizations/{org_id}/voucher-types/{vt_id}", response_model=MessageResponse)
@@ -385,7 +624,7 @@ async def delete_voucher_type(
     await verify_org_access(org_id, current_user)
     
     # Deactivate instead of hard delete
-    deactivated_vt = db_v2.deactivate_voucher_type(vt_id, current_user.id)
+    deactivated_vt = await database.deactivate_voucher_type(vt_id, current_user.id)
     if not deactivated_vt:
         raise HTTPException(status_code=404, detail="Voucher type not found")
     
@@ -396,11 +635,15 @@ async def delete_voucher_type(
 # ============================================
 @router.get("/api/voucher-types/available", response_model=List[VoucherType])
 async def list_available_voucher_types(
+    request: Request,
     current_user: UserResponse = Depends(get_current_user)
 ):
     """Client: List all available voucher types for purchase"""
-    voucher_types = db_v2.list_available_voucher_types()
-    return voucher_types
+    async def load():
+        names, rows = await database.list_available_voucher_type_rows()
+        return serializer_for(VoucherType, names).many(rows)
+
+    return catalog_response(request, await catalog_cache.fetch("available", load))
 
 @router.post("/api/vouchers/purchase", response_model=VoucherResponse, status_code=201)
 async def purchase_voucher(
@@ -412,7 +655,7 @@ async def purchase_voucher(
         raise HTTPException(status_code=403, detail="Only clients can purchase vouchers")
     
     try:
-        voucher = db_v2.purchase_voucher(
+        voucher = await database.purchase_voucher(
             client_id=current_user.id,
             voucher_type_id=purchase_data.voucher_type_id,
             payment_method=purchase_data.payment_method,
@@ -420,7 +663,7 @@ async def purchase_voucher(
         )
         
         # Get voucher type details
-        vt = db_v2.get_voucher_type(purchase_data.voucher_type_id)
+        vt = await database.get_voucher_type(purchase_data.voucher_type_id)
         voucher['voucher_type_name'] = vt['name']
         voucher['client_name'] = current_user.name
         
@@ -437,20 +680,58 @@ async def list_my_vouchers(
     # For now, return empty list
     return []
 
+# ============================================
+# CLIENT - BOOKING
+# ============================================
+@router.get("/api/client/available-slots", response_model=List[AvailableSlot])
+async def list_available_slots(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    voucher_type_id: Optional[int] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Client: Free session slots for the voucher types of my active vouchers"""
+    if current_user.role != UserRole.CLIENT:
+        raise HTTPException(status_code=403, detail="Only clients can browse available slots")
+    date_from = date_from or date.today()
+    date_to = date_to or date_from + timedelta(days=SLOTS_MAX_WINDOW_DAYS - 1)
+    if date_to < date_from or (date_to - date_from).days >= SLOTS_MAX_WINDOW_DAYS:
+        raise HTTPException(status_code=400,
+                            detail=f"Date window must span 1 to {SLOTS_MAX_WINDOW_DAYS} days")
+
+    voucher_types = [vt for vt in await database.list_bookable_voucher_types(current_user.id)
+                     if voucher_type_id is None or vt['id'] == voucher_type_id]
+    if not voucher_types:
+        return []
+    therapists = await database.list_organization_therapists(
+        list({vt['organization_id'] for vt in voucher_types}))
+    if not therapists:
+        return []
+    busy = busy_index(await database.list_therapist_sessions(
+        [t['id'] for t in therapists], date_from, date_to))
+
+    slots = []
+    for vt in voucher_types:
+        org_therapists = [t for t in therapists if t['organization_id'] == vt['organization_id']]
+        slots.extend(free_slots(slot_templates.get(vt), org_therapists, busy, date_from, date_to))
+    slots.sort(key=lambda slot: (slot['date'], slot['time'], slot['therapist_name']))
+    return slots
+
 # ============================================
 # ORGANIZATION MANAGEMENT
 # ============================================
 @router.get("/api/organizations/{org_id}", response_model=Organization)
 async def get_organization(
     org_id: int,
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: UserResponse = Depends(get_current_user),
+    validators: Dict[str, str] = Depends(if_changed("organizations"))
 ):
     """Get organization details"""
     # Check access
     if current_user.role != UserRole.ADMIN and current_user.organization_id != org_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    org = db_v2.get_organization(org_id)
+    org = await database.get_organization(org_id)
     if not org:
         raise HTTPException(status_code=404, detail="Organization not found")
     return org
@@ -464,7 +745,7 @@ async def update_organization(
     """Update organization details"""
     await verify_org_access(org_id, current_user)
     
-    updated_org = db_v2.update_organization(
+    updated_org = await database.update_organization(
         org_id=org_id,
         user_id=current_user.id,
         **org_data.dict(exclude_unset=True)
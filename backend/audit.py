@@ -0,0 +1,365 @@
+import os
+import re
+import gzip
+import json
+import time
+import queue
+import threading
+from datetime import datetime, date
+from typing import Optional, Dict, Any, List, Tuple
+
+import psycopg2.extensions
+from psycopg2.extras import execute_values
+
+# "sync": audit rows are inserted inside the mutating transaction (default)
+# "async": rows are queued on commit and written in batches by a background thread
+AUDIT_MODE = os.getenv("AUDIT_MODE", "sync").lower()
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+AUDIT_QUEUE_MAX = int(os.getenv("AUDIT_QUEUE_MAX", "10000"))
+# Total time one commit may wait for queue space; entries still not queued are dropped
+AUDIT_ENQUEUE_TIMEOUT = float(os.getenv("AUDIT_ENQUEUE_TIMEOUT", "1.0"))
+
+# Partition maintenance (see database/migrations/003_partition_audit_logs.sql)
+AUDIT_PARTITIONS_AHEAD = int(os.getenv("AUDIT_PARTITIONS_AHEAD", "3"))
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", "12"))
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", "audit_archive")
+
+# Fields that change on every write and carry no audit value
+AUDIT_IGNORED_FIELDS = {"updated_at"}
+# Derived columns left out of audit snapshots altogether
+AUDIT_EXCLUDED_FIELDS = {"booking_rules_bitmap"}
+
+INSERT_AUDIT_LOG_SQL = """
+    INSERT INTO audit_logs (user_id, organization_id, action, entity_type,
+                          entity_id, old_values, new_values, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+ENSURE_AUDIT_PARTITIONS_SQL = "SELECT ensure_audit_log_partitions(%s)"
+
+INSERT_AUDIT_LOGS_BATCH_SQL = """
+    INSERT INTO audit_logs (user_id, organization_id, action, entity_type,
+                          entity_id, old_values, new_values, created_at)
+    VALUES %s
+"""
+
+AuditEntry = Tuple[Optional[int], Optional[int], str, str, Optional[int],
+                   Optional[Dict], Optional[Dict], datetime]
+
+
+def _audited(values: Optional[Dict]) -> Optional[Dict]:
+    if values and not AUDIT_EXCLUDED_FIELDS.isdisjoint(values):
+        return {key: value for key, value in values.items() if key not in AUDIT_EXCLUDED_FIELDS}
+    return values
+
+
+def diff_values(old_values: Optional[Dict], new_values: Optional[Dict]) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """Reduce two row snapshots to the fields that actually changed.
+
+    Creates and deletes keep their single snapshot; updates keep only the
+    changed fields on both sides.
+    """
+    old_values, new_values = _audited(old_values), _audited(new_values)
+    if not old_values or not new_values:
+        return old_values or None, new_values or None
+    changed = [key for key in dict.fromkeys([*old_values, *new_values])
+               if key not in AUDIT_IGNORED_FIELDS and old_values.get(key) != new_values.get(key)]
+    if not changed:
+        return None, None
+    return ({key: old_values.get(key) for key in changed},
+            {key: new_values.get(key) for key in changed})
+
+
+class AuditLogWriter:
+    """Builds audit entries and writes them either in-transaction or in batches"""
+
+    def __init__(self, mode: str = AUDIT_MODE, batch_size: int = AUDIT_BATCH_SIZE,
+                 flush_interval: float = AUDIT_FLUSH_INTERVAL, max_queue: int = AUDIT_QUEUE_MAX):
+        self.mode = mode
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[AuditEntry]" = queue.Queue(maxsize=max_queue)
+        self._dumps = json.dumps
+        self._pool = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        # Metrics
+        self.enqueued_total = 0
+        self.written_total = 0
+        self.dropped_total = 0
+        self.flushes_total = 0
+        self.failed_flushes_total = 0
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+        self.last_flush_seconds = 0.0
+
+    @property
+    def buffered(self) -> bool:
+        return self.mode == "async"
+
+    # ============================================
+    # LIFECYCLE
+    # ============================================
+    def start(self, pool, dumps=json.dumps):
+        """Attach the psycopg2 pool used for batch flushes and start the flusher"""
+        self._pool = pool
+        self._dumps = dumps
+        if self.buffered and self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Stop the flusher and write everything still queued"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(5.0, self.flush_interval * 2))
+            self._thread = None
+        self.flush()
+
+    # ============================================
+    # ENTRIES
+    # ============================================
+    def entry(self, user_id: Optional[int], organization_id: Optional[int], action: str,
+              entity_type: str, entity_id: Optional[int], old_values: Optional[Dict],
+              new_values: Optional[Dict]) -> AuditEntry:
+        old_diff, new_diff = diff_values(old_values, new_values)
+        return (user_id, organization_id, action, entity_type, entity_id,
+                old_diff, new_diff, datetime.now())
+
+    def params(self, entry: AuditEntry) -> tuple:
+        """Query parameters for one entry, JSON-encoded"""
+        user_id, organization_id, action, entity_type, entity_id, old, new, created_at = entry
+        return (user_id, organization_id, action, entity_type, entity_id,
+                self._dumps(old) if old else None,
+                self._dumps(new) if new else None,
+                created_at)
+
+    def stage(self, conn, entry: AuditEntry) -> bool:
+        """Hold the entry on the connection until it commits; False means write it now"""
+        pending = getattr(conn, "audit_pending", None)
+        if not self.buffered or pending is None:
+            return False
+        pending.append(entry)
+        return True
+
+    def publish(self, entries: List[AuditEntry], block: bool = True,
+                timeout: float = AUDIT_ENQUEUE_TIMEOUT):
+        """Queue entries of a committed transaction.
+
+        With block=True the whole call waits at most ``timeout`` seconds for
+        queue space, however many entries the transaction wrote; once the
+        queue stays full, the rest are dropped and counted without waiting.
+        """
+        deadline = time.monotonic() + timeout
+        enqueued = 0
+        for index, entry in enumerate(entries):
+            remaining = deadline - time.monotonic()
+            try:
+                if block and remaining > 0:
+                    self._queue.put(entry, timeout=remaining)
+                else:
+                    self._queue.put_nowait(entry)
+            except queue.Full:
+                dropped = len(entries) - index
+                with self._stats_lock:
+                    self.enqueued_total += enqueued
+                    self.dropped_total += dropped
+                print(f"Audit queue full, dropped {dropped} entries from {entry[2]} {entry[3]} {entry[4]}")
+                return
+            enqueued += 1
+        with self._stats_lock:
+            self.enqueued_total += enqueued
+
+    # ============================================
+    # FLUSHING
+    # ============================================
+    def flush(self) -> int:
+        """Write queued entries in multi-row batches; returns rows written"""
+        if self._pool is None:
+            return 0
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return written
+                if not self._write(batch):
+                    return written
+                written += len(batch)
+
+    def _write(self, batch: List[AuditEntry]) -> bool:
+        started = time.perf_counter()
+        conn = None
+        try:
+            conn = self._pool.getconn()
+            with conn.cursor() as cur:
+                execute_values(cur, INSERT_AUDIT_LOGS_BATCH_SQL,
+                               [self.params(entry) for entry in batch], page_size=self.batch_size)
+            conn.commit()
+        except Exception as e:
+            if conn is not None:
+                conn.rollback()
+            with self._stats_lock:
+                self.failed_flushes_total += 1
+                self.dropped_total += len(batch)
+            print(f"Audit flush of {len(batch)} entries failed: {e}")
+            return False
+        finally:
+            if conn is not None:
+                self._pool.putconn(conn)
+
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self.flushes_total += 1
+            self.written_total += len(batch)
+            self.last_flush_seconds = elapsed
+            self.flush_seconds_total += elapsed
+            self.flush_seconds_max = max(self.flush_seconds_max, elapsed)
+        return True
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Audit writer error: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "mode": self.mode,
+                "batch_size": self.batch_size,
+                "flush_interval": self.flush_interval,
+                "queue_depth": self._queue.qsize(),
+                "queue_max": self._queue.maxsize,
+                "enqueued_total": self.enqueued_total,
+                "written_total": self.written_total,
+                "dropped_total": self.dropped_total,
+                "flushes_total": self.flushes_total,
+                "failed_flushes_total": self.failed_flushes_total,
+                "last_flush_seconds": round(self.last_flush_seconds, 6),
+                "flush_seconds_max": round(self.flush_seconds_max, 6),
+                "flush_seconds_avg": round(self.flush_seconds_total / self.flushes_total, 6)
+                if self.flushes_total else 0.0,
+            }
+
+
+class AuditedConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that hands staged audit entries to the writer on commit"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.audit_pending: List[AuditEntry] = []
+
+    def commit(self):
+        super().commit()
+        pending, self.audit_pending = self.audit_pending, []
+        if pending:
+            audit_writer.publish(pending)
+
+    def rollback(self):
+        self.audit_pending = []
+        super().rollback()
+
+
+# ============================================
+# PARTITION MAINTENANCE
+# ============================================
+PARTITION_NAME_RE = re.compile(r"^audit_logs_y(\d{4})m(\d{2})$")
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Month covered by a partition named audit_logs_yYYYYmMM"""
+    match = PARTITION_NAME_RE.match(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def retention_cutoff(retention_months: int, today: Optional[date] = None) -> date:
+    """First month that is kept; partitions for earlier months are archived"""
+    today = today or date.today()
+    months = today.year * 12 + today.month - 1 - retention_months
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def ensure_partitions(conn, months_ahead: int = AUDIT_PARTITIONS_AHEAD) -> int:
+    """Create missing monthly partitions; returns how many were created"""
+    with conn.cursor() as cur:
+        cur.execute(ENSURE_AUDIT_PARTITIONS_SQL, (months_ahead,))
+        created = cur.fetchone()[0]
+    conn.commit()
+    return created
+
+
+def list_partition_tables(conn) -> List[Tuple[str, bool]]:
+    """(table name, still attached) for every audit_logs_yYYYYmMM table"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.relname, c.relispartition
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.relkind = 'r' AND n.nspname = current_schema()
+              AND c.relname LIKE 'audit\\_logs\\_y%'
+            ORDER BY c.relname
+        """)
+        return [(name, attached) for name, attached in cur.fetchall() if partition_month(name)]
+
+
+def export_partition(conn, table: str, archive_dir: str = AUDIT_ARCHIVE_DIR) -> str:
+    """Stream a partition to <archive_dir>/<table>.ndjson.gz; returns the file path"""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{table}.ndjson.gz")
+    tmp_path = path + ".tmp"
+    with conn.cursor(name=f"export_{table}") as cur:
+        cur.itersize = 5000
+        cur.execute(f'SELECT row_to_json(t)::text FROM "{table}" t ORDER BY created_at, id')
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as out:
+            for (line,) in cur:
+                out.write(line)
+                out.write("\n")
+    conn.commit()
+    os.replace(tmp_path, path)
+    return path
+
+
+def apply_retention(conn, retention_months: int = AUDIT_RETENTION_MONTHS,
+                    archive_dir: str = AUDIT_ARCHIVE_DIR, dry_run: bool = False) -> List[str]:
+    """Detach, export and drop partitions older than the retention window.
+
+    Tables left detached by an interrupted run are picked up again, so a
+    partition is only dropped once its archive file has been written.
+    """
+    cutoff = retention_cutoff(retention_months)
+    archived = []
+    for table, attached in list_partition_tables(conn):
+        if partition_month(table) >= cutoff:
+            continue
+        if dry_run:
+            archived.append(table)
+            continue
+        if attached:
+            with conn.cursor() as cur:
+                cur.execute(f'ALTER TABLE audit_logs DETACH PARTITION "{table}"')
+            conn.commit()
+        path = export_partition(conn, table, archive_dir)
+        with conn.cursor() as cur:
+            cur.execute(f'DROP TABLE "{table}"')
+        conn.commit()
+        print(f"Archived {table} to {path}")
+        archived.append(table)
+    return archived
+
+
+# Global writer instance
+audit_writer = AuditLogWriter()
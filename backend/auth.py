@@ -1,15 +1,17 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from starlette.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from models import User
 from db_connection import db
+from passwords import password_hasher
+from principal_cache import principal_cache
 import os
 try:
     from models_v2 import UserResponse
-    from db_v2 import db_v2
+    from db_v2_async import database
     use_v2 = True
 except ImportError:
     use_v2 = False
@@ -19,14 +21,13 @@ SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-here-change-in-product
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -46,36 +47,45 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
+        user_id = payload.get("sub")
         if user_id is None:
             raise credentials_exception
+        user_id = str(user_id)
     except JWTError:
         raise credentials_exception
     
-    # Try v2 database first
-    if use_v2:
-        user_dict = db_v2.get_user(int(user_id))
-        if user_dict:
-            # Convert v2 user to v1 User model for compatibility with /users/me endpoint
-            from datetime import datetime
-            return User(
-                id=str(user_dict['id']),  # Convert int to string
-                email=user_dict['email'],
-                name=user_dict['name'],
-                role=user_dict['role'],
-                created_at=user_dict.get('created_at', datetime.now()).isoformat() if isinstance(user_dict.get('created_at'), datetime) else user_dict.get('created_at')
-            )
-    
-    # Fallback to v1
-    user = db.users.get(user_id)
-    if user is None:
-        raise credentials_exception
+    fingerprint = principal_cache.fingerprint(token)
+    user = principal_cache.get(user_id, fingerprint)
+    if user is not None:
+        return user
+    version = principal_cache.version
+
+    # v2 tokens carry an integer id, v1 tokens a UUID - resolve with a single lookup
+    if use_v2 and user_id.isdigit():
+        user_dict = await database.get_user(int(user_id))
+        if user_dict is None:
+            raise credentials_exception
+        # Convert v2 user to v1 User model for compatibility with /users/me endpoint
+        created_at = user_dict.get('created_at')
+        user = User(
+            id=str(user_dict['id']),  # Convert int to string
+            email=user_dict['email'],
+            name=user_dict['name'],
+            role=user_dict['role'],
+            created_at=created_at.isoformat() if isinstance(created_at, datetime) else created_at
+        )
+    else:
+        user = db.users.get(user_id)
+        if user is None:
+            raise credentials_exception
+
+    principal_cache.set(user_id, fingerprint, user, version)
     return user
 
-def authenticate_user(email: str, password: str) -> Optional[User]:
-    user = db.get_user_by_email(email)
+async def authenticate_user(email: str, password: str) -> Optional[User]:
+    user = await run_in_threadpool(db.get_user_by_email, email)
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    if not await password_hasher.verify_async(password, user.password_hash):
         return None
     return user
\ No newline at end of file
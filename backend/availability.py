@@ -0,0 +1,113 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Tuple
+
+# Booking rules compiled to one bit per minute of the week (bit 0 = Monday 00:00),
+# stored in voucher_types.booking_rules_bitmap next to the JSON they came from.
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+BITMAP_BYTES = MINUTES_PER_WEEK // 8
+
+_DAY_MASK = (1 << MINUTES_PER_DAY) - 1
+_WEEK_MASK = (1 << MINUTES_PER_WEEK) - 1
+
+
+def _minutes(value: str) -> int:
+    hours, minutes = value.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def compile_booking_rules(rules: Any) -> int:
+    """Bitmap of the minutes covered by the enabled ``start_time``-``end_time`` windows"""
+    if isinstance(rules, str):
+        rules = json.loads(rules)
+    bits = 0
+    for weekday, name in enumerate(WEEKDAYS):
+        rule = (rules or {}).get(name) or {}
+        if rule.get('enabled') and rule.get('start_time') and rule.get('end_time'):
+            start, end = _minutes(rule['start_time']), _minutes(rule['end_time'])
+            if end > start:
+                bits |= ((1 << (end - start)) - 1) << (weekday * MINUTES_PER_DAY + start)
+    return bits
+
+
+def minute_of_week(moment: datetime) -> int:
+    return moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+
+
+class WeeklyAvailability:
+    """Compiled booking rules answering "can a session start here" with one bit lookup.
+
+    Per session length a start mask is derived once: bit m is set when minutes
+    m..m+duration-1 are all open. It is computed for every minute of the week
+    at once with O(log duration) shifts and ANDs over the whole bitmap.
+    """
+
+    def __init__(self, bits: int = 0):
+        self.bits = bits & _WEEK_MASK
+        # The week repeated once, so sessions running past Sunday midnight wrap to Monday
+        self._doubled = self.bits | (self.bits << MINUTES_PER_WEEK)
+        self._start_masks: Dict[int, bytes] = {}
+
+    @classmethod
+    def from_rules(cls, rules: Any) -> "WeeklyAvailability":
+        return cls(compile_booking_rules(rules))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "WeeklyAvailability":
+        return cls(int.from_bytes(bytes(data), "little"))
+
+    def to_bytes(self) -> bytes:
+        return self.bits.to_bytes(BITMAP_BYTES, "little")
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, WeeklyAvailability) and self.bits == other.bits
+
+    def start_mask(self, duration_minutes: int) -> bytes:
+        """Bitmap of the minutes of the week at which a session of this length fits"""
+        mask = self._start_masks.get(duration_minutes)
+        if mask is None:
+            if duration_minutes <= 0:
+                raise ValueError("Session duration must be positive")
+            runs, width = self._doubled, 1
+            while width * 2 <= duration_minutes:
+                runs &= runs >> width
+                width *= 2
+            if width < duration_minutes:
+                runs &= runs >> (duration_minutes - width)
+            mask = (runs & _WEEK_MASK).to_bytes(BITMAP_BYTES, "little")
+            self._start_masks[duration_minutes] = mask
+        return mask
+
+    def is_bookable(self, start: datetime, duration_minutes: int) -> bool:
+        minute = minute_of_week(start)
+        return bool(self.start_mask(duration_minutes)[minute >> 3] >> (minute & 7) & 1)
+
+    def bookable_many(self, starts: Iterable[datetime], duration_minutes: int) -> List[bool]:
+        """``is_bookable`` for many candidate starts of the same length"""
+        mask = self.start_mask(duration_minutes)
+        return [bool(mask[minute >> 3] >> (minute & 7) & 1) for minute in map(minute_of_week, starts)]
+
+    def windows(self, weekday: int) -> List[Tuple[int, int]]:
+        """Open (start, end) minute ranges of one day (0=Mon), in order"""
+        day = (self.bits >> (weekday * MINUTES_PER_DAY)) & _DAY_MASK
+        windows = []
+        offset = 0
+        while day:
+            skip = (day & -day).bit_length() - 1
+            day >>= skip
+            run = (~day & (day + 1)).bit_length() - 1
+            windows.append((offset + skip, offset + skip + run))
+            day >>= run
+            offset += skip + run
+        return windows
+
+
+def availability_for(voucher_type: Dict[str, Any]) -> WeeklyAvailability:
+    """The stored bitmap of a voucher-type row, compiled from its JSON when not yet backfilled"""
+    stored = voucher_type.get('booking_rules_bitmap')
+    if stored is not None:
+        return WeeklyAvailability.from_bytes(stored)
+    return WeeklyAvailability.from_rules(voucher_type.get('booking_rules'))
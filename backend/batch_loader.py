@@ -0,0 +1,43 @@
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+# Request-scoped batching for enrichment endpoints: collect the foreign keys of
+# a result set, then fetch each referenced table once instead of once per row.
+
+FetchMany = Callable[[str, List[Any]], Iterable[Dict[str, Any]]]
+
+
+class BatchLoader:
+    """Loads rows by key with one ``fetch_many(table, keys)`` call per table and batch.
+
+    Rows already loaded are cached for the lifetime of the loader, so create
+    one per request.
+    """
+
+    def __init__(self, fetch_many: FetchMany, key: str = "id"):
+        self._fetch_many = fetch_many
+        self._key = key
+        self._cache: Dict[str, Dict[Hashable, Optional[Dict[str, Any]]]] = {}
+        self.queries = 0
+
+    def load_many(self, table: str, keys: Iterable[Hashable]) -> Dict[Hashable, Dict[str, Any]]:
+        """Rows of ``table`` for ``keys`` (missing keys are left out)"""
+        cache = self._cache.setdefault(table, {})
+        wanted = list(dict.fromkeys(k for k in keys if k is not None))
+        missing = [k for k in wanted if k not in cache]
+        if missing:
+            self.queries += 1
+            for k in missing:
+                cache[k] = None
+            for row in self._fetch_many(table, missing):
+                cache[row[self._key]] = row
+        return {k: cache[k] for k in wanted if cache[k] is not None}
+
+    def load(self, table: str, key: Hashable) -> Optional[Dict[str, Any]]:
+        return self.load_many(table, [key]).get(key)
+
+    def enrich(self, rows: List[Dict[str, Any]], field: str, table: str, into: str) -> List[Dict[str, Any]]:
+        """Attach the ``table`` row referenced by ``row[field]`` to each row as ``row[into]``"""
+        related = self.load_many(table, (row.get(field) for row in rows))
+        for row in rows:
+            row[into] = related.get(row.get(field))
+        return rows
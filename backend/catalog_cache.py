@@ -0,0 +1,255 @@
+import hashlib
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+import db_events
+import serializers
+from conditional import etag_matches
+
+# Rendered voucher-type catalogs (/api/voucher-types/available and the
+# per-organization lists), kept until an owner changes the catalog.
+#
+# The replica that writes drops its own entries through db_events; the other
+# replicas hear about it from the Postgres NOTIFY the write sends
+# (CatalogListener). The TTL only bounds how long a missed notification can
+# leave a replica stale.
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "512"))
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "300"))
+CATALOG_LISTEN_ENABLED = os.getenv("CATALOG_LISTEN_ENABLED", "true").lower() == "true"
+# Seconds between checks of the stop flag while waiting for notifications
+CATALOG_LISTEN_POLL = float(os.getenv("CATALOG_LISTEN_POLL", "5"))
+
+
+class CatalogEntry(NamedTuple):
+    etag: str
+    body: bytes
+
+
+def catalog_etag(body: bytes) -> str:
+    """Strong ETag of a rendered body; equal bodies get equal tags on every replica"""
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def catalog_response(request: Request, entry: CatalogEntry) -> Response:
+    """304 when the client already holds this body, else the body with its ETag"""
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+class LocalSharedBackend:
+    """In-process stand-in for the shared store (get/set with TTL, clear)"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[float, CatalogEntry]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CatalogEntry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[0] < time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            return item[1]
+
+    def set(self, key: str, entry: CatalogEntry, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class CatalogCache:
+    """Versioned TTL + LRU cache of rendered catalogs, optionally backed by a shared store.
+
+    ``version`` is bumped by every invalidation; a load that started before
+    one is returned to its caller but not stored, so a read racing a write
+    never puts the old catalog back.
+    """
+
+    def __init__(self, ttl: float = CATALOG_CACHE_TTL, max_size: int = CATALOG_CACHE_SIZE,
+                 shared: Optional[Any] = None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.shared = shared
+        self.version = 0
+        self._entries: "OrderedDict[str, Tuple[float, CatalogEntry]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[CatalogEntry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] >= time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._entries[key]
+            version = self.version
+        entry = self.shared.get(key) if self.shared is not None else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+        self._store(key, entry, version)
+        return entry
+
+    def put(self, key: str, content: Any, version: int) -> CatalogEntry:
+        """Render ``content``; cache it unless the catalog changed since ``version`` was read"""
+        body = serializers.dumps(content)
+        entry = CatalogEntry(catalog_etag(body), body)
+        if self._store(key, entry, version) and self.shared is not None:
+            self.shared.set(key, entry, self.ttl)
+        return entry
+
+    async def fetch(self, key: str, load: Callable[[], Awaitable[Any]]) -> CatalogEntry:
+        """Cached entry for ``key``, else ``await load()`` rendered and cached"""
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        version = self.version
+        return self.put(key, await load(), version)
+
+    def invalidate(self, **_):
+        """Drop everything here and in the shared store (the writing replica)"""
+        self.invalidate_local()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def invalidate_local(self, **_):
+        """Drop this replica's entries (a NOTIFY from another replica)"""
+        with self._lock:
+            self.version += 1
+            self.invalidations += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "ttl": self.ttl,
+                    "version": self.version, "hits": self.hits, "shared_hits": self.shared_hits,
+                    "misses": self.misses, "invalidations": self.invalidations}
+
+    def _store(self, key: str, entry: CatalogEntry, version: int) -> bool:
+        if self.ttl <= 0 or self.max_size <= 0:
+            return False
+        with self._lock:
+            if version != self.version:
+                return False
+            self._entries[key] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return True
+
+
+class CatalogListener:
+    """LISTENs on db_events.CATALOG_CHANNEL and drops the local catalog on every notification.
+
+    Other per-replica caches attach their own channels with ``listen()`` and
+    share the one LISTEN connection.
+    """
+
+    def __init__(self, cache: CatalogCache, channel: str = db_events.CATALOG_CHANNEL,
+                 poll_interval: float = CATALOG_LISTEN_POLL):
+        self.cache = cache
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self.notifications = 0
+        self.reconnects = 0
+        # channel -> (on_notify(payload), on_reconnect())
+        self._channels: Dict[str, Tuple[Callable[[str], Any], Callable[[], Any]]] = {
+            channel: (lambda payload: cache.invalidate_local(), cache.invalidate_local)
+        }
+        self._connect = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def listen(self, channel: str, on_notify: Callable[[str], Any], on_reconnect: Callable[[], Any]):
+        """Also LISTEN on ``channel``; register before start().
+
+        ``on_reconnect`` runs whenever the connection is (re)established, since
+        notifications sent while not listening are lost.
+        """
+        self._channels[channel] = (on_notify, on_reconnect)
+
+    def start(self, connect: Callable[[], Any]):
+        """``connect`` returns a fresh autocommit psycopg2 connection (db_v2.listen_connection)"""
+        self._connect = connect
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="catalog-listener", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1.0)
+            self._thread = None
+
+    def dispatch(self, notifies):
+        """Hand received notifications to their channel's handler"""
+        self.notifications += len(notifies)
+        for notify in notifies:
+            handler = self._channels.get(notify.channel)
+            if handler is None:
+                continue
+            try:
+                handler[0](notify.payload)
+            except Exception as e:
+                print(f"Listener for {notify.channel} failed: {e}")
+
+    def _run(self):
+        while not self._stopping.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                with conn.cursor() as cur:
+                    for channel in self._channels:
+                        cur.execute(f'LISTEN "{channel}"')
+                # Notifications sent while we were not listening are lost
+                for _, on_reconnect in self._channels.values():
+                    on_reconnect()
+                while not self._stopping.is_set():
+                    if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        notifies = list(conn.notifies)
+                        conn.notifies.clear()
+                        self.dispatch(notifies)
+            except Exception as e:
+                print(f"Catalog listener failed, reconnecting: {e}")
+                self.reconnects += 1
+                self._stopping.wait(self.poll_interval)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def stats(self) -> Dict[str, int]:
+        return {"notifications": self.notifications, "reconnects": self.reconnects}
+
+
+# Global catalog cache; set catalog_cache.shared to a store reachable by all
+# replicas to share rendered catalogs between them
+catalog_cache = CatalogCache()
+catalog_listener = CatalogListener(catalog_cache)
+db_events.subscribe(db_events.VOUCHER_TYPE_CHANGED, catalog_cache.invalidate)
+db_events.subscribe(db_events.ORGANIZATION_CHANGED, catalog_cache.invalidate)
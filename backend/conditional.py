@@ -0,0 +1,109 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request, Response
+
+# Conditional GET for read endpoints. Statement-level triggers (migration 010)
+# bump a 'changes.<table>' counter in stat_counters on every write, so a
+# response's validators come from a primary-key range scan: the counters of the
+# tables it reads, summed over their shards. When the client's copy is still
+# current the endpoint answers 304 before its list query runs.
+
+CHANGE_COUNTERS_SQL = """
+    SELECT key, SUM(value) AS value, MAX(updated_at)::timestamptz AS updated_at
+    FROM stat_counters WHERE key = ANY(%s)
+    GROUP BY key
+"""
+
+
+def change_keys(tables: Iterable[str]) -> List[str]:
+    return [f"changes.{table}" for table in tables]
+
+
+def read_change_counters(cursor, tables: Sequence[str]) -> List[Tuple[str, Any, Optional[datetime]]]:
+    """(key, value, updated_at) of the tables' change counters, for sync endpoints"""
+    cursor.execute(CHANGE_COUNTERS_SQL, (change_keys(tables),))
+    return [(row['key'], row['value'], row['updated_at']) if isinstance(row, dict) else tuple(row)
+            for row in cursor.fetchall()]
+
+
+class Validators(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime]
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = {"ETag": self.etag, "Cache-Control": "private, no-cache"}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified.astimezone(timezone.utc), usegmt=True)
+        return headers
+
+
+def build_validators(counters: Iterable[Tuple[str, Any, Optional[datetime]]], *scope: Any) -> Validators:
+    """Weak ETag over the counter values and ``scope`` (URL, user, ...), Last-Modified from the counters.
+
+    A table that was never written has no counter row yet; it hashes as absent
+    until its first write creates one, which changes the tag. Last-Modified is
+    rounded up to whole seconds so it never predates the newest write.
+    """
+    counters = sorted(counters, key=lambda counter: counter[0])
+    digest = hashlib.blake2b(digest_size=12)
+    for key, value, _ in counters:
+        digest.update(f"{key}={value};".encode())
+    for part in scope:
+        digest.update(f"|{part}".encode())
+    stamps = [updated_at for _, _, updated_at in counters if updated_at is not None]
+    last_modified = None
+    if stamps:
+        newest = max(stamps)
+        last_modified = newest.replace(microsecond=0)
+        if newest.microsecond:
+            last_modified += timedelta(seconds=1)
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return Validators(f'W/"{digest.hexdigest()}"', last_modified)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 prescribes for GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def is_not_modified(request: Request, validators: Validators) -> bool:
+    """If-None-Match only; If-Modified-Since never answers 304.
+
+    Last-Modified has whole-second resolution, so a second write in the same
+    second leaves it unchanged and If-Modified-Since would vouch for a copy
+    that misses that write. The ETag changes with every counter bump.
+    """
+    return etag_matches(request.headers.get("if-none-match"), validators.etag)
+
+
+def conditional_get(request: Request, response: Optional[Response],
+                    counters: Iterable[Tuple[str, Any, Optional[datetime]]], *scope: Any) -> Dict[str, str]:
+    """Raise a 304 when the client's copy is current, else return (and set) the validator headers.
+
+    ``scope`` should hold everything besides the tables that the body depends
+    on; the request URL is always part of it. Endpoints returning a Response
+    of their own pass the returned headers to it.
+    """
+    validators = build_validators(counters, str(request.url.path), str(request.url.query), *scope)
+    headers = validators.headers
+    if is_not_modified(request, validators):
+        raise HTTPException(status_code=304, headers=headers)
+    if response is not None:
+        response.headers.update(headers)
+    return headers
@@ -0,0 +1,103 @@
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from availability import WeeklyAvailability
+from interval_index import IntervalIndex
+
+# How far before and after a taken slot the nearest free one is searched for
+CONFLICT_SEARCH_DAYS = int(os.getenv("CONFLICT_SEARCH_DAYS", "14"))
+# Granularity of suggested start times
+CONFLICT_SEARCH_STEP_MINUTES = int(os.getenv("CONFLICT_SEARCH_STEP_MINUTES", "15"))
+
+# Sessions that still occupy the therapist; same status filter as the
+# therapy_sessions_no_overlap constraint (migration 008)
+THERAPIST_BUSY_SQL = """
+    SELECT id, session_date, session_time, duration_minutes
+    FROM therapy_sessions
+    WHERE therapist_id = %s AND session_date BETWEEN %s AND %s
+      AND status NOT IN ('cancelled', 'rescheduled')
+"""
+
+
+class ScheduleConflictError(Exception):
+    """Raised when a session would overlap another session of the same therapist"""
+
+    def __init__(self, message: str, suggestion: Optional[datetime] = None):
+        super().__init__(message)
+        self.suggestion = suggestion
+
+
+def session_interval(session: Dict[str, Any]) -> Tuple[datetime, datetime]:
+    start = datetime.combine(session['session_date'], session['session_time'])
+    return start, start + timedelta(minutes=session['duration_minutes'])
+
+
+class TherapistSchedule:
+    """Booked sessions of one therapist, checked in-process before the exclusion constraint.
+
+    Sessions starting at the same instant are seats of one group slot and do
+    not conflict with each other; ``capacity`` bounds how many there may be.
+    """
+
+    def __init__(self, sessions: Iterable[Dict[str, Any]] = ()):
+        self._index = IntervalIndex(session_interval(session) for session in sessions)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def add(self, start: datetime, duration_minutes: int):
+        self._index.add(start, start + timedelta(minutes=duration_minutes))
+
+    def conflicts(self, start: datetime, duration_minutes: int) -> List[Tuple[datetime, datetime]]:
+        """Booked intervals a session at ``start`` would overlap, other than its own slot"""
+        end = start + timedelta(minutes=duration_minutes)
+        return [interval for interval in self._index.overlapping(start, end) if interval[0] != start]
+
+    def is_free(self, start: datetime, duration_minutes: int, capacity: int = 1) -> bool:
+        overlapping = self._index.overlapping(start, start + timedelta(minutes=duration_minutes))
+        seats = sum(1 for booked_start, _ in overlapping if booked_start == start)
+        return seats == len(overlapping) and seats < (capacity or 1)
+
+    def nearest_free(self, start: datetime, duration_minutes: int, capacity: int = 1,
+                     availability: Optional[WeeklyAvailability] = None,
+                     not_before: Optional[datetime] = None, days: int = CONFLICT_SEARCH_DAYS,
+                     step_minutes: int = CONFLICT_SEARCH_STEP_MINUTES) -> Optional[datetime]:
+        """Free start closest to ``start`` (the later one on ties), inside the booking rules if given"""
+        step = timedelta(minutes=step_minutes)
+        candidates = [start]
+        for k in range(1, days * 24 * 60 // step_minutes + 1):
+            candidates.append(start + k * step)
+            candidates.append(start - k * step)
+        if not_before is not None:
+            candidates = [candidate for candidate in candidates if candidate >= not_before]
+        if availability is not None:
+            bookable = availability.bookable_many(candidates, duration_minutes)
+            candidates = [candidate for candidate, ok in zip(candidates, bookable) if ok]
+        for candidate in candidates:
+            if self.is_free(candidate, duration_minutes, capacity):
+                return candidate
+        return None
+
+
+def load_therapist_schedule(cursor, therapist_id: int, around: date, days: int = CONFLICT_SEARCH_DAYS,
+                            exclude_session_id: Optional[int] = None) -> TherapistSchedule:
+    """The therapist's sessions within ``days`` of ``around``, i.e. everything nearest_free can hit.
+
+    ``exclude_session_id`` leaves out a session that is being moved.
+    """
+    cursor.execute(THERAPIST_BUSY_SQL, (therapist_id, around - timedelta(days=days + 1),
+                                        around + timedelta(days=days + 1)))
+    return TherapistSchedule(session for session in cursor.fetchall() if session['id'] != exclude_session_id)
+
+
+def resolve_slot(schedule: TherapistSchedule, start: datetime, duration_minutes: int,
+                 capacity: int = 1, availability: Optional[WeeklyAvailability] = None,
+                 not_before: Optional[datetime] = None) -> datetime:
+    """``start`` if it is free, else raise ScheduleConflictError carrying the nearest free start"""
+    fits_rules = availability is None or availability.is_bookable(start, duration_minutes)
+    if fits_rules and schedule.is_free(start, duration_minutes, capacity):
+        return start
+    suggestion = schedule.nearest_free(start, duration_minutes, capacity, availability, not_before)
+    reason = "Therapist is already booked at that time" if fits_rules else "Time is outside the booking hours"
+    raise ScheduleConflictError(reason, suggestion)
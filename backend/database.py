@@ -1,20 +1,148 @@
-from typing import Dict, List, Optional
-from models import User, TherapyClass, Voucher, VoucherCode, Reservation, Session, UserRole, CodeStatus
-from datetime import datetime, date, time, timedelta
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Sequence, Tuple
+from models import User, TherapyClass, Voucher, VoucherCode, Reservation, Session, UserRole, CodeStatus, SessionStatus
+from datetime import datetime, date, time
 import uuid
 import random
 import string
+import threading
+from batch_loader import BatchLoader
+from scheduling import (
+    recurrence, schedule_dates, ClassFullError,
+    RESERVATION_SESSIONS, SCHEDULE_BLACKOUT_DATES, SEAT_RELEASING_STATUSES
+)
+
+class IndexedTable(dict):
+    """Rows by id with hash indexes on selected fields.
+    
+    Rows are stored as plain dicts, like the ``RealDictRow``s PostgresDatabase
+    returns; a pydantic model assigned to ``table[id]`` is converted. Indexes
+    are updated on every ``table[id] = row`` and ``del table[id]``; change a
+    stored row with ``update_row`` so the indexes follow. Offers the same
+    find/first/exists/get lookups as ``db_connection.Repository``, returning
+    copies of the rows (or ``row_factory(row)``, as Repository does).
+    """
+    
+    def __init__(self, *indexed_fields: str, row_factory: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        super().__init__()
+        self.row_factory = row_factory
+        # field -> value -> ids (a dict keeps insertion order)
+        self._indexes: Dict[str, Dict[Any, Dict[Hashable, None]]] = {f: {} for f in indexed_fields}
+        self._indexed_values: Dict[Hashable, Dict[str, Any]] = {}
+    
+    def __setitem__(self, key: Hashable, row: Any):
+        # dict(model) keeps fields excluded from model_dump(), e.g. password_hash
+        row = dict(row)
+        if key in self._indexed_values:
+            self._unindex(key)
+        super().__setitem__(key, row)
+        values = {field: row.get(field) for field in self._indexes}
+        self._indexed_values[key] = values
+        for field, value in values.items():
+            self._indexes[field].setdefault(value, {})[key] = None
+    
+    def __delitem__(self, key: Hashable):
+        super().__delitem__(key)
+        self._unindex(key)
+    
+    def pop(self, key: Hashable, *default):
+        if key in self:
+            self._unindex(key)
+        return super().pop(key, *default)
+    
+    def _unindex(self, key: Hashable):
+        for field, value in self._indexed_values.pop(key).items():
+            ids = self._indexes[field][value]
+            del ids[key]
+            if not ids:
+                del self._indexes[field][value]
+    
+    def _row(self, row: Dict[str, Any]) -> Any:
+        return self.row_factory(row) if self.row_factory else dict(row)
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        row = super().get(key)
+        return self._row(row) if row is not None else default
+    
+    def update_row(self, key: Hashable, **changes) -> Optional[Any]:
+        """Apply ``changes`` to the row and return it, or None when there is no such row"""
+        row = super().get(key)
+        if row is None:
+            return None
+        self[key] = {**row, **changes}
+        return self.get(key)
+    
+    def _lookup(self, field: str, value: Any) -> Dict[Hashable, None]:
+        index = self._indexes[field]
+        if isinstance(value, (list, tuple, set, frozenset)):
+            ids: Dict[Hashable, None] = {}
+            for v in value:
+                ids.update(index.get(v, {}))
+            return ids
+        return index.get(value, {})
+    
+    def find(self, order_by: Sequence[str] = (), limit: Optional[int] = None,
+             offset: Optional[int] = None, **where) -> List[Any]:
+        indexed = [self._lookup(f, v) for f, v in where.items() if f in self._indexes]
+        if "id" in where:
+            keys = where["id"] if isinstance(where["id"], (list, tuple, set, frozenset)) else [where["id"]]
+            indexed.append({key: None for key in keys if key in self})
+        indexed.sort(key=len)
+        if indexed:
+            rows: Iterable[Dict[str, Any]] = (self[key] for key in indexed[0]
+                                              if all(key in ids for ids in indexed[1:]))
+        else:
+            rows = self.values()
+        scanned = {f: v for f, v in where.items() if f not in self._indexes and f != "id"}
+        result = [row for row in rows if all(_matches(row.get(f), v) for f, v in scanned.items())]
+        for column in reversed(order_by):
+            descending = column.startswith("-")
+            result.sort(key=lambda row: row[column.lstrip("-")], reverse=descending)
+        start = offset or 0
+        result = result[start:start + limit] if limit is not None else result[start:]
+        return [self._row(row) for row in result]
+    
+    def first(self, order_by: Sequence[str] = (), **where) -> Optional[Any]:
+        rows = self.find(order_by=order_by, limit=1, **where)
+        return rows[0] if rows else None
+    
+    def exists(self, **where) -> bool:
+        return self.first(**where) is not None
+
+
+def _matches(actual: Any, expected: Any) -> bool:
+    if isinstance(expected, (list, tuple, set, frozenset)):
+        return actual in expected
+    return actual == expected
+
+
+# Columns exposed by fetch_many, matching db_connection.BATCH_LOAD_COLUMNS
+BATCH_LOAD_FIELDS = {
+    "users": {"id", "email", "name", "role"},
+    "therapy_classes": None,
+    "vouchers": None,
+    "reservations": None,
+    "sessions": None,
+}
 
 class MockDatabase:
-    def __init__(self):
-        self.users: Dict[str, User] = {}
-        self.therapy_classes: Dict[str, TherapyClass] = {}
-        self.vouchers: Dict[str, Voucher] = {}
-        self.voucher_codes: Dict[str, VoucherCode] = {}
-        self.reservations: Dict[str, Reservation] = {}
-        self.sessions: Dict[str, Session] = {}
+    """In-memory engine with the same interface as db_connection.PostgresDatabase.
+    
+    Like it, lookups return users as ``User`` models and every other row as a dict.
+    """
+    
+    def __init__(self, seed_mock_data: bool = True):
+        self.users = IndexedTable("email", "role", row_factory=lambda row: User(**row))
+        self.therapy_classes = IndexedTable("therapist_id")
+        self.vouchers = IndexedTable("client_id")
+        self.voucher_codes = IndexedTable("code", "voucher_id")
+        self.reservations = IndexedTable("client_id", "therapy_class_id", "voucher_code_id")
+        self.sessions = IndexedTable("reservation_id")
+        # (class id, date, time) -> booked seats
+        self.slot_bookings: Dict[Tuple[str, date, time], int] = {}
+        self._booking_lock = threading.Lock()
         
-        self._init_mock_data()
+        if seed_mock_data:
+            self._init_mock_data()
     
     def _init_mock_data(self):
         # Create admin user
@@ -112,107 +240,176 @@ class MockDatabase:
         
         # Create a sample voucher and reservation for testing
         sample_voucher = self.create_voucher()
-        sample_voucher.client_id = client.id
-        sample_voucher.activated_at = datetime.now()
+        self.vouchers.update_row(sample_voucher['id'], client_id=client.id, activated_at=datetime.now())
         
         # Create a reservation for the client
-        sample_code = sample_voucher.codes[0]
+        sample_code = sample_voucher['codes'][0]
         self.create_reservation(
             voucher_code=sample_code,
-            therapy_class=class1,
+            therapy_class=self.therapy_classes.get(class1.id),
             client_id=client.id,
             start_date=date.today()
         )
     
     def generate_voucher_code(self) -> str:
-        return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+        while True:
+            code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+            if not self.voucher_codes.exists(code=code):
+                return code
     
-    def create_voucher(self, regular_codes: int = 10, backup_codes: int = 2) -> Voucher:
+    def create_voucher(self, regular_codes: int = 10, backup_codes: int = 2) -> Dict[str, Any]:
+        """Voucher row with its codes under ``codes``"""
         voucher = Voucher(id=str(uuid.uuid4()))
-        
-        # Generate regular codes
-        for i in range(regular_codes):
+        self.vouchers[voucher.id] = voucher.model_dump(exclude={"codes"})
+        codes = []
+        for i in range(regular_codes + backup_codes):
             code = VoucherCode(
                 code=self.generate_voucher_code(),
                 voucher_id=voucher.id,
-                is_backup=False
+                is_backup=i >= regular_codes
             )
             self.voucher_codes[code.id] = code
-            voucher.codes.append(code)
-        
-        # Generate backup codes
-        for i in range(backup_codes):
-            code = VoucherCode(
-                code=self.generate_voucher_code(),
-                voucher_id=voucher.id,
-                is_backup=True
-            )
-            self.voucher_codes[code.id] = code
-            voucher.codes.append(code)
-        
-        self.vouchers[voucher.id] = voucher
-        return voucher
+            codes.append(self.voucher_codes.get(code.id))
+        return {**self.vouchers.get(voucher.id), "codes": codes}
     
     def get_user_by_email(self, email: str) -> Optional[User]:
-        for user in self.users.values():
-            if user.email == email:
-                return user
-        return None
-    
-    def get_voucher_code_by_code(self, code: str) -> Optional[VoucherCode]:
-        for vc in self.voucher_codes.values():
-            if vc.code == code:
-                return vc
-        return None
-    
-    def create_reservation(self, voucher_code: VoucherCode, therapy_class: TherapyClass, 
-                          client_id: str, start_date: date) -> Reservation:
+        return self.users.first(email=email)
+    
+    def get_user_by_id(self, user_id: str) -> Optional[User]:
+        return self.users.get(user_id)
+    
+    def get_voucher_code_by_code(self, code: str) -> Optional[Dict[str, Any]]:
+        return self.voucher_codes.first(code=code)
+    
+    def create_reservation(self, voucher_code: Dict[str, Any], therapy_class: Dict[str, Any],
+                          client_id: str, start_date: date, sessions: int = RESERVATION_SESSIONS,
+                          blackout: FrozenSet[date] = SCHEDULE_BLACKOUT_DATES, frequency: str = "weekly",
+                          custom_days: Optional[List[int]] = None) -> Dict[str, Any]:
+        """Reservation row with its session rows under ``sessions``.
+        
+        Raises ClassFullError when any of the slots has no seat left.
+        """
+        weekdays, interval = recurrence(frequency, custom_days, therapy_class['day_of_week'])
+        dates = schedule_dates(start_date, sessions, weekdays, interval, blackout)
+        slots = [(therapy_class['id'], d, therapy_class['time']) for d in dates]
+        capacity = therapy_class.get('max_participants') or 1
+        
+        # Claim a seat in every slot atomically, like the session_slots upsert
+        with self._booking_lock:
+            if any(self.slot_bookings.get(slot, 0) >= capacity for slot in slots):
+                raise ClassFullError(f"Therapy class {therapy_class['id']} is full")
+            for slot in slots:
+                self.slot_bookings[slot] = self.slot_bookings.get(slot, 0) + 1
+        
         reservation = Reservation(
-            voucher_code_id=voucher_code.id,
-            therapy_class_id=therapy_class.id,
+            voucher_code_id=voucher_code['id'],
+            therapy_class_id=therapy_class['id'],
             client_id=client_id,
             start_date=start_date
         )
+        self.reservations[reservation.id] = reservation.model_dump(exclude={"sessions"})
         
-        # Create 10 sessions for the next 10 weeks
-        current_date = start_date
-        for i in range(10):
-            # Find next occurrence of the therapy class day
-            while current_date.weekday() != therapy_class.day_of_week:
-                current_date += timedelta(days=1)
-            
+        # Sessions on the class day (or the voucher-type frequency), skipping blackout dates
+        session_rows = []
+        for scheduled_date in dates:
             session = Session(
                 reservation_id=reservation.id,
-                scheduled_date=current_date,
-                scheduled_time=therapy_class.time
+                scheduled_date=scheduled_date,
+                scheduled_time=therapy_class['time']
             )
             self.sessions[session.id] = session
-            reservation.sessions.append(session)
-            
-            # Move to next week
-            current_date += timedelta(days=7)
-        
-        self.reservations[reservation.id] = reservation
+            session_rows.append(self.sessions.get(session.id))
         
         # Mark voucher code as used
-        voucher_code.status = CodeStatus.USED
-        voucher_code.used_count += 1
+        code = self.voucher_codes[voucher_code['id']]
+        self.voucher_codes.update_row(code['id'], status=CodeStatus.USED, used_count=code['used_count'] + 1)
         
-        return reservation
-    
-    def get_user_reservations(self, user_id: str) -> List[Reservation]:
-        return [r for r in self.reservations.values() if r.client_id == user_id]
+        return {**self.reservations.get(reservation.id), "sessions": session_rows}
     
-    def get_therapist_sessions(self, therapist_id: str) -> List[Session]:
-        therapist_classes = [tc.id for tc in self.therapy_classes.values() 
-                           if tc.therapist_id == therapist_id]
+    def reschedule_session(self, session_id: str, new_date: date, new_time: time,
+                           therapist_notes: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Move a session to new_date / new_time, taking its seat in the class slot along.
         
-        sessions = []
-        for reservation in self.reservations.values():
-            if reservation.therapy_class_id in therapist_classes:
-                sessions.extend(reservation.sessions)
-        
-        return sorted(sessions, key=lambda s: (s.scheduled_date, s.scheduled_time))
+        Raises ClassFullError when the new slot has no seat left.
+        """
+        with self._booking_lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return None
+            therapy_class = self.therapy_classes[self.reservations[session['reservation_id']]['therapy_class_id']]
+            new_slot = (therapy_class['id'], new_date, new_time)
+            old_slot = None
+            if session['status'] not in SEAT_RELEASING_STATUSES:
+                old_slot = (therapy_class['id'], session['actual_date'] or session['scheduled_date'],
+                            session['actual_time'] or session['scheduled_time'])
+            if new_slot != old_slot:
+                if self.slot_bookings.get(new_slot, 0) >= (therapy_class['max_participants'] or 1):
+                    raise ClassFullError(f"Therapy class {therapy_class['id']} is full on {new_date} {new_time}")
+                self.slot_bookings[new_slot] = self.slot_bookings.get(new_slot, 0) + 1
+                if old_slot:
+                    self.slot_bookings[old_slot] = max(self.slot_bookings.get(old_slot, 0) - 1, 0)
+            changes = {"actual_date": new_date, "actual_time": new_time, "status": SessionStatus.RESCHEDULED}
+            if therapist_notes is not None:
+                changes["therapist_notes"] = therapist_notes
+            return self.sessions.update_row(session_id, **changes)
+    
+    def get_user_reservations(self, user_id: str) -> List[Dict[str, Any]]:
+        return self.reservations.find(client_id=user_id)
+    
+    def _therapist_reservations(self, therapist_id: str) -> List[Dict[str, Any]]:
+        class_ids = [tc['id'] for tc in self.therapy_classes.find(therapist_id=therapist_id)]
+        return self.reservations.find(therapy_class_id=class_ids)
+    
+    def get_therapist_sessions(self, therapist_id: str) -> List[Dict[str, Any]]:
+        reservation_ids = [r['id'] for r in self._therapist_reservations(therapist_id)]
+        return self.sessions.find(reservation_id=reservation_ids,
+                                  order_by=["scheduled_date", "scheduled_time"])
+    
+    def get_therapist_clients(self, therapist_id: str) -> List[Dict[str, Any]]:
+        """Same result as PostgresDatabase.get_therapist_clients, from the indexes"""
+        today = date.today()
+        clients: Dict[str, Dict[str, Any]] = {}
+        for reservation in self._therapist_reservations(therapist_id):
+            client = self.users.get(reservation['client_id'])
+            if not client:
+                continue
+            entry = clients.setdefault(client.id, {
+                'id': client.id,
+                'name': client.name,
+                'email': client.email,
+                'active_reservations': 0,
+                'total_sessions': 0,
+                'next_session': None
+            })
+            sessions = self.sessions.find(reservation_id=reservation['id'])
+            entry['total_sessions'] += len(sessions)
+            upcoming = [s for s in sessions
+                        if s['scheduled_date'] >= today and s['status'] != SessionStatus.CANCELLED]
+            if not upcoming:
+                continue
+            entry['active_reservations'] += 1
+            first = min(upcoming, key=lambda s: (s['scheduled_date'], s['scheduled_time']))
+            current = entry['next_session']
+            if not current or (first['scheduled_date'].isoformat(), first['scheduled_time'].isoformat()) < \
+                    (current['date'], current['time']):
+                entry['next_session'] = {
+                    'date': first['scheduled_date'].isoformat(),
+                    'time': first['scheduled_time'].isoformat(),
+                    'class_name': self.therapy_classes[reservation['therapy_class_id']]['name']
+                }
+        return sorted(clients.values(), key=lambda c: (c['name'], c['id']))
+    
+    def fetch_many(self, table: str, ids: List[Any]) -> List[Dict[str, Any]]:
+        """Rows of ``table`` whose id is in ``ids``, as dicts like the Postgres rows"""
+        if table not in BATCH_LOAD_FIELDS:
+            raise ValueError(f"Table {table} cannot be batch loaded")
+        rows = getattr(self, table)
+        fields = BATCH_LOAD_FIELDS[table]
+        return [{k: v for k, v in rows[key].items() if fields is None or k in fields}
+                for key in dict.fromkeys(ids) if key in rows]
+    
+    def batch_loader(self) -> BatchLoader:
+        return BatchLoader(self.fetch_many)
 
 # Global database instance
 db = MockDatabase()
\ No newline at end of file
@@ -0,0 +1,35 @@
+-- Migration: per-year invoice counters
+-- Replaces the COUNT(*) scan over vouchers in _generate_invoice_number.
+-- The counter row is locked by the allocating transaction until it commits,
+-- so concurrent purchases serialize on it and a rollback leaves no gap.
+-- organization_id = 0 holds the global series (INVOICE_NUMBERING=global).
+
+CREATE TABLE IF NOT EXISTS invoice_counters (
+    organization_id INTEGER NOT NULL DEFAULT 0,
+    year INTEGER NOT NULL,
+    last_number INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (organization_id, year)
+);
+
+-- Continue the global series after the highest number already issued
+INSERT INTO invoice_counters (organization_id, year, last_number)
+SELECT 0,
+       (regexp_match(invoice_number, '^INV-(\d{4})-(\d+)$'))[1]::INTEGER,
+       MAX((regexp_match(invoice_number, '^INV-(\d{4})-(\d+)$'))[2]::INTEGER)
+FROM vouchers
+WHERE invoice_number ~ '^INV-\d{4}-\d+$'
+GROUP BY 1, 2
+ON CONFLICT (organization_id, year)
+DO UPDATE SET last_number = GREATEST(invoice_counters.last_number, EXCLUDED.last_number);
+
+-- Continue per-organization series (INV-<year>-<org>-<n>) the same way
+INSERT INTO invoice_counters (organization_id, year, last_number)
+SELECT (regexp_match(invoice_number, '^INV-(\d{4})-(\d+)-(\d+)$'))[2]::INTEGER,
+       (regexp_match(invoice_number, '^INV-(\d{4})-(\d+)-(\d+)$'))[1]::INTEGER,
+       MAX((regexp_match(invoice_number, '^INV-(\d{4})-(\d+)-(\d+)$'))[3]::INTEGER)
+FROM vouchers
+WHERE invoice_number ~ '^INV-\d{4}-\d+-\d+$'
+GROUP BY 1, 2
+ON CONFLICT (organization_id, year)
+DO UPDATE SET last_number = GREATEST(invoice_counters.last_number, EXCLUDED.last_number);
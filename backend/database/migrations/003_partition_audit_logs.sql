@@ -0,0 +1,113 @@
+-- Migration: monthly range partitioning of audit_logs on created_at
+-- Partitions are named audit_logs_yYYYYmMM and created ahead of time by
+-- ensure_audit_log_partitions() (at startup and by the nightly
+-- audit_partitions maintenance job); old ones are detached and archived by
+-- scripts/audit_retention.py.
+--
+-- audit_logs_default catches rows no monthly partition covers yet, so audited
+-- writes never fail for want of a partition. ensure_audit_log_partitions()
+-- moves such rows into the monthly partition when it creates it.
+
+BEGIN;
+
+ALTER TABLE audit_logs RENAME TO audit_logs_legacy;
+
+CREATE TABLE audit_logs (
+    id BIGSERIAL,
+    user_id INTEGER,
+    organization_id INTEGER,
+    action VARCHAR(50) NOT NULL,
+    entity_type VARCHAR(100) NOT NULL,
+    entity_id INTEGER,
+    old_values JSONB,
+    new_values JSONB,
+    details JSONB,
+    ip_address INET,
+    user_agent TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT;
+
+-- Indexes on the parent are created on every partition
+CREATE INDEX IF NOT EXISTS idx_audit_logs_created ON audit_logs(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_user ON audit_logs(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_entity ON audit_logs(entity_type, entity_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_org ON audit_logs(organization_id, created_at);
+
+-- Create monthly partitions from from_month up to months_ahead past the current month
+CREATE OR REPLACE FUNCTION ensure_audit_log_partitions(
+    months_ahead INTEGER DEFAULT 3,
+    from_month DATE DEFAULT date_trunc('month', NOW())::DATE
+) RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', from_month)::DATE;
+    last_month DATE := (date_trunc('month', NOW()) + make_interval(months => months_ahead))::DATE;
+    month_end DATE;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        month_end := (month_start + INTERVAL '1 month')::DATE;
+        partition_name := format('audit_logs_y%sm%s', to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            -- Built detached: attaching fails while the default partition still
+            -- holds rows of this month, so those are moved over first
+            EXECUTE format('CREATE TABLE %I (LIKE audit_logs INCLUDING DEFAULTS)', partition_name);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM audit_logs_default WHERE created_at >= %L AND created_at < %L RETURNING *)
+                 INSERT INTO %I SELECT * FROM moved',
+                month_start, month_end, partition_name
+            );
+            EXECUTE format(
+                'ALTER TABLE audit_logs ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_end
+            );
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Partitions for existing history plus the next three months
+SELECT ensure_audit_log_partitions(
+    3, COALESCE((SELECT MIN(created_at) FROM audit_logs_legacy), NOW())::DATE
+);
+
+-- Deployments differ in their audit_logs columns (migration_v2.sql has
+-- details, the data layer writes organization_id / old_values / new_values):
+-- copy whichever of them the old table has
+DO $$
+DECLARE
+    target_columns TEXT[] := ARRAY['id', 'user_id', 'organization_id', 'action', 'entity_type', 'entity_id',
+                                   'old_values', 'new_values', 'details', 'ip_address', 'user_agent',
+                                   'created_at'];
+    source_columns TEXT[] := '{}';
+    col TEXT;
+BEGIN
+    FOREACH col IN ARRAY target_columns LOOP
+        IF EXISTS (SELECT 1 FROM information_schema.columns c
+                   WHERE c.table_schema = current_schema() AND c.table_name = 'audit_logs_legacy'
+                     AND c.column_name = col) THEN
+            source_columns := source_columns || CASE WHEN col = 'created_at'
+                                                     THEN 'COALESCE(created_at, NOW())'
+                                                     ELSE quote_ident(col) END;
+        ELSE
+            source_columns := source_columns || CASE WHEN col = 'created_at'
+                                                     THEN 'NOW()' ELSE 'NULL' END;
+        END IF;
+    END LOOP;
+    EXECUTE format('INSERT INTO audit_logs (%s) SELECT %s FROM audit_logs_legacy',
+                   array_to_string(target_columns, ', '), array_to_string(source_columns, ', '));
+END;
+$$;
+
+SELECT setval(pg_get_serial_sequence('audit_logs', 'id'),
+              COALESCE((SELECT MAX(id) FROM audit_logs), 0) + 1, false);
+
+DROP TABLE audit_logs_legacy;
+
+COMMIT;
@@ -0,0 +1,29 @@
+-- Migration: composite indexes for keyset-paginated listings
+-- Each index matches a (filter..., sort column, id) combination used by
+-- list_users / list_organizations / list_voucher_types, so a page is an
+-- index range scan that stops after LIMIT rows regardless of table size.
+
+-- /api/admin/users and /api/organizations/{org_id}/users
+CREATE INDEX IF NOT EXISTS idx_users_name_id ON users(name, id);
+CREATE INDEX IF NOT EXISTS idx_users_email_id ON users(email, id);
+CREATE INDEX IF NOT EXISTS idx_users_created_id ON users(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_users_org_name_id ON users(organization_id, name, id);
+CREATE INDEX IF NOT EXISTS idx_users_org_created_id ON users(organization_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_users_role_name_id ON users(role, name, id);
+CREATE INDEX IF NOT EXISTS idx_users_active_name_id ON users(is_active, name, id);
+
+-- /api/admin/organizations
+CREATE INDEX IF NOT EXISTS idx_organizations_name_id ON organizations(name, id);
+CREATE INDEX IF NOT EXISTS idx_organizations_created_id ON organizations(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_organizations_active_name_id ON organizations(is_active, name, id);
+
+-- /api/organizations/{org_id}/voucher-types
+CREATE INDEX IF NOT EXISTS idx_voucher_types_org_name_id ON voucher_types(organization_id, name, id);
+CREATE INDEX IF NOT EXISTS idx_voucher_types_org_price_id ON voucher_types(organization_id, price, id);
+CREATE INDEX IF NOT EXISTS idx_voucher_types_org_created_id ON voucher_types(organization_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_voucher_types_org_active_name_id ON voucher_types(organization_id, is_active, name, id);
+
+-- Planner statistics back the estimated totals (include_total=true)
+ANALYZE users;
+ANALYZE organizations;
+ANALYZE voucher_types;
@@ -0,0 +1,229 @@
+-- Migration: incrementally maintained dashboard counters
+-- Triggers keep stat_counters in step with every write, so /api/admin/stats
+-- reads a handful of rows instead of scanning users, vouchers and sessions.
+--
+-- Each key is spread over STAT_COUNTER_SHARDS rows and a writer bumps the one
+-- picked by its backend pid, so concurrent writers do not queue (or deadlock)
+-- on a single hot row per key. Readers SUM(value) GROUP BY key.
+--
+-- Keys:
+--   users.total, users.active, users.pending, users.role.<role>
+--   organizations.total, organizations.active
+--   organizations.<id>.clients, organizations.<id>.therapists  (therapists include employees)
+--   voucher_types.active
+--   vouchers.active.<YYYY-MM-DD>     (active vouchers by valid_until day)
+--   sessions.week.<IYYY-IW>          (non-cancelled therapy sessions by ISO week)
+--   revenue.total, revenue.month.<YYYY-MM>  (completed voucher payments)
+--
+-- A voucher expires by the clock, not by a write, so there is no single
+-- vouchers.active counter to decrement: readers sum the vouchers.active.<day>
+-- keys from today on (build_admin_stats), which drops a voucher from the
+-- count the day after its valid_until without any sweep.
+
+BEGIN;
+
+-- Block writes while triggers are installed and counters are backfilled
+LOCK TABLE users, organizations, voucher_types, vouchers, therapy_sessions IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE TABLE IF NOT EXISTS stat_counters (
+    key VARCHAR(100) NOT NULL,
+    shard SMALLINT NOT NULL DEFAULT 0,
+    value NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (key, shard)
+);
+
+-- STAT_COUNTER_SHARDS = 16. A backend only ever writes its own shard, so two
+-- transactions contend only when their pids collide modulo the shard count.
+CREATE OR REPLACE FUNCTION stat_counter_shard() RETURNS SMALLINT AS $$
+    SELECT (pg_backend_pid() % 16)::SMALLINT;
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION bump_stat(counter_key TEXT, delta NUMERIC) RETURNS VOID AS $$
+BEGIN
+    IF counter_key IS NULL OR delta IS NULL OR delta = 0 THEN
+        RETURN;
+    END IF;
+    INSERT INTO stat_counters (key, shard, value) VALUES (counter_key, stat_counter_shard(), delta)
+    ON CONFLICT (key, shard) DO UPDATE
+    SET value = stat_counters.value + EXCLUDED.value, updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- USERS
+-- ============================================
+CREATE OR REPLACE FUNCTION stat_users_row(u users, sign INTEGER) RETURNS VOID AS $$
+BEGIN
+    PERFORM bump_stat('users.total', sign);
+    PERFORM bump_stat('users.role.' || u.role, sign);
+    IF u.is_active THEN
+        PERFORM bump_stat('users.active', sign);
+    ELSIF u.approved_at IS NULL THEN
+        PERFORM bump_stat('users.pending', sign);
+    END IF;
+    IF u.organization_id IS NOT NULL AND u.role IN ('client', 'therapist', 'employee') THEN
+        PERFORM bump_stat('organizations.' || u.organization_id
+                          || CASE WHEN u.role = 'client' THEN '.clients' ELSE '.therapists' END, sign);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION stat_users_trigger() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM stat_users_row(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM stat_users_row(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_stat_users_insert_delete ON users;
+CREATE TRIGGER trg_stat_users_insert_delete
+AFTER INSERT OR DELETE ON users
+FOR EACH ROW EXECUTE FUNCTION stat_users_trigger();
+
+DROP TRIGGER IF EXISTS trg_stat_users_update ON users;
+CREATE TRIGGER trg_stat_users_update
+AFTER UPDATE OF role, is_active, approved_at, organization_id ON users
+FOR EACH ROW
+WHEN ((OLD.role, OLD.is_active, OLD.approved_at IS NULL, OLD.organization_id)
+      IS DISTINCT FROM (NEW.role, NEW.is_active, NEW.approved_at IS NULL, NEW.organization_id))
+EXECUTE FUNCTION stat_users_trigger();
+
+-- ============================================
+-- ORGANIZATIONS
+-- ============================================
+CREATE OR REPLACE FUNCTION stat_organizations_trigger() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM bump_stat('organizations.total', -1);
+        IF OLD.is_active THEN PERFORM bump_stat('organizations.active', -1); END IF;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM bump_stat('organizations.total', 1);
+        IF NEW.is_active THEN PERFORM bump_stat('organizations.active', 1); END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_stat_organizations_insert_delete ON organizations;
+CREATE TRIGGER trg_stat_organizations_insert_delete
+AFTER INSERT OR DELETE ON organizations
+FOR EACH ROW EXECUTE FUNCTION stat_organizations_trigger();
+
+DROP TRIGGER IF EXISTS trg_stat_organizations_update ON organizations;
+CREATE TRIGGER trg_stat_organizations_update
+AFTER UPDATE OF is_active ON organizations
+FOR EACH ROW WHEN (OLD.is_active IS DISTINCT FROM NEW.is_active)
+EXECUTE FUNCTION stat_organizations_trigger();
+
+-- ============================================
+-- VOUCHER TYPES
+-- ============================================
+CREATE OR REPLACE FUNCTION stat_voucher_types_trigger() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.is_active THEN
+        PERFORM bump_stat('voucher_types.active', -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.is_active THEN
+        PERFORM bump_stat('voucher_types.active', 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_stat_voucher_types ON voucher_types;
+CREATE TRIGGER trg_stat_voucher_types
+AFTER INSERT OR DELETE OR UPDATE OF is_active ON voucher_types
+FOR EACH ROW EXECUTE FUNCTION stat_voucher_types_trigger();
+
+-- ============================================
+-- VOUCHERS (active count by expiry day and revenue)
+-- ============================================
+CREATE OR REPLACE FUNCTION stat_vouchers_row(v vouchers, sign INTEGER) RETURNS VOID AS $$
+BEGIN
+    IF v.status = 'active' THEN
+        PERFORM bump_stat('vouchers.active.' || to_char(v.valid_until, 'YYYY-MM-DD'), sign);
+    END IF;
+    IF v.payment_status = 'completed' AND v.payment_amount IS NOT NULL THEN
+        PERFORM bump_stat('revenue.total', sign * v.payment_amount);
+        PERFORM bump_stat('revenue.month.' || to_char(COALESCE(v.payment_date, v.purchase_date), 'YYYY-MM'),
+                          sign * v.payment_amount);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION stat_vouchers_trigger() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM stat_vouchers_row(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM stat_vouchers_row(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_stat_vouchers ON vouchers;
+CREATE TRIGGER trg_stat_vouchers
+AFTER INSERT OR DELETE OR UPDATE OF status, valid_until, payment_status, payment_amount, payment_date ON vouchers
+FOR EACH ROW EXECUTE FUNCTION stat_vouchers_trigger();
+
+-- ============================================
+-- THERAPY SESSIONS
+-- ============================================
+CREATE OR REPLACE FUNCTION stat_sessions_trigger() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status <> 'cancelled' THEN
+        PERFORM bump_stat('sessions.week.' || to_char(OLD.session_date, 'IYYY-IW'), -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status <> 'cancelled' THEN
+        PERFORM bump_stat('sessions.week.' || to_char(NEW.session_date, 'IYYY-IW'), 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_stat_sessions ON therapy_sessions;
+CREATE TRIGGER trg_stat_sessions
+AFTER INSERT OR DELETE OR UPDATE OF status, session_date ON therapy_sessions
+FOR EACH ROW EXECUTE FUNCTION stat_sessions_trigger();
+
+-- ============================================
+-- BACKFILL
+-- ============================================
+DELETE FROM stat_counters;
+
+INSERT INTO stat_counters (key, value)
+SELECT 'users.total', COUNT(*) FROM users
+UNION ALL SELECT 'users.active', COUNT(*) FROM users WHERE is_active
+UNION ALL SELECT 'users.pending', COUNT(*) FROM users WHERE is_active IS NOT TRUE AND approved_at IS NULL
+UNION ALL SELECT 'users.role.' || role, COUNT(*) FROM users GROUP BY role
+UNION ALL SELECT 'organizations.total', COUNT(*) FROM organizations
+UNION ALL SELECT 'organizations.active', COUNT(*) FROM organizations WHERE is_active
+UNION ALL SELECT 'voucher_types.active', COUNT(*) FROM voucher_types WHERE is_active
+UNION ALL SELECT 'vouchers.active.' || to_char(valid_until, 'YYYY-MM-DD'), COUNT(*)
+          FROM vouchers WHERE status = 'active'
+          GROUP BY 1
+UNION ALL SELECT 'revenue.total', COALESCE(SUM(payment_amount), 0)
+          FROM vouchers WHERE payment_status = 'completed'
+UNION ALL SELECT 'revenue.month.' || to_char(COALESCE(payment_date, purchase_date), 'YYYY-MM'),
+                 SUM(payment_amount)
+          FROM vouchers WHERE payment_status = 'completed' AND payment_amount IS NOT NULL
+          GROUP BY 1
+UNION ALL SELECT 'organizations.' || organization_id
+                 || CASE WHEN role = 'client' THEN '.clients' ELSE '.therapists' END, COUNT(*)
+          FROM users
+          WHERE organization_id IS NOT NULL AND role IN ('client', 'therapist', 'employee')
+          GROUP BY 1
+UNION ALL SELECT 'sessions.week.' || to_char(session_date, 'IYYY-IW'), COUNT(*)
+          FROM therapy_sessions WHERE status <> 'cancelled'
+          GROUP BY 1;
+
+COMMIT;
@@ -0,0 +1,127 @@
+-- Migration: per-slot booking counters for capacity-limited classes
+-- create_reservation claims one seat in every slot (class, date, time) its
+-- sessions occupy with a conditional upsert. The upsert row-locks the slot,
+-- so concurrent bookings of a full class cannot overbook it.
+--
+-- A session holds a seat in the slot it takes place in - its actual date /
+-- time once rescheduled, its scheduled one before - unless it is cancelled.
+-- Triggers keep that in step: cancelling or deleting a session gives its
+-- seat back, and rescheduling it (or moving its scheduled date / time) gives
+-- the old seat back and claims one in the new slot with the same conditional
+-- upsert, failing with check_violation on check_slot_capacity when that slot
+-- is full.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS session_slots (
+    therapy_class_id UUID NOT NULL REFERENCES therapy_classes(id) ON DELETE CASCADE,
+    scheduled_date DATE NOT NULL,
+    scheduled_time TIME NOT NULL,
+    capacity INTEGER NOT NULL,
+    booked INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (therapy_class_id, scheduled_date, scheduled_time),
+    CONSTRAINT check_slot_capacity CHECK (booked >= 0 AND booked <= capacity)
+);
+
+-- ============================================
+-- SEAT RELEASE AND MOVES
+-- ============================================
+CREATE OR REPLACE FUNCTION claim_session_slot(class_id UUID, slot_date DATE, slot_time TIME) RETURNS VOID AS $$
+BEGIN
+    INSERT INTO session_slots (therapy_class_id, scheduled_date, scheduled_time, capacity, booked)
+    SELECT id, slot_date, slot_time, COALESCE(max_participants, 1), 1
+    FROM therapy_classes WHERE id = class_id
+    ON CONFLICT (therapy_class_id, scheduled_date, scheduled_time) DO UPDATE
+    SET booked = session_slots.booked + 1, capacity = EXCLUDED.capacity, updated_at = NOW()
+    WHERE session_slots.booked < EXCLUDED.capacity;
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'Session slot % % of therapy class % is full', slot_date, slot_time, class_id
+            USING ERRCODE = 'check_violation', CONSTRAINT = 'check_slot_capacity';
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION release_session_slot(class_id UUID, slot_date DATE, slot_time TIME,
+                                                seats INTEGER DEFAULT 1) RETURNS VOID AS $$
+    UPDATE session_slots
+    SET booked = GREATEST(booked - seats, 0), updated_at = NOW()
+    WHERE therapy_class_id = class_id AND scheduled_date = slot_date AND scheduled_time = slot_time;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION session_slots_sessions_trigger() RETURNS TRIGGER AS $$
+DECLARE
+    class_id UUID;
+    old_date DATE := COALESCE(OLD.actual_date, OLD.scheduled_date);
+    old_time TIME := COALESCE(OLD.actual_time, OLD.scheduled_time);
+    new_date DATE;
+    new_time TIME;
+BEGIN
+    -- Not found when the session goes with its reservation; the reservations
+    -- trigger below has already released its seats then
+    SELECT therapy_class_id INTO class_id FROM reservations WHERE id = OLD.reservation_id;
+    IF class_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        new_date := COALESCE(NEW.actual_date, NEW.scheduled_date);
+        new_time := COALESCE(NEW.actual_time, NEW.scheduled_time);
+        IF OLD.status <> 'cancelled' AND NEW.status <> 'cancelled'
+           AND (old_date, old_time) = (new_date, new_time) THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+    IF OLD.status <> 'cancelled' THEN
+        PERFORM release_session_slot(class_id, old_date, old_time);
+    END IF;
+    IF TG_OP = 'UPDATE' AND NEW.status <> 'cancelled' THEN
+        PERFORM claim_session_slot(class_id, new_date, new_time);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Seats are claimed by CREATE_RESERVATION_SQL itself, so INSERT is not handled
+DROP TRIGGER IF EXISTS trg_session_slots_sessions ON sessions;
+CREATE TRIGGER trg_session_slots_sessions
+AFTER DELETE OR UPDATE OF status, scheduled_date, scheduled_time, actual_date, actual_time ON sessions
+FOR EACH ROW EXECUTE FUNCTION session_slots_sessions_trigger();
+
+CREATE OR REPLACE FUNCTION session_slots_reservations_trigger() RETURNS TRIGGER AS $$
+DECLARE
+    slot RECORD;
+BEGIN
+    FOR slot IN
+        SELECT COALESCE(actual_date, scheduled_date) AS slot_date,
+               COALESCE(actual_time, scheduled_time) AS slot_time, COUNT(*) AS seats
+        FROM sessions
+        WHERE reservation_id = OLD.id AND status <> 'cancelled'
+        GROUP BY 1, 2
+    LOOP
+        PERFORM release_session_slot(OLD.therapy_class_id, slot.slot_date, slot.slot_time, slot.seats::int);
+    END LOOP;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+-- BEFORE: the cascade to sessions runs after the reservation row is gone
+DROP TRIGGER IF EXISTS trg_session_slots_reservations ON reservations;
+CREATE TRIGGER trg_session_slots_reservations
+BEFORE DELETE ON reservations
+FOR EACH ROW EXECUTE FUNCTION session_slots_reservations_trigger();
+
+-- ============================================
+-- BACKFILL
+-- ============================================
+-- Seats already taken by existing sessions
+INSERT INTO session_slots (therapy_class_id, scheduled_date, scheduled_time, capacity, booked)
+SELECT r.therapy_class_id, COALESCE(s.actual_date, s.scheduled_date), COALESCE(s.actual_time, s.scheduled_time),
+       GREATEST(MAX(tc.max_participants), COUNT(*)), COUNT(*)
+FROM sessions s
+JOIN reservations r ON r.id = s.reservation_id
+JOIN therapy_classes tc ON tc.id = r.therapy_class_id
+WHERE s.status <> 'cancelled'
+GROUP BY 1, 2, 3
+ON CONFLICT (therapy_class_id, scheduled_date, scheduled_time) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,12 @@
+-- Migration: compiled booking rules next to their JSON
+-- booking_rules_bitmap holds one bit per minute of the week (bit 0 = Monday
+-- 00:00, little-endian, 1260 bytes); see backend/availability.py. It is
+-- written by create_voucher_type / update_voucher_type. Rows left NULL are
+-- compiled from booking_rules on read until scripts/backfill_booking_bitmaps.py
+-- (or the next edit of the type) fills them in.
+
+ALTER TABLE voucher_types ADD COLUMN IF NOT EXISTS booking_rules_bitmap BYTEA;
+
+ALTER TABLE voucher_types DROP CONSTRAINT IF EXISTS check_booking_rules_bitmap_size;
+ALTER TABLE voucher_types ADD CONSTRAINT check_booking_rules_bitmap_size
+    CHECK (booking_rules_bitmap IS NULL OR octet_length(booking_rules_bitmap) = 1260);
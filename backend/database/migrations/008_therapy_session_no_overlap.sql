@@ -0,0 +1,26 @@
+-- Migration: a therapist can not hold two overlapping sessions
+-- Sessions starting at the same instant are seats of one group slot and are
+-- allowed to overlap (their count is limited by reserve_session_seat); any
+-- other overlap of active sessions of the same therapist is rejected.
+-- conflicts.TherapistSchedule applies the same rule in-process first, so the
+-- constraint only fires on races.
+--
+-- Fails if overlapping sessions already exist; list them with
+--   SELECT a.id, b.id FROM therapy_sessions a JOIN therapy_sessions b
+--     ON a.therapist_id = b.therapist_id AND a.id < b.id
+--    AND a.session_date + a.session_time <> b.session_date + b.session_time
+--    AND tsrange(a.session_date + a.session_time,
+--                a.session_date + a.session_time + a.duration_minutes * INTERVAL '1 minute')
+--     && tsrange(b.session_date + b.session_time,
+--                b.session_date + b.session_time + b.duration_minutes * INTERVAL '1 minute')
+--  WHERE a.status NOT IN ('cancelled', 'rescheduled') AND b.status NOT IN ('cancelled', 'rescheduled');
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+ALTER TABLE therapy_sessions DROP CONSTRAINT IF EXISTS therapy_sessions_no_overlap;
+ALTER TABLE therapy_sessions ADD CONSTRAINT therapy_sessions_no_overlap EXCLUDE USING gist (
+    therapist_id WITH =,
+    tsrange(session_date + session_time,
+            session_date + session_time + duration_minutes * INTERVAL '1 minute') WITH &&,
+    (session_date + session_time) WITH <>
+) WHERE (status NOT IN ('cancelled', 'rescheduled'));
@@ -0,0 +1,22 @@
+-- Migration: run log of the nightly maintenance sweeps (backend/maintenance.py)
+-- One row per job per run. A successful row for today tells the other
+-- replicas the job is done; duration_ms / rows_affected are the job metrics.
+
+CREATE TABLE IF NOT EXISTS scheduler_runs (
+    id BIGSERIAL PRIMARY KEY,
+    job VARCHAR(50) NOT NULL,
+    run_date DATE NOT NULL,
+    started_at TIMESTAMP NOT NULL,
+    duration_ms INTEGER NOT NULL,
+    rows_affected INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    instance VARCHAR(100)
+);
+
+CREATE INDEX IF NOT EXISTS idx_scheduler_runs_date_job ON scheduler_runs(run_date, job);
+
+-- Sweep predicates
+CREATE INDEX IF NOT EXISTS idx_client_vouchers_active_expiry
+    ON client_vouchers(expiry_date) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS idx_voucher_notifications_voucher_type
+    ON voucher_notifications(voucher_id, type, created_at);
@@ -0,0 +1,45 @@
+-- Migration: per-table change counters for conditional GET (backend/conditional.py)
+-- A statement-level trigger bumps stat_counters 'changes.<table>' once per
+-- writing statement, so read endpoints derive their ETag / Last-Modified from
+-- a primary-key lookup and answer 304 without running their list query.
+-- Like every stat_counters key it is sharded by backend (migration 005): the
+-- sum over shards still grows with every write, and MAX(updated_at) is the
+-- time of the latest one.
+--
+-- Every table gets its trigger unconditionally: one skipped here would keep
+-- its counter, and so the ETag of every endpoint reading it, frozen.
+--
+-- updated_at uses clock_timestamp() rather than NOW() so a long transaction
+-- does not stamp its change with its start time.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION bump_change_counter() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO stat_counters (key, shard, value, updated_at)
+    VALUES ('changes.' || TG_TABLE_NAME, stat_counter_shard(), 1, clock_timestamp())
+    ON CONFLICT (key, shard) DO UPDATE
+    SET value = stat_counters.value + 1, updated_at = clock_timestamp();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    table_name TEXT;
+BEGIN
+    FOREACH table_name IN ARRAY ARRAY[
+        'organizations', 'users', 'voucher_types', 'client_vouchers', 'therapy_sessions',
+        'reschedule_requests', 'client_therapist_assignments'
+    ] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_changes_%1$s ON %1$I', table_name);
+        EXECUTE format('CREATE TRIGGER trg_changes_%1$s
+                        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %1$I
+                        FOR EACH STATEMENT EXECUTE FUNCTION bump_change_counter()', table_name);
+        INSERT INTO stat_counters (key, value) VALUES ('changes.' || table_name, 0)
+        ON CONFLICT (key, shard) DO NOTHING;
+    END LOOP;
+END;
+$$;
+
+COMMIT;
@@ -0,0 +1,28 @@
+-- Migration: NOTIFY user changes to every replica (backend/principal_cache.py)
+-- Each replica caches resolved principals for PRINCIPAL_CACHE_TTL seconds. The
+-- replica that writes drops its own entries through db_events; this trigger
+-- tells the others on channel 'user_changed' (payload: the user id), which
+-- catalog_listener relays to principal_cache.invalidate. The notification is
+-- sent on commit, so no replica reloads the user before the change is visible.
+--
+-- Updates that only touch timestamps (updated_at, last_login) do not notify.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION notify_user_changed() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE'
+       AND to_jsonb(NEW) - 'updated_at' - 'last_login' = to_jsonb(OLD) - 'updated_at' - 'last_login' THEN
+        RETURN NULL;
+    END IF;
+    PERFORM pg_notify('user_changed', OLD.id::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_notify_user_changed ON users;
+CREATE TRIGGER trg_notify_user_changed
+    AFTER UPDATE OR DELETE ON users
+    FOR EACH ROW EXECUTE FUNCTION notify_user_changed();
+
+COMMIT;
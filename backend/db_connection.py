@@ -1,10 +1,22 @@
 import os
+import random
+import time
 import psycopg2
+from psycopg2 import errors
 from psycopg2.extras import RealDictCursor
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, FrozenSet, Sequence
+from datetime import date, time as dt_time
 from models import User, UserRole
 import bcrypt
 from urllib.parse import quote_plus
+from batch_loader import BatchLoader
+from metrics import DB_CONNECTIONS_OPENED, DB_CONNECTION_FAILURES
+from query_log import LoggedConnection
+from query_builder import select_query, exists_query, update_query
+from scheduling import (
+    recurrence, schedule_dates, ClassFullError,
+    RESERVATION_SESSIONS, SCHEDULE_BLACKOUT_DATES, BOOKING_RETRIES
+)
 
 # Try to use individual env vars first, fall back to DATABASE_URL
 DB_HOST = os.getenv("DB_HOST", "postgres")
@@ -13,6 +25,8 @@ DB_NAME = os.getenv("DB_NAME", "therapy_system")
 DB_USER = os.getenv("DB_USER", "therapy_user")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "therapy_password")
 
+V1_DATABASE = os.getenv("V1_DATABASE", "postgres")
+
 # Build DATABASE_URL from components if not provided directly
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
@@ -20,6 +34,103 @@ if not DATABASE_URL:
     encoded_password = quote_plus(DB_PASSWORD)
     DATABASE_URL = f"postgresql://{DB_USER}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# One pass over the therapist's reservations and their sessions: a reservation
+# is active while it has an upcoming, non-cancelled session
+THERAPIST_CLIENTS_SQL = """
+    WITH therapist_sessions AS (
+        SELECT r.client_id, r.id AS reservation_id, tc.name AS class_name,
+               s.id AS session_id, s.scheduled_date, s.scheduled_time,
+               (s.scheduled_date >= CURRENT_DATE AND s.status <> 'cancelled') AS upcoming
+        FROM therapy_classes tc
+        JOIN reservations r ON r.therapy_class_id = tc.id
+        LEFT JOIN sessions s ON s.reservation_id = r.id
+        WHERE tc.therapist_id = %s
+    ),
+    next_sessions AS (
+        SELECT DISTINCT ON (client_id) client_id, scheduled_date, scheduled_time, class_name
+        FROM therapist_sessions
+        WHERE upcoming
+        ORDER BY client_id, scheduled_date, scheduled_time
+    )
+    SELECT u.id, u.name, u.email,
+           COUNT(DISTINCT ts.reservation_id) FILTER (WHERE ts.upcoming) AS active_reservations,
+           COUNT(ts.session_id) AS total_sessions,
+           ns.scheduled_date AS next_date, ns.scheduled_time AS next_time,
+           ns.class_name AS next_class_name
+    FROM therapist_sessions ts
+    JOIN users u ON u.id = ts.client_id
+    LEFT JOIN next_sessions ns ON ns.client_id = ts.client_id
+    GROUP BY u.id, u.name, u.email, ns.scheduled_date, ns.scheduled_time, ns.class_name
+    ORDER BY u.name, u.id
+"""
+
+# Reservation, all of its sessions and the used voucher code in one round trip.
+# A seat is claimed in every slot first (row locks are taken in date order);
+# if any slot is full nothing is inserted and the caller rolls back.
+CREATE_RESERVATION_SQL = """
+    WITH claimed AS (
+        INSERT INTO session_slots (therapy_class_id, scheduled_date, scheduled_time, capacity, booked)
+        SELECT %(therapy_class_id)s, scheduled_date, %(scheduled_time)s, %(capacity)s, 1
+        FROM unnest(%(dates)s::date[]) AS scheduled_date
+        ON CONFLICT (therapy_class_id, scheduled_date, scheduled_time) DO UPDATE
+        SET booked = session_slots.booked + 1, capacity = EXCLUDED.capacity, updated_at = NOW()
+        WHERE session_slots.booked < EXCLUDED.capacity
+        RETURNING 1
+    ),
+    reservation AS (
+        INSERT INTO reservations (voucher_code_id, therapy_class_id, client_id, start_date)
+        SELECT %(voucher_code_id)s, %(therapy_class_id)s, %(client_id)s, %(start_date)s
+        WHERE (SELECT COUNT(*) FROM claimed) = cardinality(%(dates)s::date[])
+        RETURNING *
+    ),
+    new_sessions AS (
+        INSERT INTO sessions (reservation_id, scheduled_date, scheduled_time)
+        SELECT reservation.id, scheduled_date, %(scheduled_time)s
+        FROM reservation, unnest(%(dates)s::date[]) AS scheduled_date
+        RETURNING *
+    ),
+    used_code AS (
+        UPDATE voucher_codes
+        SET status = 'used', used_count = used_count + 1
+        WHERE id = %(voucher_code_id)s AND EXISTS (SELECT 1 FROM reservation)
+    )
+    SELECT reservation.*,
+           (SELECT COALESCE(json_agg(new_sessions ORDER BY scheduled_date), '[]'::json)
+            FROM new_sessions) AS sessions
+    FROM reservation
+"""
+
+# The trigger of migration 006 moves the session's seat to the new slot with the
+# same conditional upsert as CREATE_RESERVATION_SQL, raising check_violation
+# (and so rolling the update back) when that slot is full
+RESCHEDULE_SESSION_SQL = """
+    UPDATE sessions
+    SET actual_date = %(new_date)s, actual_time = %(new_time)s, status = 'rescheduled',
+        therapist_notes = COALESCE(%(therapist_notes)s, therapist_notes), updated_at = NOW()
+    WHERE id = %(session_id)s
+    RETURNING *
+"""
+
+# Columns that repositories may filter and sort on
+USER_COLUMNS = ("id", "email", "name", "role", "created_at")
+THERAPY_CLASS_COLUMNS = ("id", "name", "therapist_id", "created_at")
+VOUCHER_COLUMNS = ("id", "client_id", "created_at")
+VOUCHER_CODE_COLUMNS = ("id", "code", "voucher_id", "status", "created_at")
+RESERVATION_COLUMNS = ("id", "client_id", "therapy_class_id", "voucher_code_id", "created_at")
+SESSION_COLUMNS = ("id", "reservation_id", "status", "scheduled_date", "scheduled_time", "created_at")
+# Columns the v1 routes may change through Repository.update_row
+VOUCHER_WRITABLE = ("client_id", "activated_at")
+SESSION_WRITABLE = ("therapist_notes",)
+
+# Tables the batch loader may read, with the columns exposed to API responses
+BATCH_LOAD_COLUMNS = {
+    "users": "id, email, name, role",
+    "therapy_classes": "*",
+    "vouchers": "*",
+    "reservations": "*",
+    "sessions": "*",
+}
+
 class PostgresDatabase:
     def __init__(self):
         self.connection = None
@@ -34,13 +145,16 @@ class PostgresDatabase:
                     port=DB_PORT,
                     database=DB_NAME,
                     user=DB_USER,
-                    password=DB_PASSWORD
+                    password=DB_PASSWORD,
+                    connection_factory=LoggedConnection
                 )
                 print(f"Connected to database successfully using individual parameters")
             else:
-                self.connection = psycopg2.connect(DATABASE_URL)
+                self.connection = psycopg2.connect(DATABASE_URL, connection_factory=LoggedConnection)
                 print(f"Connected to database successfully using DATABASE_URL")
+            DB_CONNECTIONS_OPENED.inc("v1")
         except Exception as e:
+            DB_CONNECTION_FAILURES.inc("v1")
             print(f"Failed to connect to database: {e}")
             print(f"DB_HOST: {DB_HOST}, DB_PORT: {DB_PORT}, DB_NAME: {DB_NAME}, DB_USER: {DB_USER}")
             raise
@@ -86,129 +200,40 @@ class PostgresDatabase:
                 )
             return None
     
+    def _user_from_row(self, row: Dict[str, Any]) -> User:
+        return User(
+            id=str(row['id']),
+            email=row['email'],
+            name=row['name'],
+            role=UserRole(row['role']),
+            password_hash=row['password_hash']
+        )
+    
     @property
-    def users(self):
+    def users(self) -> "Repository":
         """Compatibility layer for existing code that uses db.users"""
-        class UserDict:
-            def __init__(self, db):
-                self.db = db
-            
-            def get(self, user_id: str) -> Optional[User]:
-                return self.db.get_user_by_id(user_id)
-            
-            def values(self) -> List[User]:
-                conn = self.db.get_connection()
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute("SELECT id, email, name, role, password_hash FROM users")
-                    rows = cur.fetchall()
-                    return [
-                        User(
-                            id=str(row['id']),
-                            email=row['email'],
-                            name=row['name'],
-                            role=UserRole(row['role']),
-                            password_hash=row['password_hash']
-                        )
-                        for row in rows
-                    ]
-        
-        return UserDict(self)
+        return Repository(self, "users", USER_COLUMNS,
+                          select="id, email, name, role, password_hash", row_factory=self._user_from_row)
     
     @property
-    def therapy_classes(self):
-        """Compatibility layer for existing code"""
-        class TherapyClassDict:
-            def __init__(self, db):
-                self.db = db
-            
-            def get(self, class_id: str) -> Optional[Dict[str, Any]]:
-                conn = self.db.get_connection()
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute(
-                        "SELECT * FROM therapy_classes WHERE id = %s",
-                        (int(class_id),)
-                    )
-                    return cur.fetchone()
-            
-            def values(self) -> List[Dict[str, Any]]:
-                conn = self.db.get_connection()
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute("SELECT * FROM therapy_classes")
-                    return cur.fetchall()
-        
-        return TherapyClassDict(self)
+    def therapy_classes(self) -> "Repository":
+        return Repository(self, "therapy_classes", THERAPY_CLASS_COLUMNS)
     
     @property
-    def vouchers(self):
-        """Compatibility layer for existing code"""
-        class VoucherDict:
-            def __init__(self, db):
-                self.db = db
-            
-            def get(self, voucher_id: str) -> Optional[Dict[str, Any]]:
-                conn = self.db.get_connection()
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute(
-                        "SELECT * FROM vouchers WHERE id = %s",
-                        (int(voucher_id),)
-                    )
-                    return cur.fetchone()
-            
-            def values(self) -> List[Dict[str, Any]]:
-                conn = self.db.get_connection()
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute("SELECT * FROM vouchers")
-                    return cur.fetchall()
-        
-        return VoucherDict(self)
+    def vouchers(self) -> "Repository":
+        return Repository(self, "vouchers", VOUCHER_COLUMNS, writable=VOUCHER_WRITABLE)
     
     @property
-    def reservations(self):
-        """Compatibility layer for existing code"""
-        class ReservationDict:
-            def __init__(self, db):
-                self.db = db
-            
-            def get(self, reservation_id: str) -> Optional[Dict[str, Any]]:
-                conn = self.db.get_connection()
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute(
-                        "SELECT * FROM reservations WHERE id = %s",
-                        (int(reservation_id),)
-                    )
-                    return cur.fetchone()
-            
-            def values(self) -> List[Dict[str, Any]]:
-                conn = self.db.get_connection()
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute("SELECT * FROM reservations")
-                    return cur.fetchall()
-        
-        return ReservationDict(self)
+    def voucher_codes(self) -> "Repository":
+        return Repository(self, "voucher_codes", VOUCHER_CODE_COLUMNS)
     
     @property
-    def sessions(self):
-        """Compatibility layer for existing code"""
-        class SessionDict:
-            def __init__(self, db):
-                self.db = db
-            
-            def get(self, session_id: str) -> Optional[Dict[str, Any]]:
-                conn = self.db.get_connection()
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute(
-                        "SELECT * FROM sessions WHERE id = %s",
-                        (int(session_id),)
-                    )
-                    return cur.fetchone()
-            
-            def values(self) -> List[Dict[str, Any]]:
-                conn = self.db.get_connection()
-                with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                    cur.execute("SELECT * FROM sessions")
-                    return cur.fetchall()
-        
-        return SessionDict(self)
+    def reservations(self) -> "Repository":
+        return Repository(self, "reservations", RESERVATION_COLUMNS)
+    
+    @property
+    def sessions(self) -> "Repository":
+        return Repository(self, "sessions", SESSION_COLUMNS, writable=SESSION_WRITABLE)
     
     # Stub methods for compatibility
     def get_voucher_code_by_code(self, code: str) -> Optional[Dict[str, Any]]:
@@ -224,9 +249,78 @@ class PostgresDatabase:
         # Stub for compatibility
         return {"id": "1", "codes": []}
     
-    def create_reservation(self, voucher_code, therapy_class, client_id, start_date):
-        # Stub for compatibility
-        return {"id": "1", "sessions": []}
+    def create_reservation(self, voucher_code: Dict[str, Any], therapy_class: Dict[str, Any],
+                           client_id: str, start_date: date, sessions: int = RESERVATION_SESSIONS,
+                           blackout: FrozenSet[date] = SCHEDULE_BLACKOUT_DATES, frequency: str = "weekly",
+                           custom_days: Optional[List[int]] = None) -> Dict[str, Any]:
+        """Reservation with all of its sessions, written in one statement and transaction.
+        
+        Raises ClassFullError when any of the slots has no seat left.
+        """
+        weekdays, interval = recurrence(frequency, custom_days, therapy_class['day_of_week'])
+        dates = schedule_dates(start_date, sessions, weekdays, interval, blackout)
+        params = {
+            'voucher_code_id': voucher_code['id'],
+            'therapy_class_id': therapy_class['id'],
+            'client_id': client_id,
+            'start_date': start_date,
+            'scheduled_time': therapy_class['time'],
+            'capacity': therapy_class.get('max_participants') or 1,
+            'dates': dates,
+        }
+        conn = self.get_connection()
+        for attempt in range(BOOKING_RETRIES + 1):
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(CREATE_RESERVATION_SQL, params)
+                    reservation = cur.fetchone()
+            except (errors.DeadlockDetected, errors.SerializationFailure):
+                conn.rollback()
+                if attempt == BOOKING_RETRIES:
+                    raise
+                time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+                continue
+            except Exception:
+                conn.rollback()
+                raise
+            if reservation is None:
+                conn.rollback()
+                raise ClassFullError(f"Therapy class {therapy_class['id']} is full")
+            conn.commit()
+            return reservation
+    
+    def reschedule_session(self, session_id: str, new_date: date, new_time: dt_time,
+                           therapist_notes: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Move a session to new_date / new_time, taking its seat in the class slot along.
+        
+        Raises ClassFullError when the new slot has no seat left.
+        """
+        params = {
+            'session_id': session_id, 'new_date': new_date, 'new_time': new_time,
+            'therapist_notes': therapist_notes,
+        }
+        conn = self.get_connection()
+        for attempt in range(BOOKING_RETRIES + 1):
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(RESCHEDULE_SESSION_SQL, params)
+                    session = cur.fetchone()
+            except (errors.DeadlockDetected, errors.SerializationFailure):
+                conn.rollback()
+                if attempt == BOOKING_RETRIES:
+                    raise
+                time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+                continue
+            except errors.CheckViolation as e:
+                conn.rollback()
+                if e.diag.constraint_name != 'check_slot_capacity':
+                    raise
+                raise ClassFullError(f"Session slot {new_date} {new_time} is full")
+            except Exception:
+                conn.rollback()
+                raise
+            conn.commit()
+            return session
     
     def get_user_reservations(self, user_id: str) -> List[Dict[str, Any]]:
         conn = self.get_connection()
@@ -249,5 +343,98 @@ class PostgresDatabase:
             """, (int(therapist_id),))
             return cur.fetchall()
 
-# Global database instance
-db = PostgresDatabase()
\ No newline at end of file
+    def fetch_many(self, table: str, ids: List[Any]) -> List[Dict[str, Any]]:
+        """Rows of ``table`` whose id is in ``ids``, in a single query"""
+        if table not in BATCH_LOAD_COLUMNS:
+            raise ValueError(f"Table {table} cannot be batch loaded")
+        if not ids:
+            return []
+        repository = Repository(self, table, ("id",), select=BATCH_LOAD_COLUMNS[table])
+        return repository.find(id=[int(i) for i in ids])
+
+    def batch_loader(self) -> BatchLoader:
+        return BatchLoader(self.fetch_many)
+
+    def get_therapist_clients(self, therapist_id: str) -> List[Dict[str, Any]]:
+        """Clients of a therapist with active reservations, session count and next session"""
+        conn = self.get_connection()
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(THERAPIST_CLIENTS_SQL, (int(therapist_id),))
+            rows = cur.fetchall()
+        return [
+            {
+                'id': str(row['id']),
+                'name': row['name'],
+                'email': row['email'],
+                'active_reservations': row['active_reservations'],
+                'total_sessions': row['total_sessions'],
+                'next_session': {
+                    'date': row['next_date'].isoformat(),
+                    'time': row['next_time'].isoformat(),
+                    'class_name': row['next_class_name']
+                } if row['next_date'] else None
+            }
+            for row in rows
+        ]
+
+class Repository:
+    """Filtered lookups on one table; only whitelisted columns can be filtered or sorted"""
+    
+    def __init__(self, db: PostgresDatabase, table: str, columns: Sequence[str],
+                 select: str = "*", row_factory: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                 writable: Sequence[str] = ()):
+        self.db = db
+        self.table = table
+        self.columns = columns
+        self.writable = writable
+        self.select = select
+        self.row_factory = row_factory
+    
+    def _fetch(self, query: str, params: List[Any]) -> List[Dict[str, Any]]:
+        conn = self.db.get_connection()
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(query, params)
+            return cur.fetchall()
+    
+    def find(self, order_by: Sequence[str] = (), limit: Optional[int] = None,
+             offset: Optional[int] = None, **where) -> List[Any]:
+        query, params = select_query(self.table, self.select, where, self.columns, order_by, limit, offset)
+        rows = self._fetch(query, params)
+        return [self.row_factory(row) for row in rows] if self.row_factory else rows
+    
+    def first(self, order_by: Sequence[str] = (), **where) -> Optional[Any]:
+        rows = self.find(order_by=order_by, limit=1, **where)
+        return rows[0] if rows else None
+    
+    def exists(self, **where) -> bool:
+        query, params = exists_query(self.table, where, self.columns)
+        return self._fetch(query, params)[0]['found']
+    
+    def get(self, row_id: str) -> Optional[Any]:
+        return self.first(id=int(row_id))
+    
+    def __contains__(self, row_id: str) -> bool:
+        return self.exists(id=int(row_id))
+    
+    def update_row(self, row_id: str, **changes) -> Optional[Any]:
+        """Apply ``changes`` (writable columns only) and return the row, or None when there is no such row"""
+        query, params = update_query(self.table, changes, {"id": int(row_id)}, self.writable, self.columns)
+        conn = self.db.get_connection()
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(query, params)
+                row = cur.fetchone()
+        except Exception:
+            conn.rollback()
+            raise
+        conn.commit()
+        if row is None:
+            return None
+        return self.row_factory(row) if self.row_factory else row
+
+# Global database instance; V1_DATABASE=memory serves the v1 API from the
+# indexed in-memory engine (tests, benchmarks and local runs without Postgres)
+if V1_DATABASE == "memory":
+    from database import db
+else:
+    db = PostgresDatabase()
\ No newline at end of file
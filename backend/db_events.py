@@ -0,0 +1,32 @@
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+# In-process notifications emitted by the data layer after a write commits.
+# Caches subscribe here instead of the data layer importing them.
+
+USER_CHANGED = "user_changed"
+VOUCHER_TYPE_CHANGED = "voucher_type_changed"
+ORGANIZATION_CHANGED = "organization_changed"
+
+# Postgres NOTIFY channel carrying catalog changes to the other replicas
+# (catalog_cache.CatalogListener); the data layer notifies inside the write
+CATALOG_CHANNEL = "catalog_changed"
+# Channel the users trigger (migration 011) notifies with the changed user id,
+# so every replica drops that user's cached principals
+USER_CHANNEL = "user_changed"
+
+_listeners: Dict[str, List[Callable]] = defaultdict(list)
+
+
+def subscribe(event: str, callback: Callable):
+    """Register ``callback(**payload)`` for ``event``"""
+    _listeners[event].append(callback)
+
+
+def emit(event: str, **payload):
+    """Notify listeners; a failing listener never breaks the write path"""
+    for callback in list(_listeners[event]):
+        try:
+            callback(**payload)
+        except Exception as e:
+            print(f"db_events listener for {event} failed: {e}")
@@ -0,0 +1,236 @@
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Any
+
+import psycopg2
+from psycopg2 import extensions
+
+# Pool sizing per backend replica (prod runs 3 replicas behind Traefik)
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+# Seconds a caller may wait for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Connections idle for longer than this are pinged before being handed out
+DB_POOL_HEALTHCHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTHCHECK_INTERVAL", "30"))
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no connection becomes free within the pool timeout"""
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections.
+
+    Connections are checked out per call (``connection()``) or bound to the
+    current context for a whole unit of work (``bind()`` / ``unit_of_work()``),
+    e.g. one HTTP request. With ``open=False`` nothing connects until ``open()``
+    or the first checkout.
+    """
+
+    def __init__(self, connect: Callable[[], Any], min_size: int = DB_POOL_MIN_SIZE,
+                 max_size: int = DB_POOL_MAX_SIZE, timeout: float = DB_POOL_TIMEOUT,
+                 healthcheck_interval: float = DB_POOL_HEALTHCHECK_INTERVAL, open: bool = True):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Invalid pool size: min=%s max=%s" % (min_size, max_size))
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+
+        self._idle = deque()  # (connection, last_used monotonic)
+        self._size = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._bound: ContextVar = ContextVar("db_pool_bound_connection_%d" % id(self), default=None)
+        self._closed = False
+
+        # Metrics
+        self.checkouts_total = 0
+        self.exhausted_total = 0
+        self.timeouts_total = 0
+        self.wait_seconds_total = 0.0
+        self.reconnects_total = 0
+        self.stale_total = 0
+        self.max_in_use = 0
+
+        if open:
+            self.open()
+
+    def open(self):
+        """Connect until ``min_size`` connections exist"""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    # ============================================
+    # CHECKOUT / RETURN
+    # ============================================
+    def getconn(self):
+        """Check out a connection, waiting up to ``timeout`` seconds for one"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        with self._cond:
+            waited = False
+            while True:
+                if self._closed:
+                    raise PoolExhaustedError("Connection pool is closed")
+                if self._idle:
+                    # LIFO keeps the hottest connections in use
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+                if not waited:
+                    self.exhausted_total += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts_total += 1
+                    raise PoolExhaustedError(
+                        "No database connection available after %.1fs (max_size=%d)"
+                        % (self.timeout, self.max_size))
+                self._cond.wait(remaining)
+
+            self._in_use += 1
+            self.max_in_use = max(self.max_in_use, self._in_use)
+            self.checkouts_total += 1
+            self.wait_seconds_total += time.monotonic() - start
+
+        try:
+            if conn is None:
+                conn = self._connect()
+            else:
+                conn = self._ensure_healthy(conn, last_used)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def putconn(self, conn):
+        """Return a connection, resetting any open or failed transaction"""
+        if not conn.closed:
+            try:
+                status = conn.info.transaction_status
+                if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                    conn.close()
+                elif status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                conn.close()
+
+        with self._cond:
+            self._in_use -= 1
+            if conn.closed or self._closed:
+                if not conn.closed:
+                    conn.close()
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _ensure_healthy(self, conn, last_used: float):
+        """Replace closed connections and ping ones that sat idle too long"""
+        if not conn.closed and time.monotonic() - last_used < self.healthcheck_interval:
+            return conn
+        if not conn.closed:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+                return conn
+            except psycopg2.Error:
+                try:
+                    conn.close()
+                except psycopg2.Error:
+                    pass
+        self.stale_total += 1
+        self.reconnects_total += 1
+        return self._connect()
+
+    # ============================================
+    # SCOPES
+    # ============================================
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for one call, reusing the bound one if present"""
+        conn = self._bound.get()
+        if conn is not None:
+            yield conn
+            return
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def bind(self, conn):
+        """Bind ``conn`` to the current context so nested calls share it"""
+        self._bound.set(conn)
+
+    def unbind(self):
+        self._bound.set(None)
+
+    @contextmanager
+    def unit_of_work(self):
+        """Share one connection across every call made inside the block"""
+        if self._bound.get() is not None:
+            yield self._bound.get()
+            return
+        conn = self.getconn()
+        self.bind(conn)
+        try:
+            yield conn
+        finally:
+            self.unbind()
+            self.putconn(conn)
+
+    # ============================================
+    # LIFECYCLE / METRICS
+    # ============================================
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                if not conn.closed:
+                    conn.close()
+                self._size -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "max_in_use": self.max_in_use,
+                "checkouts_total": self.checkouts_total,
+                "exhausted_total": self.exhausted_total,
+                "timeouts_total": self.timeouts_total,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "reconnects_total": self.reconnects_total,
+                "stale_total": self.stale_total,
+            }
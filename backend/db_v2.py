@@ -1,11 +1,12 @@
 import os
 import psycopg2
-from psycopg2.extras import RealDictCursor, Json, register_default_json
+from psycopg2.extras import RealDictCursor, Json, register_default_json, register_default_jsonb
 import json
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, timedelta, date
 from decimal import Decimal
 from urllib.parse import quote_plus
+from starlette.concurrency import run_in_threadpool
 
 class DateTimeEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -14,13 +15,22 @@ class DateTimeEncoder(json.JSONEncoder):
         elif isinstance(obj, Decimal):
             return float(obj)
         return super().default(obj)
-import bcrypt
 import secrets
 import string
 from models_v2 import (
     UserRole, VoucherStatus, PaymentStatus, Frequency,
     Organization, VoucherType, UserResponse
 )
+from db_pool import ConnectionPool, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE
+from passwords import password_hasher
+import db_events
+import serializers
+from availability import WeeklyAvailability
+from audit import audit_writer, AuditedConnection, INSERT_AUDIT_LOG_SQL
+from pagination import keyset_page, plan_rows, PAGINATION_EXACT_COUNT_BELOW
+from conditional import CHANGE_COUNTERS_SQL, change_keys
+from metrics import instrument_methods, DB_CONNECTIONS_OPENED, DB_CONNECTION_FAILURES
+from query_log import LoggedConnection
 
 # Try to use individual env vars first, fall back to DATABASE_URL
 DB_HOST = os.getenv("DB_HOST", "postgres")
@@ -36,43 +46,257 @@ if not DATABASE_URL:
     encoded_password = quote_plus(DB_PASSWORD)
     DATABASE_URL = f"postgresql://{DB_USER}:{encoded_password}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# "sync" keeps psycopg2 (calls run in the threadpool), "async" uses psycopg 3 natively
+DB_BACKEND = os.getenv("DB_BACKEND", "sync").lower()
+# With DB_BACKEND=async this pool only serves background work (audit flushes,
+# maintenance, partition checks) and connects on demand
+DB_BACKGROUND_POOL_MAX_SIZE = int(os.getenv("DB_BACKGROUND_POOL_MAX_SIZE", "2"))
+
+# Regeneration rounds before giving up on colliding voucher codes
+VOUCHER_CODE_MAX_ATTEMPTS = 5
+VOUCHER_CODE_ALPHABET = string.ascii_uppercase + string.digits
+
+INSERT_VOUCHER_CODES_SQL = """
+    INSERT INTO voucher_codes (voucher_id, code, is_spare, is_used)
+    SELECT %s, c.code, c.is_spare, false
+    FROM unnest(%s::text[], %s::boolean[]) AS c(code, is_spare)
+    ON CONFLICT (code) DO NOTHING
+    RETURNING *
+"""
+
+# "global": one INV-<year>-<n> series; "organization": INV-<year>-<org>-<n> per organization
+INVOICE_NUMBERING = os.getenv("INVOICE_NUMBERING", "global").lower()
+
+ALLOCATE_INVOICE_NUMBER_SQL = """
+    INSERT INTO invoice_counters (organization_id, year, last_number)
+    VALUES (%s, %s, 1)
+    ON CONFLICT (organization_id, year)
+    DO UPDATE SET last_number = invoice_counters.last_number + 1, updated_at = NOW()
+    RETURNING last_number
+"""
+
+
+def format_invoice_number(year: int, series: int, number: int) -> str:
+    """Series 0 is the global numbering"""
+    if series:
+        return f"INV-{year}-{series}-{number:05d}"
+    return f"INV-{year}-{number:05d}"
+
+
+BOOKABLE_VOUCHER_TYPES_SQL = """
+    SELECT DISTINCT vt.*
+    FROM vouchers v
+    JOIN voucher_types vt ON vt.id = v.voucher_type_id
+    WHERE v.client_id = %s AND v.status = 'active' AND v.valid_until >= NOW()
+      AND vt.is_active = true
+"""
+
+ORGANIZATION_THERAPISTS_SQL = """
+    SELECT id, name, organization_id FROM users
+    WHERE organization_id = ANY(%s) AND role = 'therapist' AND is_active = true
+    ORDER BY name, id
+"""
+
+THERAPIST_SESSIONS_SQL = """
+    SELECT therapist_id, session_date, session_time, duration_minutes
+    FROM therapy_sessions
+    WHERE therapist_id = ANY(%s) AND session_date BETWEEN %s AND %s
+      AND status NOT IN ('cancelled', 'rescheduled')
+"""
+
+# Counters are sharded (migration 005): a key's value is the sum of its rows
+STAT_COUNTERS_SQL = """
+    SELECT key, SUM(value) AS value FROM stat_counters
+    WHERE key = ANY(%s) OR key LIKE ANY(%s)
+    GROUP BY key
+"""
+
+AUDIT_LOG_COLUMNS = """
+    id, user_id, organization_id, action, entity_type, entity_id,
+    old_values, new_values, ip_address::text AS ip_address, user_agent, created_at
+"""
+
+
+def build_audit_log_query(date_from: datetime, date_to: datetime, filters: Dict[str, Any],
+                          after: Optional[List[Any]], limit: int):
+    """Keyset query over audit_logs, newest first.
+
+    The created_at range lets PostgreSQL prune to the partitions it covers.
+    """
+    query = f"SELECT {AUDIT_LOG_COLUMNS} FROM audit_logs WHERE created_at >= %s AND created_at < %s"
+    params: List[Any] = [date_from, date_to]
+    for column in ('user_id', 'organization_id', 'entity_type', 'entity_id', 'action'):
+        if filters.get(column) is not None:
+            query += f" AND {column} = %s"
+            params.append(filters[column])
+    if after:
+        query += " AND (created_at, id) < (%s::timestamp, %s)"
+        params.extend(after)
+    query += " ORDER BY created_at DESC, id DESC LIMIT %s"
+    params.append(limit)
+    return query, params
+
+
+# Keyset sort orders per listing; the last column is always the unique id
+USER_SORTS = {
+    "name": ("u.name", "u.id"),
+    "email": ("u.email", "u.id"),
+    "created_at": ("u.created_at", "u.id"),
+}
+ORGANIZATION_SORTS = {
+    "name": ("name", "id"),
+    "created_at": ("created_at", "id"),
+}
+VOUCHER_TYPE_SORTS = {
+    "name": ("name", "id"),
+    "price": ("price", "id"),
+    "created_at": ("created_at", "id"),
+}
+
+# Column lists of the fast list responses (UserResponse, Organization, VoucherType);
+# rows are read as tuples and mapped by serializers.RowSerializer
+USER_LIST_SELECT = """
+    SELECT u.id, u.email, u.name, u.phone, u.role, u.organization_id, o.name AS organization_name,
+           u.is_organization_owner, u.is_active, u.approved_at, u.approved_by, u.last_login,
+           u.created_at, u.updated_at
+    FROM users u
+    LEFT JOIN organizations o ON u.organization_id = o.id
+"""
+ORGANIZATION_LIST_SELECT = """
+    SELECT id, name, slug, address, phone, email, tax_id, logo_url, is_active, created_at, updated_at
+    FROM organizations
+"""
+VOUCHER_TYPE_LIST_SELECT = """
+    SELECT id, organization_id, name, session_name, description, total_sessions, backup_sessions,
+           session_duration_minutes, max_clients_per_session, frequency, custom_days, price,
+           validity_days, booking_rules, is_active, deactivated_at, created_at, updated_at
+    FROM voucher_types
+"""
+# Purchase catalog of /api/voucher-types/available, served through catalog_cache
+AVAILABLE_VOUCHER_TYPES_SELECT = """
+    SELECT vt.id, vt.organization_id, vt.name, vt.session_name, vt.description, vt.total_sessions,
+           vt.backup_sessions, vt.session_duration_minutes, vt.max_clients_per_session, vt.frequency,
+           vt.custom_days, vt.price, vt.validity_days, vt.booking_rules, vt.is_active,
+           vt.deactivated_at, vt.created_at, vt.updated_at
+    FROM voucher_types vt
+    JOIN organizations o ON vt.organization_id = o.id
+    WHERE vt.is_active = true AND o.is_active = true
+    ORDER BY o.name, vt.name
+"""
+
+# Sent inside the writing transaction: Postgres delivers it only on commit
+CATALOG_NOTIFY_SQL = "SELECT pg_notify(%s, %s)"
+
+
+def user_list_where(organization_id: Optional[int] = None, role: Optional[str] = None,
+                    is_active: Optional[bool] = None, approved: Optional[bool] = None):
+    """WHERE clause over users u shared by list_users and count_users"""
+    query = " WHERE 1=1"
+    params = []
+    if organization_id:
+        query += " AND u.organization_id = %s"
+        params.append(organization_id)
+    if role:
+        query += " AND u.role = %s"
+        params.append(getattr(role, "value", role))
+    if is_active is not None:
+        query += " AND u.is_active = %s"
+        params.append(is_active)
+    if approved is not None:
+        query += " AND u.approved_at IS NOT NULL" if approved else " AND u.approved_at IS NULL"
+    return query, params
+
+
+def organization_list_where(is_active: Optional[bool] = None):
+    """WHERE clause shared by list_organizations and count_organizations"""
+    if is_active is None:
+        return " WHERE 1=1", []
+    return " WHERE is_active = %s", [is_active]
+
+
+def voucher_type_list_where(organization_id: Optional[int] = None, is_active: Optional[bool] = None):
+    """WHERE clause shared by list_voucher_types and count_voucher_types"""
+    query = " WHERE 1=1"
+    params = []
+    if organization_id:
+        query += " AND organization_id = %s"
+        params.append(organization_id)
+    if is_active is not None:
+        query += " AND is_active = %s"
+        params.append(is_active)
+    return query, params
+
+
+def catalog_notify_params(**payload) -> Tuple[str, str]:
+    """CATALOG_NOTIFY_SQL parameters for a voucher type / organization change"""
+    return db_events.CATALOG_CHANNEL, json.dumps(payload)
+
+
+def generate_voucher_codes(count: int) -> List[str]:
+    """Generate ``count`` distinct 'VK-XXXXXXXX' codes"""
+    codes = set()
+    while len(codes) < count:
+        codes.add('VK-' + ''.join(secrets.choice(VOUCHER_CODE_ALPHABET) for _ in range(8)))
+    return list(codes)
+
+class DatabaseV2Connection(LoggedConnection, AuditedConnection):
+    """Pooled connection: statements feed query_log, commits publish staged audit entries"""
+
+
 class DatabaseV2:
-    def __init__(self):
-        self.connection = None
-        # Register custom JSON encoder for datetime serialization
-        register_default_json(loads=json.loads, globally=False)
-        self.connect()
+    def __init__(self, min_size: int = DB_POOL_MIN_SIZE, max_size: int = DB_POOL_MAX_SIZE):
+        # Decode json/jsonb columns with the fast loader (process-wide)
+        register_default_json(loads=serializers.loads, globally=True)
+        register_default_jsonb(loads=serializers.loads, globally=True)
+        # Nothing connects at import; the sync backend opens the pool on startup
+        self.pool = ConnectionPool(self._connect, min_size=min_size, max_size=max_size, open=False)
     
-    def connect(self):
+    def _connect(self):
+        """Open a new connection for the pool"""
         try:
             # Alternative connection method using individual parameters
             if all([DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD]) and not os.getenv("DATABASE_URL"):
-                self.connection = psycopg2.connect(
+                connection = psycopg2.connect(
                     host=DB_HOST,
                     port=DB_PORT,
                     database=DB_NAME,
                     user=DB_USER,
-                    password=DB_PASSWORD
+                    password=DB_PASSWORD,
+                    connection_factory=DatabaseV2Connection
                 )
                 print(f"Connected to database successfully using individual parameters")
             else:
-                self.connection = psycopg2.connect(DATABASE_URL)
+                connection = psycopg2.connect(DATABASE_URL, connection_factory=DatabaseV2Connection)
                 print(f"Connected to database successfully using DATABASE_URL")
+            DB_CONNECTIONS_OPENED.inc("psycopg2")
+            return connection
         except Exception as e:
+            DB_CONNECTION_FAILURES.inc("psycopg2")
             print(f"Failed to connect to database: {e}")
             print(f"DB_HOST: {DB_HOST}, DB_PORT: {DB_PORT}, DB_NAME: {DB_NAME}, DB_USER: {DB_USER}")
             raise
     
-    def get_connection(self):
-        if not self.connection or self.connection.closed:
-            self.connect()
-        return self.connection
+    def listen_connection(self):
+        """Dedicated autocommit connection outside the pool, for LISTEN"""
+        connection = self._connect()
+        connection.autocommit = True
+        return connection
+    
+    def connection(self):
+        """Borrow a pooled connection for one call (or the bound unit of work)"""
+        return self.pool.connection()
+    
+    def unit_of_work(self):
+        """Run several calls on one pooled connection"""
+        return self.pool.unit_of_work()
     
     def commit(self):
-        self.get_connection().commit()
+        with self.connection() as conn:
+            conn.commit()
     
     def rollback(self):
-        self.get_connection().rollback()
+        with self.connection() as conn:
+            conn.rollback()
     
     # ============================================
     # ORGANIZATION METHODS
@@ -80,106 +304,112 @@ class DatabaseV2:
     def create_organization(self, name: str, owner_email: str, owner_name: str, 
                           owner_password: str, **kwargs) -> Dict[str, Any]:
         """Create organization with owner"""
-        conn = self.get_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Generate slug
-                cur.execute("SELECT generate_org_slug(%s) as slug", (name,))
-                slug = cur.fetchone()['slug']
+        with self.connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    # Generate slug
+                    cur.execute("SELECT generate_org_slug(%s) as slug", (name,))
+                    slug = cur.fetchone()['slug']
                 
-                # Create organization
-                cur.execute("""
-                    INSERT INTO organizations (name, slug, address, phone, email, tax_id, logo_url)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    RETURNING *
-                """, (name, slug, kwargs.get('address'), kwargs.get('phone'), 
-                     kwargs.get('email'), kwargs.get('tax_id'), kwargs.get('logo_url')))
-                org = cur.fetchone()
+                    # Create organization
+                    cur.execute("""
+                        INSERT INTO organizations (name, slug, address, phone, email, tax_id, logo_url)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                        RETURNING *
+                    """, (name, slug, kwargs.get('address'), kwargs.get('phone'), 
+                         kwargs.get('email'), kwargs.get('tax_id'), kwargs.get('logo_url')))
+                    org = cur.fetchone()
                 
-                # Create owner user
-                password_hash = bcrypt.hashpw(owner_password.encode(), bcrypt.gensalt()).decode()
-                cur.execute("""
-                    INSERT INTO users (email, name, password_hash, role, organization_id, 
-                                     is_organization_owner, is_active, approved_by, approved_at)
-                    VALUES (%s, %s, %s, %s, %s, true, true, %s, NOW())
-                    RETURNING id, email, name, role, organization_id, is_organization_owner,
-                             is_active, approved_by, approved_at, last_login, created_at, updated_at
-                """, (owner_email, owner_name, password_hash, UserRole.ORGANIZATION_OWNER, org['id'], 1))
-                owner = cur.fetchone()
+                    # Create owner user
+                    password_hash = password_hasher.hash(owner_password)
+                    cur.execute("""
+                        INSERT INTO users (email, name, password_hash, role, organization_id, 
+                                         is_organization_owner, is_active, approved_by, approved_at)
+                        VALUES (%s, %s, %s, %s, %s, true, true, %s, NOW())
+                        RETURNING id, email, name, role, organization_id, is_organization_owner,
+                                 is_active, approved_by, approved_at, last_login, created_at, updated_at
+                    """, (owner_email, owner_name, password_hash, UserRole.ORGANIZATION_OWNER, org['id'], 1))
+                    owner = cur.fetchone()
                 
-                # Grant permissions
-                cur.execute("""
-                    INSERT INTO permissions (user_id, organization_id, permission)
-                    VALUES (%s, %s, 'manage_organization'),
-                           (%s, %s, 'manage_users'),
-                           (%s, %s, 'manage_voucher_types')
-                """, (owner['id'], org['id'], owner['id'], org['id'], owner['id'], org['id']))
+                    # Grant permissions
+                    cur.execute("""
+                        INSERT INTO permissions (user_id, organization_id, permission)
+                        VALUES (%s, %s, 'manage_organization'),
+                               (%s, %s, 'manage_users'),
+                               (%s, %s, 'manage_voucher_types')
+                    """, (owner['id'], org['id'], owner['id'], org['id'], owner['id'], org['id']))
                 
-                # Add audit log
-                self._add_audit_log(cur, owner['id'], org['id'], 'CREATE', 'organization', 
-                                  org['id'], None, org)
+                    # Add audit log
+                    self._add_audit_log(cur, owner['id'], org['id'], 'CREATE', 'organization', 
+                                      org['id'], None, org)
                 
-                conn.commit()
-                org['owner'] = owner
-                return org
-        except Exception as e:
-            conn.rollback()
-            raise e
+                    conn.commit()
+                    org['owner'] = owner
+                    return org
+            except Exception as e:
+                conn.rollback()
+                raise e
     
     def get_organization(self, org_id: int) -> Optional[Dict[str, Any]]:
-        conn = self.get_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT * FROM organizations WHERE id = %s", (org_id,))
-            return cur.fetchone()
-    
-    def list_organizations(self, is_active: Optional[bool] = None) -> List[Dict[str, Any]]:
-        conn = self.get_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            query = "SELECT * FROM organizations"
-            params = []
-            if is_active is not None:
-                query += " WHERE is_active = %s"
-                params.append(is_active)
-            query += " ORDER BY name"
-            cur.execute(query, params)
-            return cur.fetchall()
-    
-    def update_organization(self, org_id: int, user_id: int, **kwargs) -> Dict[str, Any]:
-        conn = self.get_connection()
-        try:
+        with self.connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Get old values for audit
                 cur.execute("SELECT * FROM organizations WHERE id = %s", (org_id,))
-                old_org = cur.fetchone()
+                return cur.fetchone()
+    
+    def list_organizations(self, is_active: Optional[bool] = None, sort: str = "name",
+                           descending: bool = False, after: Optional[List[Any]] = None,
+                           limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                where, params = organization_list_where(is_active)
+                query, params = keyset_page("SELECT * FROM organizations" + where, params,
+                                            ORGANIZATION_SORTS[sort], after, descending, limit)
+                cur.execute(query, params)
+                return cur.fetchall()
+    
+    def count_organizations(self, is_active: Optional[bool] = None) -> Tuple[int, bool]:
+        """(total, is_estimate) for list_organizations"""
+        where, params = organization_list_where(is_active)
+        return self._count("SELECT 1 FROM organizations" + where, params)
+    
+    def update_organization(self, org_id: int, user_id: int, **kwargs) -> Dict[str, Any]:
+        with self.connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    # Get old values for audit
+                    cur.execute("SELECT * FROM organizations WHERE id = %s", (org_id,))
+                    old_org = cur.fetchone()
                 
-                # Build update query
-                updates = []
-                values = []
-                for key, value in kwargs.items():
-                    if key in ['name', 'address', 'phone', 'email', 'tax_id', 'logo_url', 'is_active']:
-                        updates.append(f"{key} = %s")
-                        values.append(value)
+                    # Build update query
+                    updates = []
+                    values = []
+                    for key, value in kwargs.items():
+                        if key in ['name', 'address', 'phone', 'email', 'tax_id', 'logo_url', 'is_active']:
+                            updates.append(f"{key} = %s")
+                            values.append(value)
                 
-                if updates:
-                    values.append(org_id)
-                    cur.execute(f"""
-                        UPDATE organizations 
-                        SET {', '.join(updates)}, updated_at = NOW()
-                        WHERE id = %s
-                        RETURNING *
-                    """, values)
-                    new_org = cur.fetchone()
+                    if updates:
+                        values.append(org_id)
+                        cur.execute(f"""
+                            UPDATE organizations 
+                            SET {', '.join(updates)}, updated_at = NOW()
+                            WHERE id = %s
+                            RETURNING *
+                        """, values)
+                        new_org = cur.fetchone()
                     
-                    # Add audit log
-                    self._add_audit_log(cur, user_id, org_id, 'UPDATE', 'organization', 
-                                      org_id, old_org, new_org)
+                        # Add audit log
+                        self._add_audit_log(cur, user_id, org_id, 'UPDATE', 'organization', 
+                                          org_id, old_org, new_org)
+                        cur.execute(CATALOG_NOTIFY_SQL, catalog_notify_params(organization_id=org_id))
                     
-                    conn.commit()
-                    return new_org
-                return old_org
-        except Exception as e:
-            conn.rollback()
-            raise e
+                        conn.commit()
+                        db_events.emit(db_events.ORGANIZATION_CHANGED, organization_id=org_id)
+                        return new_org
+                    return old_org
+            except Exception as e:
+                conn.rollback()
+                raise e
     
     # ============================================
     # USER METHODS
@@ -187,198 +417,198 @@ class DatabaseV2:
     def create_user(self, email: str, name: str, password: str, role: str, 
                    organization_id: int, created_by: int = None, **kwargs) -> Dict[str, Any]:
         """Create a new user"""
-        conn = self.get_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Hash password
-                password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+        with self.connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    # Hash password
+                    password_hash = password_hasher.hash(password)
                 
-                # Create user
-                cur.execute("""
-                    INSERT INTO users (email, name, password_hash, role, organization_id, 
-                                     phone, is_active, is_organization_owner, approved_by, approved_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id, email, name, role, organization_id, phone, 
-                             is_active, is_organization_owner, approved_by, approved_at,
-                             last_login, created_at, updated_at
-                """, (email, name, password_hash, role, organization_id, 
-                     kwargs.get('phone'), kwargs.get('is_active', True),
-                     kwargs.get('is_organization_owner', False),
-                     created_by, datetime.now() if created_by else None))
-                user = cur.fetchone()
+                    # Create user
+                    cur.execute("""
+                        INSERT INTO users (email, name, password_hash, role, organization_id, 
+                                         phone, is_active, is_organization_owner, approved_by, approved_at)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        RETURNING id, email, name, role, organization_id, phone, 
+                                 is_active, is_organization_owner, approved_by, approved_at,
+                                 last_login, created_at, updated_at
+                    """, (email, name, password_hash, role, organization_id, 
+                         kwargs.get('phone'), kwargs.get('is_active', True),
+                         kwargs.get('is_organization_owner', False),
+                         created_by, datetime.now() if created_by else None))
+                    user = cur.fetchone()
                 
-                # Add audit log
-                self._add_audit_log(cur, created_by, organization_id, 'CREATE', 'user', 
-                                  user['id'], None, user)
+                    # Add audit log
+                    self._add_audit_log(cur, created_by, organization_id, 'CREATE', 'user', 
+                                      user['id'], None, user)
                 
-                conn.commit()
-                return user
-        except Exception as e:
-            conn.rollback()
-            raise e
+                    conn.commit()
+                    return user
+            except Exception as e:
+                conn.rollback()
+                raise e
     
     def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
-        conn = self.get_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT u.*, o.name as organization_name
-                FROM users u
-                LEFT JOIN organizations o ON u.organization_id = o.id
-                WHERE u.id = %s
-            """, (user_id,))
-            return cur.fetchone()
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("""
+                    SELECT u.*, o.name as organization_name
+                    FROM users u
+                    LEFT JOIN organizations o ON u.organization_id = o.id
+                    WHERE u.id = %s
+                """, (user_id,))
+                return cur.fetchone()
     
     def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
-        conn = self.get_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT u.*, o.name as organization_name
-                FROM users u
-                LEFT JOIN organizations o ON u.organization_id = o.id
-                WHERE u.email = %s
-            """, (email,))
-            return cur.fetchone()
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("""
+                    SELECT u.*, o.name as organization_name
+                    FROM users u
+                    LEFT JOIN organizations o ON u.organization_id = o.id
+                    WHERE u.email = %s
+                """, (email,))
+                return cur.fetchone()
     
     def list_users(self, organization_id: Optional[int] = None, 
-                  role: Optional[str] = None, is_active: Optional[bool] = None) -> List[Dict[str, Any]]:
+                  role: Optional[str] = None, is_active: Optional[bool] = None,
+                  approved: Optional[bool] = None, sort: str = "name", descending: bool = False,
+                  after: Optional[List[Any]] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """List users with filters"""
-        conn = self.get_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            query = """
-                SELECT u.*, o.name as organization_name
-                FROM users u
-                LEFT JOIN organizations o ON u.organization_id = o.id
-                WHERE 1=1
-            """
-            params = []
-            
-            if organization_id:
-                query += " AND u.organization_id = %s"
-                params.append(organization_id)
-            if role:
-                query += " AND u.role = %s"
-                params.append(role)
-            if is_active is not None:
-                query += " AND u.is_active = %s"
-                params.append(is_active)
-            
-            query += " ORDER BY u.name"
-            cur.execute(query, params)
-            return cur.fetchall()
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                where, params = user_list_where(organization_id, role, is_active, approved)
+                query = """
+                    SELECT u.*, o.name as organization_name
+                    FROM users u
+                    LEFT JOIN organizations o ON u.organization_id = o.id
+                """ + where
+                query, params = keyset_page(query, params, USER_SORTS[sort], after, descending, limit)
+                cur.execute(query, params)
+                return cur.fetchall()
+    
+    def count_users(self, organization_id: Optional[int] = None, role: Optional[str] = None,
+                    is_active: Optional[bool] = None, approved: Optional[bool] = None) -> Tuple[int, bool]:
+        """(total, is_estimate) for list_users"""
+        where, params = user_list_where(organization_id, role, is_active, approved)
+        return self._count("SELECT 1 FROM users u" + where, params)
     
     def update_user(self, user_id: int, updated_by: int, **kwargs) -> Dict[str, Any]:
         """Update user details"""
-        conn = self.get_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Get old values
-                cur.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-                old_user = cur.fetchone()
+        with self.connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    # Get old values
+                    cur.execute("SELECT * FROM users WHERE id = %s", (user_id,))
+                    old_user = cur.fetchone()
                 
-                # Build update query
-                updates = []
-                values = []
-                for key, value in kwargs.items():
-                    if key in ['email', 'name', 'phone', 'role', 'is_active', 
-                             'organization_id', 'is_organization_owner']:
-                        updates.append(f"{key} = %s")
-                        values.append(value)
+                    # Build update query
+                    updates = []
+                    values = []
+                    for key, value in kwargs.items():
+                        if key in ['email', 'name', 'phone', 'role', 'is_active', 
+                                 'organization_id', 'is_organization_owner']:
+                            updates.append(f"{key} = %s")
+                            values.append(value)
                 
-                if updates:
-                    values.append(user_id)
-                    cur.execute(f"""
-                        UPDATE users 
-                        SET {', '.join(updates)}, updated_at = NOW()
-                        WHERE id = %s
-                        RETURNING *
-                    """, values)
-                    new_user = cur.fetchone()
+                    if updates:
+                        values.append(user_id)
+                        cur.execute(f"""
+                            UPDATE users 
+                            SET {', '.join(updates)}, updated_at = NOW()
+                            WHERE id = %s
+                            RETURNING *
+                        """, values)
+                        new_user = cur.fetchone()
                     
-                    # Add audit log
-                    self._add_audit_log(cur, updated_by, old_user['organization_id'], 
-                                      'UPDATE', 'user', user_id, old_user, new_user)
+                        # Add audit log
+                        self._add_audit_log(cur, updated_by, old_user['organization_id'], 
+                                          'UPDATE', 'user', user_id, old_user, new_user)
                     
-                    conn.commit()
-                    return new_user
-                return old_user
-        except Exception as e:
-            conn.rollback()
-            raise e
+                        conn.commit()
+                        db_events.emit(db_events.USER_CHANGED, user_id=user_id)
+                        return new_user
+                    return old_user
+            except Exception as e:
+                conn.rollback()
+                raise e
     
     def change_user_password(self, user_id: int, new_password: str, changed_by: int) -> bool:
         """Change user password"""
-        conn = self.get_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Hash new password
-                password_hash = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode()
+        with self.connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    # Hash new password
+                    password_hash = password_hasher.hash(new_password)
                 
-                # Update password
-                cur.execute("""
-                    UPDATE users 
-                    SET password_hash = %s, updated_at = NOW()
-                    WHERE id = %s
-                    RETURNING organization_id
-                """, (password_hash, user_id))
-                result = cur.fetchone()
+                    # Update password
+                    cur.execute("""
+                        UPDATE users 
+                        SET password_hash = %s, updated_at = NOW()
+                        WHERE id = %s
+                        RETURNING organization_id
+                    """, (password_hash, user_id))
+                    result = cur.fetchone()
                 
-                if result:
-                    # Add audit log
-                    self._add_audit_log(cur, changed_by, result['organization_id'], 
-                                      'CHANGE_PASSWORD', 'user', user_id, None, None)
-                    conn.commit()
-                    return True
-                return False
-        except Exception as e:
-            conn.rollback()
-            raise e
+                    if result:
+                        # Add audit log
+                        self._add_audit_log(cur, changed_by, result['organization_id'], 
+                                          'CHANGE_PASSWORD', 'user', user_id, None, None)
+                        conn.commit()
+                        db_events.emit(db_events.USER_CHANGED, user_id=user_id)
+                        return True
+                    return False
+            except Exception as e:
+                conn.rollback()
+                raise e
     
     def delete_user(self, user_id: int, deleted_by: int) -> bool:
         """Delete a user"""
-        conn = self.get_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Get user info for audit
-                cur.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-                user = cur.fetchone()
+        with self.connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    # Get user info for audit
+                    cur.execute("SELECT * FROM users WHERE id = %s", (user_id,))
+                    user = cur.fetchone()
                 
-                if user:
-                    # Delete user
-                    cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
+                    if user:
+                        # Delete user
+                        cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
                     
-                    # Add audit log
-                    self._add_audit_log(cur, deleted_by, user['organization_id'], 
-                                      'DELETE', 'user', user_id, user, None)
+                        # Add audit log
+                        self._add_audit_log(cur, deleted_by, user['organization_id'], 
+                                          'DELETE', 'user', user_id, user, None)
                     
-                    conn.commit()
-                    return True
-                return False
-        except Exception as e:
-            conn.rollback()
-            raise e
+                        conn.commit()
+                        db_events.emit(db_events.USER_CHANGED, user_id=user_id)
+                        return True
+                    return False
+            except Exception as e:
+                conn.rollback()
+                raise e
     
     def approve_user(self, user_id: int, approved_by: int) -> Dict[str, Any]:
         """Approve a pending user"""
-        conn = self.get_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    UPDATE users 
-                    SET is_active = true, approved_by = %s, approved_at = NOW(), updated_at = NOW()
-                    WHERE id = %s
-                    RETURNING *
-                """, (approved_by, user_id))
-                user = cur.fetchone()
+        with self.connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute("""
+                        UPDATE users 
+                        SET is_active = true, approved_by = %s, approved_at = NOW(), updated_at = NOW()
+                        WHERE id = %s
+                        RETURNING *
+                    """, (approved_by, user_id))
+                    user = cur.fetchone()
                 
-                if user:
-                    # Add audit log
-                    self._add_audit_log(cur, approved_by, user['organization_id'], 
-                                      'APPROVE', 'user', user_id, None, user)
-                    conn.commit()
-                return user
-        except Exception as e:
-            conn.rollback()
-            raise e
+                    if user:
+                        # Add audit log
+                        self._add_audit_log(cur, approved_by, user['organization_id'], 
+                                          'APPROVE', 'user', user_id, None, user)
+                        conn.commit()
+                        db_events.emit(db_events.USER_CHANGED, user_id=user_id)
+                    return user
+            except Exception as e:
+                conn.rollback()
+                raise e
     
     # ============================================
     # VOUCHER TYPE METHODS
@@ -386,132 +616,147 @@ class DatabaseV2:
     def create_voucher_type(self, organization_id: int, created_by: int, 
                            **kwargs) -> Dict[str, Any]:
         """Create a new voucher type"""
-        conn = self.get_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Convert booking_rules to JSON with custom encoder
-                booking_rules = Json(kwargs['booking_rules'], dumps=lambda x: json.dumps(x, cls=DateTimeEncoder))
+        with self.connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    # Convert booking_rules to JSON with custom encoder
+                    booking_rules = Json(kwargs['booking_rules'], dumps=lambda x: json.dumps(x, cls=DateTimeEncoder))
+                    bitmap = WeeklyAvailability.from_rules(kwargs['booking_rules']).to_bytes()
                 
-                cur.execute("""
-                    INSERT INTO voucher_types (
-                        organization_id, name, session_name, description,
-                        total_sessions, backup_sessions, session_duration_minutes,
-                        max_clients_per_session, frequency, custom_days,
-                        price, validity_days, booking_rules, is_active
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING *
-                """, (
-                    organization_id, kwargs['name'], kwargs.get('session_name', 'Session'),
-                    kwargs.get('description'), kwargs['total_sessions'], 
-                    kwargs.get('backup_sessions', 0), kwargs['session_duration_minutes'],
-                    kwargs.get('max_clients_per_session', 1), kwargs['frequency'],
-                    kwargs.get('custom_days'), kwargs['price'], kwargs['validity_days'],
-                    booking_rules, kwargs.get('is_active', True)
-                ))
-                voucher_type = cur.fetchone()
+                    cur.execute("""
+                        INSERT INTO voucher_types (
+                            organization_id, name, session_name, description,
+                            total_sessions, backup_sessions, session_duration_minutes,
+                            max_clients_per_session, frequency, custom_days,
+                            price, validity_days, booking_rules, booking_rules_bitmap, is_active
+                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        RETURNING *
+                    """, (
+                        organization_id, kwargs['name'], kwargs.get('session_name', 'Session'),
+                        kwargs.get('description'), kwargs['total_sessions'], 
+                        kwargs.get('backup_sessions', 0), kwargs['session_duration_minutes'],
+                        kwargs.get('max_clients_per_session', 1), kwargs['frequency'],
+                        kwargs.get('custom_days'), kwargs['price'], kwargs['validity_days'],
+                        booking_rules, bitmap, kwargs.get('is_active', True)
+                    ))
+                    voucher_type = cur.fetchone()
                 
-                # Add audit log
-                self._add_audit_log(cur, created_by, organization_id, 'CREATE', 
-                                  'voucher_type', voucher_type['id'], None, voucher_type)
+                    # Add audit log
+                    self._add_audit_log(cur, created_by, organization_id, 'CREATE', 
+                                      'voucher_type', voucher_type['id'], None, voucher_type)
+                    cur.execute(CATALOG_NOTIFY_SQL, catalog_notify_params(
+                        voucher_type_id=voucher_type['id'], organization_id=organization_id))
                 
-                conn.commit()
-                return voucher_type
-        except Exception as e:
-            conn.rollback()
-            raise e
+                    conn.commit()
+                    db_events.emit(db_events.VOUCHER_TYPE_CHANGED, voucher_type_id=voucher_type['id'],
+                                   organization_id=organization_id)
+                    return voucher_type
+            except Exception as e:
+                conn.rollback()
+                raise e
     
     def get_voucher_type(self, voucher_type_id: int) -> Optional[Dict[str, Any]]:
-        conn = self.get_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT * FROM voucher_types WHERE id = %s", (voucher_type_id,))
-            return cur.fetchone()
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("SELECT * FROM voucher_types WHERE id = %s", (voucher_type_id,))
+                return cur.fetchone()
     
     def list_voucher_types(self, organization_id: Optional[int] = None, 
-                          is_active: Optional[bool] = None) -> List[Dict[str, Any]]:
+                          is_active: Optional[bool] = None, sort: str = "name",
+                          descending: bool = False, after: Optional[List[Any]] = None,
+                          limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """List voucher types with filters"""
-        conn = self.get_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            query = "SELECT * FROM voucher_types WHERE 1=1"
-            params = []
-            
-            if organization_id:
-                query += " AND organization_id = %s"
-                params.append(organization_id)
-            if is_active is not None:
-                query += " AND is_active = %s"
-                params.append(is_active)
-            
-            query += " ORDER BY name"
-            cur.execute(query, params)
-            return cur.fetchall()
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                where, params = voucher_type_list_where(organization_id, is_active)
+                query, params = keyset_page("SELECT * FROM voucher_types" + where, params,
+                                            VOUCHER_TYPE_SORTS[sort], after, descending, limit)
+                cur.execute(query, params)
+                return cur.fetchall()
+    
+    def count_voucher_types(self, organization_id: Optional[int] = None,
+                            is_active: Optional[bool] = None) -> Tuple[int, bool]:
+        """(total, is_estimate) for list_voucher_types"""
+        where, params = voucher_type_list_where(organization_id, is_active)
+        return self._count("SELECT 1 FROM voucher_types" + where, params)
     
     def update_voucher_type(self, voucher_type_id: int, updated_by: int, 
                            **kwargs) -> Dict[str, Any]:
         """Update voucher type"""
-        conn = self.get_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Get old values
-                cur.execute("SELECT * FROM voucher_types WHERE id = %s", (voucher_type_id,))
-                old_vt = cur.fetchone()
+        with self.connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    # Get old values
+                    cur.execute("SELECT * FROM voucher_types WHERE id = %s", (voucher_type_id,))
+                    old_vt = cur.fetchone()
                 
-                # Build update query
-                updates = []
-                values = []
-                for key, value in kwargs.items():
-                    if key == 'booking_rules':
-                        updates.append(f"{key} = %s")
-                        values.append(Json(value, dumps=lambda x: json.dumps(x, cls=DateTimeEncoder)))
-                    elif key in ['name', 'session_name', 'description', 'total_sessions',
-                                'backup_sessions', 'session_duration_minutes',
-                                'max_clients_per_session', 'frequency', 'custom_days',
-                                'price', 'validity_days', 'is_active']:
-                        updates.append(f"{key} = %s")
-                        values.append(value)
+                    # Build update query
+                    updates = []
+                    values = []
+                    for key, value in kwargs.items():
+                        if key == 'booking_rules':
+                            updates.append(f"{key} = %s")
+                            values.append(Json(value, dumps=lambda x: json.dumps(x, cls=DateTimeEncoder)))
+                            updates.append("booking_rules_bitmap = %s")
+                            values.append(WeeklyAvailability.from_rules(value).to_bytes())
+                        elif key in ['name', 'session_name', 'description', 'total_sessions',
+                                    'backup_sessions', 'session_duration_minutes',
+                                    'max_clients_per_session', 'frequency', 'custom_days',
+                                    'price', 'validity_days', 'is_active']:
+                            updates.append(f"{key} = %s")
+                            values.append(value)
                 
-                if updates:
-                    values.append(voucher_type_id)
-                    cur.execute(f"""
-                        UPDATE voucher_types 
-                        SET {', '.join(updates)}, updated_at = NOW()
-                        WHERE id = %s
-                        RETURNING *
-                    """, values)
-                    new_vt = cur.fetchone()
+                    if updates:
+                        values.append(voucher_type_id)
+                        cur.execute(f"""
+                            UPDATE voucher_types 
+                            SET {', '.join(updates)}, updated_at = NOW()
+                            WHERE id = %s
+                            RETURNING *
+                        """, values)
+                        new_vt = cur.fetchone()
                     
-                    # Add audit log
-                    self._add_audit_log(cur, updated_by, old_vt['organization_id'], 
-                                      'UPDATE', 'voucher_type', voucher_type_id, old_vt, new_vt)
+                        # Add audit log
+                        self._add_audit_log(cur, updated_by, old_vt['organization_id'], 
+                                          'UPDATE', 'voucher_type', voucher_type_id, old_vt, new_vt)
+                        cur.execute(CATALOG_NOTIFY_SQL, catalog_notify_params(
+                            voucher_type_id=voucher_type_id, organization_id=old_vt['organization_id']))
                     
-                    conn.commit()
-                    return new_vt
-                return old_vt
-        except Exception as e:
-            conn.rollback()
-            raise e
+                        conn.commit()
+                        db_events.emit(db_events.VOUCHER_TYPE_CHANGED, voucher_type_id=voucher_type_id,
+                                       organization_id=old_vt['organization_id'])
+                        return new_vt
+                    return old_vt
+            except Exception as e:
+                conn.rollback()
+                raise e
     
     def deactivate_voucher_type(self, voucher_type_id: int, deactivated_by: int) -> Dict[str, Any]:
         """Deactivate a voucher type"""
-        conn = self.get_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    UPDATE voucher_types 
-                    SET is_active = false, deactivated_at = NOW(), updated_at = NOW()
-                    WHERE id = %s
-                    RETURNING *
-                """, (voucher_type_id,))
-                vt = cur.fetchone()
+        with self.connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute("""
+                        UPDATE voucher_types 
+                        SET is_active = false, deactivated_at = NOW(), updated_at = NOW()
+                        WHERE id = %s
+                        RETURNING *
+                    """, (voucher_type_id,))
+                    vt = cur.fetchone()
                 
-                if vt:
-                    # Add audit log
-                    self._add_audit_log(cur, deactivated_by, vt['organization_id'], 
-                                      'DEACTIVATE', 'voucher_type', voucher_type_id, None, vt)
-                    conn.commit()
-                return vt
-        except Exception as e:
-            conn.rollback()
-            raise e
+                    if vt:
+                        # Add audit log
+                        self._add_audit_log(cur, deactivated_by, vt['organization_id'], 
+                                          'DEACTIVATE', 'voucher_type', voucher_type_id, None, vt)
+                        cur.execute(CATALOG_NOTIFY_SQL, catalog_notify_params(
+                            voucher_type_id=voucher_type_id, organization_id=vt['organization_id']))
+                        conn.commit()
+                        db_events.emit(db_events.VOUCHER_TYPE_CHANGED, voucher_type_id=voucher_type_id,
+                                       organization_id=vt['organization_id'])
+                    return vt
+            except Exception as e:
+                conn.rollback()
+                raise e
     
     # ============================================
     # VOUCHER PURCHASE METHODS
@@ -519,139 +764,246 @@ class DatabaseV2:
     def purchase_voucher(self, client_id: int, voucher_type_id: int, 
                         payment_method: str, **kwargs) -> Dict[str, Any]:
         """Purchase a voucher"""
-        conn = self.get_connection()
-        try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Get voucher type details
-                cur.execute("SELECT * FROM voucher_types WHERE id = %s", (voucher_type_id,))
-                vt = cur.fetchone()
-                
-                if not vt or not vt['is_active']:
-                    raise ValueError("Voucher type not available")
+        with self.connection() as conn:
+            try:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    # Get voucher type details
+                    cur.execute("SELECT * FROM voucher_types WHERE id = %s", (voucher_type_id,))
+                    vt = cur.fetchone()
                 
-                # Calculate validity
-                valid_until = datetime.now() + timedelta(days=vt['validity_days'])
+                    if not vt or not vt['is_active']:
+                        raise ValueError("Voucher type not available")
                 
-                # Generate invoice number
-                invoice_number = self._generate_invoice_number(cur)
+                    # Calculate validity
+                    valid_until = datetime.now() + timedelta(days=vt['validity_days'])
                 
-                # Create voucher
-                cur.execute("""
-                    INSERT INTO vouchers (
-                        client_id, voucher_type_id, organization_id,
-                        purchase_date, valid_until, total_sessions, used_sessions,
-                        payment_method, payment_status, payment_amount, 
-                        payment_date, invoice_number, status
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING *
-                """, (
-                    client_id, voucher_type_id, vt['organization_id'],
-                    datetime.now(), valid_until, vt['total_sessions'], 0,
-                    payment_method, PaymentStatus.COMPLETED, vt['price'],
-                    datetime.now(), invoice_number, VoucherStatus.ACTIVE
-                ))
-                voucher = cur.fetchone()
+                    # Generate invoice number
+                    invoice_number = self._generate_invoice_number(cur, vt['organization_id'])
                 
-                # Generate voucher codes
-                codes = []
-                for i in range(vt['total_sessions']):
-                    code = self._generate_voucher_code(cur)
+                    # Create voucher
                     cur.execute("""
-                        INSERT INTO voucher_codes (voucher_id, code, is_spare, is_used)
-                        VALUES (%s, %s, false, false)
+                        INSERT INTO vouchers (
+                            client_id, voucher_type_id, organization_id,
+                            purchase_date, valid_until, total_sessions, used_sessions,
+                            payment_method, payment_status, payment_amount, 
+                            payment_date, invoice_number, status
+                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                         RETURNING *
-                    """, (voucher['id'], code))
-                    codes.append(cur.fetchone())
+                    """, (
+                        client_id, voucher_type_id, vt['organization_id'],
+                        datetime.now(), valid_until, vt['total_sessions'], 0,
+                        payment_method, PaymentStatus.COMPLETED, vt['price'],
+                        datetime.now(), invoice_number, VoucherStatus.ACTIVE
+                    ))
+                    voucher = cur.fetchone()
                 
-                # Generate backup codes
-                for i in range(vt['backup_sessions']):
-                    code = self._generate_voucher_code(cur)
-                    cur.execute("""
-                        INSERT INTO voucher_codes (voucher_id, code, is_spare, is_used)
-                        VALUES (%s, %s, true, false)
-                        RETURNING *
-                    """, (voucher['id'], code))
-                    codes.append(cur.fetchone())
+                    # Generate voucher codes (regular first, then backup) in one statement
+                    spare_flags = [False] * vt['total_sessions'] + [True] * vt['backup_sessions']
+                    codes = self._insert_voucher_codes(cur, voucher['id'], spare_flags)
                 
-                voucher['codes'] = codes
+                    voucher['codes'] = codes
                 
-                # Add audit log
-                self._add_audit_log(cur, client_id, vt['organization_id'], 
-                                  'PURCHASE', 'voucher', voucher['id'], None, voucher)
+                    # Add audit log
+                    self._add_audit_log(cur, client_id, vt['organization_id'], 
+                                      'PURCHASE', 'voucher', voucher['id'], None, voucher)
                 
-                conn.commit()
-                return voucher
-        except Exception as e:
-            conn.rollback()
-            raise e
+                    conn.commit()
+                    return voucher
+            except Exception as e:
+                conn.rollback()
+                raise e
     
     def list_available_voucher_types(self) -> List[Dict[str, Any]]:
         """List all active voucher types available for purchase"""
-        conn = self.get_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT vt.*, o.name as organization_name
-                FROM voucher_types vt
-                JOIN organizations o ON vt.organization_id = o.id
-                WHERE vt.is_active = true AND o.is_active = true
-                ORDER BY o.name, vt.name
-            """)
-            return cur.fetchall()
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("""
+                    SELECT vt.*, o.name as organization_name
+                    FROM voucher_types vt
+                    JOIN organizations o ON vt.organization_id = o.id
+                    WHERE vt.is_active = true AND o.is_active = true
+                    ORDER BY o.name, vt.name
+                """)
+                return cur.fetchall()
+    
+    # ============================================
+    # SLOT SEARCH
+    # ============================================
+    def list_bookable_voucher_types(self, client_id: int) -> List[Dict[str, Any]]:
+        """Active voucher types of the client's active, unexpired vouchers"""
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(BOOKABLE_VOUCHER_TYPES_SQL, (client_id,))
+                return cur.fetchall()
+    
+    def list_organization_therapists(self, organization_ids: List[int]) -> List[Dict[str, Any]]:
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(ORGANIZATION_THERAPISTS_SQL, (organization_ids,))
+                return cur.fetchall()
+    
+    def list_therapist_sessions(self, therapist_ids: List[int], date_from: date,
+                                date_to: date) -> List[Dict[str, Any]]:
+        """Booked (not cancelled) therapy sessions of the therapists in a date range"""
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(THERAPIST_SESSIONS_SQL, (therapist_ids, date_from, date_to))
+                return cur.fetchall()
+    
+    # ============================================
+    # DASHBOARD STATS
+    # ============================================
+    def get_stat_counters(self, keys: List[str], prefixes: List[str]) -> Dict[str, Any]:
+        """Read trigger-maintained counters by exact key or key prefix"""
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(STAT_COUNTERS_SQL, (keys, [prefix + '%' for prefix in prefixes]))
+                return {row['key']: row['value'] for row in cur.fetchall()}
+    
+    def get_change_counters(self, tables: List[str]) -> List[Tuple[str, Any, Any]]:
+        """(key, value, updated_at) of the tables' change counters (migration 010)"""
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(CHANGE_COUNTERS_SQL, (change_keys(tables),))
+                return cur.fetchall()
+    
+    # ============================================
+    # LIST RESPONSE ROWS
+    # ============================================
+    def list_user_rows(self, organization_id: Optional[int] = None, role: Optional[str] = None,
+                       is_active: Optional[bool] = None, approved: Optional[bool] = None,
+                       sort: str = "name", descending: bool = False, after: Optional[List[Any]] = None,
+                       limit: Optional[int] = None) -> Tuple[Tuple[str, ...], List[tuple]]:
+        """list_users as (column names, tuples) for the fast response path"""
+        where, params = user_list_where(organization_id, role, is_active, approved)
+        return self._rows(*keyset_page(USER_LIST_SELECT + where, params, USER_SORTS[sort],
+                                       after, descending, limit))
+    
+    def list_organization_rows(self, is_active: Optional[bool] = None, sort: str = "name",
+                               descending: bool = False, after: Optional[List[Any]] = None,
+                               limit: Optional[int] = None) -> Tuple[Tuple[str, ...], List[tuple]]:
+        """list_organizations as (column names, tuples) for the fast response path"""
+        where, params = organization_list_where(is_active)
+        return self._rows(*keyset_page(ORGANIZATION_LIST_SELECT + where, params, ORGANIZATION_SORTS[sort],
+                                       after, descending, limit))
+    
+    def list_voucher_type_rows(self, organization_id: Optional[int] = None, is_active: Optional[bool] = None,
+                               sort: str = "name", descending: bool = False, after: Optional[List[Any]] = None,
+                               limit: Optional[int] = None) -> Tuple[Tuple[str, ...], List[tuple]]:
+        """list_voucher_types as (column names, tuples) for the fast response path"""
+        where, params = voucher_type_list_where(organization_id, is_active)
+        return self._rows(*keyset_page(VOUCHER_TYPE_LIST_SELECT + where, params, VOUCHER_TYPE_SORTS[sort],
+                                       after, descending, limit))
+    
+    def list_available_voucher_type_rows(self) -> Tuple[Tuple[str, ...], List[tuple]]:
+        """list_available_voucher_types as (column names, tuples) for the catalog cache"""
+        return self._rows(AVAILABLE_VOUCHER_TYPES_SELECT, [])
+    
+    # ============================================
+    # AUDIT LOG METHODS
+    # ============================================
+    def list_audit_logs(self, date_from: datetime, date_to: datetime, filters: Dict[str, Any],
+                        after: Optional[List[Any]] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """List audit log entries in a date range, newest first"""
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(*build_audit_log_query(date_from, date_to, filters, after, limit))
+                return cur.fetchall()
     
     # ============================================
     # HELPER METHODS
     # ============================================
+    def _rows(self, query: str, params: List[Any]) -> Tuple[Tuple[str, ...], List[tuple]]:
+        """Column names and plain tuples of a query"""
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return tuple(column.name for column in cur.description), cur.fetchall()
+    
+    def _count(self, query: str, params: List[Any]) -> Tuple[int, bool]:
+        """Planner row estimate for a query, counted exactly when the estimate is small"""
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+                estimate = plan_rows(cur.fetchone())
+                if estimate >= PAGINATION_EXACT_COUNT_BELOW:
+                    return estimate, True
+                cur.execute(f"SELECT COUNT(*) AS total FROM ({query}) AS q", params)
+                return cur.fetchone()['total'], False
+    
     def _add_audit_log(self, cur, user_id: Optional[int], organization_id: Optional[int],
                       action: str, entity_type: str, entity_id: Optional[int],
                       old_values: Optional[Dict], new_values: Optional[Dict]):
-        """Add audit log entry"""
-        cur.execute("""
-            INSERT INTO audit_logs (user_id, organization_id, action, entity_type, 
-                                  entity_id, old_values, new_values)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (user_id, organization_id, action, entity_type, entity_id,
-             Json(old_values, dumps=lambda x: json.dumps(x, cls=DateTimeEncoder)) if old_values else None,
-             Json(new_values, dumps=lambda x: json.dumps(x, cls=DateTimeEncoder)) if new_values else None))
-    
-    def _generate_voucher_code(self, cur) -> str:
-        """Generate unique voucher code"""
-        while True:
-            code = 'VK-' + ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(8))
-            cur.execute("SELECT 1 FROM voucher_codes WHERE code = %s", (code,))
-            if not cur.fetchone():
-                return code
-    
-    def _generate_invoice_number(self, cur) -> str:
-        """Generate invoice number"""
+        """Add audit log entry (field-level diff, buffered when AUDIT_MODE=async)"""
+        entry = audit_writer.entry(user_id, organization_id, action, entity_type,
+                                   entity_id, old_values, new_values)
+        if not audit_writer.stage(cur.connection, entry):
+            cur.execute(INSERT_AUDIT_LOG_SQL, audit_writer.params(entry))
+    
+    def _insert_voucher_codes(self, cur, voucher_id: int, spare_flags: List[bool]) -> List[Dict[str, Any]]:
+        """Insert one code per flag; codes that collide are regenerated and retried"""
+        inserted = []
+        pending = spare_flags
+        for _ in range(VOUCHER_CODE_MAX_ATTEMPTS):
+            if not pending:
+                break
+            batch = generate_voucher_codes(len(pending))
+            cur.execute(INSERT_VOUCHER_CODES_SQL, (voucher_id, batch, pending))
+            rows = cur.fetchall()
+            inserted.extend(rows)
+            taken = {row['code'] for row in rows}
+            pending = [flag for code, flag in zip(batch, pending) if code not in taken]
+        if pending:
+            raise RuntimeError("Could not generate unique voucher codes")
+        inserted.sort(key=lambda row: (row['is_spare'], row['id']))
+        return inserted
+    
+    def _generate_invoice_number(self, cur, organization_id: int) -> str:
+        """Allocate the next invoice number (locks the counter row until commit)"""
         year = datetime.now().year
-        cur.execute("""
-            SELECT COUNT(*) + 1 as next_num 
-            FROM vouchers 
-            WHERE EXTRACT(YEAR FROM purchase_date) = %s
-        """, (year,))
-        next_num = cur.fetchone()['next_num']
-        return f"INV-{year}-{next_num:05d}"
+        series = organization_id if INVOICE_NUMBERING == "organization" else 0
+        cur.execute(ALLOCATE_INVOICE_NUMBER_SQL, (series, year))
+        return format_invoice_number(year, series, cur.fetchone()['last_number'])
     
     def check_permission(self, user_id: int, organization_id: int, permission: str) -> bool:
         """Check if user has permission"""
-        conn = self.get_connection()
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT 1 FROM permissions 
-                WHERE user_id = %s AND organization_id = %s 
-                AND (permission = %s OR permission = 'all')
-            """, (user_id, organization_id, permission))
-            return cur.fetchone() is not None
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT 1 FROM permissions 
+                    WHERE user_id = %s AND organization_id = %s 
+                    AND (permission = %s OR permission = 'all')
+                """, (user_id, organization_id, permission))
+                return cur.fetchone() is not None
     
     def get_user_permissions(self, user_id: int, organization_id: int) -> List[str]:
         """Get all permissions for user in organization"""
-        conn = self.get_connection()
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT permission FROM permissions 
-                WHERE user_id = %s AND organization_id = %s
-            """, (user_id, organization_id))
-            return [row[0] for row in cur.fetchall()]
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT permission FROM permissions 
+                    WHERE user_id = %s AND organization_id = %s
+                """, (user_id, organization_id))
+                return [row[0] for row in cur.fetchall()]
+
+# Per-method latency in metrics.DB_QUERY_LATENCY
+instrument_methods(DatabaseV2, exclude=("listen_connection", "connection", "unit_of_work"))
 
 # Global database instance
-db_v2 = DatabaseV2()
\ No newline at end of file
+if DB_BACKEND == "async":
+    db_v2 = DatabaseV2(min_size=0, max_size=DB_BACKGROUND_POOL_MAX_SIZE)
+else:
+    db_v2 = DatabaseV2()
+audit_writer.start(db_v2.pool, dumps=lambda x: json.dumps(x, cls=DateTimeEncoder))
+
+async def db_v2_connection():
+    """FastAPI dependency: check out one pooled connection for the whole request"""
+    # Wait for a free connection off the event loop so a saturated pool
+    # cannot block the coroutines that would release connections
+    conn = await run_in_threadpool(db_v2.pool.getconn)
+    db_v2.pool.bind(conn)
+    try:
+        yield conn
+    finally:
+        db_v2.pool.unbind()
+        db_v2.pool.putconn(conn)
\ No newline at end of file
@@ -0,0 +1,802 @@
+import os
+import json
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from typing import Optional, List, Dict, Any, Tuple
+
+import time
+from psycopg import AsyncConnection, AsyncCursor
+from psycopg.rows import dict_row, tuple_row
+from psycopg.types.json import Json
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+from starlette.concurrency import run_in_threadpool
+
+from models_v2 import UserRole, VoucherStatus, PaymentStatus
+from passwords import password_hasher
+import db_events
+from availability import WeeklyAvailability
+from audit import audit_writer, INSERT_AUDIT_LOG_SQL
+from pagination import keyset_page, plan_rows, PAGINATION_EXACT_COUNT_BELOW
+from conditional import CHANGE_COUNTERS_SQL, change_keys
+from metrics import instrument_methods, DB_CONNECTIONS_OPENED
+from query_log import query_log, query_text, EXPLAIN_PREFIX, QUERY_LOG_ENABLED
+from db_pool import (
+    PoolExhaustedError, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT,
+    DB_POOL_HEALTHCHECK_INTERVAL
+)
+from db_v2 import (
+    db_v2, db_v2_connection, DateTimeEncoder,
+    generate_voucher_codes, INSERT_VOUCHER_CODES_SQL, VOUCHER_CODE_MAX_ATTEMPTS,
+    INVOICE_NUMBERING, ALLOCATE_INVOICE_NUMBER_SQL, format_invoice_number,
+    build_audit_log_query, user_list_where, organization_list_where, voucher_type_list_where,
+    USER_SORTS, ORGANIZATION_SORTS, VOUCHER_TYPE_SORTS, STAT_COUNTERS_SQL,
+    USER_LIST_SELECT, ORGANIZATION_LIST_SELECT, VOUCHER_TYPE_LIST_SELECT, AVAILABLE_VOUCHER_TYPES_SELECT,
+    CATALOG_NOTIFY_SQL, catalog_notify_params,
+    BOOKABLE_VOUCHER_TYPES_SQL, ORGANIZATION_THERAPISTS_SQL, THERAPIST_SESSIONS_SQL,
+    DATABASE_URL, DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD, DB_BACKEND
+)
+
+
+def _json(value):
+    return Json(value, dumps=lambda x: json.dumps(x, cls=DateTimeEncoder))
+
+
+async def explain_async(conn, query: str, params) -> Optional[str]:
+    """psycopg 3 counterpart of query_log.explain_sync"""
+    try:
+        # Savepoint inside a transaction, BEGIN/ROLLBACK outside one
+        async with conn.transaction(force_rollback=True):
+            async with AsyncCursor(conn, row_factory=tuple_row) as cur:
+                await cur.execute(EXPLAIN_PREFIX + query, params)
+                return "\n".join(row[0] for row in await cur.fetchall())
+    except Exception as e:
+        print(f"EXPLAIN of slow query failed: {e}")
+        return None
+
+
+class LoggedAsyncCursor(AsyncCursor):
+    """psycopg 3 counterpart of query_log.LoggedCursorMixin"""
+
+    async def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = await super().execute(query, params, **kwargs)
+        except Exception:
+            await self._log(query, params, time.perf_counter() - started, explain=False)
+            raise
+        await self._log(query, params, time.perf_counter() - started)
+        return result
+
+    async def executemany(self, query, params_seq, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().executemany(query, params_seq, **kwargs)
+        finally:
+            await self._log(query, None, time.perf_counter() - started, explain=False)
+
+    async def _log(self, query, params, seconds: float, explain: bool = True):
+        try:
+            text = query_text(query, self.connection)
+            if query_log.record(text, seconds, self.rowcount) and explain:
+                plan = await explain_async(self.connection, text, params)
+                if plan:
+                    query_log.add_plan(text, plan)
+        except Exception as e:
+            print(f"Query log failed: {e}")
+
+
+class AuditedAsyncConnection(AsyncConnection):
+    """psycopg 3 counterpart of audit.AuditedConnection (and query_log.LoggedConnection)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.audit_pending = []
+        if QUERY_LOG_ENABLED:
+            self.cursor_factory = LoggedAsyncCursor
+
+    async def commit(self):
+        await super().commit()
+        pending, self.audit_pending = self.audit_pending, []
+        if pending:
+            # Runs on the event loop: drop instead of waiting for queue space
+            audit_writer.publish(pending, block=False)
+
+    async def rollback(self):
+        self.audit_pending = []
+        await super().rollback()
+
+
+async def _connection_opened(conn):
+    DB_CONNECTIONS_OPENED.inc("psycopg3")
+
+
+class AsyncDatabaseV2:
+    """asyncio-native implementation of the DatabaseV2 surface on psycopg 3.
+
+    Shares SQL with db_v2.DatabaseV2; every method is awaitable and borrows a
+    connection from its own AsyncConnectionPool. The pool connection context
+    commits on success and rolls back on error.
+    """
+
+    def __init__(self):
+        if all([DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD]) and not os.getenv("DATABASE_URL"):
+            conninfo = ""
+            kwargs = dict(host=DB_HOST, port=DB_PORT, dbname=DB_NAME,
+                          user=DB_USER, password=DB_PASSWORD)
+        else:
+            conninfo = DATABASE_URL
+            kwargs = {}
+        self.pool = AsyncConnectionPool(
+            conninfo,
+            kwargs=kwargs,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            timeout=DB_POOL_TIMEOUT,
+            max_idle=max(DB_POOL_HEALTHCHECK_INTERVAL, 60),
+            check=AsyncConnectionPool.check_connection,
+            connection_class=AuditedAsyncConnection,
+            configure=_connection_opened,
+            open=False,
+        )
+
+    async def open(self):
+        await self.pool.open()
+        print("Connected to database successfully using async pool")
+
+    async def close(self):
+        await self.pool.close()
+
+    @asynccontextmanager
+    async def connection(self):
+        try:
+            async with self.pool.connection() as conn:
+                yield conn
+        except PoolTimeout as e:
+            raise PoolExhaustedError(str(e))
+
+    def stats(self) -> Dict[str, Any]:
+        return self.pool.get_stats()
+
+    # ============================================
+    # ORGANIZATION METHODS
+    # ============================================
+    async def create_organization(self, name: str, owner_email: str, owner_name: str,
+                                  owner_password: str, **kwargs) -> Dict[str, Any]:
+        """Create organization with owner"""
+        password_hash = await password_hasher.hash_async(owner_password)
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("SELECT generate_org_slug(%s) as slug", (name,))
+                slug = (await cur.fetchone())['slug']
+
+                await cur.execute("""
+                    INSERT INTO organizations (name, slug, address, phone, email, tax_id, logo_url)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    RETURNING *
+                """, (name, slug, kwargs.get('address'), kwargs.get('phone'),
+                      kwargs.get('email'), kwargs.get('tax_id'), kwargs.get('logo_url')))
+                org = await cur.fetchone()
+
+                await cur.execute("""
+                    INSERT INTO users (email, name, password_hash, role, organization_id,
+                                     is_organization_owner, is_active, approved_by, approved_at)
+                    VALUES (%s, %s, %s, %s, %s, true, true, %s, NOW())
+                    RETURNING id, email, name, role, organization_id, is_organization_owner,
+                             is_active, approved_by, approved_at, last_login, created_at, updated_at
+                """, (owner_email, owner_name, password_hash, UserRole.ORGANIZATION_OWNER.value,
+                      org['id'], 1))
+                owner = await cur.fetchone()
+
+                await cur.execute("""
+                    INSERT INTO permissions (user_id, organization_id, permission)
+                    VALUES (%s, %s, 'manage_organization'),
+                           (%s, %s, 'manage_users'),
+                           (%s, %s, 'manage_voucher_types')
+                """, (owner['id'], org['id'], owner['id'], org['id'], owner['id'], org['id']))
+
+                await self._add_audit_log(cur, owner['id'], org['id'], 'CREATE', 'organization',
+                                          org['id'], None, org)
+                org['owner'] = owner
+                return org
+
+    async def get_organization(self, org_id: int) -> Optional[Dict[str, Any]]:
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("SELECT * FROM organizations WHERE id = %s", (org_id,))
+                return await cur.fetchone()
+
+    async def list_organizations(self, is_active: Optional[bool] = None, sort: str = "name",
+                                 descending: bool = False, after: Optional[List[Any]] = None,
+                                 limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                where, params = organization_list_where(is_active)
+                query, params = keyset_page("SELECT * FROM organizations" + where, params,
+                                            ORGANIZATION_SORTS[sort], after, descending, limit)
+                await cur.execute(query, params)
+                return await cur.fetchall()
+
+    async def count_organizations(self, is_active: Optional[bool] = None) -> Tuple[int, bool]:
+        """(total, is_estimate) for list_organizations"""
+        where, params = organization_list_where(is_active)
+        return await self._count("SELECT 1 FROM organizations" + where, params)
+
+    async def update_organization(self, org_id: int, user_id: int, **kwargs) -> Dict[str, Any]:
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("SELECT * FROM organizations WHERE id = %s", (org_id,))
+                old_org = await cur.fetchone()
+
+                updates = []
+                values = []
+                for key, value in kwargs.items():
+                    if key in ['name', 'address', 'phone', 'email', 'tax_id', 'logo_url', 'is_active']:
+                        updates.append(f"{key} = %s")
+                        values.append(value)
+
+                if updates:
+                    values.append(org_id)
+                    await cur.execute(f"""
+                        UPDATE organizations
+                        SET {', '.join(updates)}, updated_at = NOW()
+                        WHERE id = %s
+                        RETURNING *
+                    """, values)
+                    new_org = await cur.fetchone()
+
+                    await self._add_audit_log(cur, user_id, org_id, 'UPDATE', 'organization',
+                                              org_id, old_org, new_org)
+                    await cur.execute(CATALOG_NOTIFY_SQL, catalog_notify_params(organization_id=org_id))
+                else:
+                    return old_org
+        db_events.emit(db_events.ORGANIZATION_CHANGED, organization_id=org_id)
+        return new_org
+
+    # ============================================
+    # USER METHODS
+    # ============================================
+    async def create_user(self, email: str, name: str, password: str, role: str,
+                          organization_id: int, created_by: int = None, **kwargs) -> Dict[str, Any]:
+        """Create a new user"""
+        password_hash = await password_hasher.hash_async(password)
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("""
+                    INSERT INTO users (email, name, password_hash, role, organization_id,
+                                     phone, is_active, is_organization_owner, approved_by, approved_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id, email, name, role, organization_id, phone,
+                             is_active, is_organization_owner, approved_by, approved_at,
+                             last_login, created_at, updated_at
+                """, (email, name, password_hash, role, organization_id,
+                      kwargs.get('phone'), kwargs.get('is_active', True),
+                      kwargs.get('is_organization_owner', False),
+                      created_by, datetime.now() if created_by else None))
+                user = await cur.fetchone()
+
+                await self._add_audit_log(cur, created_by, organization_id, 'CREATE', 'user',
+                                          user['id'], None, user)
+                return user
+
+    async def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("""
+                    SELECT u.*, o.name as organization_name
+                    FROM users u
+                    LEFT JOIN organizations o ON u.organization_id = o.id
+                    WHERE u.id = %s
+                """, (user_id,))
+                return await cur.fetchone()
+
+    async def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("""
+                    SELECT u.*, o.name as organization_name
+                    FROM users u
+                    LEFT JOIN organizations o ON u.organization_id = o.id
+                    WHERE u.email = %s
+                """, (email,))
+                return await cur.fetchone()
+
+    async def list_users(self, organization_id: Optional[int] = None,
+                         role: Optional[str] = None, is_active: Optional[bool] = None,
+                         approved: Optional[bool] = None, sort: str = "name", descending: bool = False,
+                         after: Optional[List[Any]] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """List users with filters"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                where, params = user_list_where(organization_id, role, is_active, approved)
+                query = """
+                    SELECT u.*, o.name as organization_name
+                    FROM users u
+                    LEFT JOIN organizations o ON u.organization_id = o.id
+                """ + where
+                query, params = keyset_page(query, params, USER_SORTS[sort], after, descending, limit)
+                await cur.execute(query, params)
+                return await cur.fetchall()
+
+    async def count_users(self, organization_id: Optional[int] = None, role: Optional[str] = None,
+                          is_active: Optional[bool] = None, approved: Optional[bool] = None) -> Tuple[int, bool]:
+        """(total, is_estimate) for list_users"""
+        where, params = user_list_where(organization_id, role, is_active, approved)
+        return await self._count("SELECT 1 FROM users u" + where, params)
+
+    async def update_user(self, user_id: int, updated_by: int, **kwargs) -> Dict[str, Any]:
+        """Update user details"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("SELECT * FROM users WHERE id = %s", (user_id,))
+                old_user = await cur.fetchone()
+
+                updates = []
+                values = []
+                for key, value in kwargs.items():
+                    if key in ['email', 'name', 'phone', 'role', 'is_active',
+                               'organization_id', 'is_organization_owner']:
+                        updates.append(f"{key} = %s")
+                        values.append(value)
+
+                if updates:
+                    values.append(user_id)
+                    await cur.execute(f"""
+                        UPDATE users
+                        SET {', '.join(updates)}, updated_at = NOW()
+                        WHERE id = %s
+                        RETURNING *
+                    """, values)
+                    new_user = await cur.fetchone()
+
+                    await self._add_audit_log(cur, updated_by, old_user['organization_id'],
+                                              'UPDATE', 'user', user_id, old_user, new_user)
+                else:
+                    return old_user
+        db_events.emit(db_events.USER_CHANGED, user_id=user_id)
+        return new_user
+
+    async def change_user_password(self, user_id: int, new_password: str, changed_by: int) -> bool:
+        """Change user password"""
+        password_hash = await password_hasher.hash_async(new_password)
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("""
+                    UPDATE users
+                    SET password_hash = %s, updated_at = NOW()
+                    WHERE id = %s
+                    RETURNING organization_id
+                """, (password_hash, user_id))
+                result = await cur.fetchone()
+
+                if result:
+                    await self._add_audit_log(cur, changed_by, result['organization_id'],
+                                              'CHANGE_PASSWORD', 'user', user_id, None, None)
+                else:
+                    return False
+        db_events.emit(db_events.USER_CHANGED, user_id=user_id)
+        return True
+
+    async def delete_user(self, user_id: int, deleted_by: int) -> bool:
+        """Delete a user"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("SELECT * FROM users WHERE id = %s", (user_id,))
+                user = await cur.fetchone()
+
+                if user:
+                    await cur.execute("DELETE FROM users WHERE id = %s", (user_id,))
+                    await self._add_audit_log(cur, deleted_by, user['organization_id'],
+                                              'DELETE', 'user', user_id, user, None)
+                else:
+                    return False
+        db_events.emit(db_events.USER_CHANGED, user_id=user_id)
+        return True
+
+    async def approve_user(self, user_id: int, approved_by: int) -> Dict[str, Any]:
+        """Approve a pending user"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("""
+                    UPDATE users
+                    SET is_active = true, approved_by = %s, approved_at = NOW(), updated_at = NOW()
+                    WHERE id = %s
+                    RETURNING *
+                """, (approved_by, user_id))
+                user = await cur.fetchone()
+
+                if user:
+                    await self._add_audit_log(cur, approved_by, user['organization_id'],
+                                              'APPROVE', 'user', user_id, None, user)
+        if user:
+            db_events.emit(db_events.USER_CHANGED, user_id=user_id)
+        return user
+
+    # ============================================
+    # VOUCHER TYPE METHODS
+    # ============================================
+    async def create_voucher_type(self, organization_id: int, created_by: int,
+                                  **kwargs) -> Dict[str, Any]:
+        """Create a new voucher type"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("""
+                    INSERT INTO voucher_types (
+                        organization_id, name, session_name, description,
+                        total_sessions, backup_sessions, session_duration_minutes,
+                        max_clients_per_session, frequency, custom_days,
+                        price, validity_days, booking_rules, booking_rules_bitmap, is_active
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING *
+                """, (
+                    organization_id, kwargs['name'], kwargs.get('session_name', 'Session'),
+                    kwargs.get('description'), kwargs['total_sessions'],
+                    kwargs.get('backup_sessions', 0), kwargs['session_duration_minutes'],
+                    kwargs.get('max_clients_per_session', 1), kwargs['frequency'],
+                    kwargs.get('custom_days'), kwargs['price'], kwargs['validity_days'],
+                    _json(kwargs['booking_rules']),
+                    WeeklyAvailability.from_rules(kwargs['booking_rules']).to_bytes(),
+                    kwargs.get('is_active', True)
+                ))
+                voucher_type = await cur.fetchone()
+
+                await self._add_audit_log(cur, created_by, organization_id, 'CREATE',
+                                          'voucher_type', voucher_type['id'], None, voucher_type)
+                await cur.execute(CATALOG_NOTIFY_SQL, catalog_notify_params(
+                    voucher_type_id=voucher_type['id'], organization_id=organization_id))
+        db_events.emit(db_events.VOUCHER_TYPE_CHANGED, voucher_type_id=voucher_type['id'],
+                       organization_id=organization_id)
+        return voucher_type
+
+    async def get_voucher_type(self, voucher_type_id: int) -> Optional[Dict[str, Any]]:
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("SELECT * FROM voucher_types WHERE id = %s", (voucher_type_id,))
+                return await cur.fetchone()
+
+    async def list_voucher_types(self, organization_id: Optional[int] = None,
+                                 is_active: Optional[bool] = None, sort: str = "name",
+                                 descending: bool = False, after: Optional[List[Any]] = None,
+                                 limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """List voucher types with filters"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                where, params = voucher_type_list_where(organization_id, is_active)
+                query, params = keyset_page("SELECT * FROM voucher_types" + where, params,
+                                            VOUCHER_TYPE_SORTS[sort], after, descending, limit)
+                await cur.execute(query, params)
+                return await cur.fetchall()
+
+    async def count_voucher_types(self, organization_id: Optional[int] = None,
+                                  is_active: Optional[bool] = None) -> Tuple[int, bool]:
+        """(total, is_estimate) for list_voucher_types"""
+        where, params = voucher_type_list_where(organization_id, is_active)
+        return await self._count("SELECT 1 FROM voucher_types" + where, params)
+
+    async def update_voucher_type(self, voucher_type_id: int, updated_by: int,
+                                  **kwargs) -> Dict[str, Any]:
+        """Update voucher type"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("SELECT * FROM voucher_types WHERE id = %s", (voucher_type_id,))
+                old_vt = await cur.fetchone()
+
+                updates = []
+                values = []
+                for key, value in kwargs.items():
+                    if key == 'booking_rules':
+                        updates.append(f"{key} = %s")
+                        values.append(_json(value))
+                        updates.append("booking_rules_bitmap = %s")
+                        values.append(WeeklyAvailability.from_rules(value).to_bytes())
+                    elif key in ['name', 'session_name', 'description', 'total_sessions',
+                                 'backup_sessions', 'session_duration_minutes',
+                                 'max_clients_per_session', 'frequency', 'custom_days',
+                                 'price', 'validity_days', 'is_active']:
+                        updates.append(f"{key} = %s")
+                        values.append(value)
+
+                if updates:
+                    values.append(voucher_type_id)
+                    await cur.execute(f"""
+                        UPDATE voucher_types
+                        SET {', '.join(updates)}, updated_at = NOW()
+                        WHERE id = %s
+                        RETURNING *
+                    """, values)
+                    new_vt = await cur.fetchone()
+
+                    await self._add_audit_log(cur, updated_by, old_vt['organization_id'],
+                                              'UPDATE', 'voucher_type', voucher_type_id, old_vt, new_vt)
+                    await cur.execute(CATALOG_NOTIFY_SQL, catalog_notify_params(
+                        voucher_type_id=voucher_type_id, organization_id=old_vt['organization_id']))
+                else:
+                    return old_vt
+        db_events.emit(db_events.VOUCHER_TYPE_CHANGED, voucher_type_id=voucher_type_id,
+                       organization_id=old_vt['organization_id'])
+        return new_vt
+
+    async def deactivate_voucher_type(self, voucher_type_id: int, deactivated_by: int) -> Dict[str, Any]:
+        """Deactivate a voucher type"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("""
+                    UPDATE voucher_types
+                    SET is_active = false, deactivated_at = NOW(), updated_at = NOW()
+                    WHERE id = %s
+                    RETURNING *
+                """, (voucher_type_id,))
+                vt = await cur.fetchone()
+
+                if vt:
+                    await self._add_audit_log(cur, deactivated_by, vt['organization_id'],
+                                              'DEACTIVATE', 'voucher_type', voucher_type_id, None, vt)
+                    await cur.execute(CATALOG_NOTIFY_SQL, catalog_notify_params(
+                        voucher_type_id=voucher_type_id, organization_id=vt['organization_id']))
+        if vt:
+            db_events.emit(db_events.VOUCHER_TYPE_CHANGED, voucher_type_id=voucher_type_id,
+                           organization_id=vt['organization_id'])
+        return vt
+
+    # ============================================
+    # VOUCHER PURCHASE METHODS
+    # ============================================
+    async def purchase_voucher(self, client_id: int, voucher_type_id: int,
+                               payment_method: str, **kwargs) -> Dict[str, Any]:
+        """Purchase a voucher"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("SELECT * FROM voucher_types WHERE id = %s", (voucher_type_id,))
+                vt = await cur.fetchone()
+
+                if not vt or not vt['is_active']:
+                    raise ValueError("Voucher type not available")
+
+                valid_until = datetime.now() + timedelta(days=vt['validity_days'])
+                invoice_number = await self._generate_invoice_number(cur, vt['organization_id'])
+
+                await cur.execute("""
+                    INSERT INTO vouchers (
+                        client_id, voucher_type_id, organization_id,
+                        purchase_date, valid_until, total_sessions, used_sessions,
+                        payment_method, payment_status, payment_amount,
+                        payment_date, invoice_number, status
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING *
+                """, (
+                    client_id, voucher_type_id, vt['organization_id'],
+                    datetime.now(), valid_until, vt['total_sessions'], 0,
+                    payment_method, PaymentStatus.COMPLETED.value, vt['price'],
+                    datetime.now(), invoice_number, VoucherStatus.ACTIVE.value
+                ))
+                voucher = await cur.fetchone()
+
+                spare_flags = [False] * vt['total_sessions'] + [True] * vt['backup_sessions']
+                codes = await self._insert_voucher_codes(cur, voucher['id'], spare_flags)
+
+                voucher['codes'] = codes
+
+                await self._add_audit_log(cur, client_id, vt['organization_id'],
+                                          'PURCHASE', 'voucher', voucher['id'], None, voucher)
+                return voucher
+
+    async def list_available_voucher_types(self) -> List[Dict[str, Any]]:
+        """List all active voucher types available for purchase"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("""
+                    SELECT vt.*, o.name as organization_name
+                    FROM voucher_types vt
+                    JOIN organizations o ON vt.organization_id = o.id
+                    WHERE vt.is_active = true AND o.is_active = true
+                    ORDER BY o.name, vt.name
+                """)
+                return await cur.fetchall()
+
+    # ============================================
+    # SLOT SEARCH
+    # ============================================
+    async def list_bookable_voucher_types(self, client_id: int) -> List[Dict[str, Any]]:
+        """Active voucher types of the client's active, unexpired vouchers"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(BOOKABLE_VOUCHER_TYPES_SQL, (client_id,))
+                return await cur.fetchall()
+
+    async def list_organization_therapists(self, organization_ids: List[int]) -> List[Dict[str, Any]]:
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(ORGANIZATION_THERAPISTS_SQL, (organization_ids,))
+                return await cur.fetchall()
+
+    async def list_therapist_sessions(self, therapist_ids: List[int], date_from: date,
+                                      date_to: date) -> List[Dict[str, Any]]:
+        """Booked (not cancelled) therapy sessions of the therapists in a date range"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(THERAPIST_SESSIONS_SQL, (therapist_ids, date_from, date_to))
+                return await cur.fetchall()
+
+    # ============================================
+    # DASHBOARD STATS
+    # ============================================
+    async def get_stat_counters(self, keys: List[str], prefixes: List[str]) -> Dict[str, Any]:
+        """Read trigger-maintained counters by exact key or key prefix"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(STAT_COUNTERS_SQL, (keys, [prefix + '%' for prefix in prefixes]))
+                return {row['key']: row['value'] for row in await cur.fetchall()}
+
+    async def get_change_counters(self, tables: List[str]) -> List[Tuple[str, Any, Any]]:
+        """(key, value, updated_at) of the tables' change counters (migration 010)"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=tuple_row) as cur:
+                await cur.execute(CHANGE_COUNTERS_SQL, (change_keys(tables),))
+                return await cur.fetchall()
+
+    # ============================================
+    # LIST RESPONSE ROWS
+    # ============================================
+    async def list_user_rows(self, organization_id: Optional[int] = None, role: Optional[str] = None,
+                             is_active: Optional[bool] = None, approved: Optional[bool] = None,
+                             sort: str = "name", descending: bool = False, after: Optional[List[Any]] = None,
+                             limit: Optional[int] = None) -> Tuple[Tuple[str, ...], List[tuple]]:
+        """list_users as (column names, tuples) for the fast response path"""
+        where, params = user_list_where(organization_id, role, is_active, approved)
+        return await self._rows(*keyset_page(USER_LIST_SELECT + where, params, USER_SORTS[sort],
+                                             after, descending, limit))
+
+    async def list_organization_rows(self, is_active: Optional[bool] = None, sort: str = "name",
+                                     descending: bool = False, after: Optional[List[Any]] = None,
+                                     limit: Optional[int] = None) -> Tuple[Tuple[str, ...], List[tuple]]:
+        """list_organizations as (column names, tuples) for the fast response path"""
+        where, params = organization_list_where(is_active)
+        return await self._rows(*keyset_page(ORGANIZATION_LIST_SELECT + where, params,
+                                             ORGANIZATION_SORTS[sort], after, descending, limit))
+
+    async def list_voucher_type_rows(self, organization_id: Optional[int] = None,
+                                     is_active: Optional[bool] = None, sort: str = "name",
+                                     descending: bool = False, after: Optional[List[Any]] = None,
+                                     limit: Optional[int] = None) -> Tuple[Tuple[str, ...], List[tuple]]:
+        """list_voucher_types as (column names, tuples) for the fast response path"""
+        where, params = voucher_type_list_where(organization_id, is_active)
+        return await self._rows(*keyset_page(VOUCHER_TYPE_LIST_SELECT + where, params,
+                                             VOUCHER_TYPE_SORTS[sort], after, descending, limit))
+
+    async def list_available_voucher_type_rows(self) -> Tuple[Tuple[str, ...], List[tuple]]:
+        """list_available_voucher_types as (column names, tuples) for the catalog cache"""
+        return await self._rows(AVAILABLE_VOUCHER_TYPES_SELECT, [])
+
+    # ============================================
+    # AUDIT LOG METHODS
+    # ============================================
+    async def list_audit_logs(self, date_from: datetime, date_to: datetime, filters: Dict[str, Any],
+                              after: Optional[List[Any]] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """List audit log entries in a date range, newest first"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(*build_audit_log_query(date_from, date_to, filters, after, limit))
+                return await cur.fetchall()
+
+    # ============================================
+    # HELPER METHODS
+    # ============================================
+    async def _rows(self, query: str, params: List[Any]) -> Tuple[Tuple[str, ...], List[tuple]]:
+        """Column names and plain tuples of a query"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=tuple_row) as cur:
+                await cur.execute(query, params)
+                return tuple(column.name for column in cur.description), await cur.fetchall()
+
+    async def _count(self, query: str, params: List[Any]) -> Tuple[int, bool]:
+        """Planner row estimate for a query, counted exactly when the estimate is small"""
+        async with self.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+                estimate = plan_rows(await cur.fetchone())
+                if estimate >= PAGINATION_EXACT_COUNT_BELOW:
+                    return estimate, True
+                await cur.execute(f"SELECT COUNT(*) AS total FROM ({query}) AS q", params)
+                return (await cur.fetchone())['total'], False
+
+    async def _add_audit_log(self, cur, user_id: Optional[int], organization_id: Optional[int],
+                             action: str, entity_type: str, entity_id: Optional[int],
+                             old_values: Optional[Dict], new_values: Optional[Dict]):
+        """Add audit log entry (field-level diff, buffered when AUDIT_MODE=async)"""
+        entry = audit_writer.entry(user_id, organization_id, action, entity_type,
+                                   entity_id, old_values, new_values)
+        if not audit_writer.stage(cur.connection, entry):
+            await cur.execute(INSERT_AUDIT_LOG_SQL, audit_writer.params(entry))
+
+    async def _insert_voucher_codes(self, cur, voucher_id: int,
+                                    spare_flags: List[bool]) -> List[Dict[str, Any]]:
+        """Insert one code per flag; codes that collide are regenerated and retried"""
+        inserted = []
+        pending = spare_flags
+        for _ in range(VOUCHER_CODE_MAX_ATTEMPTS):
+            if not pending:
+                break
+            batch = generate_voucher_codes(len(pending))
+            await cur.execute(INSERT_VOUCHER_CODES_SQL, (voucher_id, batch, pending))
+            rows = await cur.fetchall()
+            inserted.extend(rows)
+            taken = {row['code'] for row in rows}
+            pending = [flag for code, flag in zip(batch, pending) if code not in taken]
+        if pending:
+            raise RuntimeError("Could not generate unique voucher codes")
+        inserted.sort(key=lambda row: (row['is_spare'], row['id']))
+        return inserted
+
+    async def _generate_invoice_number(self, cur, organization_id: int) -> str:
+        """Allocate the next invoice number (locks the counter row until commit)"""
+        year = datetime.now().year
+        series = organization_id if INVOICE_NUMBERING == "organization" else 0
+        await cur.execute(ALLOCATE_INVOICE_NUMBER_SQL, (series, year))
+        return format_invoice_number(year, series, (await cur.fetchone())['last_number'])
+
+    async def check_permission(self, user_id: int, organization_id: int, permission: str) -> bool:
+        """Check if user has permission"""
+        async with self.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT 1 FROM permissions
+                    WHERE user_id = %s AND organization_id = %s
+                    AND (permission = %s OR permission = 'all')
+                """, (user_id, organization_id, permission))
+                return await cur.fetchone() is not None
+
+    async def get_user_permissions(self, user_id: int, organization_id: int) -> List[str]:
+        """Get all permissions for user in organization"""
+        async with self.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("""
+                    SELECT permission FROM permissions
+                    WHERE user_id = %s AND organization_id = %s
+                """, (user_id, organization_id))
+                return [row[0] for row in await cur.fetchall()]
+
+
+class ThreadedDatabaseV2:
+    """Awaitable facade over the synchronous DatabaseV2.
+
+    Each call runs in the threadpool so psycopg2 never blocks the event loop;
+    the request-bound pool connection follows the call via contextvars.
+    """
+
+    def __init__(self, db):
+        self._db = db
+
+    async def open(self):
+        await run_in_threadpool(self._db.pool.open)
+
+    async def close(self):
+        self._db.pool.closeall()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._db.pool.stats()
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(attr, *args, **kwargs)
+        call.__name__ = name
+        return call
+
+
+async def _no_request_scope():
+    """The async pool checks out a connection per call"""
+    yield None
+
+
+instrument_methods(AsyncDatabaseV2, exclude=("open", "close", "connection", "stats"))
+
+
+# Global database handle used by the routers: always awaitable
+if DB_BACKEND == "async":
+    database = AsyncDatabaseV2()
+    request_scope = _no_request_scope
+else:
+    database = ThreadedDatabaseV2(db_v2)
+    request_scope = db_v2_connection
@@ -0,0 +1,40 @@
+from bisect import bisect_left, insort
+from typing import Iterable, List, Tuple
+
+# Half-open [start, end) intervals in any ordered unit (minutes, datetimes)
+
+
+class IntervalIndex:
+    """Static-ish interval set with O(log n + k) overlap queries.
+
+    Intervals are kept sorted by start; together with the longest interval
+    length this bounds where an overlapping interval can start.
+    """
+
+    def __init__(self, intervals: Iterable[Tuple] = ()):
+        self._intervals: List[Tuple] = sorted((start, end) for start, end in intervals if end > start)
+        self._starts = [start for start, _ in self._intervals]
+        self._max_length = max((end - start for start, end in self._intervals), default=None)
+
+    def __len__(self) -> int:
+        return len(self._intervals)
+
+    def add(self, start, end):
+        if end <= start:
+            return
+        insort(self._intervals, (start, end))
+        self._starts = [s for s, _ in self._intervals]
+        length = end - start
+        if self._max_length is None or length > self._max_length:
+            self._max_length = length
+
+    def overlapping(self, start, end) -> List[Tuple]:
+        """Intervals sharing at least one instant with [start, end)"""
+        if not self._intervals or end <= start:
+            return []
+        lo = bisect_left(self._starts, start - self._max_length)
+        hi = bisect_left(self._starts, end)
+        return [(s, e) for s, e in self._intervals[lo:hi] if e > start]
+
+    def count_overlapping(self, start, end) -> int:
+        return len(self.overlapping(start, end))
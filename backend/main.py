@@ -1,13 +1,15 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from datetime import timedelta, datetime, date
-from typing import List
+from datetime import timedelta, datetime
+from typing import List, Optional
+import secrets
 
 from models import (
     User, TherapyClass, Voucher, VoucherCode, Reservation, Session,
     LoginRequest, TokenResponse, VoucherGenerateRequest, ReservationRequest,
-    SessionRescheduleRequest, UserRole, SessionStatus, CodeStatus
+    SessionRescheduleRequest, UserRole, CodeStatus
 )
 # Use real PostgreSQL database instead of MockDatabase
 from db_connection import db
@@ -15,10 +17,26 @@ from auth import (
     authenticate_user, create_access_token, get_current_user,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from principal_cache import principal_cache
 # Import v2 API routes
 from api_v2 import router as api_v2_router
+from db_v2_async import database
+from db_pool import PoolExhaustedError
+from passwords import password_hasher, PasswordHasherBusy
+from audit import audit_writer, ensure_partitions
+from maintenance import maintenance_scheduler, SCHEDULER_ENABLED
+from catalog_cache import catalog_cache, catalog_listener, CATALOG_LISTEN_ENABLED
+import db_events
+from slots import slot_templates
+from query_log import query_log
+from metrics import registry, MetricsMiddleware, METRICS_ENABLED, METRICS_TOKEN
+from serializers import FastJSONResponse
+from db_v2 import db_v2, DB_BACKEND
+from pagination import PAGINATION_MAX_LIMIT
+from scheduling import RESERVATION_SESSIONS, ClassFullError
+from starlette.concurrency import run_in_threadpool
 
-app = FastAPI(title="Therapy System API", version="2.0.0")
+app = FastAPI(title="Therapy System API", version="2.0.0", default_response_class=FastJSONResponse)
 
 # Include v2 API routes
 app.include_router(api_v2_router)
@@ -45,13 +63,88 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so request latency includes CORS and the other middleware
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Component stats exported on /metrics next to the request/query histograms
+registry.register_stats("db_pool", database.stats)
+if DB_BACKEND == "async":
+    registry.register_stats("db_background_pool", db_v2.pool.stats)
+registry.register_stats("password_hasher", password_hasher.stats)
+registry.register_stats("audit_writer", audit_writer.stats)
+registry.register_stats("principal_cache", principal_cache.stats)
+registry.register_stats("slot_templates", slot_templates.stats)
+registry.register_stats("catalog_cache", catalog_cache.stats)
+registry.register_stats("catalog_listener", catalog_listener.stats)
+registry.register_stats("query_log", query_log.stats)
+registry.register_stats("maintenance_job", maintenance_scheduler.stats, label="job")
+
+@app.exception_handler(PoolExhaustedError)
+async def pool_exhausted_handler(request: Request, exc: PoolExhaustedError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Database busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many login attempts in progress, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.exception_handler(ClassFullError)
+async def class_full_handler(request: Request, exc: ClassFullError):
+    return JSONResponse(status_code=409, content={"detail": "Therapy class is full"})
+
+def ensure_audit_partitions():
+    """Make sure audit_logs has partitions for the coming months"""
+    try:
+        with db_v2.connection() as conn:
+            created = ensure_partitions(conn)
+        if created:
+            print(f"Created {created} audit_logs partition(s)")
+    except Exception as e:
+        print(f"Could not ensure audit_logs partitions: {e}")
+
+@app.on_event("startup")
+async def open_db_pool():
+    await database.open()
+    await run_in_threadpool(ensure_audit_partitions)
+    if SCHEDULER_ENABLED:
+        maintenance_scheduler.start(db_v2.pool)
+    if CATALOG_LISTEN_ENABLED:
+        # Principals cached on this replica follow user writes made on any replica
+        catalog_listener.listen(db_events.USER_CHANNEL, principal_cache.invalidate, principal_cache.clear)
+        catalog_listener.start(db_v2.listen_connection)
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    maintenance_scheduler.close()
+    catalog_listener.close()
+    # Flush buffered audit entries while the pool is still open
+    await run_in_threadpool(audit_writer.close)
+    await database.close()
+    password_hasher.shutdown()
+
 @app.get("/")
 def read_root():
     return {"message": "Therapy System API"}
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics(request: Request):
+    """Prometheus scrape endpoint (Bearer METRICS_TOKEN when configured)"""
+    if METRICS_TOKEN and not secrets.compare_digest(request.headers.get("authorization", ""),
+                                                    f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/token", response_model=TokenResponse)
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -83,24 +176,38 @@ async def generate_voucher(
     )
     return voucher
 
+# v1 list endpoints return every row unless the caller pages with limit/offset
 @app.get("/admin/vouchers", response_model=List[Voucher])
-async def list_vouchers(current_user: User = Depends(get_current_user)):
+async def list_vouchers(
+    limit: Optional[int] = Query(None, ge=1, le=PAGINATION_MAX_LIMIT),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user)
+):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    return list(db.vouchers.values())
+    return db.vouchers.find(order_by=["id"], limit=limit, offset=offset)
 
 @app.get("/admin/users", response_model=List[User])
-async def list_users(current_user: User = Depends(get_current_user)):
+async def list_users(
+    limit: Optional[int] = Query(None, ge=1, le=PAGINATION_MAX_LIMIT),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user)
+):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    return list(db.users.values())
+    return db.users.find(order_by=["id"], limit=limit, offset=offset)
 
 # Therapy classes endpoints
 @app.get("/therapy-classes", response_model=List[TherapyClass])
-async def list_therapy_classes():
-    return list(db.therapy_classes.values())
+async def list_therapy_classes(
+    therapist_id: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=PAGINATION_MAX_LIMIT),
+    offset: int = Query(0, ge=0)
+):
+    filters = {"therapist_id": therapist_id} if therapist_id else {}
+    return db.therapy_classes.find(order_by=["name", "id"], limit=limit, offset=offset, **filters)
 
 @app.get("/therapy-classes/{class_id}", response_model=TherapyClass)
 async def get_therapy_class(class_id: str):
@@ -162,9 +269,7 @@ async def delete_therapy_class(
         raise HTTPException(status_code=404, detail="Therapy class not found")
     
     # Check for active reservations
-    active_reservations = [r for r in db.reservations.values() 
-                          if r.therapy_class_id == class_id]
-    if active_reservations:
+    if db.reservations.exists(therapy_class_id=class_id):
         raise HTTPException(
             status_code=400, 
             detail="Cannot delete class with active reservations"
@@ -187,14 +292,13 @@ async def activate_code(
     if not voucher_code:
         raise HTTPException(status_code=404, detail="Invalid code")
     
-    voucher = db.vouchers.get(voucher_code.voucher_id)
-    if voucher.client_id and voucher.client_id != current_user.id:
+    voucher = db.vouchers.get(voucher_code['voucher_id'])
+    if voucher['client_id'] and voucher['client_id'] != current_user.id:
         raise HTTPException(status_code=400, detail="Code already assigned to another client")
     
-    voucher.client_id = current_user.id
-    voucher.activated_at = datetime.now()
+    db.vouchers.update_row(voucher['id'], client_id=current_user.id, activated_at=datetime.now())
     
-    return {"message": "Code activated successfully", "voucher_id": voucher.id}
+    return {"message": "Code activated successfully", "voucher_id": voucher['id']}
 
 @app.post("/client/activate-code/{code}")
 async def activate_voucher_code(code: str, current_user: User = Depends(get_current_user)):
@@ -205,27 +309,26 @@ async def activate_voucher_code(code: str, current_user: User = Depends(get_curr
     if not voucher_code:
         raise HTTPException(status_code=404, detail="Invalid voucher code")
     
-    if voucher_code.status != CodeStatus.ACTIVE:
+    if voucher_code['status'] != CodeStatus.ACTIVE:
         raise HTTPException(status_code=400, detail="Code is not active")
     
-    voucher = db.vouchers.get(voucher_code.voucher_id)
+    voucher = db.vouchers.get(voucher_code['voucher_id'])
     if not voucher:
         raise HTTPException(status_code=404, detail="Voucher not found")
     
     # Check if voucher is already activated by another client
-    if voucher.client_id and voucher.client_id != current_user.id:
+    if voucher['client_id'] and voucher['client_id'] != current_user.id:
         raise HTTPException(status_code=400, detail="Voucher already activated by another user")
     
     # Activate voucher for the client
-    voucher.client_id = current_user.id
-    voucher.activated_at = datetime.now()
+    voucher = db.vouchers.update_row(voucher['id'], client_id=current_user.id, activated_at=datetime.now())
     
     # Return info about code type
     return {
         "success": True, 
         "voucher": voucher,
-        "code_type": "backup" if voucher_code.is_backup else "regular",
-        "is_backup": voucher_code.is_backup
+        "code_type": "backup" if voucher_code['is_backup'] else "regular",
+        "is_backup": voucher_code['is_backup']
     }
 
 @app.post("/client/reservations", response_model=Reservation)
@@ -240,11 +343,11 @@ async def create_reservation(
     if not voucher_code:
         raise HTTPException(status_code=404, detail="Invalid code")
     
-    voucher = db.vouchers.get(voucher_code.voucher_id)
-    if voucher.client_id != current_user.id:
+    voucher = db.vouchers.get(voucher_code['voucher_id'])
+    if voucher['client_id'] != current_user.id:
         raise HTTPException(status_code=403, detail="Code not assigned to this client")
     
-    if voucher_code.status != CodeStatus.ACTIVE:
+    if voucher_code['status'] != CodeStatus.ACTIVE:
         raise HTTPException(status_code=400, detail="Code already used or expired")
     
     therapy_class = db.therapy_classes.get(request.therapy_class_id)
@@ -255,7 +358,8 @@ async def create_reservation(
         voucher_code=voucher_code,
         therapy_class=therapy_class,
         client_id=current_user.id,
-        start_date=request.start_date
+        start_date=request.start_date,
+        sessions=request.sessions_count or RESERVATION_SESSIONS
     )
     
     return reservation
@@ -272,44 +376,41 @@ async def list_client_sessions(current_user: User = Depends(get_current_user)):
     if current_user.role != UserRole.CLIENT:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    sessions = []
-    for reservation in db.get_user_reservations(current_user.id):
-        sessions.extend(reservation.sessions)
-    
-    return sorted(sessions, key=lambda s: (s.scheduled_date, s.scheduled_time))
+    reservation_ids = [r['id'] for r in db.get_user_reservations(current_user.id)]
+    if not reservation_ids:
+        return []
+    return db.sessions.find(reservation_id=reservation_ids, order_by=["scheduled_date", "scheduled_time"])
 
 @app.get("/client/voucher-status")
 async def get_voucher_status(current_user: User = Depends(get_current_user)):
     if current_user.role != UserRole.CLIENT:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Find vouchers for this client
-    client_vouchers = [v for v in db.vouchers.values() if v.client_id == current_user.id]
+    # Most recent voucher of this client
+    voucher = db.vouchers.first(client_id=current_user.id, order_by=["-created_at", "-id"])
     
-    if not client_vouchers:
+    if not voucher:
         return {"has_voucher": False}
     
-    voucher = client_vouchers[0]  # Get the most recent one
-    
     # Count used codes
     regular_used = 0
     backup_used = 0
     regular_total = 0
     backup_total = 0
     
-    for code in voucher.codes:
-        if code.is_backup:
+    for code in db.voucher_codes.find(voucher_id=voucher['id']):
+        if code['is_backup']:
             backup_total += 1
-            if code.status == CodeStatus.USED:
+            if code['status'] == CodeStatus.USED.value:
                 backup_used += 1
         else:
             regular_total += 1
-            if code.status == CodeStatus.USED:
+            if code['status'] == CodeStatus.USED.value:
                 regular_used += 1
     
     return {
         "has_voucher": True,
-        "voucher_id": voucher.id,
+        "voucher_id": str(voucher['id']),
         "regular_codes": {
             "total": regular_total,
             "used": regular_used,
@@ -337,17 +438,19 @@ async def list_therapist_sessions_with_details(current_user: User = Depends(get_
     
     sessions = db.get_therapist_sessions(current_user.id)
     
-    # Enrich sessions with client and class details
+    # Enrich sessions with client and class details, one query per table
+    loader = db.batch_loader()
+    reservations = loader.load_many("reservations", (s['reservation_id'] for s in sessions))
+    classes = loader.load_many("therapy_classes", (r['therapy_class_id'] for r in reservations.values()))
+    clients = loader.load_many("users", (r['client_id'] for r in reservations.values()))
+    
     enriched_sessions = []
     for session in sessions:
-        reservation = db.reservations.get(session.reservation_id)
+        reservation = reservations.get(session['reservation_id'])
         if reservation:
-            therapy_class = db.therapy_classes.get(reservation.therapy_class_id)
-            client = db.users.get(reservation.client_id)
-            
-            session_dict = session.dict()
-            session_dict['therapy_class'] = therapy_class
-            session_dict['client'] = client
+            session_dict = dict(session)
+            session_dict['therapy_class'] = classes.get(reservation['therapy_class_id'])
+            session_dict['client'] = clients.get(reservation['client_id'])
             enriched_sessions.append(session_dict)
     
     return enriched_sessions
@@ -366,18 +469,13 @@ async def reschedule_session(
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Verify therapist owns this session
-    reservation = db.reservations.get(session.reservation_id)
-    therapy_class = db.therapy_classes.get(reservation.therapy_class_id)
-    if therapy_class.therapist_id != current_user.id:
+    reservation = db.reservations.get(session['reservation_id'])
+    therapy_class = db.therapy_classes.get(reservation['therapy_class_id'])
+    if therapy_class['therapist_id'] != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to modify this session")
     
-    session.actual_date = request.new_date
-    session.actual_time = request.new_time
-    session.status = SessionStatus.RESCHEDULED
-    if request.reason:
-        session.therapist_notes = f"Rescheduled: {request.reason}"
-    
-    return session
+    notes = f"Rescheduled: {request.reason}" if request.reason else None
+    return db.reschedule_session(session_id, request.new_date, request.new_time, notes)
 
 @app.put("/therapist/sessions/{session_id}/notes", response_model=Session)
 async def update_session_notes(
@@ -393,71 +491,19 @@ async def update_session_notes(
         raise HTTPException(status_code=404, detail="Session not found")
     
     # Verify therapist owns this session
-    reservation = db.reservations.get(session.reservation_id)
-    therapy_class = db.therapy_classes.get(reservation.therapy_class_id)
-    if therapy_class.therapist_id != current_user.id:
+    reservation = db.reservations.get(session['reservation_id'])
+    therapy_class = db.therapy_classes.get(reservation['therapy_class_id'])
+    if therapy_class['therapist_id'] != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to modify this session")
     
-    session.therapist_notes = notes
-    return session
+    return db.sessions.update_row(session_id, therapist_notes=notes)
 
 @app.get("/therapist/clients")
 async def list_therapist_clients(current_user: User = Depends(get_current_user)):
     if current_user.role != UserRole.THERAPIST:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    # Get all therapy classes for this therapist
-    therapist_classes = [tc for tc in db.therapy_classes.values() 
-                        if tc.therapist_id == current_user.id]
-    therapist_class_ids = [tc.id for tc in therapist_classes]
-    
-    # Find all unique clients from reservations
-    clients_data = {}
-    
-    for reservation in db.reservations.values():
-        if reservation.therapy_class_id in therapist_class_ids:
-            client = db.users.get(reservation.client_id)
-            if client and client.id not in clients_data:
-                # Get all reservations for this client with this therapist
-                client_reservations = [r for r in db.reservations.values() 
-                                     if r.client_id == client.id 
-                                     and r.therapy_class_id in therapist_class_ids]
-                
-                # Count total sessions and find next session
-                total_sessions = 0
-                next_session = None
-                active_reservations = 0
-                
-                for res in client_reservations:
-                    sessions = [s for s in db.sessions.values() if s.reservation_id == res.id]
-                    total_sessions += len(sessions)
-                    
-                    # Check if reservation is active (has future sessions)
-                    future_sessions = [s for s in sessions 
-                                     if s.scheduled_date >= date.today() 
-                                     and s.status != SessionStatus.CANCELLED]
-                    if future_sessions:
-                        active_reservations += 1
-                        # Find the next upcoming session
-                        future_sessions.sort(key=lambda s: (s.scheduled_date, s.scheduled_time))
-                        if not next_session or future_sessions[0].scheduled_date < next_session['date']:
-                            therapy_class = db.therapy_classes.get(res.therapy_class_id)
-                            next_session = {
-                                'date': future_sessions[0].scheduled_date.isoformat(),
-                                'time': future_sessions[0].scheduled_time.isoformat(),
-                                'class_name': therapy_class.name
-                            }
-                
-                clients_data[client.id] = {
-                    'id': client.id,
-                    'name': client.name,
-                    'email': client.email,
-                    'active_reservations': active_reservations,
-                    'total_sessions': total_sessions,
-                    'next_session': next_session
-                }
-    
-    return list(clients_data.values())
+    return db.get_therapist_clients(current_user.id)
 
 if __name__ == "__main__":
     import uvicorn
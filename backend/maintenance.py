@@ -0,0 +1,257 @@
+import os
+import socket
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from audit import ENSURE_AUDIT_PARTITIONS_SQL, AUDIT_PARTITIONS_AHEAD
+
+# Nightly set-based sweeps over client_vouchers / therapy_sessions: status
+# transitions and bulk notifications. Each job is one statement. The nightly run
+# also keeps AUDIT_PARTITIONS_AHEAD months of audit_logs partitions in place.
+#
+# Every replica may run the scheduler thread (SCHEDULER_ENABLED=true) or a
+# sidecar may run scripts/run_maintenance.py. A Postgres advisory lock elects
+# one leader per sweep and scheduler_runs (migration 009) records what already
+# ran today, so the other replicas skip it.
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "false").lower() == "true"
+# Local time of day after which the nightly sweep is due
+SCHEDULER_RUN_AT = os.getenv("SCHEDULER_RUN_AT", "02:00")
+SCHEDULER_POLL_INTERVAL = float(os.getenv("SCHEDULER_POLL_INTERVAL", "60"))
+SCHEDULER_LOCK_KEY = int(os.getenv("SCHEDULER_LOCK_KEY", "7240311"))
+
+EXPIRY_WARNING_DAYS = int(os.getenv("EXPIRY_WARNING_DAYS", "7"))
+SESSIONS_LOW_THRESHOLD = int(os.getenv("SESSIONS_LOW_THRESHOLD", "2"))
+
+EXPIRE_VOUCHERS_SQL = """
+    WITH expired AS (
+        UPDATE client_vouchers SET status = 'expired', updated_at = CURRENT_TIMESTAMP
+        WHERE status = 'active' AND expiry_date < CURRENT_DATE
+        RETURNING id, client_id, expiry_date
+    ), notified AS (
+        INSERT INTO voucher_notifications (voucher_id, client_id, type, title, message)
+        SELECT id, client_id, 'voucher_expired', 'Voucher Expired',
+               'Your voucher expired on ' || to_char(expiry_date, 'YYYY-MM-DD') || '.'
+        FROM expired
+    )
+    SELECT COUNT(*) FROM expired
+"""
+
+EXHAUST_VOUCHERS_SQL = """
+    UPDATE client_vouchers SET status = 'exhausted', updated_at = CURRENT_TIMESTAMP
+    WHERE status = 'active' AND sessions_remaining <= 0 AND backup_sessions_remaining <= 0
+"""
+
+EXPIRY_WARNING_SQL = """
+    INSERT INTO voucher_notifications (voucher_id, client_id, type, title, message)
+    SELECT cv.id, cv.client_id, 'expiry_warning', 'Voucher Expiring Soon',
+           'Your voucher expires on ' || to_char(cv.expiry_date, 'YYYY-MM-DD')
+           || ' with ' || cv.sessions_remaining || ' session(s) left.'
+    FROM client_vouchers cv
+    WHERE cv.status = 'active' AND cv.sessions_remaining > 0
+      AND cv.expiry_date BETWEEN CURRENT_DATE AND CURRENT_DATE + %(days)s
+      AND NOT EXISTS (SELECT 1 FROM voucher_notifications n
+                      WHERE n.voucher_id = cv.id AND n.type = 'expiry_warning')
+"""
+
+SESSIONS_LOW_SQL = """
+    INSERT INTO voucher_notifications (voucher_id, client_id, type, title, message)
+    SELECT cv.id, cv.client_id, 'sessions_low', 'Few Sessions Left',
+           'Only ' || cv.sessions_remaining || ' session(s) left on your voucher.'
+    FROM client_vouchers cv
+    WHERE cv.status = 'active' AND cv.sessions_remaining BETWEEN 1 AND %(threshold)s
+      AND NOT EXISTS (SELECT 1 FROM voucher_notifications n
+                      WHERE n.voucher_id = cv.id AND n.type = 'sessions_low')
+"""
+
+SESSION_REMINDER_SQL = """
+    INSERT INTO voucher_notifications (voucher_id, client_id, type, title, message)
+    SELECT DISTINCT ON (ts.voucher_id) ts.voucher_id, ts.client_id, 'session_reminder', 'Session Tomorrow',
+           'Your session is on ' || to_char(ts.session_date, 'YYYY-MM-DD')
+           || ' at ' || to_char(ts.session_time, 'HH24:MI') || '.'
+    FROM therapy_sessions ts
+    WHERE ts.session_date = CURRENT_DATE + 1 AND ts.status IN ('scheduled', 'confirmed')
+      AND NOT EXISTS (SELECT 1 FROM voucher_notifications n
+                      WHERE n.voucher_id = ts.voucher_id AND n.type = 'session_reminder'
+                        AND n.created_at >= CURRENT_DATE)
+    ORDER BY ts.voucher_id, ts.session_time
+"""
+
+RAN_TODAY_SQL = """
+    SELECT job FROM scheduler_runs WHERE run_date = %s AND error IS NULL AND job = ANY(%s)
+"""
+
+INSERT_RUN_SQL = """
+    INSERT INTO scheduler_runs (job, run_date, started_at, duration_ms, rows_affected, error, instance)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def _audit_partitions(cur) -> int:
+    cur.execute(ENSURE_AUDIT_PARTITIONS_SQL, (AUDIT_PARTITIONS_AHEAD,))
+    return cur.fetchone()[0]
+
+
+def _expire_vouchers(cur) -> int:
+    cur.execute(EXPIRE_VOUCHERS_SQL)
+    return cur.fetchone()[0]
+
+
+def _exhaust_vouchers(cur) -> int:
+    cur.execute(EXHAUST_VOUCHERS_SQL)
+    return cur.rowcount
+
+
+def _expiry_warnings(cur) -> int:
+    cur.execute(EXPIRY_WARNING_SQL, {"days": EXPIRY_WARNING_DAYS})
+    return cur.rowcount
+
+
+def _sessions_low(cur) -> int:
+    cur.execute(SESSIONS_LOW_SQL, {"threshold": SESSIONS_LOW_THRESHOLD})
+    return cur.rowcount
+
+
+def _session_reminders(cur) -> int:
+    cur.execute(SESSION_REMINDER_SQL)
+    return cur.rowcount
+
+
+# In order: status transitions first so warnings skip vouchers that just ended
+JOBS: List[Tuple[str, Callable[[Any], int]]] = [
+    ("audit_partitions", _audit_partitions),
+    ("expire_vouchers", _expire_vouchers),
+    ("exhaust_vouchers", _exhaust_vouchers),
+    ("expiry_warnings", _expiry_warnings),
+    ("sessions_low", _sessions_low),
+    ("session_reminders", _session_reminders),
+]
+
+
+class MaintenanceScheduler:
+    """Runs JOBS once a day on whichever replica holds the advisory lock"""
+
+    def __init__(self, run_at: str = SCHEDULER_RUN_AT, poll_interval: float = SCHEDULER_POLL_INTERVAL,
+                 lock_key: int = SCHEDULER_LOCK_KEY, jobs: List[Tuple[str, Callable[[Any], int]]] = JOBS):
+        hours, minutes = run_at.split(":")
+        self.run_at = (int(hours), int(minutes))
+        self.poll_interval = poll_interval
+        self.lock_key = lock_key
+        self.jobs = jobs
+        self.instance = socket.gethostname()
+        self._pool = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._last_checked: Optional[date] = None
+        self.job_stats: Dict[str, Dict[str, Any]] = {
+            name: {"runs_total": 0, "failures_total": 0, "rows_total": 0, "last_rows": 0,
+                   "last_duration_seconds": 0.0, "duration_seconds_total": 0.0, "last_run": None}
+            for name, _ in jobs
+        }
+
+    # ============================================
+    # LIFECYCLE
+    # ============================================
+    def start(self, pool):
+        """Attach the psycopg2 pool and start polling for the nightly sweep"""
+        self._pool = pool
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="maintenance-scheduler", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def due(self, now: datetime) -> bool:
+        """Past today's run time and not yet handled by this process today"""
+        return (now.hour, now.minute) >= self.run_at and self._last_checked != now.date()
+
+    def _run(self):
+        while not self._stopping.wait(self.poll_interval):
+            now = datetime.now()
+            if not self.due(now):
+                continue
+            conn = self._pool.getconn()
+            try:
+                # Lock busy: retry on the next poll, by then the leader's runs are recorded
+                if self.run(conn, now.date()) is not None:
+                    self._last_checked = now.date()
+            except Exception as e:
+                print(f"Maintenance sweep failed: {e}")
+            finally:
+                self._pool.putconn(conn)
+
+    # ============================================
+    # SWEEP
+    # ============================================
+    def run(self, conn, run_date: Optional[date] = None, force: bool = False,
+            only: Optional[List[str]] = None) -> Optional[Dict[str, int]]:
+        """One sweep; None when another replica holds the lock.
+
+        Jobs already recorded as successful for ``run_date`` are skipped
+        unless ``force``. Each job commits on its own.
+        """
+        run_date = run_date or date.today()
+        jobs = [(name, job) for name, job in self.jobs if only is None or name in only]
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (self.lock_key,))
+            leader = cur.fetchone()[0]
+        conn.commit()
+        if not leader:
+            return None
+        try:
+            done = set()
+            if not force:
+                with conn.cursor() as cur:
+                    cur.execute(RAN_TODAY_SQL, (run_date, [name for name, _ in jobs]))
+                    done = {row[0] for row in cur.fetchall()}
+                conn.commit()
+            return {name: self._run_job(conn, name, job, run_date) for name, job in jobs if name not in done}
+        finally:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (self.lock_key,))
+            conn.commit()
+
+    def _run_job(self, conn, name: str, job: Callable[[Any], int], run_date: date) -> int:
+        started_at = datetime.now()
+        started = time.perf_counter()
+        rows, error = 0, None
+        try:
+            with conn.cursor() as cur:
+                rows = job(cur)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            error = str(e)
+            print(f"Maintenance job {name} failed: {e}")
+        elapsed = time.perf_counter() - started
+
+        with self._stats_lock:
+            stats = self.job_stats[name]
+            stats["runs_total"] += 1
+            stats["failures_total"] += error is not None
+            stats["rows_total"] += rows
+            stats["last_rows"] = rows
+            stats["last_duration_seconds"] = elapsed
+            stats["duration_seconds_total"] += elapsed
+            stats["last_run"] = started_at
+        with conn.cursor() as cur:
+            cur.execute(INSERT_RUN_SQL, (name, run_date, started_at, int(elapsed * 1000),
+                                         rows, error, self.instance))
+        conn.commit()
+        print(f"Maintenance job {name}: {rows} row(s) in {elapsed * 1000:.0f} ms")
+        return rows
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._stats_lock:
+            return {name: dict(stats) for name, stats in self.job_stats.items()}
+
+
+# Global scheduler, started from main.py when SCHEDULER_ENABLED
+maintenance_scheduler = MaintenanceScheduler()
@@ -0,0 +1,304 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# In-process metrics in the Prometheus text format (version 0.0.4), served by
+# GET /metrics in main.py. Recording is a dict lookup, a bisect and a few adds
+# under one lock per metric; values live per worker process, so scrape every
+# replica / worker (or run one worker per container).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Bearer token required by /metrics when set
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+BCRYPT_BUCKETS = (0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0)
+
+# Route label of requests that matched no route, so 404 scans cannot blow up cardinality
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[Any, ...], float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: Any) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, labels)} {_format_value(value)}"
+                                for labels, value in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: Any, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: Any):
+        with self._lock:
+            self._values[labels] = value
+
+
+class LoopGauge(Gauge):
+    """Gauge only updated from the event loop thread, so updates skip the lock"""
+
+    def inc(self, *labels: Any, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = REQUEST_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [non-cumulative bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[Any, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: Any):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self, *labels: Any) -> Tuple[List[int], int, float]:
+        """(cumulative bucket counts, count, sum) of one label set"""
+        with self._lock:
+            series = list(self._series.get(labels) or [0] * (len(self.buckets) + 1) + [0.0])
+        cumulative, running = [], 0
+        for count in series[:-1]:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, series[-1]
+
+    def render(self) -> List[str]:
+        with self._lock:
+            keys = sorted(self._series)
+        lines = self.header()
+        for labels in keys:
+            cumulative, count, total = self.snapshot(*labels)
+            for bound, value in zip(self.buckets + (float("inf"),), cumulative):
+                extra = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, extra)} {value}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class StatsCollector:
+    """Exports a component's stats() dict as gauges (counters for *_total keys).
+
+    With ``label`` set, stats() returns {label value: stats dict}, as
+    MaintenanceScheduler.stats() does per job.
+    """
+
+    def __init__(self, prefix: str, stats: Callable[[], Dict[str, Any]], label: Optional[str] = None):
+        self.prefix = prefix
+        self.stats = stats
+        self.label = label
+
+    def render(self) -> List[str]:
+        try:
+            stats = self.stats()
+        except Exception as e:
+            print(f"Metrics collector {self.prefix} failed: {e}")
+            return []
+        series = stats.items() if self.label else [(None, stats)]
+        samples: Dict[str, List[str]] = {}
+        for label_value, values in series:
+            labels = _labels((self.label,), (label_value,)) if self.label else ""
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                samples.setdefault(key, []).append(f"{self.prefix}_{key}{labels} {_format_value(value)}")
+        lines = []
+        for key, rendered in samples.items():
+            kind = "counter" if key.endswith("_total") else "gauge"
+            lines += [f"# TYPE {self.prefix}_{key} {kind}"] + rendered
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._collectors: List[Any] = []
+
+    def register(self, collector):
+        self._collectors.append(collector)
+        return collector
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def register_stats(self, prefix: str, stats: Callable[[], Dict[str, Any]], label: Optional[str] = None):
+        self.register(StatsCollector(prefix, stats, label))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for collector in self._collectors:
+            lines.extend(collector.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"), REQUEST_BUCKETS)
+REQUESTS_IN_FLIGHT = registry.register(LoopGauge(
+    "http_requests_in_flight", "HTTP requests being served", ("method",)))
+DB_QUERY_LATENCY = registry.histogram(
+    "db_query_duration_seconds", "Data layer call latency by DatabaseV2 method", ("method",), QUERY_BUCKETS)
+DB_QUERY_ERRORS = registry.counter(
+    "db_query_errors_total", "Data layer calls that raised, by DatabaseV2 method", ("method",))
+DB_CONNECTIONS_OPENED = registry.counter(
+    "db_connections_opened_total", "Database connections opened (initial and reconnects)", ("client",))
+DB_CONNECTION_FAILURES = registry.counter(
+    "db_connection_failures_total", "Failed attempts to open a database connection", ("client",))
+PASSWORD_HASH_LATENCY = registry.histogram(
+    "password_hash_duration_seconds", "bcrypt time per call, excluding queue wait", ("operation",),
+    BCRYPT_BUCKETS)
+
+
+# ============================================
+# INSTRUMENTATION
+# ============================================
+def _timed(name: str, func: Callable) -> Callable:
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def timed_async(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                DB_QUERY_ERRORS.inc(name)
+                raise
+            finally:
+                DB_QUERY_LATENCY.observe(time.perf_counter() - started, name)
+        return timed_async
+
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            DB_QUERY_ERRORS.inc(name)
+            raise
+        finally:
+            DB_QUERY_LATENCY.observe(time.perf_counter() - started, name)
+    return timed
+
+
+def instrument_methods(cls, exclude: Iterable[str] = ()):
+    """Time every public method of a data layer class in DB_QUERY_LATENCY"""
+    if not METRICS_ENABLED:
+        return cls
+    skipped = set(exclude)
+    for name, attr in list(vars(cls).items()):
+        if name.startswith("_") or name in skipped or not callable(attr) or isinstance(attr, type):
+            continue
+        setattr(cls, name, _timed(name, attr))
+    return cls
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording REQUEST_LATENCY and REQUESTS_IN_FLIGHT.
+
+    Labels use the matched route's path template (/api/organizations/{org_id}),
+    looked up from the endpoint the router resolved.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._templates: Dict[Any, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(method)
+            REQUEST_LATENCY.observe(time.perf_counter() - started, method, self.route(scope), status[0])
+
+    def route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        template = self._templates.get(endpoint)
+        if template is None:
+            template = UNMATCHED_ROUTE
+            for route in getattr(scope.get("app"), "routes", ()):
+                if getattr(route, "endpoint", None) is endpoint:
+                    template = route.path
+                    break
+            self._templates[endpoint] = template
+        return template
@@ -4,6 +4,7 @@ from typing import List, Optional, Literal
 from datetime import datetime, date, time
 from enum import Enum
 import uuid
+from scheduling import RESERVATION_MAX_SESSIONS
 
 class UserRole(str, Enum):
     CLIENT = "client"
@@ -97,6 +98,7 @@ class ReservationRequest(BaseModel):
     voucher_code: str
     therapy_class_id: str
     start_date: date
+    sessions_count: Optional[int] = Field(None, ge=1, le=RESERVATION_MAX_SESSIONS)
 
 class SessionRescheduleRequest(BaseModel):
     new_date: date
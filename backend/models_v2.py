@@ -1,8 +1,10 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Generic, Literal, TypeVar
 from datetime import datetime, date, time
 from enum import Enum
 
+T = TypeVar("T")
+
 # ============================================
 # ENUMS
 # ============================================
@@ -239,6 +241,10 @@ class AuditLog(BaseModel):
     class Config:
         from_attributes = True
 
+class AuditLogPage(BaseModel):
+    items: List[AuditLog]
+    next_cursor: Optional[str] = None
+
 # ============================================
 # PERMISSION MODELS
 # ============================================
@@ -264,12 +270,39 @@ class MessageResponse(BaseModel):
     message: str
     details: Optional[Dict[str, Any]] = None
 
-class PaginatedResponse(BaseModel):
-    items: List[Any]
-    total: int
-    page: int
+class AdminStats(BaseModel):
+    users_total: int
+    users_active: int
+    users_pending: int
+    users_by_role: Dict[str, int]
+    organizations_total: int
+    organizations_active: int
+    voucher_types_active: int
+    vouchers_active: int
+    sessions_this_week: int
+    revenue_this_month: float
+    revenue_total: float
+    generated_at: datetime
+
+class AvailableSlot(BaseModel):
+    voucher_type_id: int
+    therapist_id: int
+    therapist_name: str
+    date: date
+    time: str  # HH:MM
+    duration_minutes: int
+    type: Literal['individual', 'group']
+    spots_left: int
+
+class PaginatedResponse(BaseModel, Generic[T]):
+    items: List[T]
+    total: Optional[int] = None
+    page: Optional[int] = None
     per_page: int
-    pages: int
+    pages: Optional[int] = None
+    # Keyset pagination: pass back as ?cursor= to get the next page
+    next_cursor: Optional[str] = None
+    total_is_estimate: bool = False
 
 # Update forward references
 Organization.model_rebuild()
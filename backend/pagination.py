@@ -0,0 +1,68 @@
+import os
+import json
+import base64
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence, Tuple
+
+PAGINATION_DEFAULT_LIMIT = int(os.getenv("PAGINATION_DEFAULT_LIMIT", "50"))
+PAGINATION_MAX_LIMIT = int(os.getenv("PAGINATION_MAX_LIMIT", "200"))
+# Below this planner estimate the total is counted exactly
+PAGINATION_EXACT_COUNT_BELOW = int(os.getenv("PAGINATION_EXACT_COUNT_BELOW", "10000"))
+
+
+def _cursor_value(value: Any) -> Any:
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Opaque keyset cursor for the sort-key values of the last row on a page"""
+    raw = json.dumps([_cursor_value(v) for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def keyset_page(query: str, params: List[Any], columns: Sequence[str], after: Optional[List[Any]],
+                descending: bool = False, limit: Optional[int] = None) -> Tuple[str, List[Any]]:
+    """Append the keyset condition, ORDER BY and LIMIT to a query ending in a WHERE clause.
+
+    ``columns`` must end with a unique column (the id) so the order is total.
+    """
+    params = list(params)
+    if after:
+        placeholders = ", ".join(["%s"] * len(columns))
+        query += f" AND ({', '.join(columns)}) {'<' if descending else '>'} ({placeholders})"
+        params.extend(after)
+    direction = "DESC" if descending else "ASC"
+    query += " ORDER BY " + ", ".join(f"{column} {direction}" for column in columns)
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params
+
+
+def cursor_for(row: dict, columns: Sequence[str]) -> str:
+    """Cursor pointing just past ``row`` for the given sort columns"""
+    return encode_cursor([row[column.split(".")[-1]] for column in columns])
+
+
+def plan_rows(explain_row: Any) -> int:
+    """Row estimate from an ``EXPLAIN (FORMAT JSON)`` result row"""
+    plan = explain_row["QUERY PLAN"] if isinstance(explain_row, dict) else explain_row[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
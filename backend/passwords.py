@@ -0,0 +1,140 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any
+
+import bcrypt
+
+from metrics import PASSWORD_HASH_LATENCY
+
+# bcrypt cost factor; lower it in dev/test, keep >= 12 in production
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so a small thread pool hashes in parallel
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Requests allowed to wait for a worker before new ones are rejected
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+
+class PasswordHasher:
+    """Runs bcrypt hashing/verification in a dedicated, size-limited pool.
+
+    Keeps the 200-300 ms bcrypt calls off the event loop and caps how many
+    can be in flight, so a burst of logins degrades into fast 503s instead
+    of freezing the worker.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS,
+                 max_queue: int = PASSWORD_HASH_MAX_QUEUE, rounds: int = BCRYPT_ROUNDS):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        # Metrics
+        self.hash_total = 0
+        self.verify_total = 0
+        self.rejected_total = 0
+        self.seconds_total = 0.0
+        self.seconds_max = 0.0
+        self.queue_wait_seconds_total = 0.0
+
+    # ============================================
+    # PUBLIC API
+    # ============================================
+    def hash(self, password: str) -> str:
+        return self._submit("hash", self._hash, password).result()
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self._submit("verify", self._verify, password, hashed).result()
+
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit("hash", self._hash, password))
+
+    async def verify_async(self, password: str, hashed: str) -> bool:
+        return await asyncio.wrap_future(self._submit("verify", self._verify, password, hashed))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self.hash_total + self.verify_total
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "rounds": self.rounds,
+                "queue_depth": max(0, self._pending - self.workers),
+                "in_flight": self._pending,
+                "hash_total": self.hash_total,
+                "verify_total": self.verify_total,
+                "rejected_total": self.rejected_total,
+                "seconds_total": round(self.seconds_total, 6),
+                "seconds_max": round(self.seconds_max, 6),
+                "seconds_avg": round(self.seconds_total / calls, 6) if calls else 0.0,
+                "queue_wait_seconds_total": round(self.queue_wait_seconds_total, 6),
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    # ============================================
+    # INTERNALS
+    # ============================================
+    def _submit(self, kind: str, func, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected_total += 1
+            raise PasswordHasherBusy("Password hashing queue is full")
+        with self._lock:
+            self._pending += 1
+        submitted = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                elapsed = time.perf_counter() - started
+                PASSWORD_HASH_LATENCY.observe(elapsed, kind)
+                with self._lock:
+                    if kind == "hash":
+                        self.hash_total += 1
+                    else:
+                        self.verify_total += 1
+                    self.seconds_total += elapsed
+                    self.seconds_max = max(self.seconds_max, elapsed)
+                    self.queue_wait_seconds_total += started - submitted
+
+        try:
+            future = self._executor.submit(run)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _hash(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(self.rounds)).decode()
+
+    @staticmethod
+    def _verify(password: str, hashed: str) -> bool:
+        try:
+            return bcrypt.checkpw(password.encode(), hashed.encode())
+        except ValueError:
+            # Malformed or non-bcrypt hash
+            return False
+
+
+# Global hasher instance
+password_hasher = PasswordHasher()
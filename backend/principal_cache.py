@@ -0,0 +1,98 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Set, Tuple
+
+import db_events
+from models import User
+
+# Resolved principals are cached per process. A write to a user invalidates
+# them here through db_events and on the other replicas through the
+# db_events.USER_CHANNEL notification (migration 011, catalog_listener); the
+# TTL only bounds how long a missed notification can leave a replica stale.
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+
+class PrincipalCache:
+    """TTL + LRU cache of authenticated users keyed by (user id, token fingerprint)
+
+    ``version`` is bumped by every invalidation; a user loaded before one is
+    returned to its caller but not stored, so a request racing a write never
+    puts the old principal back.
+    """
+
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL, max_size: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.version = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, User]]" = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+    def get(self, user_id: str, fingerprint: str) -> Optional[User]:
+        key = (user_id, fingerprint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, user_id: str, fingerprint: str, user: User, version: int) -> bool:
+        """Cache ``user`` unless an invalidation happened since ``version`` was read"""
+        if self.ttl <= 0 or self.max_size <= 0:
+            return False
+        key = (user_id, fingerprint)
+        with self._lock:
+            if version != self.version:
+                return False
+            self._entries[key] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(key)
+            self._by_user.setdefault(user_id, set()).add(fingerprint)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+            return True
+
+    def invalidate(self, user_id):
+        """Drop every cached token for a user"""
+        user_id = str(user_id)
+        with self._lock:
+            self.version += 1
+            for fingerprint in self._by_user.pop(user_id, ()):
+                self._entries.pop((user_id, fingerprint), None)
+
+    def clear(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "ttl": self.ttl,
+                    "version": self.version, "hits": self.hits, "misses": self.misses}
+
+    def _remove(self, key: Tuple[str, str]):
+        self._entries.pop(key, None)
+        fingerprints = self._by_user.get(key[0])
+        if fingerprints is not None:
+            fingerprints.discard(key[1])
+            if not fingerprints:
+                del self._by_user[key[0]]
+
+
+principal_cache = PrincipalCache()
+db_events.subscribe(db_events.USER_CHANGED, lambda user_id, **_: principal_cache.invalidate(user_id))
+
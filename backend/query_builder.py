@@ -0,0 +1,63 @@
+from typing import Any, Collection, Dict, List, Optional, Sequence, Tuple
+
+# Small SELECT / UPDATE builder for the v1 repositories. Identifiers are never taken
+# from user input: every table and column must appear in the caller's whitelist.
+
+
+def _check(column: str, allowed: Collection[str]) -> str:
+    if column not in allowed:
+        raise ValueError(f"Unknown column {column}")
+    return column
+
+
+def where_clause(where: Dict[str, Any], allowed: Collection[str]) -> Tuple[str, List[Any]]:
+    """``AND``-joined equality filters; lists become ``= ANY(%s)`` and None ``IS NULL``"""
+    conditions = []
+    params: List[Any] = []
+    for column, value in where.items():
+        _check(column, allowed)
+        if value is None:
+            conditions.append(f"{column} IS NULL")
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            conditions.append(f"{column} = ANY(%s)")
+            params.append(list(value))
+        else:
+            conditions.append(f"{column} = %s")
+            params.append(value)
+    return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+
+def select_query(table: str, select: str, where: Dict[str, Any], allowed: Collection[str],
+                 order_by: Sequence[str] = (), limit: Optional[int] = None,
+                 offset: Optional[int] = None) -> Tuple[str, List[Any]]:
+    """``SELECT`` with filters, ordering (``-column`` for descending) and paging"""
+    clause, params = where_clause(where, allowed)
+    query = f"SELECT {select} FROM {table}{clause}"
+    if order_by:
+        query += " ORDER BY " + ", ".join(
+            f"{_check(column[1:], allowed)} DESC" if column.startswith("-") else f"{_check(column, allowed)} ASC"
+            for column in order_by
+        )
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    if offset:
+        query += " OFFSET %s"
+        params.append(offset)
+    return query, params
+
+
+def exists_query(table: str, where: Dict[str, Any], allowed: Collection[str]) -> Tuple[str, List[Any]]:
+    """``SELECT EXISTS`` for the filters, stopping at the first matching row"""
+    clause, params = where_clause(where, allowed)
+    return f"SELECT EXISTS (SELECT 1 FROM {table}{clause}) AS found", params
+
+
+def update_query(table: str, changes: Dict[str, Any], where: Dict[str, Any], writable: Collection[str],
+                 allowed: Collection[str]) -> Tuple[str, List[Any]]:
+    """``UPDATE ... RETURNING *`` of the ``writable`` columns in ``changes`` on the filtered rows"""
+    if not changes:
+        raise ValueError("Nothing to update")
+    assignments = ", ".join(f"{_check(column, writable)} = %s" for column in changes)
+    clause, params = where_clause(where, allowed)
+    return f"UPDATE {table} SET {assignments}{clause} RETURNING *", list(changes.values()) + params
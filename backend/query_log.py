@@ -0,0 +1,247 @@
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+# Statement-level timing for every cursor the data layer opens: calls, time and
+# rows per statement fingerprint (literals and parameters stripped), a log line
+# for each statement slower than SLOW_QUERY_MS, and a sampled
+# EXPLAIN (ANALYZE, BUFFERS) of slow read-only statements. The rolling top-N is
+# served at /api/admin/slow-queries.
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "true").lower() == "true"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Fraction of slow read-only statements re-run under EXPLAIN ANALYZE (0 = never)
+SLOW_QUERY_EXPLAIN_SAMPLE = float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE", "0"))
+SLOW_QUERY_TOP_N = int(os.getenv("SLOW_QUERY_TOP_N", "50"))
+# Distinct fingerprints kept; the one with the least total time makes room
+QUERY_LOG_MAX_FINGERPRINTS = int(os.getenv("QUERY_LOG_MAX_FINGERPRINTS", "2000"))
+
+_COMMENT_RE = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_PARAM_RE = re.compile(r"%\(\w+\)s|%s|\$\d+")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+# EXPLAIN ANALYZE runs the statement: only plain reads, never anything with side effects
+_READ_ONLY_RE = re.compile(r"^\s*(select|with)\b", re.I)
+EXPLAIN_PREFIX = "EXPLAIN (ANALYZE, BUFFERS) "
+_SIDE_EFFECT_RE = re.compile(
+    r"\b(insert|update|delete|merge|for\s+update|for\s+share|nextval|setval|pg_notify|"
+    r"pg_advisory\w*|pg_try_advisory\w*)\b", re.I)
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(query: str) -> str:
+    """Statement with comments, literals and parameters replaced by ``?`` and whitespace collapsed"""
+    text = _COMMENT_RE.sub(" ", query)
+    text = _STRING_RE.sub("?", text)
+    text = _PARAM_RE.sub("?", text)
+    text = _NUMBER_RE.sub("?", text)
+    text = _LIST_RE.sub("(...)", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def explainable(query: str) -> bool:
+    return bool(_READ_ONLY_RE.match(query)) and not _SIDE_EFFECT_RE.search(query)
+
+
+class QueryStats:
+    __slots__ = ("fingerprint", "calls", "seconds_total", "seconds_max", "rows_total",
+                 "slow_calls", "last_slow_at", "plan", "plan_at")
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.calls = 0
+        self.seconds_total = 0.0
+        self.seconds_max = 0.0
+        self.rows_total = 0
+        self.slow_calls = 0
+        self.last_slow_at: Optional[datetime] = None
+        self.plan: Optional[str] = None
+        self.plan_at: Optional[datetime] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "calls": self.calls,
+            "total_ms": round(self.seconds_total * 1000, 3),
+            "mean_ms": round(self.seconds_total * 1000 / self.calls, 3) if self.calls else 0.0,
+            "max_ms": round(self.seconds_max * 1000, 3),
+            "rows_total": self.rows_total,
+            "slow_calls": self.slow_calls,
+            "last_slow_at": self.last_slow_at,
+            "plan": self.plan,
+            "plan_at": self.plan_at,
+        }
+
+
+REPORT_ORDER = {
+    "total": lambda stats: stats.seconds_total,
+    "max": lambda stats: stats.seconds_max,
+    "mean": lambda stats: stats.seconds_total / stats.calls if stats.calls else 0.0,
+    "calls": lambda stats: stats.calls,
+    "slow": lambda stats: stats.slow_calls,
+}
+
+
+class QueryLog:
+    """Per-fingerprint statement statistics of this process"""
+
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS, explain_sample: float = SLOW_QUERY_EXPLAIN_SAMPLE,
+                 top_n: int = SLOW_QUERY_TOP_N, max_fingerprints: int = QUERY_LOG_MAX_FINGERPRINTS):
+        self.slow_seconds = slow_ms / 1000
+        self.explain_sample = explain_sample
+        self.top_n = top_n
+        self.max_fingerprints = max_fingerprints
+        self._stats: Dict[str, QueryStats] = {}
+        self._lock = threading.Lock()
+        self.statements_total = 0
+        self.slow_total = 0
+        self.explains_total = 0
+        self.evicted_total = 0
+
+    def record(self, query: str, seconds: float, rows: int) -> bool:
+        """Account one execution; True when it was slow and should be EXPLAINed"""
+        key = fingerprint(query)
+        slow = seconds >= self.slow_seconds
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    del self._stats[min(self._stats.values(), key=REPORT_ORDER["total"]).fingerprint]
+                    self.evicted_total += 1
+                stats = self._stats[key] = QueryStats(key)
+            stats.calls += 1
+            stats.seconds_total += seconds
+            stats.seconds_max = max(stats.seconds_max, seconds)
+            if rows > 0:
+                stats.rows_total += rows
+            self.statements_total += 1
+            if slow:
+                stats.slow_calls += 1
+                stats.last_slow_at = datetime.now()
+                self.slow_total += 1
+        if not slow:
+            return False
+        print(f"Slow query ({seconds * 1000:.0f} ms, {rows} rows): {key[:500]}")
+        return (self.explain_sample > 0 and random.random() < self.explain_sample
+                and explainable(query))
+
+    def add_plan(self, query: str, plan: str):
+        key = fingerprint(query)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is not None:
+                stats.plan = plan
+                stats.plan_at = datetime.now()
+            self.explains_total += 1
+        print(f"EXPLAIN ANALYZE of slow query {key[:200]}:\n{plan}")
+
+    def report(self, order_by: str = "total", limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Top fingerprints by ``order_by`` (one of REPORT_ORDER)"""
+        with self._lock:
+            ranked = sorted(self._stats.values(), key=REPORT_ORDER[order_by], reverse=True)
+            return [stats.as_dict() for stats in ranked[:limit or self.top_n]]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"fingerprints": len(self._stats), "statements_total": self.statements_total,
+                    "slow_total": self.slow_total, "explains_total": self.explains_total,
+                    "evicted_total": self.evicted_total, "slow_ms": self.slow_seconds * 1000,
+                    "explain_sample": self.explain_sample}
+
+
+# Global query log of this process
+query_log = QueryLog()
+
+
+def query_text(query: Any, conn) -> str:
+    """SQL text of a str, bytes or psycopg sql.Composable statement"""
+    if isinstance(query, str):
+        return query
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    return query.as_string(conn)
+
+
+# ============================================
+# PSYCOPG2
+# ============================================
+def explain_sync(conn, query: str, params: Any) -> Optional[str]:
+    """EXPLAIN (ANALYZE, BUFFERS) inside a savepoint that is always rolled back"""
+    # A plain cursor, so the EXPLAIN itself is not logged
+    cur = psycopg2.extensions.cursor(conn)
+    begin, rollback = (("BEGIN", "ROLLBACK") if conn.autocommit else
+                       ("SAVEPOINT query_log_explain", "ROLLBACK TO SAVEPOINT query_log_explain"))
+    try:
+        cur.execute(begin)
+        try:
+            cur.execute(EXPLAIN_PREFIX + query, params)
+            return "\n".join(row[0] for row in cur.fetchall())
+        except Exception as e:
+            print(f"EXPLAIN of slow query failed: {e}")
+            return None
+        finally:
+            cur.execute(rollback)
+    finally:
+        cur.close()
+
+
+class LoggedCursorMixin:
+    """Times execute()/executemany() into query_log; mixed into the cursor class asked for"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            result = super().execute(query, vars)
+        except Exception:
+            # The statement aborted the transaction; nothing more may run in it
+            self._log(query, vars, time.perf_counter() - started, explain=False)
+            raise
+        self._log(query, vars, time.perf_counter() - started)
+        return result
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            # Never EXPLAINed: there is no single parameter set to re-run
+            self._log(query, None, time.perf_counter() - started, explain=False)
+
+    def _log(self, query, vars, seconds: float, explain: bool = True):
+        try:
+            text = query_text(query, self.connection)
+            if query_log.record(text, seconds, self.rowcount) and explain:
+                plan = explain_sync(self.connection, text, vars)
+                if plan:
+                    query_log.add_plan(text, plan)
+        except Exception as e:
+            print(f"Query log failed: {e}")
+
+
+@lru_cache(maxsize=None)
+def logged_cursor_class(cursor_class):
+    return type("Logged" + cursor_class.__name__, (LoggedCursorMixin, cursor_class), {})
+
+
+class LoggedConnection(psycopg2.extensions.connection):
+    """psycopg2 connection whose cursors, of whatever cursor_factory, feed query_log"""
+
+    def cursor(self, *args, **kwargs):
+        if QUERY_LOG_ENABLED:
+            cursor_class = kwargs.get("cursor_factory") or self.cursor_factory or psycopg2.extensions.cursor
+            kwargs["cursor_factory"] = logged_cursor_class(cursor_class)
+        return super().cursor(*args, **kwargs)
@@ -0,0 +1,71 @@
+import os
+from datetime import date, timedelta
+from typing import FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+# Sessions created per reservation when the request does not say otherwise
+RESERVATION_SESSIONS = int(os.getenv("RESERVATION_SESSIONS", "10"))
+RESERVATION_MAX_SESSIONS = int(os.getenv("RESERVATION_MAX_SESSIONS", "104"))
+# Retries of a booking transaction aborted by a deadlock or serialization failure
+BOOKING_RETRIES = int(os.getenv("BOOKING_RETRIES", "3"))
+# Session statuses that give their slot seat back (session_slots, migration 006);
+# a rescheduled session keeps a seat, in the slot it was moved to
+SEAT_RELEASING_STATUSES = frozenset({"cancelled"})
+
+
+class ClassFullError(Exception):
+    """Raised when a reservation would exceed a slot's capacity"""
+
+
+def parse_blackout_dates(value: str) -> FrozenSet[date]:
+    """Comma-separated ISO dates, e.g. ``2024-12-25,2024-12-26``"""
+    return frozenset(date.fromisoformat(d.strip()) for d in value.split(",") if d.strip())
+
+
+# Days on which no session is ever scheduled (holidays, closures)
+SCHEDULE_BLACKOUT_DATES = parse_blackout_dates(os.getenv("SCHEDULE_BLACKOUT_DATES", ""))
+
+
+def recurrence(frequency: str, custom_days: Optional[Sequence[int]] = None,
+               day_of_week: Optional[int] = None) -> Tuple[List[int], int]:
+    """Weekdays (0=Mon) and week interval for a voucher-type frequency.
+
+    ``custom_days`` uses the voucher-type convention 1=Mon..7=Sun;
+    ``day_of_week`` the TherapyClass one, 0=Mon..6=Sun.
+    """
+    frequency = getattr(frequency, "value", frequency)
+    if frequency == "daily":
+        return list(range(7)), 1
+    if frequency == "custom":
+        if not custom_days:
+            raise ValueError("custom frequency requires custom_days")
+        return sorted({(d - 1) % 7 for d in custom_days}), 1
+    if frequency not in ("weekly", "biweekly"):
+        raise ValueError(f"Unknown frequency {frequency}")
+    if day_of_week is None:
+        raise ValueError(f"{frequency} frequency requires day_of_week")
+    return [day_of_week], 2 if frequency == "biweekly" else 1
+
+
+def schedule_dates(start: date, count: int, weekdays: Iterable[int], interval_weeks: int = 1,
+                   blackout: FrozenSet[date] = frozenset()) -> List[date]:
+    """The first ``count`` dates on or after ``start`` falling on ``weekdays``.
+
+    Occurrences repeat every ``interval_weeks`` weeks counted from the week of
+    ``start``; blackout dates are skipped without consuming an occurrence.
+    """
+    offsets = sorted(set(weekdays))
+    if not offsets or interval_weeks < 1:
+        raise ValueError("Schedule needs at least one weekday and a positive interval")
+    week_start = start - timedelta(days=start.weekday())
+    dates: List[date] = []
+    period = 0
+    while len(dates) < count:
+        base = week_start + timedelta(weeks=period * interval_weeks)
+        for offset in offsets:
+            day = base + timedelta(days=offset)
+            if day >= start and day not in blackout:
+                dates.append(day)
+                if len(dates) == count:
+                    break
+        period += 1
+    return dates
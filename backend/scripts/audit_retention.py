@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Audit log partition maintenance. Run daily from cron:
+
+    python scripts/audit_retention.py
+    python scripts/audit_retention.py --retention-months 24 --archive-dir /backups/audit
+    python scripts/audit_retention.py --dry-run
+
+Creates upcoming monthly partitions of audit_logs, then detaches every
+partition older than the retention window, exports it to
+<archive-dir>/audit_logs_yYYYYmMM.ndjson.gz and drops it.
+"""
+
+import argparse
+import os
+import sys
+
+import psycopg2
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audit import (
+    ensure_partitions, apply_retention,
+    AUDIT_PARTITIONS_AHEAD, AUDIT_RETENTION_MONTHS, AUDIT_ARCHIVE_DIR
+)
+
+
+def get_database_connection():
+    """Connect with DATABASE_URL or the DB_* variables used by the backend"""
+    database_url = os.getenv("DATABASE_URL")
+    if database_url:
+        return psycopg2.connect(database_url)
+    return psycopg2.connect(
+        host=os.getenv("DB_HOST", "postgres"),
+        port=os.getenv("DB_PORT", "5432"),
+        database=os.getenv("DB_NAME", "therapy_system"),
+        user=os.getenv("DB_USER", "therapy_user"),
+        password=os.getenv("DB_PASSWORD", "therapy_password"),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months-ahead", type=int, default=AUDIT_PARTITIONS_AHEAD)
+    parser.add_argument("--retention-months", type=int, default=AUDIT_RETENTION_MONTHS)
+    parser.add_argument("--archive-dir", default=AUDIT_ARCHIVE_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="Only list partitions that would be archived")
+    args = parser.parse_args()
+
+    conn = get_database_connection()
+    try:
+        if not args.dry_run:
+            created = ensure_partitions(conn, args.months_ahead)
+            print(f"Created {created} new audit_logs partition(s)")
+        archived = apply_retention(conn, args.retention_months, args.archive_dir, dry_run=args.dry_run)
+        verb = "Would archive" if args.dry_run else "Archived"
+        print(f"{verb} {len(archived)} partition(s): {', '.join(archived) or '-'}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
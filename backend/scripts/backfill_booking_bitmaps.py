@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Fill voucher_types.booking_rules_bitmap for rows created before migration 007:
+
+    python scripts/backfill_booking_bitmaps.py
+    python scripts/backfill_booking_bitmaps.py --all
+
+Compiles each type's booking_rules JSON (see availability.py). Without --all
+only rows whose bitmap is still NULL are touched.
+"""
+
+import argparse
+import os
+import sys
+
+import psycopg2
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from availability import WeeklyAvailability
+
+
+def get_database_connection():
+    """Connect with DATABASE_URL or the DB_* variables used by the backend"""
+    database_url = os.getenv("DATABASE_URL")
+    if database_url:
+        return psycopg2.connect(database_url)
+    return psycopg2.connect(
+        host=os.getenv("DB_HOST", "postgres"),
+        port=os.getenv("DB_PORT", "5432"),
+        database=os.getenv("DB_NAME", "therapy_system"),
+        user=os.getenv("DB_USER", "therapy_user"),
+        password=os.getenv("DB_PASSWORD", "therapy_password"),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--all", action="store_true", help="Recompile every voucher type")
+    args = parser.parse_args()
+
+    conn = get_database_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT id, booking_rules FROM voucher_types"
+                        + ("" if args.all else " WHERE booking_rules_bitmap IS NULL"))
+            rows = cur.fetchall()
+            for voucher_type_id, rules in rows:
+                cur.execute("UPDATE voucher_types SET booking_rules_bitmap = %s WHERE id = %s",
+                            (WeeklyAvailability.from_rules(rules).to_bytes(), voucher_type_id))
+        conn.commit()
+        print(f"Compiled booking rules of {len(rows)} voucher type(s)")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the v2 API: concurrent mixed read/write traffic.
+
+Compare the threaded psycopg2 backend with the native async one by starting
+the backend twice and running this script against each:
+
+    DB_BACKEND=sync  uvicorn main:app --port 8000 --workers 1
+    DB_BACKEND=async uvicorn main:app --port 8000 --workers 1
+
+    python scripts/benchmark_api_v2_load.py --token <admin JWT> --org-id 1
+
+Reports throughput and p50/p95/p99 latency per request kind and overall.
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def build_mix(org_id):
+    """Weighted request mix roughly matching dashboard polling traffic"""
+    return [
+        (40, "list_users", "GET", "/api/admin/users", None),
+        (20, "list_orgs", "GET", "/api/admin/organizations", None),
+        (20, "org_voucher_types", "GET", f"/api/organizations/{org_id}/voucher-types", None),
+        (15, "available_types", "GET", "/api/voucher-types/available", None),
+        (5, "update_org", "PUT", f"/api/organizations/{org_id}", {"phone": "+48 000 000 000"}),
+    ]
+
+
+async def worker(client, mix, deadline, samples, errors):
+    weights = [m[0] for m in mix]
+    while time.monotonic() < deadline:
+        _, name, method, path, body = random.choices(mix, weights=weights)[0]
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body)
+            if response.status_code >= 400:
+                errors[name] += 1
+        except httpx.HTTPError:
+            errors[name] += 1
+            continue
+        samples[name].append((time.perf_counter() - start) * 1000)
+
+
+async def run(args):
+    headers = {"Authorization": f"Bearer {args.token}"}
+    mix = build_mix(args.org_id)
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers,
+                                 limits=limits, timeout=30) as client:
+        deadline = time.monotonic() + args.duration
+        await asyncio.gather(*(worker(client, mix, deadline, samples, errors)
+                               for _ in range(args.concurrency)))
+
+    all_samples = [v for values in samples.values() for v in values]
+    print(f"concurrency={args.concurrency} duration={args.duration}s "
+          f"requests={len(all_samples)} rps={len(all_samples) / args.duration:.1f}")
+    print(f"{'kind':<20}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name in sorted(samples):
+        values = samples[name]
+        print(f"{name:<20}{len(values):>8}{errors[name]:>8}"
+              f"{statistics.median(values):>10.1f}{percentile(values, 95):>10.1f}"
+              f"{percentile(values, 99):>10.1f}")
+    if all_samples:
+        print(f"{'overall':<20}{len(all_samples):>8}{sum(errors.values()):>8}"
+              f"{statistics.median(all_samples):>10.1f}{percentile(all_samples, 95):>10.1f}"
+              f"{percentile(all_samples, 99):>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="Admin bearer token")
+    parser.add_argument("--org-id", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=int, default=30)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Contention benchmark for class bookings on the in-memory v1 engine.
+
+    python scripts/benchmark_booking_capacity.py
+    python scripts/benchmark_booking_capacity.py --bookings 2000 --seats 25
+
+Fires --bookings simultaneous reservations at one class with --seats seats and
+reports how many succeeded and the p50/p99/max latency of a booking attempt.
+Exits non-zero when the class is overbooked or underfilled.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import MockDatabase
+from scheduling import ClassFullError
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, default=500)
+    parser.add_argument("--seats", type=int, default=10)
+    parser.add_argument("--sessions", type=int, default=10, help="sessions per reservation")
+    args = parser.parse_args()
+
+    db = MockDatabase()
+    group_class = db.therapy_classes.update_row("class-5", max_participants=args.seats)
+    codes = [db.create_voucher(regular_codes=1, backup_codes=0)["codes"][0] for _ in range(args.bookings)]
+    start_line = threading.Barrier(args.bookings)
+
+    def book(code):
+        start_line.wait()
+        started = time.perf_counter()
+        try:
+            db.create_reservation(code, group_class, "client-1", date(2030, 1, 1), sessions=args.sessions)
+            ok = True
+        except ClassFullError:
+            ok = False
+        return ok, (time.perf_counter() - started) * 1000
+
+    with ThreadPoolExecutor(max_workers=args.bookings) as executor:
+        results = list(executor.map(book, codes))
+
+    booked = sum(ok for ok, _ in results)
+    latencies = sorted(latency for _, latency in results)
+    p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+    print(f"{booked}/{args.bookings} bookings succeeded for {args.seats} seats")
+    print(f"p50 {statistics.median(latencies):.2f} ms  p99 {p99:.2f} ms  max {latencies[-1]:.2f} ms")
+    return 0 if booked == min(args.seats, args.bookings) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
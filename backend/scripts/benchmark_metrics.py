@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Per-request cost of the /metrics instrumentation, no database needed:
+
+    python scripts/benchmark_metrics.py
+    python scripts/benchmark_metrics.py --iterations 200000 --request-us 2000
+
+Measures, in CPU time (process time, so other load on the machine skews it
+less), what instrumentation adds to one request: MetricsMiddleware around an
+ASGI app that answers immediately, and one instrument_methods()-wrapped data
+layer call. Each is compared with the same code uninstrumented.
+
+The added cost is then related to a FastAPI request with an empty handler
+(measured here; the worst case) and to a request of ``--request-us``
+(default 1000, a typical single-query endpoint).
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from fastapi import FastAPI
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import MetricsMiddleware, instrument_methods
+
+SCOPE = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+         "scheme": "http", "path": "/api/organizations/7/users", "raw_path": b"/api/organizations/7/users",
+         "root_path": "", "query_string": b"", "headers": [(b"host", b"bench")],
+         "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def answer(scope, receive, send):
+    """ASGI app that responds at once"""
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"[]"})
+
+
+class FakeDatabase:
+    async def list_user_rows(self, organization_id):
+        return [organization_id]
+
+
+class InstrumentedDatabase(FakeDatabase):
+    async def list_user_rows(self, organization_id):
+        return [organization_id]
+
+
+instrument_methods(InstrumentedDatabase)
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    database = FakeDatabase()
+
+    @app.get("/api/organizations/{org_id}/users")
+    async def list_organization_users(org_id: int):
+        return await database.list_user_rows(org_id)
+
+    return app
+
+
+async def per_call(call, count: int) -> float:
+    started = time.process_time()
+    for _ in range(count):
+        await call()
+    return (time.process_time() - started) / count
+
+
+def median_us(variants, count: int, repeat: int):
+    """Median CPU microseconds per call of each variant, runs interleaved"""
+    runs = {name: [] for name in variants}
+    for _ in range(repeat):
+        for name, call in variants.items():
+            runs[name].append(asyncio.run(per_call(call, count)))
+    return {name: statistics.median(values) * 1e6 for name, values in runs.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=9)
+    parser.add_argument("--request-us", type=float, default=1000.0)
+    args = parser.parse_args()
+
+    middleware = MetricsMiddleware(answer)
+    app = make_app()
+    plain, instrumented = FakeDatabase(), InstrumentedDatabase()
+    timings = median_us({
+        "asgi": lambda: answer(dict(SCOPE), receive, send),
+        "asgi+middleware": lambda: middleware(dict(SCOPE), receive, send),
+        "query": lambda: plain.list_user_rows(7),
+        "query+timing": lambda: instrumented.list_user_rows(7),
+    }, args.iterations, args.repeat)
+    request = median_us({"request": lambda: app(dict(SCOPE), receive, send)},
+                        args.iterations // 10, args.repeat)["request"]
+
+    middleware_us = timings["asgi+middleware"] - timings["asgi"]
+    query_us = timings["query+timing"] - timings["query"]
+    added = middleware_us + query_us
+    print(f"median of {args.repeat} runs, CPU time")
+    print(f"  MetricsMiddleware:        {middleware_us:6.2f} us/request")
+    print(f"  instrumented query call:  {query_us:6.2f} us/call")
+    print(f"  empty-handler request:    {request:6.1f} us  -> +{added / request * 100:.1f}% with one query")
+    print(f"  {args.request_us:.0f} us request:          -> +{added / args.request_us * 100:.1f}% with one query")
+
+
+if __name__ == "__main__":
+    main()
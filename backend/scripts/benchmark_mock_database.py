@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the in-memory v1 engine (database.MockDatabase).
+
+    python scripts/benchmark_mock_database.py
+    python scripts/benchmark_mock_database.py --vouchers 5000 --clients 20000
+
+Seeds users, classes, vouchers with codes and reservations, then reports the
+per-call latency of the indexed lookups used by the v1 API.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, time as clock
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import MockDatabase
+from models import User, UserRole, TherapyClass
+
+
+def seed(db, args):
+    therapists = [User(email=f"therapist{i}@bench.local", name=f"Therapist {i}", role=UserRole.THERAPIST)
+                  for i in range(args.therapists)]
+    clients = [User(email=f"client{i}@bench.local", name=f"Client {i}", role=UserRole.CLIENT)
+               for i in range(args.clients)]
+    for user in therapists + clients:
+        db.users[user.id] = user
+    classes = []
+    for i, therapist in enumerate(therapists):
+        therapy_class = TherapyClass(name=f"Class {i}", description="", therapist_id=therapist.id,
+                                     day_of_week=i % 7, time=clock(9 + i % 8),
+                                     max_participants=args.reservations)
+        db.therapy_classes[therapy_class.id] = therapy_class
+        classes.append(db.therapy_classes.get(therapy_class.id))
+    for i in range(args.vouchers):
+        voucher = db.create_voucher(regular_codes=args.codes_per_voucher, backup_codes=2)
+        client = clients[i % len(clients)]
+        db.vouchers.update_row(voucher["id"], client_id=client.id)
+        if i < args.reservations:
+            db.create_reservation(voucher["codes"][0], classes[i % len(classes)], client.id, date.today())
+    return therapists, clients
+
+
+def measure(name, fn, args_list):
+    samples = []
+    for arg in args_list:
+        start = time.perf_counter()
+        fn(arg)
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    print(f"{name:<28}{len(samples):>8}{statistics.median(samples):>12.1f}{max(samples):>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vouchers", type=int, default=10000)
+    parser.add_argument("--codes-per-voucher", type=int, default=10)
+    parser.add_argument("--reservations", type=int, default=5000)
+    parser.add_argument("--therapists", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=10000)
+    parser.add_argument("--calls", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = MockDatabase(seed_mock_data=False)
+    start = time.perf_counter()
+    therapists, clients = seed(db, args)
+    print(f"seeded {len(db.users)} users, {len(db.voucher_codes)} codes, {len(db.reservations)} reservations, "
+          f"{len(db.sessions)} sessions in {time.perf_counter() - start:.1f}s")
+
+    codes = random.choices([c["code"] for c in db.voucher_codes.values()], k=args.calls)
+    emails = [u.email for u in random.choices(clients, k=args.calls)]
+    client_ids = [u.id for u in random.choices(clients, k=args.calls)]
+    therapist_ids = [u.id for u in random.choices(therapists, k=min(args.calls, 100))]
+
+    print(f"{'lookup':<28}{'calls':>8}{'p50 us':>12}{'max us':>12}")
+    measure("get_voucher_code_by_code", db.get_voucher_code_by_code, codes)
+    measure("get_user_by_email", db.get_user_by_email, emails)
+    measure("get_user_reservations", db.get_user_reservations, client_ids)
+    measure("vouchers by client", lambda cid: db.vouchers.first(client_id=cid), client_ids)
+    measure("get_therapist_sessions", db.get_therapist_sessions, therapist_ids)
+    measure("get_therapist_clients", db.get_therapist_clients, therapist_ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the /therapist/clients query (THERAPIST_CLIENTS_SQL).
+
+Seeds a scratch schema with the reservations/sessions layout of
+database/init/01_schema.sql at increasing sizes and times the grouped query
+for one therapist whose own data stays fixed:
+
+    python scripts/benchmark_therapist_clients.py
+    python scripts/benchmark_therapist_clients.py --scales 1000,10000,50000 --runs 50
+
+The default largest scale is 10k reservations / 100k sessions. Latency should
+stay flat as the tables grow, since the query only touches the therapist's
+reservations through the therapist_id, therapy_class_id and reservation_id
+indexes. The replaced Python loop fetched every reservation once per client
+and every session once per reservation.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_connection import THERAPIST_CLIENTS_SQL, db
+
+SCHEMA = "bench_therapist_clients"
+
+SCHEMA_SQL = f"""
+    DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+    CREATE SCHEMA {SCHEMA};
+    SET search_path TO {SCHEMA};
+    CREATE TABLE users (
+        id SERIAL PRIMARY KEY, email VARCHAR(255) UNIQUE NOT NULL, name VARCHAR(255) NOT NULL,
+        role VARCHAR(50) NOT NULL, password_hash VARCHAR(255) NOT NULL DEFAULT ''
+    );
+    CREATE TABLE therapy_classes (
+        id SERIAL PRIMARY KEY, name VARCHAR(255) NOT NULL, therapist_id INTEGER NOT NULL REFERENCES users(id)
+    );
+    CREATE TABLE reservations (
+        id SERIAL PRIMARY KEY, client_id INTEGER NOT NULL REFERENCES users(id),
+        therapy_class_id INTEGER NOT NULL REFERENCES therapy_classes(id), start_date DATE NOT NULL
+    );
+    CREATE TABLE sessions (
+        id SERIAL PRIMARY KEY, reservation_id INTEGER NOT NULL REFERENCES reservations(id),
+        scheduled_date DATE NOT NULL, scheduled_time TIME NOT NULL,
+        status VARCHAR(50) NOT NULL DEFAULT 'scheduled'
+    );
+    CREATE INDEX ON therapy_classes(therapist_id);
+    CREATE INDEX ON reservations(client_id);
+    CREATE INDEX ON reservations(therapy_class_id);
+    CREATE INDEX ON sessions(reservation_id);
+"""
+
+
+def seed(conn, reservations, own, sessions_per_reservation, therapists, clients):
+    """Therapist 1 owns class 1 and exactly ``own`` reservations; the rest go to other therapists"""
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA_SQL)
+        cur.execute("""
+            INSERT INTO users (email, name, role)
+            SELECT 'therapist' || g || '@bench.local', 'Therapist ' || g, 'therapist'
+            FROM generate_series(1, %(therapists)s) g;
+            INSERT INTO users (email, name, role)
+            SELECT 'client' || g || '@bench.local', 'Client ' || g, 'client'
+            FROM generate_series(1, %(clients)s) g;
+            INSERT INTO therapy_classes (name, therapist_id)
+            SELECT 'Class ' || g, g FROM generate_series(1, %(therapists)s) g;
+            INSERT INTO reservations (client_id, therapy_class_id, start_date)
+            SELECT %(therapists)s + 1 + (g * 7919) %% %(clients)s,
+                   CASE WHEN g <= %(own)s THEN 1 ELSE 2 + g %% (%(therapists)s - 1) END,
+                   CURRENT_DATE - (g %% 120)
+            FROM generate_series(1, %(reservations)s) g;
+            INSERT INTO sessions (reservation_id, scheduled_date, scheduled_time, status)
+            SELECT r.id, r.start_date + 7 * w, TIME '09:00' + (r.id %% 8) * INTERVAL '1 hour',
+                   CASE WHEN (r.id + w) %% 17 = 0 THEN 'cancelled' ELSE 'scheduled' END
+            FROM reservations r, generate_series(0, %(sessions)s - 1) w;
+            ANALYZE;
+        """, {"therapists": therapists, "clients": clients, "own": own,
+              "reservations": reservations, "sessions": sessions_per_reservation})
+    conn.commit()
+
+
+def time_query(conn, runs):
+    samples = []
+    with conn.cursor() as cur:
+        cur.execute(f"SET search_path TO {SCHEMA}")
+        for _ in range(runs):
+            start = time.perf_counter()
+            cur.execute(THERAPIST_CLIENTS_SQL, (1,))
+            rows = cur.fetchall()
+            samples.append((time.perf_counter() - start) * 1000)
+    conn.rollback()
+    return len(rows), samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1000,10000", help="Comma-separated total reservation counts")
+    parser.add_argument("--own", type=int, default=100, help="Reservations owned by the measured therapist")
+    parser.add_argument("--sessions-per-reservation", type=int, default=10)
+    parser.add_argument("--therapists", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema afterwards")
+    args = parser.parse_args()
+
+    conn = db.get_connection()
+    try:
+        print(f"{'reservations':>13}{'sessions':>10}{'clients':>9}{'p50 ms':>9}{'max ms':>9}")
+        for scale in [int(s) for s in args.scales.split(",")]:
+            seed(conn, scale, min(args.own, scale), args.sessions_per_reservation,
+                 args.therapists, args.clients)
+            clients, samples = time_query(conn, args.runs)
+            print(f"{scale:>13}{scale * args.sessions_per_reservation:>10}{clients:>9}"
+                  f"{statistics.median(samples):>9.2f}{max(samples):>9.2f}")
+    finally:
+        conn.rollback()
+        if not args.keep:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Nightly voucher maintenance sweeps (see maintenance.py). Run from cron or as a
+sidecar instead of SCHEDULER_ENABLED in the API replicas:
+
+    python scripts/run_maintenance.py
+    python scripts/run_maintenance.py --job expire_vouchers --job exhaust_vouchers
+    python scripts/run_maintenance.py --force
+
+Jobs already recorded as successful today are skipped unless --force. Exits
+without doing anything when another instance holds the leader lock.
+"""
+
+import argparse
+import os
+import sys
+
+import psycopg2
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from maintenance import MaintenanceScheduler, JOBS
+
+
+def get_database_connection():
+    """Connect with DATABASE_URL or the DB_* variables used by the backend"""
+    database_url = os.getenv("DATABASE_URL")
+    if database_url:
+        return psycopg2.connect(database_url)
+    return psycopg2.connect(
+        host=os.getenv("DB_HOST", "postgres"),
+        port=os.getenv("DB_PORT", "5432"),
+        database=os.getenv("DB_NAME", "therapy_system"),
+        user=os.getenv("DB_USER", "therapy_user"),
+        password=os.getenv("DB_PASSWORD", "therapy_password"),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--job", action="append", choices=[name for name, _ in JOBS],
+                        help="Run only this job (repeatable)")
+    parser.add_argument("--force", action="store_true", help="Run jobs that already ran today")
+    args = parser.parse_args()
+
+    conn = get_database_connection()
+    try:
+        results = MaintenanceScheduler().run(conn, force=args.force, only=args.job)
+        if results is None:
+            print("Another instance holds the maintenance lock, nothing done")
+        elif not results:
+            print("All jobs already ran today")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
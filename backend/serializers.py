@@ -0,0 +1,103 @@
+import json
+import typing
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Type
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Fast path for list endpoints: cursor tuples are mapped straight to response
+# dicts by a serializer compiled once per (model, column order), and rendered
+# without a second round of response_model validation. Rows must already
+# satisfy the model; the SELECT lists in db_v2 are written for that.
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def loads(data: Any) -> Any:
+    """JSON column decoder (orjson when installed)"""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON; orjson when installed, the stdlib encoder otherwise"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """Default response class of the app (see main.py)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _converter(annotation: Any) -> Callable[[Any], Any]:
+    """Conversion pydantic would apply to a DB value of this field, or None"""
+    if typing.get_origin(annotation) is typing.Union:
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            annotation = args[0]
+    if annotation is float:
+        return float
+    return None
+
+
+class RowSerializer:
+    """Maps cursor tuples with a fixed column order onto one response model's fields"""
+
+    def __init__(self, model: Type[BaseModel], columns: Sequence[str]):
+        index = {column: position for position, column in enumerate(columns)}
+        names, positions = [], []
+        self._converters: List[Tuple[str, Callable[[Any], Any]]] = []
+        self._defaults: Dict[str, Any] = {}
+        for name, field in model.model_fields.items():
+            if name not in index:
+                if field.is_required():
+                    raise ValueError(f"{model.__name__}.{name} is not among the selected columns")
+                self._defaults[name] = field.get_default(call_default_factory=True)
+                continue
+            names.append(name)
+            positions.append(index[name])
+            convert = _converter(field.annotation)
+            if convert is not None:
+                self._converters.append((name, convert))
+        self._names = tuple(names)
+        # itemgetter with one index returns the value itself, not a 1-tuple
+        self._get = itemgetter(*positions) if len(positions) > 1 else (lambda row: (row[positions[0]],))
+
+    def __call__(self, row: Sequence[Any]) -> Dict[str, Any]:
+        item = dict(zip(self._names, self._get(row)))
+        for name, convert in self._converters:
+            value = item[name]
+            if value is not None:
+                item[name] = convert(value)
+        if self._defaults:
+            item.update(self._defaults)
+        return item
+
+    def many(self, rows: Sequence[Sequence[Any]]) -> List[Dict[str, Any]]:
+        return [self(row) for row in rows]
+
+
+@lru_cache(maxsize=64)
+def serializer_for(model: Type[BaseModel], columns: Tuple[str, ...]) -> RowSerializer:
+    return RowSerializer(model, columns)
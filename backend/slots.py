@@ -0,0 +1,119 @@
+import os
+import threading
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import db_events
+from availability import availability_for
+from conflicts import session_interval
+from interval_index import IntervalIndex
+
+SLOTS_MAX_WINDOW_DAYS = int(os.getenv("SLOTS_MAX_WINDOW_DAYS", "90"))
+
+
+class RuleTemplate(NamedTuple):
+    """A voucher type's booking rules expanded into slot start times per weekday (0=Mon)"""
+    voucher_type_id: int
+    updated_at: Any
+    duration: timedelta
+    capacity: int
+    week: Tuple[Tuple[time, ...], ...]
+
+
+def expand_rule_template(voucher_type: Dict[str, Any]) -> RuleTemplate:
+    """Back-to-back slots of session_duration_minutes inside each enabled day's window.
+
+    A ``custom`` frequency further limits the weekdays to ``custom_days``
+    (1=Mon..7=Sun).
+    """
+    availability = availability_for(voucher_type)
+    minutes = voucher_type['session_duration_minutes']
+    allowed = set(range(7))
+    if voucher_type.get('frequency') == 'custom' and voucher_type.get('custom_days'):
+        allowed = {(d - 1) % 7 for d in voucher_type['custom_days']}
+
+    week = []
+    for weekday in range(7):
+        starts: List[time] = []
+        if weekday in allowed:
+            for begin, end in availability.windows(weekday):
+                starts.extend(time(m // 60, m % 60) for m in range(begin, end - minutes + 1, minutes))
+        week.append(tuple(starts))
+
+    return RuleTemplate(voucher_type['id'], voucher_type.get('updated_at'), timedelta(minutes=minutes),
+                        voucher_type.get('max_clients_per_session') or 1, tuple(week))
+
+
+class SlotTemplateCache:
+    """Expanded rule templates per voucher type, dropped when the type changes"""
+
+    def __init__(self):
+        self._templates: Dict[int, RuleTemplate] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, voucher_type: Dict[str, Any]) -> RuleTemplate:
+        template = self._templates.get(voucher_type['id'])
+        # updated_at also catches edits made by another worker process
+        if template is not None and template.updated_at == voucher_type.get('updated_at'):
+            self.hits += 1
+            return template
+        template = expand_rule_template(voucher_type)
+        with self._lock:
+            self.misses += 1
+            self._templates[voucher_type['id']] = template
+        return template
+
+    def invalidate(self, voucher_type_id: Optional[int] = None, **_):
+        with self._lock:
+            if voucher_type_id is None:
+                self._templates.clear()
+            else:
+                self._templates.pop(voucher_type_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._templates), "hits": self.hits, "misses": self.misses}
+
+
+def busy_index(sessions: Iterable[Dict[str, Any]]) -> Dict[int, IntervalIndex]:
+    """Per-therapist interval index of booked sessions"""
+    intervals: Dict[int, List[Tuple[datetime, datetime]]] = {}
+    for session in sessions:
+        intervals.setdefault(session['therapist_id'], []).append(session_interval(session))
+    return {therapist_id: IntervalIndex(items) for therapist_id, items in intervals.items()}
+
+
+def free_slots(template: RuleTemplate, therapists: List[Dict[str, Any]], busy: Dict[int, IntervalIndex],
+               date_from: date, date_to: date, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Slots in [date_from, date_to] where a therapist still has room for a client"""
+    now = now or datetime.now()
+    empty = IntervalIndex()
+    slots = []
+    day = date_from
+    while day <= date_to:
+        for start_time in template.week[day.weekday()]:
+            start = datetime.combine(day, start_time)
+            if start <= now:
+                continue
+            end = start + template.duration
+            for therapist in therapists:
+                booked = busy.get(therapist['id'], empty).count_overlapping(start, end)
+                if booked < template.capacity:
+                    slots.append({
+                        'voucher_type_id': template.voucher_type_id,
+                        'therapist_id': therapist['id'],
+                        'therapist_name': therapist['name'],
+                        'date': day,
+                        'time': start_time.strftime("%H:%M"),
+                        'duration_minutes': int(template.duration.total_seconds() // 60),
+                        'type': 'individual' if template.capacity == 1 else 'group',
+                        'spots_left': template.capacity - booked,
+                    })
+        day += timedelta(days=1)
+    return slots
+
+
+# Global template cache, invalidated by update_voucher_type / deactivate_voucher_type
+slot_templates = SlotTemplateCache()
+db_events.subscribe(db_events.VOUCHER_TYPE_CHANGED, slot_templates.invalidate)
@@ -15,9 +15,11 @@ class TestUserAdministration:
             headers={"Authorization": f"Bearer {admin_token}"}
         )
         assert response.status_code == 200
-        users = response.json()
+        page = response.json()
+        users = page["items"]
         assert isinstance(users, list)
         assert len(users) > 0
+        assert "next_cursor" in page
         # Check user structure
         user = users[0]
         assert "id" in user
@@ -28,6 +30,35 @@ class TestUserAdministration:
         assert "is_active" in user
         assert "created_at" in user
     
+    def test_admin_user_list_is_keyset_paginated(self, client: TestClient, admin_token: str):
+        """Following next_cursor should walk every user exactly once"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 1, "include_total": "true"}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/api/admin/users", params=params, headers=headers)
+            assert response.status_code == 200
+            page = response.json()
+            assert len(page["items"]) <= 1
+            seen.extend(user["id"] for user in page["items"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        assert len(seen) == len(set(seen))
+        assert page["total"] == len(seen)
+
+    def test_invalid_cursor_is_rejected(self, client: TestClient, admin_token: str):
+        """A malformed cursor should return 400"""
+        response = client.get(
+            "/api/admin/users",
+            params={"cursor": "garbage"},
+            headers={"Authorization": f"Bearer {admin_token}"}
+        )
+        assert response.status_code == 400
+    
     def test_admin_can_create_user(self, client: TestClient, admin_token: str):
         """Admin should be able to create a new user"""
         new_user = {
@@ -190,7 +221,7 @@ class TestOrganizationManagement:
             headers={"Authorization": f"Bearer {owner_token}"}
         )
         assert response.status_code == 200
-        users = response.json()
+        users = response.json()["items"]
         assert isinstance(users, list)
         # All users should belong to the same organization
         for user in users:
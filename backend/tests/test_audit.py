@@ -0,0 +1,178 @@
+import pytest
+import sys
+import os
+import json
+from datetime import datetime, date
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import queue
+
+import audit
+from audit import AuditLogWriter, diff_values
+
+
+class RecordingQueue(queue.Queue):
+    """Queue that records how long each blocking put() may wait"""
+
+    def __init__(self, maxsize, waits):
+        super().__init__(maxsize)
+        self.waits = waits
+
+    def put(self, item, block=True, timeout=None):
+        if block:
+            self.waits.append(timeout)
+        super().put(item, block, timeout)
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakePool:
+    def __init__(self):
+        self.conn = FakeConnection()
+
+    def getconn(self):
+        return self.conn
+
+    def putconn(self, conn):
+        pass
+
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Capture multi-row inserts instead of talking to PostgreSQL"""
+    written = []
+    monkeypatch.setattr(audit, "execute_values",
+                        lambda cur, sql, rows, page_size: written.append(list(rows)))
+    return written
+
+
+class TestDiffValues:
+    """Tests for field-level audit diffs"""
+
+    def test_update_keeps_only_changed_fields(self):
+        old = {"id": 1, "name": "Old", "phone": "1", "updated_at": datetime(2024, 1, 1)}
+        new = {"id": 1, "name": "New", "phone": "1", "updated_at": datetime(2024, 1, 2)}
+        assert diff_values(old, new) == ({"name": "Old"}, {"name": "New"})
+
+    def test_create_and_delete_keep_snapshot(self):
+        row = {"id": 1, "name": "Test"}
+        assert diff_values(None, row) == (None, row)
+        assert diff_values(row, None) == (row, None)
+
+    def test_derived_columns_are_excluded(self):
+        row = {"id": 1, "booking_rules": {}, "booking_rules_bitmap": b"\x00" * 1260}
+        assert diff_values(None, row) == (None, {"id": 1, "booking_rules": {}})
+
+    def test_no_changes(self):
+        row = {"id": 1, "name": "Test"}
+        assert diff_values(row, dict(row)) == (None, None)
+
+
+class TestAuditLogWriter:
+    """Tests for staging and batched flushing of audit entries"""
+
+    def test_sync_mode_never_stages(self):
+        writer = AuditLogWriter(mode="sync")
+        conn = type("Conn", (), {"audit_pending": []})()
+        entry = writer.entry(1, 1, "UPDATE", "user", 1, None, {"name": "x"})
+        assert writer.stage(conn, entry) is False
+        assert conn.audit_pending == []
+
+    def test_async_mode_stages_on_audited_connections_only(self):
+        writer = AuditLogWriter(mode="async")
+        conn = type("Conn", (), {"audit_pending": []})()
+        entry = writer.entry(1, 1, "UPDATE", "user", 1, None, {"name": "x"})
+        assert writer.stage(conn, entry) is True
+        assert conn.audit_pending == [entry]
+        assert writer.stage(object(), entry) is False
+
+    def test_flush_writes_in_batches(self, batches):
+        writer = AuditLogWriter(mode="async", batch_size=2)
+        pool = FakePool()
+        writer._pool = pool
+        writer.publish([writer.entry(1, 1, "CREATE", "user", i, None, {"id": i}) for i in range(5)])
+        assert writer.stats()["queue_depth"] == 5
+
+        assert writer.flush() == 5
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        assert pool.conn.commits == 3
+        stats = writer.stats()
+        assert stats["queue_depth"] == 0
+        assert stats["written_total"] == 5
+        assert stats["flushes_total"] == 3
+
+    def test_params_are_json_encoded(self, batches):
+        writer = AuditLogWriter(mode="async")
+        writer._pool = FakePool()
+        writer.publish([writer.entry(7, 2, "UPDATE", "user", 3, {"name": "a"}, {"name": "b"})])
+        writer.flush()
+        row = batches[0][0]
+        assert row[:5] == (7, 2, "UPDATE", "user", 3)
+        assert json.loads(row[5]) == {"name": "a"}
+        assert json.loads(row[6]) == {"name": "b"}
+
+    def test_full_queue_drops_without_blocking(self):
+        writer = AuditLogWriter(mode="async", max_queue=1)
+        entries = [writer.entry(1, 1, "CREATE", "user", i, None, {"id": i}) for i in range(3)]
+        writer.publish(entries, block=False)
+        stats = writer.stats()
+        assert stats["enqueued_total"] == 1
+        assert stats["dropped_total"] == 2
+
+    def test_full_queue_waits_once_per_commit(self):
+        writer = AuditLogWriter(mode="async", max_queue=1)
+        waits = []
+        writer._queue = RecordingQueue(maxsize=1, waits=waits)
+        entries = [writer.entry(1, 1, "CREATE", "user", i, None, {"id": i}) for i in range(20)]
+        writer.publish(entries, timeout=0.05)
+        # One shared deadline: the put that finds the queue full gets what is left
+        # of the 0.05 s, and the other 18 entries are dropped without waiting
+        assert len(waits) == 2
+        assert waits[1] <= waits[0] <= 0.05
+        stats = writer.stats()
+        assert stats["enqueued_total"] == 1
+        assert stats["dropped_total"] == 19
+
+    def test_close_flushes_remaining_entries(self, batches):
+        writer = AuditLogWriter(mode="async", flush_interval=60)
+        writer.start(FakePool())
+        writer.publish([writer.entry(1, 1, "CREATE", "user", 1, None, {"id": 1})])
+        writer.close()
+        assert writer.stats()["written_total"] == 1
+
+
+class TestPartitionHelpers:
+    """Tests for audit_logs partition naming and retention windows"""
+
+    def test_partition_month(self):
+        assert audit.partition_month("audit_logs_y2024m03") == date(2024, 3, 1)
+        assert audit.partition_month("audit_logs_legacy") is None
+
+    def test_retention_cutoff_crosses_year(self):
+        assert audit.retention_cutoff(12, today=date(2024, 3, 15)) == date(2023, 3, 1)
+        assert audit.retention_cutoff(3, today=date(2024, 2, 1)) == date(2023, 11, 1)
+        assert audit.retention_cutoff(0, today=date(2024, 2, 29)) == date(2024, 2, 1)
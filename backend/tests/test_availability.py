@@ -0,0 +1,76 @@
+import sys
+import os
+import random
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from availability import (
+    WeeklyAvailability, compile_booking_rules, availability_for, BITMAP_BYTES, MINUTES_PER_DAY
+)
+
+MONDAY = datetime(2024, 1, 1)
+RULES = {
+    "monday": {"enabled": True, "start_time": "09:00", "end_time": "12:00"},
+    "tuesday": {"enabled": False, "start_time": "09:00", "end_time": "17:00"},
+    "wednesday": {"enabled": True, "start_time": "08:30", "end_time": "10:15"},
+    "sunday": {"enabled": True, "start_time": "22:00", "end_time": "23:59"},
+}
+
+
+def reference_bookable(rules, start, duration):
+    """Straightforward per-minute check the bitmap must agree with"""
+    names = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+    for minute in range(duration):
+        moment = start + timedelta(minutes=minute)
+        rule = rules.get(names[moment.weekday()]) or {}
+        if not rule.get("enabled"):
+            return False
+        opens = datetime.combine(moment.date(), datetime.strptime(rule["start_time"], "%H:%M").time())
+        closes = datetime.combine(moment.date(), datetime.strptime(rule["end_time"], "%H:%M").time())
+        if not opens <= moment < closes:
+            return False
+    return True
+
+
+class TestWeeklyAvailability:
+    """Tests for compiled booking rules"""
+
+    def test_window_edges(self):
+        availability = WeeklyAvailability.from_rules(RULES)
+        assert availability.is_bookable(MONDAY.replace(hour=9), 60)
+        assert availability.is_bookable(MONDAY.replace(hour=11), 60)
+        assert not availability.is_bookable(MONDAY.replace(hour=11, minute=1), 60)
+        assert not availability.is_bookable(MONDAY.replace(hour=8, minute=59), 60)
+        assert not availability.is_bookable(MONDAY.replace(hour=10) + timedelta(days=1), 30)
+
+    def test_windows(self):
+        availability = WeeklyAvailability.from_rules(RULES)
+        assert availability.windows(0) == [(540, 720)]
+        assert availability.windows(1) == []
+        assert availability.windows(2) == [(510, 615)]
+        assert availability.windows(6) == [(1320, 1439)]
+
+    def test_bytes_round_trip(self):
+        availability = WeeklyAvailability.from_rules(RULES)
+        data = availability.to_bytes()
+        assert len(data) == BITMAP_BYTES
+        assert WeeklyAvailability.from_bytes(memoryview(data)) == availability
+        assert availability_for({"booking_rules_bitmap": data, "booking_rules": {}}) == availability
+        assert availability_for({"booking_rules": '{"monday": {"enabled": true, "start_time": "09:00",'
+                                                  ' "end_time": "12:00"}}'}).windows(0) == [(540, 720)]
+
+    def test_midnight_wrap(self):
+        rules = {"sunday": {"enabled": True, "start_time": "00:00", "end_time": "23:59"}}
+        bits = compile_booking_rules(rules) | (1 << (7 * MINUTES_PER_DAY - 1))
+        bits |= (1 << 60) - 1  # Monday 00:00-01:00
+        availability = WeeklyAvailability(bits)
+        assert availability.is_bookable(MONDAY - timedelta(minutes=30), 60)
+        assert not availability.is_bookable(MONDAY - timedelta(minutes=30), 120)
+
+    def test_bulk_matches_reference(self):
+        availability = WeeklyAvailability.from_rules(RULES)
+        rng = random.Random(7)
+        starts = [MONDAY + timedelta(minutes=rng.randrange(7 * MINUTES_PER_DAY)) for _ in range(5000)]
+        for duration in (1, 45, 60, 105, 106):
+            expected = [reference_bookable(RULES, start, duration) for start in starts]
+            assert availability.bookable_many(starts, duration) == expected
@@ -0,0 +1,52 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_loader import BatchLoader
+
+
+class RecordingFetch:
+    def __init__(self, tables):
+        self.tables = tables
+        self.calls = []
+
+    def __call__(self, table, ids):
+        self.calls.append((table, list(ids)))
+        return [row for row in self.tables[table] if row["id"] in ids]
+
+
+def make_loader():
+    fetch = RecordingFetch({
+        "users": [{"id": i, "name": f"User {i}"} for i in range(1, 301)],
+        "therapy_classes": [{"id": 1, "name": "CBT"}, {"id": 2, "name": "Art"}],
+    })
+    return BatchLoader(fetch), fetch
+
+
+class TestBatchLoader:
+    """Tests for per-table batched lookups"""
+
+    def test_one_query_per_table(self):
+        loader, fetch = make_loader()
+        rows = [{"client_id": i % 300 + 1, "therapy_class_id": i % 2 + 1} for i in range(900)]
+        loader.enrich(rows, "client_id", "users", "client")
+        loader.enrich(rows, "therapy_class_id", "therapy_classes", "therapy_class")
+        assert [table for table, _ in fetch.calls] == ["users", "therapy_classes"]
+        assert len(fetch.calls[0][1]) == 300
+        assert rows[0]["client"] == {"id": 1, "name": "User 1"}
+        assert rows[1]["therapy_class"]["name"] == "Art"
+
+    def test_cached_keys_are_not_fetched_again(self):
+        loader, fetch = make_loader()
+        loader.load_many("users", [1, 2])
+        loader.load_many("users", [2, 3, 3])
+        assert fetch.calls == [("users", [1, 2]), ("users", [3])]
+        assert loader.queries == 2
+
+    def test_missing_and_null_keys(self):
+        loader, fetch = make_loader()
+        assert loader.load_many("users", [None, 999, 5]) == {5: {"id": 5, "name": "User 5"}}
+        assert loader.load("users", 999) is None
+        assert len(fetch.calls) == 1
+        rows = loader.enrich([{"client_id": None}], "client_id", "users", "client")
+        assert rows[0]["client"] is None
@@ -0,0 +1,94 @@
+import pytest
+import sys
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import MockDatabase
+from scheduling import ClassFullError
+
+PARALLEL_BOOKINGS = 500
+SEATS = 10
+
+
+@pytest.fixture
+def booking_db():
+    db = MockDatabase()
+    group_class = db.therapy_classes.update_row("class-5", max_participants=SEATS)
+    codes = [db.create_voucher(regular_codes=1, backup_codes=0)["codes"][0] for _ in range(PARALLEL_BOOKINGS)]
+    return db, group_class, codes
+
+
+class TestBookingCapacity:
+    """Tests for atomic capacity enforcement under concurrent bookings"""
+
+    def test_parallel_bookings_fill_exactly_capacity(self, booking_db):
+        db, group_class, codes = booking_db
+        start_line = threading.Barrier(PARALLEL_BOOKINGS)
+
+        def book(code):
+            start_line.wait()
+            try:
+                db.create_reservation(code, group_class, "client-1", date(2030, 1, 1))
+                return True
+            except ClassFullError:
+                return False
+
+        with ThreadPoolExecutor(max_workers=PARALLEL_BOOKINGS) as executor:
+            results = list(executor.map(book, codes))
+
+        assert sum(results) == SEATS
+        assert len(db.reservations.find(therapy_class_id=group_class["id"])) == SEATS
+        assert {n for slot, n in db.slot_bookings.items() if slot[0] == group_class["id"]} == {SEATS}
+
+    def test_full_slot_rejects_without_side_effects(self, booking_db):
+        db, group_class, codes = booking_db
+        for code in codes[:SEATS]:
+            db.create_reservation(code, group_class, "client-1", date(2030, 1, 1), sessions=2)
+        sessions_before = len(db.sessions)
+        with pytest.raises(ClassFullError):
+            db.create_reservation(codes[SEATS], group_class, "client-1", date(2030, 1, 1))
+        assert len(db.sessions) == sessions_before
+        # A reservation starting after the full weeks still fits
+        db.create_reservation(codes[SEATS], group_class, "client-1", date(2030, 1, 15))
+
+    def test_reschedule_moves_the_seat(self, booking_db):
+        db, group_class, codes = booking_db
+        reservations = [db.create_reservation(code, group_class, "client-1", date(2030, 1, 1), sessions=1)
+                        for code in codes[:SEATS]]
+        session = reservations[0]["sessions"][0]
+        slot = (group_class["id"], session["scheduled_date"], session["scheduled_time"])
+        moved_to = (group_class["id"], date(2030, 1, 4), group_class["time"])
+        with pytest.raises(ClassFullError):
+            db.create_reservation(codes[SEATS], group_class, "client-1", date(2030, 1, 1), sessions=1)
+
+        moved = db.reschedule_session(session["id"], moved_to[1], moved_to[2], "Rescheduled: sick")
+        assert moved["status"] == "rescheduled" and moved["actual_date"] == date(2030, 1, 4)
+        assert db.slot_bookings[slot] == SEATS - 1
+        assert db.slot_bookings[moved_to] == 1
+        # Rescheduling again moves the seat on rather than handing it back twice
+        db.reschedule_session(session["id"], date(2030, 1, 5), group_class["time"])
+        assert db.slot_bookings[slot] == SEATS - 1
+        assert db.slot_bookings[moved_to] == 0
+
+        db.create_reservation(codes[SEATS], group_class, "client-1", date(2030, 1, 1), sessions=1)
+        assert db.slot_bookings[slot] == SEATS
+
+    def test_reschedule_into_full_slot_is_rejected(self, booking_db):
+        db, group_class, codes = booking_db
+        full = [db.create_reservation(code, group_class, "client-1", date(2030, 1, 1), sessions=1)
+                for code in codes[:SEATS]]
+        other = db.create_reservation(codes[SEATS], group_class, "client-1", date(2030, 1, 8), sessions=1)
+        session = other["sessions"][0]
+        full_slot = (full[0]["sessions"][0]["scheduled_date"], full[0]["sessions"][0]["scheduled_time"])
+        with pytest.raises(ClassFullError):
+            db.reschedule_session(session["id"], *full_slot)
+        assert db.sessions.get(session["id"])["status"] == "scheduled"
+        assert db.slot_bookings[(group_class["id"], *full_slot)] == SEATS
+        assert db.slot_bookings[(group_class["id"], session["scheduled_date"], session["scheduled_time"])] == 1
+
+    def test_reschedule_unknown_session(self, booking_db):
+        db, group_class, _ = booking_db
+        assert db.reschedule_session("missing", date(2030, 1, 2), group_class["time"]) is None
@@ -0,0 +1,158 @@
+import pytest
+import sys
+import os
+import random
+import string
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2.extras import RealDictCursor
+
+from scheduling import ClassFullError
+
+try:
+    from db_connection import PostgresDatabase, db
+except Exception as e:  # pragma: no cover - depends on a running database
+    pytest.skip(f"PostgreSQL not available: {e}", allow_module_level=True)
+if not isinstance(db, PostgresDatabase):
+    pytest.skip("V1_DATABASE is not postgres", allow_module_level=True)
+
+PARALLEL_BOOKINGS = 100
+WORKERS = 20
+SEATS = 5
+START = date(2031, 1, 6)
+
+
+def execute(sql, params=None, fetch=False):
+    conn = db.get_connection()
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(sql, params)
+        rows = cur.fetchall() if fetch else None
+    conn.commit()
+    return rows
+
+
+@pytest.fixture
+def group_class():
+    """Private class, users and voucher codes, removed again after the test"""
+    suffix = "".join(random.choices(string.ascii_lowercase, k=12))
+    therapist, client = (
+        execute("INSERT INTO users (email, name, role, password_hash) VALUES (%s, %s, %s, 'x') RETURNING id",
+                (f"{role}-{suffix}@example.com", f"Capacity {role}", role), fetch=True)[0]["id"]
+        for role in ("therapist", "client")
+    )
+    therapy_class = execute("""
+        INSERT INTO therapy_classes (name, therapist_id, day_of_week, time, duration_minutes, max_participants)
+        VALUES ('Capacity test', %s, %s, '16:00', 60, %s) RETURNING *
+    """, (therapist, START.weekday(), SEATS), fetch=True)[0]
+    voucher_id = execute("INSERT INTO vouchers (client_id) VALUES (%s) RETURNING id", (client,), fetch=True)[0]["id"]
+    codes = execute("""
+        INSERT INTO voucher_codes (code, voucher_id)
+        SELECT upper(substr(md5(random()::text || n), 1, 8)), %s FROM generate_series(1, %s) AS n
+        RETURNING *
+    """, (voucher_id, PARALLEL_BOOKINGS), fetch=True)
+    yield therapy_class, client, codes
+    execute("DELETE FROM reservations WHERE therapy_class_id = %s", (therapy_class["id"],))
+    execute("DELETE FROM therapy_classes WHERE id = %s", (therapy_class["id"],))
+    execute("DELETE FROM vouchers WHERE id = %s", (voucher_id,))
+    execute("DELETE FROM users WHERE id IN (%s, %s)", (therapist, client))
+
+
+@pytest.fixture
+def connections():
+    """One PostgresDatabase (and so one connection) per worker thread"""
+    opened = []
+    local = threading.local()
+
+    def connection():
+        if not hasattr(local, "db"):
+            local.db = PostgresDatabase()
+            opened.append(local.db)
+        return local.db
+
+    yield connection
+    for database in opened:
+        database.connection.close()
+
+
+def booked(therapy_class, slot_date):
+    rows = execute("""
+        SELECT booked FROM session_slots
+        WHERE therapy_class_id = %s AND scheduled_date = %s AND scheduled_time = %s
+    """, (therapy_class["id"], slot_date, therapy_class["time"]), fetch=True)
+    return rows[0]["booked"] if rows else 0
+
+
+def fill(therapy_class, client, codes, start):
+    return [db.create_reservation(code, therapy_class, client, start, sessions=1)["sessions"][0]
+            for code in codes]
+
+
+class TestBookingCapacityPostgres:
+    """Tests for session_slots capacity enforcement against PostgreSQL"""
+
+    def test_parallel_bookings_fill_exactly_capacity(self, group_class, connections):
+        therapy_class, client, codes = group_class
+
+        def book(code):
+            try:
+                connections().create_reservation(code, therapy_class, client, START, sessions=1)
+                return True
+            except ClassFullError:
+                return False
+
+        with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+            results = list(executor.map(book, codes))
+
+        assert results.count(True) == SEATS
+        assert results.count(False) == PARALLEL_BOOKINGS - SEATS
+        assert booked(therapy_class, START) == SEATS
+        used = execute("SELECT COUNT(*) AS used FROM voucher_codes WHERE voucher_id = %s AND status = 'used'",
+                       (codes[0]["voucher_id"],), fetch=True)[0]["used"]
+        assert used == SEATS
+
+    def test_cancel_gives_the_seat_back(self, group_class):
+        therapy_class, client, codes = group_class
+        sessions = fill(therapy_class, client, codes[:SEATS], START)
+        with pytest.raises(ClassFullError):
+            db.create_reservation(codes[SEATS], therapy_class, client, START, sessions=1)
+
+        execute("UPDATE sessions SET status = 'cancelled' WHERE id = %s", (sessions[0]["id"],))
+        assert booked(therapy_class, START) == SEATS - 1
+        db.create_reservation(codes[SEATS], therapy_class, client, START, sessions=1)
+        assert booked(therapy_class, START) == SEATS
+
+    def test_reschedule_into_full_slot_is_rejected(self, group_class):
+        therapy_class, client, codes = group_class
+        next_week = START + timedelta(weeks=1)
+        fill(therapy_class, client, codes[:SEATS], START)
+        session = fill(therapy_class, client, codes[SEATS:SEATS + 1], next_week)[0]
+
+        with pytest.raises(ClassFullError):
+            db.reschedule_session(session["id"], START, therapy_class["time"], "Rescheduled: full")
+        assert booked(therapy_class, START) == SEATS
+        assert booked(therapy_class, next_week) == 1
+        status = execute("SELECT status FROM sessions WHERE id = %s", (session["id"],), fetch=True)[0]["status"]
+        assert status == "scheduled"
+
+    def test_parallel_reschedules_fill_exactly_capacity(self, group_class, connections):
+        therapy_class, client, codes = group_class
+        next_week, target = START + timedelta(weeks=1), START + timedelta(weeks=2)
+        sessions = (fill(therapy_class, client, codes[:SEATS], START)
+                    + fill(therapy_class, client, codes[SEATS:2 * SEATS], next_week))
+
+        def move(session):
+            try:
+                connections().reschedule_session(session["id"], target, therapy_class["time"])
+                return True
+            except ClassFullError:
+                return False
+
+        with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+            results = list(executor.map(move, sessions))
+
+        assert results.count(True) == SEATS
+        assert booked(therapy_class, target) == SEATS
+        assert booked(therapy_class, START) + booked(therapy_class, next_week) == SEATS
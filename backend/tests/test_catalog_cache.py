@@ -0,0 +1,121 @@
+import sys
+import os
+import asyncio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from starlette.requests import Request
+
+import db_events
+from catalog_cache import (
+    CatalogCache, CatalogEntry, LocalSharedBackend, catalog_cache, catalog_etag,
+    catalog_response, etag_matches
+)
+
+CATALOG = [{"id": 1, "name": "Ten sessions", "price": 300.0}]
+
+
+def request_with(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def load_counting(calls, content=CATALOG):
+    async def load():
+        calls.append(1)
+        return content
+    return load
+
+
+class TestCatalogCache:
+    """Tests for the versioned catalog cache"""
+
+    def test_second_fetch_is_a_hit(self):
+        cache, calls = CatalogCache(), []
+        first = asyncio.run(cache.fetch("available", load_counting(calls)))
+        second = asyncio.run(cache.fetch("available", load_counting(calls)))
+        assert second == first
+        assert len(calls) == 1
+        assert cache.stats()["hits"] == 1
+
+    def test_lru_evicts_oldest(self):
+        cache = CatalogCache(max_size=2)
+        for key in ("a", "b"):
+            cache.put(key, CATALOG, cache.version)
+        cache.get("a")
+        cache.put("c", CATALOG, cache.version)
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+
+    def test_expired_entry_is_reloaded(self):
+        cache, calls = CatalogCache(ttl=-1), []
+        asyncio.run(cache.fetch("available", load_counting(calls)))
+        asyncio.run(cache.fetch("available", load_counting(calls)))
+        assert len(calls) == 2
+
+    def test_load_racing_a_write_is_not_stored(self):
+        cache = CatalogCache()
+
+        async def load():
+            cache.invalidate()
+            return CATALOG
+
+        entry = asyncio.run(cache.fetch("available", load))
+        assert entry.body
+        assert cache.get("available") is None
+
+    def test_catalog_events_invalidate_global_cache(self):
+        catalog_cache.put("available", CATALOG, catalog_cache.version)
+        db_events.emit(db_events.VOUCHER_TYPE_CHANGED, voucher_type_id=1, organization_id=2)
+        assert catalog_cache.get("available") is None
+        catalog_cache.put("available", CATALOG, catalog_cache.version)
+        db_events.emit(db_events.ORGANIZATION_CHANGED, organization_id=2)
+        assert catalog_cache.get("available") is None
+
+
+class TestSharedBackend:
+    """Tests for sharing rendered catalogs between replicas"""
+
+    def test_other_replica_reads_shared_entry(self):
+        shared = LocalSharedBackend()
+        writer, reader = CatalogCache(shared=shared), CatalogCache(shared=shared)
+        entry = writer.put("available", CATALOG, writer.version)
+        assert reader.get("available") == entry
+        assert reader.stats()["shared_hits"] == 1
+
+    def test_writer_clears_shared_store(self):
+        shared = LocalSharedBackend()
+        writer, reader = CatalogCache(shared=shared), CatalogCache(shared=shared)
+        writer.put("available", CATALOG, writer.version)
+        writer.invalidate()
+        # The reader got the NOTIFY as well
+        reader.invalidate_local()
+        assert reader.get("available") is None
+
+
+class TestConditionalResponse:
+    """Tests for ETag / If-None-Match handling"""
+
+    def test_etag_depends_on_body_only(self):
+        assert catalog_etag(b"[1]") == catalog_etag(b"[1]")
+        assert catalog_etag(b"[1]") != catalog_etag(b"[2]")
+
+    @pytest.mark.parametrize("header,expected", [
+        (None, False), ('"abc"', True), ('W/"abc"', True), ('"x", "abc"', True), ("*", True), ('"x"', False),
+    ])
+    def test_etag_matches(self, header, expected):
+        assert etag_matches(header, '"abc"') is expected
+
+    def test_not_modified(self):
+        entry = CatalogEntry(catalog_etag(b"[]"), b"[]")
+        response = catalog_response(request_with(entry.etag), entry)
+        assert response.status_code == 304
+        assert response.body == b""
+        assert response.headers["etag"] == entry.etag
+
+    def test_full_response_carries_etag(self):
+        entry = CatalogEntry(catalog_etag(b"[]"), b"[]")
+        response = catalog_response(request_with('"stale"'), entry)
+        assert response.status_code == 200
+        assert response.body == b"[]"
+        assert response.headers["etag"] == entry.etag
@@ -0,0 +1,103 @@
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi import HTTPException, Response
+from starlette.requests import Request
+
+from conditional import build_validators, change_keys, conditional_get, is_not_modified
+
+EARLIER = datetime(2024, 5, 1, 8, 0, 0, tzinfo=timezone.utc)
+LATER = datetime(2024, 5, 1, 9, 30, 15, 500000, tzinfo=timezone.utc)
+COUNTERS = [("changes.users", 41, EARLIER), ("changes.organizations", 7, LATER)]
+
+
+def request_with(headers=None, path="/api/admin/users", query=""):
+    raw = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": query.encode(),
+                    "headers": raw})
+
+
+class TestBuildValidators:
+    """Tests for ETag / Last-Modified derivation from change counters"""
+
+    def test_weak_etag_independent_of_counter_order(self):
+        assert build_validators(COUNTERS).etag == build_validators(list(reversed(COUNTERS))).etag
+        assert build_validators(COUNTERS).etag.startswith('W/"')
+
+    def test_counter_change_changes_etag(self):
+        bumped = [("changes.users", 42, LATER), COUNTERS[1]]
+        assert build_validators(bumped).etag != build_validators(COUNTERS).etag
+
+    def test_scope_changes_etag(self):
+        assert build_validators(COUNTERS, "/a", 1).etag != build_validators(COUNTERS, "/a", 2).etag
+
+    def test_last_modified_is_newest_counter_rounded_up_to_seconds(self):
+        validators = build_validators(COUNTERS)
+        assert validators.last_modified == LATER.replace(microsecond=0) + timedelta(seconds=1)
+        assert validators.headers["Last-Modified"] == "Wed, 01 May 2024 09:30:16 GMT"
+
+    def test_whole_second_last_modified_is_kept(self):
+        assert build_validators([("changes.users", 1, EARLIER)]).last_modified == EARLIER
+
+    def test_no_counters_has_no_last_modified(self):
+        validators = build_validators([])
+        assert validators.last_modified is None
+        assert "Last-Modified" not in validators.headers
+
+    def test_change_keys(self):
+        assert change_keys(["users", "organizations"]) == ["changes.users", "changes.organizations"]
+
+
+class TestIsNotModified:
+    """Tests for If-None-Match / If-Modified-Since evaluation"""
+
+    def test_matching_etag(self):
+        validators = build_validators(COUNTERS)
+        assert is_not_modified(request_with({"If-None-Match": validators.etag}), validators)
+
+    def test_if_none_match_takes_precedence(self):
+        validators = build_validators(COUNTERS)
+        since = format_datetime(LATER, usegmt=True)
+        assert not is_not_modified(request_with({"If-None-Match": '"old"', "If-Modified-Since": since}),
+                                   validators)
+
+    @pytest.mark.parametrize("since", [LATER, LATER + timedelta(days=1), EARLIER])
+    def test_if_modified_since_alone_is_modified(self, since):
+        validators = build_validators(COUNTERS)
+        header = format_datetime(since, usegmt=True)
+        assert not is_not_modified(request_with({"If-Modified-Since": header}), validators)
+
+    def test_two_writes_in_the_same_second(self):
+        first = build_validators([("changes.users", 41, LATER)])
+        second = build_validators([("changes.users", 42, LATER + timedelta(microseconds=300000))])
+        assert first.last_modified == second.last_modified
+        cached = {"If-None-Match": first.etag, "If-Modified-Since": first.headers["Last-Modified"]}
+        assert not is_not_modified(request_with(cached), second)
+        assert not is_not_modified(request_with({"If-Modified-Since": first.headers["Last-Modified"]}), second)
+        assert is_not_modified(request_with({"If-None-Match": second.etag}), second)
+
+
+class TestConditionalGet:
+    """Tests for the 304 short-circuit"""
+
+    def test_sets_headers_when_modified(self):
+        response = Response()
+        headers = conditional_get(request_with(), response, COUNTERS, 5)
+        assert response.headers["etag"] == headers["ETag"]
+        assert response.headers["cache-control"] == "private, no-cache"
+
+    def test_raises_304_when_current(self):
+        etag = conditional_get(request_with(), None, COUNTERS, 5)["ETag"]
+        with pytest.raises(HTTPException) as exc:
+            conditional_get(request_with({"If-None-Match": etag}), None, COUNTERS, 5)
+        assert exc.value.status_code == 304
+        assert exc.value.headers["ETag"] == etag
+
+    def test_etag_is_per_user_and_url(self):
+        etag = conditional_get(request_with(), None, COUNTERS, 5)["ETag"]
+        assert conditional_get(request_with(), None, COUNTERS, 6)["ETag"] != etag
+        assert conditional_get(request_with(query="limit=5"), None, COUNTERS, 5)["ETag"] != etag
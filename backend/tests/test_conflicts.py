@@ -0,0 +1,57 @@
+import sys
+import os
+from datetime import date, datetime, time, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from availability import WeeklyAvailability
+from conflicts import TherapistSchedule, ScheduleConflictError, resolve_slot
+
+WORKDAYS = WeeklyAvailability.from_rules({
+    day: {"enabled": True, "start_time": "09:00", "end_time": "17:00"}
+    for day in ("monday", "tuesday", "wednesday", "thursday", "friday")
+})
+MONDAY = date(2030, 1, 7)
+
+
+def session(day, hour, minute=0, duration=60):
+    return {"id": hash((day, hour, minute)), "session_date": day,
+            "session_time": time(hour, minute), "duration_minutes": duration}
+
+
+class TestTherapistSchedule:
+    """Tests for in-process conflict checks"""
+
+    def test_overlap_and_group_seats(self):
+        schedule = TherapistSchedule([session(MONDAY, 10), session(MONDAY, 10)])
+        start = datetime.combine(MONDAY, time(10, 30))
+        assert schedule.conflicts(start, 60) == [(datetime.combine(MONDAY, time(10)),
+                                                  datetime.combine(MONDAY, time(11)))] * 2
+        group = datetime.combine(MONDAY, time(10))
+        assert schedule.conflicts(group, 60) == []
+        assert schedule.is_free(group, 60, capacity=3)
+        assert not schedule.is_free(group, 60, capacity=2)
+        assert schedule.is_free(datetime.combine(MONDAY, time(11)), 60)
+
+    def test_nearest_free_prefers_closest_then_later(self):
+        schedule = TherapistSchedule([session(MONDAY, 10), session(MONDAY, 11, 15)])
+        wanted = datetime.combine(MONDAY, time(10, 30))
+        assert schedule.nearest_free(wanted, 30) == datetime.combine(MONDAY, time(9, 30))
+        assert schedule.nearest_free(wanted, 60, not_before=wanted) == datetime.combine(MONDAY, time(12, 15))
+
+    def test_nearest_free_respects_booking_rules(self):
+        friday_evening = datetime.combine(MONDAY + timedelta(days=4), time(16, 30))
+        schedule = TherapistSchedule([session(MONDAY + timedelta(days=4), 15, 30, 90)])
+        suggestion = schedule.nearest_free(friday_evening, 60, availability=WORKDAYS, not_before=friday_evening)
+        assert suggestion == datetime.combine(MONDAY + timedelta(days=7), time(9))
+
+    def test_resolve_slot(self):
+        schedule = TherapistSchedule([session(MONDAY, 10)])
+        free = datetime.combine(MONDAY, time(14))
+        assert resolve_slot(schedule, free, 60, availability=WORKDAYS) == free
+        with pytest.raises(ScheduleConflictError) as excinfo:
+            resolve_slot(schedule, datetime.combine(MONDAY, time(10, 15)), 60, availability=WORKDAYS)
+        assert excinfo.value.suggestion == datetime.combine(MONDAY, time(11))
+        with pytest.raises(ScheduleConflictError, match="booking hours"):
+            resolve_slot(schedule, datetime.combine(MONDAY, time(18)), 60, availability=WORKDAYS)
@@ -0,0 +1,125 @@
+import pytest
+import sys
+import os
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2 import extensions
+from db_pool import ConnectionPool, PoolExhaustedError
+
+
+class FakeInfo:
+    def __init__(self):
+        self.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+
+class FakeCursor:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, query):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.info = FakeInfo()
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor()
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class TestConnectionPool:
+    """Tests for the pooled connection layer used by DatabaseV2"""
+
+    def test_prefills_min_size(self):
+        pool = ConnectionPool(FakeConnection, min_size=3, max_size=5)
+        stats = pool.stats()
+        assert stats["size"] == 3
+        assert stats["idle"] == 3
+        assert stats["in_use"] == 0
+
+    def test_unopened_pool_connects_on_demand(self):
+        pool = ConnectionPool(FakeConnection, min_size=2, max_size=3, open=False)
+        assert pool.stats()["size"] == 0
+        with pool.connection():
+            assert pool.stats()["size"] == 1
+        pool.open()
+        assert pool.stats()["size"] == 2
+        assert pool.stats()["idle"] == 2
+
+    def test_connection_is_returned_and_reused(self):
+        pool = ConnectionPool(FakeConnection, min_size=1, max_size=2)
+        with pool.connection() as first:
+            assert pool.stats()["in_use"] == 1
+        with pool.connection() as second:
+            assert second is first
+        assert pool.stats()["checkouts_total"] == 2
+
+    def test_open_transaction_is_rolled_back_on_return(self):
+        pool = ConnectionPool(FakeConnection, min_size=0, max_size=1)
+        with pool.connection() as conn:
+            conn.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+        assert conn.rollbacks == 1
+
+    def test_closed_connection_is_replaced(self):
+        pool = ConnectionPool(FakeConnection, min_size=1, max_size=1)
+        with pool.connection() as conn:
+            conn.close()
+        assert pool.stats()["size"] == 0
+        with pool.connection() as fresh:
+            assert fresh is not conn
+            assert not fresh.closed
+
+    def test_stale_idle_connection_is_replaced(self):
+        pool = ConnectionPool(FakeConnection, min_size=1, max_size=1, healthcheck_interval=0)
+        with pool.connection() as conn:
+            pass
+        conn.closed = 1
+        with pool.connection() as fresh:
+            assert fresh is not conn
+        assert pool.stats()["reconnects_total"] == 1
+
+    def test_exhaustion_times_out(self):
+        pool = ConnectionPool(FakeConnection, min_size=0, max_size=1, timeout=0.05)
+        held = pool.getconn()
+        with pytest.raises(PoolExhaustedError):
+            pool.getconn()
+        stats = pool.stats()
+        assert stats["exhausted_total"] == 1
+        assert stats["timeouts_total"] == 1
+        pool.putconn(held)
+
+    def test_waiter_gets_released_connection(self):
+        pool = ConnectionPool(FakeConnection, min_size=0, max_size=1, timeout=2)
+        held = pool.getconn()
+        result = {}
+
+        def waiter():
+            result["conn"] = pool.getconn()
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        pool.putconn(held)
+        thread.join(timeout=2)
+        assert result["conn"] is held
+
+    def test_unit_of_work_shares_one_connection(self):
+        pool = ConnectionPool(FakeConnection, min_size=0, max_size=2)
+        with pool.unit_of_work() as bound:
+            with pool.connection() as a, pool.connection() as b:
+                assert a is bound and b is bound
+            assert pool.stats()["in_use"] == 1
+        assert pool.stats()["in_use"] == 0
@@ -0,0 +1,82 @@
+import sys
+import os
+import asyncio
+from contextlib import asynccontextmanager
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import db_events
+from db_v2_async import AsyncDatabaseV2
+
+USER = {"id": 7, "email": "ann@example.com", "name": "Ann", "role": "client",
+        "organization_id": 3, "is_active": True}
+
+
+class FakeCursor:
+    def __init__(self, connection, rows):
+        self.connection = connection
+        self.rows = rows
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def execute(self, query, params=None):
+        self.connection.executed.append(" ".join(query.split()))
+
+    async def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.executed = []
+
+    def cursor(self, row_factory=None):
+        return FakeCursor(self, self.rows)
+
+
+def database_with(rows):
+    db = AsyncDatabaseV2()
+    conn = FakeConnection(rows)
+
+    @asynccontextmanager
+    async def connection():
+        yield conn
+    db.connection = connection
+    return db, conn
+
+
+@pytest.fixture
+def user_changes():
+    changes = []
+    listener = lambda user_id, **_: changes.append(user_id)
+    db_events.subscribe(db_events.USER_CHANGED, listener)
+    yield changes
+    db_events._listeners[db_events.USER_CHANGED].remove(listener)
+
+
+class TestAsyncUserWrites:
+    """Tests for the async backend's user write paths"""
+
+    def test_update_user_emits_user_changed(self, user_changes):
+        db, conn = database_with([USER, {**USER, "role": "therapist"}])
+        updated = asyncio.run(db.update_user(7, updated_by=1, role="therapist"))
+        assert updated["role"] == "therapist"
+        assert any(sql.startswith("UPDATE users SET role = %s") for sql in conn.executed)
+        assert user_changes == [7]
+
+    def test_delete_user_emits_user_changed(self, user_changes):
+        db, conn = database_with([USER])
+        assert asyncio.run(db.delete_user(7, deleted_by=1)) is True
+        assert "DELETE FROM users WHERE id = %s" in conn.executed
+        assert user_changes == [7]
+
+    def test_missing_user_emits_nothing(self, user_changes):
+        db, _ = database_with([])
+        assert asyncio.run(db.delete_user(7, deleted_by=1)) is False
+        assert user_changes == []
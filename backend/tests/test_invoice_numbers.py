@@ -0,0 +1,63 @@
+import pytest
+import sys
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2.extras import RealDictCursor
+
+try:
+    import db_v2 as db_v2_module
+    from db_v2 import db_v2
+except Exception as e:  # pragma: no cover - depends on a running database
+    pytest.skip(f"PostgreSQL not available: {e}", allow_module_level=True)
+
+PARALLEL_PURCHASES = 300
+
+
+@pytest.fixture
+def series(monkeypatch):
+    """Private per-organization series so the test never touches real counters"""
+    monkeypatch.setattr(db_v2_module, "INVOICE_NUMBERING", "organization")
+    organization_id = random.randint(900000, 999999)
+    yield organization_id
+    with db_v2.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM invoice_counters WHERE organization_id = %s", (organization_id,))
+        conn.commit()
+
+
+def allocate(organization_id, commit=True):
+    conn = db_v2.pool.getconn()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            number = db_v2._generate_invoice_number(cur, organization_id)
+        if commit:
+            conn.commit()
+            return number
+        conn.rollback()
+        return None
+    finally:
+        db_v2.pool.putconn(conn)
+
+
+class TestInvoiceNumberAllocator:
+    """Tests for the invoice_counters allocator under concurrency"""
+
+    def test_parallel_allocations_are_unique_and_gap_free(self, series):
+        with ThreadPoolExecutor(max_workers=50) as executor:
+            numbers = list(executor.map(lambda _: allocate(series), range(PARALLEL_PURCHASES)))
+
+        year = datetime.now().year
+        expected = {f"INV-{year}-{series}-{n:05d}" for n in range(1, PARALLEL_PURCHASES + 1)}
+        assert len(set(numbers)) == PARALLEL_PURCHASES
+        assert set(numbers) == expected
+
+    def test_rolled_back_allocation_is_reused(self, series):
+        first = allocate(series)
+        assert allocate(series, commit=False) is None
+        second = allocate(series)
+        assert first.endswith("-00001")
+        assert second.endswith("-00002")
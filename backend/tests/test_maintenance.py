@@ -0,0 +1,111 @@
+import sys
+import os
+from datetime import date, datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audit import ENSURE_AUDIT_PARTITIONS_SQL, AUDIT_PARTITIONS_AHEAD
+from maintenance import MaintenanceScheduler, JOBS, RAN_TODAY_SQL, INSERT_RUN_SQL
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+        self._result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append((sql, params))
+        if "pg_try_advisory_lock" in sql:
+            self._result = [(self.conn.lock_free,)]
+        elif sql == RAN_TODAY_SQL:
+            self._result = [(job,) for job in self.conn.ran_today]
+        elif sql == INSERT_RUN_SQL:
+            self.conn.runs.append(params)
+        elif sql == ENSURE_AUDIT_PARTITIONS_SQL:
+            self._result = [(2,)]
+
+    def fetchone(self):
+        return self._result[0]
+
+    def fetchall(self):
+        return self._result
+
+
+class FakeConnection:
+    def __init__(self, lock_free=True, ran_today=()):
+        self.lock_free = lock_free
+        self.ran_today = list(ran_today)
+        self.executed = []
+        self.runs = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def counting_job(rows):
+    def job(cur):
+        cur.execute("job")
+        return rows
+    return job
+
+
+def failing_job(cur):
+    raise RuntimeError("boom")
+
+
+class TestMaintenanceScheduler:
+    """Tests for leader election, run bookkeeping and job metrics"""
+
+    def make(self):
+        return MaintenanceScheduler(run_at="02:00", jobs=[("a", counting_job(3)), ("b", failing_job),
+                                                          ("c", counting_job(0))])
+
+    def test_runs_jobs_and_records_them(self):
+        scheduler = self.make()
+        conn = FakeConnection()
+        assert scheduler.run(conn, date(2030, 1, 1)) == {"a": 3, "b": 0, "c": 0}
+        assert [(run[0], run[4], run[5]) for run in conn.runs] == [("a", 3, None), ("b", 0, "boom"), ("c", 0, None)]
+        assert conn.rollbacks == 1
+        assert "pg_advisory_unlock" in conn.executed[-1][0]
+        stats = scheduler.stats()
+        assert stats["a"]["runs_total"] == 1 and stats["a"]["rows_total"] == 3
+        assert stats["b"]["failures_total"] == 1
+        assert stats["c"]["last_duration_seconds"] >= 0
+
+    def test_skips_when_not_leader(self):
+        conn = FakeConnection(lock_free=False)
+        assert self.make().run(conn) is None
+        assert len(conn.executed) == 1 and not conn.runs
+
+    def test_skips_jobs_done_today_unless_forced(self):
+        conn = FakeConnection(ran_today=["a", "c"])
+        assert self.make().run(conn) == {"b": 0}
+        assert self.make().run(FakeConnection(ran_today=["a"]), force=True, only=["a"]) == {"a": 3}
+
+    def test_due(self):
+        scheduler = self.make()
+        assert not scheduler.due(datetime(2030, 1, 1, 1, 59))
+        assert scheduler.due(datetime(2030, 1, 1, 2, 0))
+        scheduler._last_checked = date(2030, 1, 1)
+        assert not scheduler.due(datetime(2030, 1, 1, 23, 0))
+        assert scheduler.due(datetime(2030, 1, 2, 2, 30))
+
+    def test_nightly_run_creates_audit_partitions(self):
+        conn = FakeConnection()
+        scheduler = MaintenanceScheduler(jobs=JOBS[:1])
+        assert scheduler.run(conn) == {"audit_partitions": 2}
+        assert (ENSURE_AUDIT_PARTITIONS_SQL, (AUDIT_PARTITIONS_AHEAD,)) in conn.executed
@@ -0,0 +1,134 @@
+import sys
+import os
+import asyncio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from metrics import (
+    Counter, Gauge, Histogram, Registry, MetricsMiddleware, instrument_methods,
+    DB_QUERY_ERRORS, DB_QUERY_LATENCY, REQUEST_LATENCY, REQUESTS_IN_FLIGHT, UNMATCHED_ROUTE
+)
+
+
+class TestMetricTypes:
+    """Tests for counters, gauges and histograms"""
+
+    def test_counter_render(self):
+        counter = Counter("jobs_total", "Jobs", ("kind",))
+        counter.inc("a")
+        counter.inc("a", amount=2)
+        assert counter.render() == ["# HELP jobs_total Jobs", "# TYPE jobs_total counter",
+                                    'jobs_total{kind="a"} 3']
+
+    def test_gauge_inc_dec(self):
+        gauge = Gauge("in_flight", "In flight")
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        assert gauge.value() == 1
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, "/x")
+        cumulative, count, total = histogram.snapshot("/x")
+        assert cumulative == [2, 3, 4]
+        assert count == 4
+        assert total == pytest.approx(3.65)
+        lines = histogram.render()
+        assert 'latency_seconds_bucket{route="/x",le="0.1"} 2' in lines
+        assert 'latency_seconds_bucket{route="/x",le="+Inf"} 4' in lines
+        assert 'latency_seconds_count{route="/x"} 4' in lines
+
+    def test_label_values_are_escaped(self):
+        counter = Counter("c_total", "C", ("path",))
+        counter.inc('a"b')
+        assert counter.render()[-1] == 'c_total{path="a\\"b"} 1'
+
+
+class TestStatsCollector:
+    """Tests for exporting component stats() dicts"""
+
+    def test_numeric_fields_only(self):
+        registry = Registry()
+        registry.register_stats("pool", lambda: {"size": 3, "checkouts_total": 10, "mode": "sync", "ok": True})
+        text = registry.render()
+        assert "# TYPE pool_size gauge\npool_size 3" in text
+        assert "# TYPE pool_checkouts_total counter\npool_checkouts_total 10" in text
+        assert "mode" not in text and "pool_ok" not in text
+
+    def test_labelled_stats(self):
+        registry = Registry()
+        registry.register_stats("job", lambda: {"expire": {"runs_total": 2}, "warn": {"runs_total": 1}},
+                                label="job")
+        text = registry.render()
+        assert 'job_runs_total{job="expire"} 2' in text
+        assert 'job_runs_total{job="warn"} 1' in text
+        assert text.count("# TYPE job_runs_total") == 1
+
+    def test_failing_collector_is_skipped(self):
+        registry = Registry()
+        registry.register_stats("broken", lambda: 1 / 0)
+        assert registry.render() == "\n"
+
+
+class TestInstrumentMethods:
+    """Tests for per-method data layer timing"""
+
+    def test_sync_and_async_methods(self):
+        class FakeDatabase:
+            def fake_get_thing(self):
+                return 1
+
+            async def fake_list_things(self):
+                return [1]
+
+            def fake_fail(self):
+                raise RuntimeError("boom")
+
+            def connection(self):
+                return "conn"
+
+        instrument_methods(FakeDatabase, exclude=("connection",))
+        db = FakeDatabase()
+        assert db.fake_get_thing() == 1
+        assert asyncio.run(db.fake_list_things()) == [1]
+        with pytest.raises(RuntimeError):
+            db.fake_fail()
+        assert db.connection() == "conn"
+        assert DB_QUERY_LATENCY.snapshot("fake_get_thing")[1] == 1
+        assert DB_QUERY_LATENCY.snapshot("fake_list_things")[1] == 1
+        assert DB_QUERY_ERRORS.value("fake_fail") == 1
+        assert DB_QUERY_LATENCY.snapshot("connection")[1] == 0
+
+
+class TestMetricsMiddleware:
+    """Tests for request latency by route template"""
+
+    def make_client(self):
+        app = FastAPI()
+
+        @app.get("/metrics-test/items/{item_id}")
+        def get_item(item_id: int):
+            return {"id": item_id}
+
+        app.add_middleware(MetricsMiddleware)
+        return TestClient(app)
+
+    def test_route_template_label(self):
+        client = self.make_client()
+        before = REQUEST_LATENCY.snapshot("GET", "/metrics-test/items/{item_id}", 200)[1]
+        assert client.get("/metrics-test/items/1").status_code == 200
+        assert client.get("/metrics-test/items/2").status_code == 200
+        assert REQUEST_LATENCY.snapshot("GET", "/metrics-test/items/{item_id}", 200)[1] == before + 2
+        assert REQUESTS_IN_FLIGHT.value("GET") == 0
+
+    def test_unmatched_paths_share_one_label(self):
+        client = self.make_client()
+        before = REQUEST_LATENCY.snapshot("GET", UNMATCHED_ROUTE, 404)[1]
+        client.get("/nope/1")
+        client.get("/nope/2")
+        assert REQUEST_LATENCY.snapshot("GET", UNMATCHED_ROUTE, 404)[1] == before + 2
@@ -0,0 +1,103 @@
+import sys
+import os
+import time as timer
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import MockDatabase, IndexedTable
+from models import User, UserRole, SessionStatus
+
+
+def make_user(user_id, email, role=UserRole.CLIENT):
+    return User(id=user_id, email=email, name=user_id, role=role)
+
+
+class TestIndexedTable:
+    """Tests for secondary index maintenance"""
+
+    def test_lookup_by_indexed_field(self):
+        users = IndexedTable("email", "role")
+        users["a"] = make_user("a", "a@x.com")
+        users["b"] = make_user("b", "b@x.com", UserRole.THERAPIST)
+        assert users.first(email="b@x.com")["id"] == "b"
+        assert [u["id"] for u in users.find(role=[UserRole.CLIENT, UserRole.THERAPIST])] == ["a", "b"]
+        assert users.exists(email="a@x.com", role=UserRole.CLIENT)
+        assert not users.exists(email="a@x.com", role=UserRole.THERAPIST)
+
+    def test_index_follows_updates_and_deletes(self):
+        users = IndexedTable("email")
+        users["a"] = make_user("a", "old@x.com")
+        users.update_row("a", email="new@x.com")
+        assert users.first(email="old@x.com") is None
+        assert users.first(email="new@x.com")["id"] == "a"
+        del users["a"]
+        assert users.first(email="new@x.com") is None
+        assert users._indexes["email"] == {}
+
+    def test_find_by_id_order_and_paging(self):
+        users = IndexedTable("email")
+        for i in range(5):
+            users[f"u{i}"] = make_user(f"u{i}", f"{i}@x.com")
+        assert [u["id"] for u in users.find(id=["u3", "u1", "missing"], order_by=["-email"])] == ["u3", "u1"]
+        assert [u["id"] for u in users.find(order_by=["email"], limit=2, offset=1)] == ["u1", "u2"]
+
+    def test_rows_are_dict_copies(self):
+        users = IndexedTable("email")
+        users["a"] = make_user("a", "a@x.com")
+        row = users.get("a")
+        assert isinstance(row, dict) and row["password_hash"] is None
+        row["email"] = "changed@x.com"
+        assert users.first(email="a@x.com") is not None
+        assert users.update_row("missing", email="x") is None
+
+    def test_row_factory(self):
+        users = IndexedTable("email", row_factory=lambda row: User(**row))
+        users["a"] = make_user("a", "a@x.com")
+        assert isinstance(users.get("a"), User) and users.get("a").email == "a@x.com"
+        assert [u.id for u in users.find(email="a@x.com")] == ["a"]
+
+
+class TestMockDatabase:
+    """Tests for the in-memory engine's PostgresDatabase-compatible queries"""
+
+    def test_seeded_lookups(self):
+        db = MockDatabase()
+        assert db.get_user_by_email("client@example.com").id == "client-1"
+        reservations = db.get_user_reservations("client-1")
+        assert len(reservations) == 1
+        code = db.voucher_codes.get(reservations[0]["voucher_code_id"])
+        assert db.get_voucher_code_by_code(code["code"]) == code
+        assert code["status"] == "used" and code["used_count"] == 1
+        assert db.vouchers.first(client_id="client-1")["id"] == code["voucher_id"]
+
+    def test_therapist_sessions_and_clients(self):
+        db = MockDatabase()
+        sessions = db.get_therapist_sessions("therapist-1")
+        assert len(sessions) == 10
+        assert sessions == sorted(sessions, key=lambda s: (s["scheduled_date"], s["scheduled_time"]))
+        assert db.get_therapist_sessions("therapist-2") == []
+
+        db.sessions.update_row(sessions[0]["id"], status=SessionStatus.CANCELLED)
+        clients = db.get_therapist_clients("therapist-1")
+        assert [c["id"] for c in clients] == ["client-1"]
+        assert clients[0]["total_sessions"] == 10
+        assert clients[0]["active_reservations"] == 1
+        assert clients[0]["next_session"]["date"] == sessions[1]["scheduled_date"].isoformat()
+
+    def test_batch_loader_hides_password_hash(self):
+        db = MockDatabase()
+        loader = db.batch_loader()
+        assert loader.load("users", "client-1") == {
+            "id": "client-1", "email": "client@example.com", "name": "Test Client", "role": UserRole.CLIENT
+        }
+
+    def test_code_lookup_at_volume(self):
+        db = MockDatabase(seed_mock_data=False)
+        for _ in range(1000):
+            db.create_voucher(regular_codes=100, backup_codes=0)
+        codes = [c["code"] for c in list(db.voucher_codes.values())[::1000]]
+        assert len(db.voucher_codes) == 100000
+
+        start = timer.perf_counter()
+        for code in codes * 100:
+            assert db.get_voucher_code_by_code(code) is not None
+        assert timer.perf_counter() - start < 1.0
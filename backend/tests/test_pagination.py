@@ -0,0 +1,49 @@
+import pytest
+import sys
+import os
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pagination import encode_cursor, decode_cursor, keyset_page, cursor_for, plan_rows
+
+
+class TestCursor:
+    """Tests for opaque keyset cursors"""
+
+    def test_round_trip(self):
+        cursor = encode_cursor([datetime(2024, 5, 1, 12, 30), 42])
+        assert decode_cursor(cursor, 2) == ["2024-05-01T12:30:00", 42]
+
+    def test_cursor_is_url_safe(self):
+        cursor = encode_cursor(["Ąę?/+ name", 1])
+        assert all(c.isalnum() or c in "-_" for c in cursor)
+
+    def test_malformed_cursor(self):
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor", 2)
+        with pytest.raises(ValueError):
+            decode_cursor(encode_cursor([1, 2, 3]), 2)
+
+
+class TestKeysetPage:
+    """Tests for keyset query composition"""
+
+    def test_first_page(self):
+        query, params = keyset_page("SELECT * FROM t WHERE 1=1", [], ("name", "id"), None, limit=11)
+        assert query == "SELECT * FROM t WHERE 1=1 ORDER BY name ASC, id ASC LIMIT %s"
+        assert params == [11]
+
+    def test_following_page_descending(self):
+        query, params = keyset_page("SELECT * FROM t WHERE a = %s", [5], ("u.name", "u.id"),
+                                    ["Kowalski", 7], descending=True, limit=3)
+        assert query == ("SELECT * FROM t WHERE a = %s AND (u.name, u.id) < (%s, %s)"
+                         " ORDER BY u.name DESC, u.id DESC LIMIT %s")
+        assert params == [5, "Kowalski", 7, 3]
+
+    def test_cursor_for_strips_table_alias(self):
+        cursor = cursor_for({"name": "Anna", "id": 3}, ("u.name", "u.id"))
+        assert decode_cursor(cursor, 2) == ["Anna", 3]
+
+    def test_plan_rows(self):
+        assert plan_rows({"QUERY PLAN": [{"Plan": {"Plan Rows": 1234}}]}) == 1234
+        assert plan_rows(('[{"Plan": {"Plan Rows": 5}}]',)) == 5
@@ -0,0 +1,55 @@
+import pytest
+import sys
+import os
+import asyncio
+import threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passwords import PasswordHasher, PasswordHasherBusy
+
+
+@pytest.fixture
+def hasher():
+    """Cheap cost factor so the tests stay fast"""
+    h = PasswordHasher(workers=2, max_queue=2, rounds=4)
+    yield h
+    h.shutdown()
+
+
+class TestPasswordHasher:
+    """Tests for the bounded bcrypt worker pool"""
+
+    def test_hash_and_verify(self, hasher):
+        hashed = hasher.hash("Secret123")
+        assert hashed.startswith("$2b$04$")
+        assert hasher.verify("Secret123", hashed)
+        assert not hasher.verify("wrong", hashed)
+
+    def test_verify_rejects_malformed_hash(self, hasher):
+        assert hasher.verify("Secret123", "not-a-bcrypt-hash") is False
+
+    def test_async_api(self, hasher):
+        async def run():
+            hashed = await hasher.hash_async("Secret123")
+            return await hasher.verify_async("Secret123", hashed)
+        assert asyncio.run(run())
+
+    def test_stats_track_calls(self, hasher):
+        hashed = hasher.hash("Secret123")
+        hasher.verify("Secret123", hashed)
+        stats = hasher.stats()
+        assert stats["hash_total"] == 1
+        assert stats["verify_total"] == 1
+        assert stats["rounds"] == 4
+        assert stats["seconds_max"] > 0
+
+    def test_full_queue_is_rejected(self, hasher):
+        release = threading.Event()
+        hasher._hash = lambda password: release.wait(2) and "hashed"
+        futures = [hasher._submit("hash", hasher._hash, "x") for _ in range(4)]
+        with pytest.raises(PasswordHasherBusy):
+            hasher.hash("x")
+        assert hasher.stats()["rejected_total"] == 1
+        release.set()
+        for future in futures:
+            assert future.result(timeout=2) == "hashed"
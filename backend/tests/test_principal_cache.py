@@ -0,0 +1,98 @@
+import pytest
+import sys
+import os
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from collections import namedtuple
+
+import db_events
+from catalog_cache import CatalogCache, CatalogListener
+from principal_cache import PrincipalCache, principal_cache
+from models import User
+
+
+Notify = namedtuple("Notify", "pid channel payload")
+
+
+def make_user(user_id="1"):
+    return User(id=user_id, email=f"user{user_id}@example.com", name="Test User",
+                role="client", created_at="2024-01-01T00:00:00")
+
+
+class TestPrincipalCache:
+    """Tests for the authenticated-principal cache"""
+
+    def test_hit_requires_same_token(self):
+        cache = PrincipalCache(ttl=60, max_size=10)
+        cache.set("1", cache.fingerprint("token-a"), make_user(), cache.version)
+        assert cache.get("1", cache.fingerprint("token-a")).email == "user1@example.com"
+        assert cache.get("1", cache.fingerprint("token-b")) is None
+
+    def test_entries_expire(self):
+        cache = PrincipalCache(ttl=0.01, max_size=10)
+        cache.set("1", "fp", make_user(), cache.version)
+        time.sleep(0.02)
+        assert cache.get("1", "fp") is None
+        assert cache.stats()["size"] == 0
+
+    def test_least_recently_used_is_evicted(self):
+        cache = PrincipalCache(ttl=60, max_size=2)
+        cache.set("1", "fp", make_user("1"), cache.version)
+        cache.set("2", "fp", make_user("2"), cache.version)
+        cache.get("1", "fp")
+        cache.set("3", "fp", make_user("3"), cache.version)
+        assert cache.get("2", "fp") is None
+        assert cache.get("1", "fp") is not None
+
+    def test_invalidate_drops_all_tokens_of_user(self):
+        cache = PrincipalCache(ttl=60, max_size=10)
+        cache.set("1", "fp-a", make_user("1"), cache.version)
+        cache.set("1", "fp-b", make_user("1"), cache.version)
+        cache.set("2", "fp-a", make_user("2"), cache.version)
+        cache.invalidate(1)
+        assert cache.get("1", "fp-a") is None
+        assert cache.get("1", "fp-b") is None
+        assert cache.get("2", "fp-a") is not None
+
+    def test_load_racing_an_invalidation_is_not_stored(self):
+        cache = PrincipalCache(ttl=60, max_size=10)
+        version = cache.version
+        cache.invalidate("1")  # the user is written while the request loads it
+        assert not cache.set("1", "fp", make_user("1"), version)
+        assert cache.get("1", "fp") is None
+        assert cache.set("1", "fp", make_user("1"), cache.version)
+
+    def test_clear_bumps_version(self):
+        cache = PrincipalCache(ttl=60, max_size=10)
+        version = cache.version
+        cache.clear()
+        assert not cache.set("1", "fp", make_user("1"), version)
+
+    def test_user_changed_event_invalidates_global_cache(self):
+        principal_cache.set("42", "fp", make_user("42"), principal_cache.version)
+        db_events.emit(db_events.USER_CHANGED, user_id=42)
+        assert principal_cache.get("42", "fp") is None
+
+
+class TestReplicaInvalidation:
+    """Tests for invalidation relayed from other replicas over NOTIFY"""
+
+    def make_listener(self, cache):
+        listener = CatalogListener(CatalogCache(ttl=60))
+        listener.listen(db_events.USER_CHANNEL, cache.invalidate, cache.clear)
+        return listener
+
+    def test_user_notification_drops_that_user(self):
+        cache = PrincipalCache(ttl=60, max_size=10)
+        cache.set("7", "fp", make_user("7"), cache.version)
+        cache.set("8", "fp", make_user("8"), cache.version)
+        self.make_listener(cache).dispatch([Notify(1, db_events.USER_CHANNEL, "7")])
+        assert cache.get("7", "fp") is None
+        assert cache.get("8", "fp") is not None
+
+    def test_catalog_notification_leaves_principals(self):
+        cache = PrincipalCache(ttl=60, max_size=10)
+        cache.set("7", "fp", make_user("7"), cache.version)
+        self.make_listener(cache).dispatch([Notify(1, db_events.CATALOG_CHANNEL, "{}")])
+        assert cache.get("7", "fp") is not None
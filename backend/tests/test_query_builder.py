@@ -0,0 +1,60 @@
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from query_builder import select_query, exists_query, update_query, where_clause
+
+COLUMNS = ("id", "client_id", "therapy_class_id", "created_at")
+
+
+class TestWhereClause:
+    """Tests for whitelisted filter composition"""
+
+    def test_scalar_list_and_null_filters(self):
+        clause, params = where_clause({"client_id": 5, "id": [1, 2], "therapy_class_id": None}, COLUMNS)
+        assert clause == " WHERE client_id = %s AND id = ANY(%s) AND therapy_class_id IS NULL"
+        assert params == [5, [1, 2]]
+
+    def test_no_filters(self):
+        assert where_clause({}, COLUMNS) == ("", [])
+
+    def test_unknown_column_is_rejected(self):
+        with pytest.raises(ValueError):
+            where_clause({"client_id = 1 OR 1": 1}, COLUMNS)
+
+
+class TestSelectQuery:
+    """Tests for bounded SELECT and EXISTS queries"""
+
+    def test_order_limit_offset(self):
+        query, params = select_query("vouchers", "*", {"client_id": 3}, COLUMNS,
+                                     order_by=["-created_at", "id"], limit=10, offset=20)
+        assert query == ("SELECT * FROM vouchers WHERE client_id = %s "
+                         "ORDER BY created_at DESC, id ASC LIMIT %s OFFSET %s")
+        assert params == [3, 10, 20]
+
+    def test_unknown_sort_column_is_rejected(self):
+        with pytest.raises(ValueError):
+            select_query("vouchers", "*", {}, COLUMNS, order_by=["-password_hash"])
+
+    def test_exists(self):
+        query, params = exists_query("reservations", {"therapy_class_id": 7}, COLUMNS)
+        assert query == "SELECT EXISTS (SELECT 1 FROM reservations WHERE therapy_class_id = %s) AS found"
+        assert params == [7]
+
+
+class TestUpdateQuery:
+    """Tests for whitelisted UPDATE queries"""
+
+    def test_update_returning(self):
+        query, params = update_query("vouchers", {"client_id": 5, "activated_at": "now"}, {"id": 9},
+                                     ("client_id", "activated_at"), COLUMNS)
+        assert query == "UPDATE vouchers SET client_id = %s, activated_at = %s WHERE id = %s RETURNING *"
+        assert params == [5, "now", 9]
+
+    def test_column_outside_writable_is_rejected(self):
+        with pytest.raises(ValueError):
+            update_query("vouchers", {"created_at": "now"}, {"id": 9}, ("client_id",), COLUMNS)
+        with pytest.raises(ValueError):
+            update_query("vouchers", {}, {"id": 9}, ("client_id",), COLUMNS)
@@ -0,0 +1,125 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from psycopg2.extras import RealDictCursor
+
+from query_log import QueryLog, LoggedCursorMixin, explainable, fingerprint, logged_cursor_class
+
+
+class TestFingerprint:
+    """Tests for statement normalisation"""
+
+    def test_parameters_and_literals_stripped(self):
+        assert fingerprint("SELECT * FROM users WHERE id = %s AND role = 'admin' LIMIT 20") == \
+            "SELECT * FROM users WHERE id = ? AND role = ? LIMIT ?"
+
+    def test_named_parameters_and_whitespace(self):
+        assert fingerprint("SELECT *\n  FROM users\n WHERE 1=1  AND email = %(email)s") == \
+            "SELECT * FROM users WHERE ?=? AND email = ?"
+
+    def test_in_lists_collapse(self):
+        assert fingerprint("SELECT 1 FROM t WHERE id IN (%s, %s, %s)") == \
+            fingerprint("SELECT 1 FROM t WHERE id IN (3, 4)") == "SELECT ? FROM t WHERE id IN (...)"
+
+    def test_comments_and_identifiers_with_digits(self):
+        assert fingerprint("SELECT v2.x -- trailing\nFROM audit_logs_y2024m05 v2 /* hint */") == \
+            "SELECT v2.x FROM audit_logs_y2024m05 v2"
+
+    def test_same_shape_different_values_share_fingerprint(self):
+        assert fingerprint("UPDATE users SET name = 'a' WHERE id = 1") == \
+            fingerprint("UPDATE users SET name = 'it''s' WHERE id = 42")
+
+
+class TestExplainable:
+    """Tests for which slow statements may be re-run under EXPLAIN ANALYZE"""
+
+    @pytest.mark.parametrize("query", [
+        "SELECT * FROM users WHERE 1=1 AND organization_id = %s",
+        "  with recent AS (SELECT 1) SELECT * FROM recent",
+    ])
+    def test_reads(self, query):
+        assert explainable(query)
+
+    @pytest.mark.parametrize("query", [
+        "UPDATE users SET is_active = false WHERE id = %s",
+        "WITH moved AS (DELETE FROM t RETURNING *) SELECT * FROM moved",
+        "SELECT * FROM client_vouchers WHERE id = %s FOR UPDATE",
+        "SELECT nextval('invoice_seq')",
+        "SELECT pg_notify(%s, %s)",
+        "SELECT pg_try_advisory_lock(%s)",
+    ])
+    def test_side_effects(self, query):
+        assert not explainable(query)
+
+
+class TestQueryLog:
+    """Tests for per-fingerprint statistics and the top-N report"""
+
+    def test_aggregates_by_fingerprint(self):
+        log = QueryLog(slow_ms=1000)
+        log.record("SELECT * FROM users WHERE id = %s", 0.002, 1)
+        log.record("SELECT * FROM users WHERE id = 7", 0.004, 1)
+        log.record("SELECT * FROM organizations", 0.001, 30)
+        report = log.report()
+        assert [row["calls"] for row in report] == [2, 1]
+        assert report[0]["total_ms"] == pytest.approx(6.0)
+        assert report[0]["max_ms"] == pytest.approx(4.0)
+        assert report[0]["mean_ms"] == pytest.approx(3.0)
+        assert report[1]["rows_total"] == 30
+
+    def test_order_and_limit(self):
+        log = QueryLog(slow_ms=1000)
+        for _ in range(5):
+            log.record("SELECT 1 FROM a", 0.001, 1)
+        log.record("SELECT 1 FROM b", 0.5, 1)
+        assert log.report("calls", 1)[0]["fingerprint"] == "SELECT ? FROM a"
+        assert log.report("max", 1)[0]["fingerprint"] == "SELECT ? FROM b"
+
+    def test_slow_statement_is_logged(self, capsys):
+        log = QueryLog(slow_ms=100)
+        assert not log.record("SELECT * FROM users", 0.05, 3)
+        assert capsys.readouterr().out == ""
+        log.record("SELECT * FROM users WHERE email = 'x@y'", 0.25, 0)
+        assert "Slow query (250 ms, 0 rows): SELECT * FROM users WHERE email = ?" in capsys.readouterr().out
+        assert log.stats()["slow_total"] == 1
+        assert log.report()[0]["last_slow_at"] is not None
+
+    def test_explain_sampling(self):
+        always = QueryLog(slow_ms=10, explain_sample=1.0)
+        assert always.record("SELECT * FROM users", 0.5, 1)
+        assert not always.record("UPDATE users SET name = %s", 0.5, 1)
+        assert not always.record("SELECT * FROM users", 0.001, 1)
+        assert not QueryLog(slow_ms=10, explain_sample=0).record("SELECT * FROM users", 0.5, 1)
+
+    def test_plan_attached_to_fingerprint(self):
+        log = QueryLog(slow_ms=10, explain_sample=1.0)
+        log.record("SELECT * FROM users WHERE id = %s", 0.5, 1)
+        log.add_plan("SELECT * FROM users WHERE id = %s", "Seq Scan on users")
+        assert log.report()[0]["plan"] == "Seq Scan on users"
+        assert log.stats()["explains_total"] == 1
+
+    def test_eviction_drops_least_total_time(self):
+        log = QueryLog(slow_ms=1000, max_fingerprints=2)
+        log.record("SELECT 1 FROM a", 0.3, 1)
+        log.record("SELECT 1 FROM b", 0.1, 1)
+        log.record("SELECT 1 FROM c", 0.2, 1)
+        assert sorted(row["fingerprint"] for row in log.report()) == ["SELECT ? FROM a", "SELECT ? FROM c"]
+        assert log.stats()["evicted_total"] == 1
+
+    def test_reset(self):
+        log = QueryLog()
+        log.record("SELECT 1", 0.001, 1)
+        log.reset()
+        assert log.report() == []
+
+
+class TestLoggedCursorClass:
+    """Tests for wrapping the requested cursor_factory"""
+
+    def test_keeps_requested_cursor_class(self):
+        cursor_class = logged_cursor_class(RealDictCursor)
+        assert issubclass(cursor_class, RealDictCursor)
+        assert cursor_class.__mro__[1] is LoggedCursorMixin
+        assert logged_cursor_class(RealDictCursor) is cursor_class
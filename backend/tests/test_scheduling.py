@@ -0,0 +1,58 @@
+import pytest
+import sys
+import os
+from datetime import date, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduling import schedule_dates, recurrence, parse_blackout_dates
+from database import MockDatabase
+
+
+class TestScheduleDates:
+    """Tests for arithmetic recurring schedules"""
+
+    def test_weekly_from_mid_week(self):
+        # 2024-01-03 is a Wednesday; Monday sessions start the following week
+        assert schedule_dates(date(2024, 1, 3), 3, [0]) == [date(2024, 1, 8), date(2024, 1, 15), date(2024, 1, 22)]
+
+    def test_start_day_is_included(self):
+        assert schedule_dates(date(2024, 1, 1), 1, [0]) == [date(2024, 1, 1)]
+
+    def test_biweekly_and_custom(self):
+        assert schedule_dates(date(2024, 1, 1), 3, *recurrence("biweekly", day_of_week=2)) == [
+            date(2024, 1, 3), date(2024, 1, 17), date(2024, 1, 31)]
+        weekdays, interval = recurrence("custom", custom_days=[1, 3, 5])
+        assert schedule_dates(date(2024, 1, 3), 4, weekdays, interval) == [
+            date(2024, 1, 3), date(2024, 1, 5), date(2024, 1, 8), date(2024, 1, 10)]
+
+    def test_blackout_dates_are_skipped(self):
+        blackout = parse_blackout_dates("2024-12-23, 2024-12-30")
+        assert schedule_dates(date(2024, 12, 16), 3, [0], blackout=blackout) == [
+            date(2024, 12, 16), date(2025, 1, 6), date(2025, 1, 13)]
+
+    def test_year_long_schedule(self):
+        dates = schedule_dates(date(2024, 1, 1), 52, [4])
+        assert len(dates) == 52
+        assert all(d.weekday() == 4 for d in dates)
+        assert dates[-1] == date(2024, 12, 27)
+
+    def test_invalid_recurrence(self):
+        with pytest.raises(ValueError):
+            recurrence("custom")
+        with pytest.raises(ValueError):
+            recurrence("monthly", day_of_week=0)
+
+
+class TestMockReservation:
+    """Tests for reservation creation in the in-memory engine"""
+
+    def test_sessions_follow_schedule(self):
+        db = MockDatabase()
+        voucher = db.create_voucher()
+        therapy_class = db.therapy_classes.get("class-3")  # Fridays 10:00
+        reservation = db.create_reservation(voucher["codes"][0], therapy_class, "client-1", date(2024, 1, 1),
+                                            sessions=52, blackout=frozenset({date(2024, 1, 5)}))
+        assert len(reservation["sessions"]) == 52
+        assert reservation["sessions"][0]["scheduled_date"] == date(2024, 1, 12)
+        assert all(s["scheduled_time"] == time(10, 0) for s in reservation["sessions"])
+        assert len(db.sessions.find(reservation_id=reservation["id"])) == 52
@@ -0,0 +1,56 @@
+import sys
+import os
+import json
+from datetime import datetime
+from decimal import Decimal
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import serializers
+from models_v2 import Organization, UserResponse, VoucherType
+from serializers import RowSerializer, serializer_for, dumps
+
+NOW = datetime(2024, 5, 1, 12, 30, 15, 120000)
+RULES = {day: {"enabled": day == "monday", "start_time": "09:00" if day == "monday" else None,
+               "end_time": "17:00" if day == "monday" else None}
+         for day in ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")}
+
+
+def pydantic_json(model, row):
+    return json.loads(model.model_validate(row).model_dump_json())
+
+
+class TestRowSerializer:
+    """Tests for tuple-to-response mapping"""
+
+    def test_matches_response_model(self):
+        columns = ("id", "email", "name", "phone", "role", "organization_id", "organization_name",
+                   "is_organization_owner", "is_active", "approved_at", "approved_by", "last_login",
+                   "created_at", "updated_at")
+        row = (7, "a@b.c", "Ann", None, "therapist", 2, "Org", False, True, NOW, 1, None, NOW, NOW)
+        item = serializer_for(UserResponse, columns)(row)
+        assert json.loads(dumps(item)) == pydantic_json(UserResponse, dict(zip(columns, row)))
+
+    def test_decimal_and_json_columns(self):
+        columns = ("id", "organization_id", "name", "session_name", "description", "total_sessions",
+                   "backup_sessions", "session_duration_minutes", "max_clients_per_session", "frequency",
+                   "custom_days", "price", "validity_days", "booking_rules", "is_active", "deactivated_at",
+                   "created_at", "updated_at")
+        row = (1, 2, "Ten", "Session", None, 10, 1, 50, 1, "weekly", None, Decimal("450.50"), 90,
+               RULES, True, None, NOW, NOW)
+        item = RowSerializer(VoucherType, columns)(row)
+        assert item["price"] == 450.5 and isinstance(item["price"], float)
+        assert json.loads(dumps(item)) == pydantic_json(VoucherType, dict(zip(columns, row)))
+
+    def test_optional_fields_default_and_required_fields_checked(self):
+        columns = ("id", "name", "slug", "is_active", "created_at", "updated_at")
+        item = RowSerializer(Organization, columns)((1, "Org", "org", True, NOW, NOW))
+        assert item["owner"] is None and item["address"] is None
+        with pytest.raises(ValueError, match="slug"):
+            RowSerializer(Organization, ("id", "name"))
+
+    def test_stdlib_fallback(self, monkeypatch):
+        monkeypatch.setattr(serializers, "orjson", None)
+        body = dumps({"at": NOW, "price": Decimal("1.5"), "name": "Zoë"})
+        assert body == '{"at":"2024-05-01T12:30:15.120000","price":1.5,"name":"Zoë"}'.encode("utf-8")
@@ -0,0 +1,98 @@
+import sys
+import os
+import time as timer
+from datetime import date, datetime, time, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_events
+from interval_index import IntervalIndex
+from slots import expand_rule_template, busy_index, free_slots, slot_templates
+
+WEEKDAY_RULE = {"enabled": True, "start_time": "09:00", "end_time": "17:00"}
+
+
+def voucher_type(**overrides):
+    vt = {
+        "id": 1, "organization_id": 1, "updated_at": datetime(2024, 1, 1),
+        "session_duration_minutes": 60, "max_clients_per_session": 1, "frequency": "weekly",
+        "custom_days": None,
+        "booking_rules": {day: WEEKDAY_RULE for day in ("monday", "tuesday", "wednesday", "thursday", "friday")},
+    }
+    vt.update(overrides)
+    return vt
+
+
+class TestIntervalIndex:
+    """Tests for overlap queries"""
+
+    def test_overlapping(self):
+        index = IntervalIndex([(10, 20), (15, 16), (30, 40), (0, 5)])
+        assert index.overlapping(12, 18) == [(10, 20), (15, 16)]
+        assert index.count_overlapping(20, 30) == 0
+        assert index.count_overlapping(0, 100) == 4
+        index.add(25, 35)
+        assert index.overlapping(20, 30) == [(25, 35)]
+
+    def test_long_interval_is_found_from_far_start(self):
+        index = IntervalIndex([(0, 100), (50, 51)])
+        assert index.count_overlapping(90, 95) == 1
+
+
+class TestRuleTemplate:
+    """Tests for booking rule expansion"""
+
+    def test_back_to_back_slots(self):
+        template = expand_rule_template(voucher_type(session_duration_minutes=90))
+        assert template.week[0] == (time(9), time(10, 30), time(12), time(13, 30), time(15))
+        assert template.week[5] == ()
+
+    def test_custom_days_limit_weekdays(self):
+        template = expand_rule_template(voucher_type(frequency="custom", custom_days=[2, 4]))
+        assert [bool(day) for day in template.week] == [False, True, False, True, False, False, False]
+
+    def test_cache_invalidated_on_voucher_type_change(self):
+        slot_templates.invalidate()
+        vt = voucher_type(id=99)
+        first = slot_templates.get(vt)
+        assert slot_templates.get(vt) is first
+        db_events.emit(db_events.VOUCHER_TYPE_CHANGED, voucher_type_id=99)
+        assert slot_templates.get(vt) is not first
+        assert slot_templates.get(voucher_type(id=99, updated_at=datetime(2024, 2, 1))) is not first
+
+
+class TestFreeSlots:
+    """Tests for subtracting booked sessions from candidate slots"""
+
+    def test_booked_sessions_are_subtracted(self):
+        template = expand_rule_template(voucher_type())
+        therapists = [{"id": 1, "name": "A"}, {"id": 2, "name": "B"}]
+        busy = busy_index([{"therapist_id": 1, "session_date": date(2030, 1, 7),
+                            "session_time": time(9, 30), "duration_minutes": 60}])
+        slots = free_slots(template, therapists, busy, date(2030, 1, 7), date(2030, 1, 7), now=datetime(2030, 1, 1))
+        taken = {(s["therapist_id"], s["time"]) for s in slots}
+        assert len(slots) == 14
+        assert (1, "09:00") not in taken and (1, "10:00") not in taken
+        assert (2, "09:00") in taken
+
+    def test_group_capacity_and_past_slots(self):
+        template = expand_rule_template(voucher_type(max_clients_per_session=3))
+        busy = busy_index([{"therapist_id": 1, "session_date": date(2030, 1, 7),
+                            "session_time": time(9), "duration_minutes": 60}])
+        slots = free_slots(template, [{"id": 1, "name": "A"}], busy, date(2030, 1, 7), date(2030, 1, 7),
+                           now=datetime(2030, 1, 7, 8, 30))
+        assert slots[0]["time"] == "09:00" and slots[0]["spots_left"] == 2 and slots[0]["type"] == "group"
+        later = free_slots(template, [{"id": 1, "name": "A"}], busy, date(2030, 1, 7), date(2030, 1, 7),
+                           now=datetime(2030, 1, 7, 12))
+        assert later[0]["time"] == "13:00"
+
+    def test_ninety_day_window_is_fast(self):
+        template = expand_rule_template(voucher_type(session_duration_minutes=30))
+        therapists = [{"id": i, "name": f"T{i}"} for i in range(20)]
+        start = date(2030, 1, 1)
+        sessions = [{"therapist_id": i % 20, "session_date": start + timedelta(days=i % 90),
+                     "session_time": time(9 + i % 8), "duration_minutes": 50} for i in range(5000)]
+        began = timer.perf_counter()
+        busy = busy_index(sessions)
+        slots = free_slots(template, therapists, busy, start, start + timedelta(days=89), now=datetime(2029, 1, 1))
+        assert timer.perf_counter() - began < 0.5
+        assert slots
@@ -0,0 +1,143 @@
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Serve the v1 routes from the in-memory engine; must be set before main is imported
+os.environ["V1_DATABASE"] = "memory"
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import auth
+import db_events
+import main
+from auth import create_access_token
+from database import MockDatabase
+from principal_cache import principal_cache
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fresh = MockDatabase()
+    monkeypatch.setattr(main, "db", fresh)
+    monkeypatch.setattr(auth, "db", fresh)
+    return fresh
+
+
+@pytest.fixture
+def client(db):
+    # Not used as a context manager: startup would open the Postgres pools
+    return TestClient(main.app)
+
+
+def headers(user_id):
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': user_id})}"}
+
+
+class TestV1Principal:
+    """Tests for get_current_user against the v1 engine"""
+
+    def test_user_changed_during_load_is_not_cached(self, db, monkeypatch):
+        principal_cache.clear()
+        token = create_access_token(data={"sub": "client-1"})
+        load = db.users.get
+
+        def racing_get(user_id, default=None):
+            user = load(user_id, default)
+            db_events.emit(db_events.USER_CHANGED, user_id=user_id)
+            return user
+
+        monkeypatch.setattr(db.users, "get", racing_get)
+        assert asyncio.run(auth.get_current_user(token)).id == "client-1"
+        assert principal_cache.get("client-1", principal_cache.fingerprint(token)) is None
+
+        monkeypatch.setattr(db.users, "get", load)
+        asyncio.run(auth.get_current_user(token))
+        assert principal_cache.get("client-1", principal_cache.fingerprint(token)).id == "client-1"
+
+
+class TestV1ClientRoutes:
+    """Tests for the v1 client routes with V1_DATABASE=memory"""
+
+    def test_voucher_status(self, client):
+        response = client.get("/client/voucher-status", headers=headers("client-1"))
+        assert response.status_code == 200
+        body = response.json()
+        assert body["has_voucher"] is True
+        assert body["regular_codes"] == {"total": 10, "used": 1, "remaining": 9}
+        assert body["backup_codes"] == {"total": 2, "used": 0, "remaining": 2}
+
+    def test_reservations_and_sessions(self, client):
+        reservations = client.get("/client/reservations", headers=headers("client-1"))
+        assert reservations.status_code == 200
+        assert [r["therapy_class_id"] for r in reservations.json()] == ["class-1"]
+        sessions = client.get("/client/sessions", headers=headers("client-1")).json()
+        assert len(sessions) == 10
+        assert sessions == sorted(sessions, key=lambda s: (s["scheduled_date"], s["scheduled_time"]))
+
+    def test_activate_code_and_book(self, client, db):
+        voucher = client.post("/admin/vouchers", headers=headers("admin-1"),
+                              json={"regular_codes_count": 2, "backup_codes_count": 0}).json()
+        code = voucher["codes"][0]["code"]
+        activated = client.post(f"/client/activate-code/{code}", headers=headers("client-1"))
+        assert activated.status_code == 200
+        assert activated.json()["voucher"]["client_id"] == "client-1"
+        assert db.vouchers.get(voucher["id"])["client_id"] == "client-1"
+
+        booked = client.post("/client/reservations", headers=headers("client-1"), json={
+            "voucher_code": code, "therapy_class_id": "class-2", "start_date": "2030-01-01", "sessions_count": 3
+        })
+        assert booked.status_code == 200
+        assert len(booked.json()["sessions"]) == 3
+        assert db.get_voucher_code_by_code(code)["status"] == "used"
+
+
+class TestV1TherapistRoutes:
+    """Tests for the v1 therapist routes with V1_DATABASE=memory"""
+
+    def test_sessions_with_details(self, client):
+        response = client.get("/therapist/sessions-with-details", headers=headers("therapist-1"))
+        assert response.status_code == 200
+        sessions = response.json()
+        assert len(sessions) == 10
+        assert sessions[0]["therapy_class"]["id"] == "class-1"
+        assert sessions[0]["client"] == {"id": "client-1", "email": "client@example.com",
+                                         "name": "Test Client", "role": "client"}
+
+    def test_sessions_and_clients(self, client):
+        assert len(client.get("/therapist/sessions", headers=headers("therapist-1")).json()) == 10
+        clients = client.get("/therapist/clients", headers=headers("therapist-1")).json()
+        assert [c["id"] for c in clients] == ["client-1"]
+
+    def test_reschedule_and_notes(self, client, db):
+        session_id = db.get_therapist_sessions("therapist-1")[0]["id"]
+        moved = client.put(f"/therapist/sessions/{session_id}/reschedule", headers=headers("therapist-1"),
+                           json={"new_date": "2030-02-01", "new_time": "09:00:00", "reason": "holiday"})
+        assert moved.status_code == 200
+        assert moved.json()["status"] == "rescheduled"
+        assert moved.json()["therapist_notes"] == "Rescheduled: holiday"
+
+        noted = client.put(f"/therapist/sessions/{session_id}/notes", headers=headers("therapist-1"),
+                           params={"notes": "went well"})
+        assert noted.status_code == 200
+        assert db.sessions.get(session_id)["therapist_notes"] == "went well"
+
+    def test_other_therapists_session_is_forbidden(self, client, db):
+        session_id = db.get_therapist_sessions("therapist-1")[0]["id"]
+        response = client.put(f"/therapist/sessions/{session_id}/notes", headers=headers("therapist-2"),
+                              params={"notes": "x"})
+        assert response.status_code == 403
+
+
+class TestV1AdminRoutes:
+    """Tests for the v1 admin and catalog routes with V1_DATABASE=memory"""
+
+    def test_lists(self, client):
+        assert len(client.get("/admin/users", headers=headers("admin-1")).json()) == 4
+        assert len(client.get("/admin/vouchers", headers=headers("admin-1")).json()) == 1
+        classes = client.get("/therapy-classes", params={"therapist_id": "therapist-2", "limit": 2}).json()
+        assert [c["id"] for c in classes] == ["class-5", "class-2"]
+        assert client.get("/therapy-classes/class-3").json()["name"] == "Art Therapy"
+        assert client.get("/therapy-classes/missing").status_code == 404
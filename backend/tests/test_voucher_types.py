@@ -52,7 +52,7 @@ class TestVoucherTypeConfiguration:
             headers={"Authorization": f"Bearer {owner_token}"}
         )
         assert response.status_code == 200
-        voucher_types = response.json()
+        voucher_types = response.json()["items"]
         assert isinstance(voucher_types, list)
         for vt in voucher_types:
             assert vt["organization_id"] == org_id
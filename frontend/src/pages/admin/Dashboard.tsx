@@ -51,30 +51,15 @@ const Dashboard: React.FC = () => {
   const fetchDashboardStats = async () => {
     try {
       setLoading(true);
-      // Fetch users
-      const usersResponse = await api.get('/api/admin/users');
-      const users = usersResponse.data;
-      
-      // Calculate user stats
-      const activeUsers = users.filter((u: any) => u.is_active).length;
-      const pendingUsers = users.filter((u: any) => !u.is_active && !u.approved_at).length;
-      
-      // Try to fetch organizations (may not exist yet)
-      let orgCount = 0;
-      try {
-        const orgsResponse = await api.get('/api/admin/organizations');
-        orgCount = orgsResponse.data.length;
-      } catch (e) {
-        // Organizations endpoint might not exist
-      }
-
+      // Counters are aggregated server-side
+      const { data } = await api.get('/api/admin/stats');
       setStats({
-        totalUsers: users.length,
-        activeUsers: activeUsers,
-        pendingApprovals: pendingUsers,
-        organizations: orgCount,
-        voucherTypes: 0, // Will be implemented later
-        activeVouchers: 0, // Will be implemented later
+        totalUsers: data.users_total,
+        activeUsers: data.users_active,
+        pendingApprovals: data.users_pending,
+        organizations: data.organizations_active,
+        voucherTypes: data.voucher_types_active,
+        activeVouchers: data.vouchers_active,
       });
     } catch (error) {
       console.error('Failed to fetch dashboard stats:', error);
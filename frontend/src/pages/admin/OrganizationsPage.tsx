@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../../contexts/AuthContext';
-import api from '../../services/api';
+import api, { fetchAllPages } from '../../services/api';
 import {
   Card,
   CardContent,
@@ -108,8 +108,7 @@ const OrganizationsPage: React.FC = () => {
     try {
       setLoading(true);
       setError(null);
-      const response = await api.get('/api/admin/organizations');
-      setOrganizations(response.data);
+      setOrganizations(await fetchAllPages('/api/admin/organizations'));
     } catch (error: any) {
       console.error('Failed to fetch organizations:', error);
       setError('Failed to load organizations. Please try again.');
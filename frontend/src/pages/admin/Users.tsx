@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import api from '../../services/api';
+import api, { fetchAllPages } from '../../services/api';
 import {
   Card,
   CardContent,
@@ -92,9 +92,9 @@ const UsersPage: React.FC = () => {
   const fetchUsers = async () => {
     try {
       setLoading(true);
-      const response = await api.get('/api/admin/users');
-      setUsers(response.data);
-      setFilteredUsers(response.data);
+      const users = await fetchAllPages('/api/admin/users');
+      setUsers(users);
+      setFilteredUsers(users);
     } catch (error) {
       console.error('Failed to fetch users:', error);
       // Use mock data if API fails
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../../contexts/AuthContext';
-import api from '../../services/api';
+import api, { fetchAllPages } from '../../services/api';
 import {
   Card,
   CardContent,
@@ -105,8 +105,7 @@ const UsersPage: React.FC = () => {
   const fetchUsers = async () => {
     try {
       setLoading(true);
-      const response = await api.get('/api/admin/users');
-      setUsers(response.data);
+      setUsers(await fetchAllPages('/api/admin/users'));
     } catch (err: any) {
       setError(err.response?.data?.detail || 'Failed to fetch users');
     } finally {
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { useAuth } from '../../contexts/AuthContext';
-import api from '../../services/api';
+import api, { fetchAllPages } from '../../services/api';
 import {
   Card,
   CardContent,
@@ -119,13 +119,13 @@ const VoucherTypesPage: React.FC = () => {
       setError(null);
       
       // Fetch voucher types and organizations in parallel
-      const [typesResponse, orgsResponse] = await Promise.all([
+      const [typesResponse, orgs] = await Promise.all([
         api.get('/api/admin/voucher-types').catch(() => ({ data: [] })),
-        api.get('/api/admin/organizations')
+        fetchAllPages('/api/admin/organizations')
       ]);
       
       setVoucherTypes(typesResponse.data);
-      setOrganizations(orgsResponse.data);
+      setOrganizations(orgs);
     } catch (error: any) {
       console.error('Failed to fetch data:', error);
       setError('Failed to load voucher types. Please try again.');
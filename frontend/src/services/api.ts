@@ -35,4 +35,25 @@ api.interceptors.response.use(
   }
 );
 
+// Keyset-paginated list response (see PaginatedResponse in the backend)
+export interface Page<T> {
+  items: T[];
+  total?: number | null;
+  per_page: number;
+  next_cursor?: string | null;
+  total_is_estimate?: boolean;
+}
+
+// Follow next_cursor until the whole list has been loaded
+export async function fetchAllPages<T = any>(url: string, params: Record<string, any> = {}): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | null | undefined;
+  do {
+    const response = await api.get<Page<T>>(url, { params: { ...params, limit: 200, cursor } });
+    items.push(...response.data.items);
+    cursor = response.data.next_cursor;
+  } while (cursor);
+  return items;
+}
+
 export default api;
\ No newline at end of file